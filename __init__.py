@@ -1,20 +1,41 @@
 """Python App Packer"""
 
-from toolbox.qt import qtbase
+import os
 from .version import __version__
 from .version import __update_timestamp__
 
+ROOT = os.path.dirname(os.path.abspath(__file__))
 
-q_appcfg = qtbase.QAppConfig(
-    name = "Python 应用打包器",
-    name_en = "Python App Packer",
-    date=__update_timestamp__,
-    version = __version__,
-    fontsize = 11,
-    slot="py_app_packer",
-    APPCFG_DICT=qtbase.get_appcfg(__file__),
-    FF=__file__,
-)
 
-ROOT = q_appcfg.ROOT
-APPCFG = q_appcfg.APPCFG_DICT
+def _load_appcfg() -> dict:
+    """读取包目录下的 appcfg.yaml（不依赖 Qt，命令行模式直接使用）"""
+    import yaml
+    with open(os.path.join(ROOT, "appcfg.yaml"), "r", encoding="utf-8") as f:
+        return yaml.safe_load(f) or {}
+
+
+def _make_q_appcfg():
+    # 只有界面需要 QAppConfig，导入 toolbox.qt 会加载 PySide6
+    from toolbox.qt import qtbase
+    return qtbase.QAppConfig(
+        name = "Python 应用打包器",
+        name_en = "Python App Packer",
+        date=__update_timestamp__,
+        version = __version__,
+        fontsize = 11,
+        slot="py_app_packer",
+        APPCFG_DICT=__getattr__("APPCFG"),
+        FF=__file__,
+    )
+
+
+def __getattr__(name):
+    """APPCFG / q_appcfg 在首次访问时才创建，import py_app_packer（如只读取版本号）不加载 yaml 和 Qt"""
+    if name == "APPCFG":
+        value = _load_appcfg()
+    elif name == "q_appcfg":
+        value = _make_q_appcfg()
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    globals()[name] = value
+    return value
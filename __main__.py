@@ -1,4 +1,9 @@
-from . import app
+import sys
 
 if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        # 带子命令时走命令行模式，不启动 Qt 界面
+        from . import cli
+        sys.exit(cli.main())
+    from . import app
     app.main()
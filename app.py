@@ -1,13 +1,20 @@
 import sys
+from typing import TYPE_CHECKING
 from .ui.ui_form import Ui_MainWindow
 from toolbox.qt import qtbase_future as qtbase
 from toolbox.core.log import LogHelper, printc
 from . import q_appcfg, APPCFG
+from . import pkgmodel
+from . import releasequeue
+from .pkgmodel import PackageFilterProxy, PackageTableModel, ReleaseQueueModel
+from .worker import PipelineWorker, ScanWorker
 from loguru import logger
-from PySide6 import QtWidgets
-from datetime import date, datetime
+from PySide6 import QtCore, QtWidgets
 import os
-import shutil
+import time
+
+if TYPE_CHECKING:
+    from . import watch
 
 
 class PackerApp(qtbase.QApp):
@@ -19,6 +26,7 @@ class PackerApp(qtbase.QApp):
         self.ui: Ui_MainWindow
 
     def init_after(self):
+        from . import packer
         self.set_main_app(appcfg=q_appcfg, is_set_theme=0)
         self.set_logger(logger=logger)
         # ✅ 让窗口本身获得焦点（接收键盘事件）
@@ -29,17 +37,35 @@ class PackerApp(qtbase.QApp):
         qtbase.bind_clicked(ui.btn_scan, self.on_scan)
         qtbase.bind_clicked(ui.btn_root_select, self.on_root_select)
         qtbase.bind_clicked(ui.btn_update_version, self.on_update_version)
+        qtbase.bind_clicked(ui.btn_update_version_bulk, self.on_update_versions_bulk)
         qtbase.bind_clicked(ui.btn_update_major, self.on_bump_major)
         qtbase.bind_clicked(ui.btn_update_minor, self.on_bump_minor)
         qtbase.bind_clicked(ui.btn_update_patch, self.on_bump_patch)
         qtbase.bind_clicked(ui.btn_release, self.on_release)
         qtbase.bind_clicked(ui.btn_zip, self.on_zip)
         qtbase.bind_clicked(ui.btn_open_dist_dir, self.on_open_dist_dir)
-
-        # 配置模块列表表头（图标 / 包名 / 路径 / 完整版本号 / 更新时间），路径列隐藏，仅内部使用
+        qtbase.bind_clicked(ui.btn_delta, self.on_delta)
+        qtbase.bind_clicked(ui.btn_cancel, self.on_cancel)
+        qtbase.bind_clicked(ui.btn_queue_zip, self.on_queue_zip)
+        qtbase.bind_clicked(ui.btn_queue_clear, self.on_queue_clear)
+        ui.is_stream_release.setChecked(bool(APPCFG.get('is_stream_release', 0)))
+
+        # 后台任务：输出区只保留最近若干行，定时批量刷新，避免逐行刷新界面
+        self._worker: PipelineWorker | None = None
+        ui.log_output.setMaximumBlockCount(packer.OUTPUT_RING_LINES)
+        self._log_timer = QtCore.QTimer(self)
+        self._log_timer.setInterval(100)
+        self._log_timer.timeout.connect(self._flush_worker_output)
+
+        # 模块列表：模型 + 排序/过滤代理（图标 / 包名 / 路径 / 完整版本号 / 更新时间），路径列隐藏，仅内部使用
+        self.pkg_model = PackageTableModel(self)
+        self.pkg_proxy = PackageFilterProxy(self)
+        self.pkg_proxy.setSourceModel(self.pkg_model)
         table = ui.table_mod
-        table.setColumnCount(5)
-        table.setHorizontalHeaderLabels(["", "包名", "路径", "版本号", "更新时间"])
+        table.setModel(self.pkg_proxy)
+        table.setSortingEnabled(True)
+        table.sortByColumn(pkgmodel.COL_NAME, QtCore.Qt.SortOrder.AscendingOrder)
+        table.verticalHeader().setVisible(False)
         header = table.horizontalHeader()
         # 第一列（图标）固定宽度，第二列（包名）按内容自适应宽度，第四列（版本号）按内容，第五列（更新时间）占用剩余空间
         header.setSectionResizeMode(0, QtWidgets.QHeaderView.ResizeMode.Fixed)
@@ -48,59 +74,60 @@ class PackerApp(qtbase.QApp):
         header.setSectionResizeMode(2, QtWidgets.QHeaderView.ResizeMode.ResizeToContents)
         header.setSectionResizeMode(3, QtWidgets.QHeaderView.ResizeMode.ResizeToContents)
         header.setSectionResizeMode(4, QtWidgets.QHeaderView.ResizeMode.Stretch)
-        table.setColumnHidden(2, True)  # 路径列隐藏
+        table.setColumnHidden(pkgmodel.COL_PATH, True)  # 路径列隐藏
         table.setSelectionBehavior(QtWidgets.QAbstractItemView.SelectionBehavior.SelectRows)
-        table.setSelectionMode(QtWidgets.QAbstractItemView.SelectionMode.SingleSelection)
-        table.itemSelectionChanged.connect(self.on_mod_selected)
-
-        self.ui.btn_scan.click()
+        # 可多选（Ctrl / Shift），选中的包一起加入发布队列
+        table.setSelectionMode(QtWidgets.QAbstractItemView.SelectionMode.ExtendedSelection)
+        table.selectionModel().selectionChanged.connect(lambda *_: self.on_mod_selected())
+        ui.mod_filter.textChanged.connect(self.pkg_proxy.setFilterFixedString)
+
+        # 发布队列：并发上限默认按 CPU 核数和发布目录所在磁盘估算，见 releasequeue.default_limit
+        limit = int(APPCFG.get('release_queue_limit', 0) or 0) or releasequeue.default_limit(
+            os.path.dirname(os.path.abspath(ui.root_path.text().strip() or os.getcwd())))
+        self.release_queue = releasequeue.ReleaseQueue(limit)
+        self._queue_workers: dict[releasequeue.ReleaseJob, PipelineWorker] = {}
+        self._queue_batch: list[releasequeue.ReleaseJob] = []  # 队列从空闲开始后加入的任务，全部结束时汇总提示
+        self.queue_model = ReleaseQueueModel(self.release_queue, self)
+        queue_table = ui.table_queue
+        queue_table.setModel(self.queue_model)
+        queue_table.verticalHeader().setVisible(False)
+        queue_header = queue_table.horizontalHeader()
+        for col in range(3):
+            queue_header.setSectionResizeMode(col, QtWidgets.QHeaderView.ResizeMode.ResizeToContents)
+        queue_header.setSectionResizeMode(3, QtWidgets.QHeaderView.ResizeMode.Stretch)
+        queue_table.setSelectionBehavior(QtWidgets.QAbstractItemView.SelectionBehavior.SelectRows)
+        ui.queue_limit.setValue(limit)
+        ui.queue_limit.valueChanged.connect(self.on_queue_limit_changed)
+
+        # 监视模式：QFileSystemWatcher（inotify）或轮询触发，去抖后在后台线程中增量更新 dist/live_<包名>
+        self._live: "watch.LiveBuild | None" = None
+        self._live_worker: PipelineWorker | None = None
+        self._live_pending = False
+        self._fs_watcher = QtCore.QFileSystemWatcher(self)
+        self._fs_watcher.directoryChanged.connect(self._on_live_changed)
+        self._fs_watcher.fileChanged.connect(self._on_live_changed)
+        self._live_debounce = QtCore.QTimer(self)
+        self._live_debounce.setSingleShot(True)
+        self._live_debounce.setInterval(int(APPCFG.get('watch_debounce_ms', 300) or 0))
+        self._live_debounce.timeout.connect(self._run_live_update)
+        self._live_poll = QtCore.QTimer(self)
+        self._live_poll.timeout.connect(self._on_live_changed)
+        ui.btn_watch.toggled.connect(self.on_watch_toggled)
+
+        # 窗口显示后再开始扫描，不阻塞首屏
+        self._scan_worker: ScanWorker | None = None
+        QtCore.QTimer.singleShot(0, self.on_scan)
 
     def _scan_packages(self, root_path: str):
-        """
-        扫描 root_path 下第一层级子文件夹中包含 __init__.py 的包（不递归，排除 tests）
-        返回: list[tuple[str, str, str]]，每个元素为 (包名, 路径, 类型)
-        类型: 'runnable' 表示可运行模块（同时有 __init__.py 和 __main__.py），'normal' 表示普通模块（只有 __init__.py）
-        """
-        packages: list[tuple[str, str, str]] = []
-        root_path = os.path.abspath(root_path)
-
-        # 只遍历第一层级的子文件夹，不递归
-        try:
-            entries = os.listdir(root_path)
-        except OSError:
-            return packages
-
-        for entry in entries:
-            # 排除 tests 文件夹
-            if entry.lower() == "tests":
-                continue
-            
-            dirpath = os.path.join(root_path, entry)
-            # 只处理文件夹
-            if not os.path.isdir(dirpath):
-                continue
-            
-            # 检查该文件夹中是否有 __init__.py
-            init_file = os.path.join(dirpath, "__init__.py")
-            if not os.path.isfile(init_file):
-                continue
-            
-            # 获取包名（文件夹名）
-            pkg_name = entry
-            
-            # 判断类型：同时有 __main__.py 则为可运行模块，否则为普通模块
-            main_file = os.path.join(dirpath, "__main__.py")
-            pkg_type = "runnable" if os.path.isfile(main_file) else "normal"
-            
-            packages.append((pkg_name, dirpath, pkg_type))
-
-        return packages
+        """扫描 root_path 下的包（深度与排除规则读取 appcfg.yaml），见 packer.scan_packages"""
+        from . import packer, scanner
+        return packer.scan_packages(root_path, scanner.ScanOptions.from_cfg(APPCFG))
 
     # ---------- 版本号工具函数 ----------
 
     # ---------- 模块选择 & 版本读取 ----------
     def _get_selected_row(self):
-        """返回当前选中行索引，未选中则返回 -1"""
+        """返回当前选中行在模型中的行号（已换算掉排序/过滤），未选中则返回 -1"""
         table = self.ui.table_mod
         sel_model = table.selectionModel()
         if not sel_model:
@@ -108,23 +135,29 @@ class PackerApp(qtbase.QApp):
         rows = sel_model.selectedRows()
         if not rows:
             return -1
-        return rows[0].row()
+        return self.pkg_proxy.mapToSource(rows[0]).row()
+
+    def _get_selected_rows(self) -> list[int]:
+        """返回全部选中行在模型中的行号（按表格中的显示顺序）"""
+        sel_model = self.ui.table_mod.selectionModel()
+        if not sel_model:
+            return []
+        rows = sorted(sel_model.selectedRows(), key=lambda index: index.row())
+        return [self.pkg_proxy.mapToSource(index).row() for index in rows]
 
     def _get_row_info(self, row: int):
-        """根据行号获取 (包名, 路径)，任一为空则返回 (None, None)"""
-        table = self.ui.table_mod
-        name_item = table.item(row, 1)  # 包名列现在是第2列（索引1）
-        path_item = table.item(row, 2)  # 路径列现在是第3列（索引2）
-        if not name_item or not path_item:
+        """根据模型行号获取 (包名, 路径)，任一为空则返回 (None, None)"""
+        record = self.pkg_model.record(row)
+        if not record:
             return None, None
-        pkg_name = name_item.text().strip()
-        pkg_path = path_item.text().strip()
+        pkg_name, pkg_path = record[0].strip(), record[1].strip()
         if not pkg_name or not pkg_path:
             return None, None
         return pkg_name, pkg_path
 
     def _version_file_path(self, pkg_path: str) -> str:
-        return os.path.join(pkg_path, "version.py")
+        from . import packer
+        return packer.version_file_path(pkg_path)
 
     def _read_version_from_file(self, version_file: str):
         """兼容旧接口：仅返回 __version__，失败返回 None"""
@@ -133,59 +166,31 @@ class PackerApp(qtbase.QApp):
 
     def _read_version_info(self, version_file: str) -> tuple[str | None, str | None]:
         """从 version.py 中读取 (__version__, __update_timestamp__)，任一不存在则为 None"""
-        if not os.path.isfile(version_file):
-            return None, None
-        try:
-            ns: dict = {}
-            with open(version_file, "r", encoding="utf-8") as f:
-                code = f.read()
-            exec(code, ns)
-            v = ns.get("__version__")
-            ts = ns.get("__update_timestamp__")
-            return (str(v) if v is not None else None,
-                    str(ts) if ts is not None else None)
-        except Exception as e:  # noqa: BLE001
-            logger.exception(f"读取版本文件失败: {version_file}, err={e}")
-            return None, None
+        from . import packer
+        return packer.read_version_info(version_file)
 
     def _default_version(self) -> str:
-        today = date.today().strftime("%Y%m%d")
-        return f"0.0.1.post{today}"
+        from . import packer
+        return packer.default_version()
 
     def _split_version(self, full_version: str) -> tuple[str, str]:
         """拆分完整版本号为 (主版本, 后缀)，如 0.1.6.post20260114 -> ('0.1.6', '20260114')"""
-        if not full_version:
-            return "", ""
-        parts = full_version.split(".post", 1)
-        base = parts[0]
-        suffix = parts[1] if len(parts) > 1 else ""
-        return base, suffix
+        from . import packer
+        return packer.split_version(full_version)
 
     def _write_version_file(self, version_file: str, full_version: str) -> str:
         """写入 version.py，包含版本号和更新时间，返回写入的时间戳字符串"""
-        ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        os.makedirs(os.path.dirname(version_file), exist_ok=True)
-        with open(version_file, "w", encoding="utf-8") as f:
-            f.write(f'__version__ = "{full_version}"\n')
-            f.write(f'__update_timestamp__ = "{ts}"\n')
-        return ts
+        from . import packer
+        return packer.write_version_file(version_file, full_version)
 
     def _ensure_version(self, pkg_path: str) -> str:
         """获取包的完整版本号，如不存在则按默认规则创建 version.py 并返回"""
-        version_file = self._version_file_path(pkg_path)
-        full_version, _ = self._read_version_info(version_file)
-        if full_version is not None:
-            return full_version
-        # 不存在时自动创建默认版本文件
-        full_version = self._default_version()
-        try:
-            self._write_version_file(version_file, full_version)
-        except Exception as e:  # noqa: BLE001
-            logger.exception(f"创建默认版本文件失败: {version_file}, err={e}")
-        return full_version
+        from . import packer
+        return packer.ensure_version(pkg_path)
 
     def on_mod_selected(self):
         """当选择表格中的某一行时，在右侧显示包名、路径和版本号"""
+        from . import packer
         ui = self.ui
         row = self._get_selected_row()
         if row < 0:
@@ -198,18 +203,22 @@ class PackerApp(qtbase.QApp):
         ui.mod_name.setText(pkg_name)
         ui.mod_path.setText(pkg_path)
 
-        # 确保有版本文件并读取完整版本号与更新时间
-        full_version = self._ensure_version(pkg_path)
-        _, ts = self._read_version_info(self._version_file_path(pkg_path))
+        # 确保有版本文件并读取完整版本号与更新时间（只读取一次）
+        full_version, ts = packer.ensure_version_info(pkg_path)
         base_version, _ = self._split_version(full_version)
         ui.mod_version.setText(base_version)
+        if full_version is None:
+            ui.statusbar.showMessage(f"无法读取 {pkg_name} 的版本号（version.py 中的 __version__ 不是字面量）", 5000)
 
-        # 更新表格中对应行的"版本号"列
-        table = ui.table_mod
-        table.setItem(row, 3, QtWidgets.QTableWidgetItem(full_version))  # 版本号列现在是第4列（索引3）
-        table.setItem(row, 4, QtWidgets.QTableWidgetItem(ts or ""))  # 更新时间列现在是第5列（索引4）
+        # 更新表格中对应行的"版本号"与"更新时间"列
+        self.pkg_model.update_version(row, full_version, ts)
 
     def on_scan(self):
+        """
+        后台扫描：有上次的扫描快照时先立即显示，再在后台校验，结果有变化才刷新表格；
+        没有快照时边扫描边把结果追加到表格
+        """
+        from . import scanner, tracing
         ui = self.ui
         root_path = ui.root_path.text().strip()
         if not root_path:
@@ -219,74 +228,54 @@ class PackerApp(qtbase.QApp):
             QtWidgets.QMessageBox.warning(self, "错误", f"路径不存在或不是文件夹：\n{root_path}")
             return
 
-        packages = self._scan_packages(root_path)
+        # 同时只保留一个扫描任务，旧任务的结果直接丢弃
+        if self._scan_worker is not None:
+            self._scan_worker.cancel()
 
-        table = ui.table_mod
-        table.setRowCount(0)
-
-        # 获取图标路径：尝试从当前文件位置推断仓库根目录
-        # 当前文件路径：projects/py_app_packer/app.py，向上两级到仓库根
-        current_file_dir = os.path.dirname(os.path.abspath(__file__))
-        repo_root = os.path.dirname(os.path.dirname(current_file_dir))
-        icon_play = os.path.join(repo_root, "data", "assets", "play.svg")
-        # 创建普通模块图标（文件夹图标）的 SVG 字符串
-        icon_folder_svg = """<svg width="24" height="24" viewBox="0 0 24 24" fill="none" xmlns="http://www.w3.org/2000/svg">
-  <path d="M4 5h6l2 2h8a1 1 0 0 1 1 1v11a1 1 0 0 1-1 1H4a1 1 0 0 1-1-1V6a1 1 0 0 1 1-1z" stroke="#666666" stroke-width="2" stroke-linecap="round" stroke-linejoin="round"/>
-</svg>"""
-
-        for row, (pkg_name, pkg_path, pkg_type) in enumerate(packages):
-            table.insertRow(row)
-            
-            # 第一列：图标
-            icon_item = QtWidgets.QTableWidgetItem()
-            if pkg_type == "runnable":
-                # 可运行模块：使用 play.svg
-                if os.path.exists(icon_play):
-                    icon = qtbase.get_icon(icon_play, 20)
-                    icon_item.setIcon(icon)
-            else:
-                # 普通模块：使用文件夹图标（从 SVG 字符串创建）
-                try:
-                    from PySide6.QtGui import QIcon, QPixmap
-                    from PySide6.QtCore import QByteArray, Qt
-                    svg_bytes = QByteArray(icon_folder_svg.encode('utf-8'))
-                    pixmap = QPixmap()
-                    pixmap.loadFromData(svg_bytes, format='SVG')  # type: ignore
-                    if pixmap.size().width() > 0:
-                        pixmap = pixmap.scaled(20, 20, Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.SmoothTransformation)
-                        icon = QIcon(pixmap)
-                        icon_item.setIcon(icon)
-                except Exception:  # noqa: BLE001
-                    pass  # 如果图标加载失败，继续执行
-            table.setItem(row, 0, icon_item)
-            
-            # 第二列：包名
-            table.setItem(row, 1, QtWidgets.QTableWidgetItem(pkg_name))
-            # 第三列：路径（隐藏）
-            table.setItem(row, 2, QtWidgets.QTableWidgetItem(pkg_path))
-
-            # 尝试读取现有版本信息（不在这里强制创建文件）
-            version_file = self._version_file_path(pkg_path)
-            full_version, ts = self._read_version_info(version_file)
-            # 第四列：版本号
-            table.setItem(row, 3, QtWidgets.QTableWidgetItem(full_version or ""))
-            # 第五列：更新时间
-            table.setItem(row, 4, QtWidgets.QTableWidgetItem(ts or ""))
-
-        ui.statusbar.showMessage(f"共找到 {len(packages)} 个可打包模块。", 5000)
         ui.mod_name.clear()
         ui.mod_version.clear()
         ui.mod_path.clear()
 
+        # 有快照时按差异更新当前表格，没有快照时清空后边扫描边追加
+        options = scanner.ScanOptions.from_cfg(APPCFG)
+        snap_rows = scanner.snapshot_rows(root_path, options)
+        if snap_rows is not None:
+            self.pkg_model.set_rows(snap_rows)
+            ui.statusbar.showMessage(f"已显示上次扫描结果（{len(snap_rows)} 个模块），正在后台校验...")
+        else:
+            self.pkg_model.clear()
+
+        worker = ScanWorker(root_path, options, trace=tracing.enabled_by_cfg(APPCFG), parent=self)
+        self._scan_worker = worker
+
+        def on_batch(rows):
+            if worker is self._scan_worker and snap_rows is None:
+                self.pkg_model.append_rows(rows)
+
+        def on_done(rows):
+            if worker is not self._scan_worker:
+                return
+            self.pkg_model.set_rows(rows)
+            ui.statusbar.showMessage(f"共找到 {len(rows)} 个可打包模块。", 5000)
+
+        def on_finished():
+            if worker is self._scan_worker:
+                self._scan_worker = None
+            worker.deleteLater()
+
+        worker.batch.connect(on_batch)
+        worker.succeeded.connect(on_done)
+        worker.failed.connect(lambda err: ui.statusbar.showMessage(f"扫描失败：{err}", 5000))
+        worker.finished.connect(on_finished)
+        worker.start()
+
     # ---------- 版本号自增（major / minor / patch） ----------
     def _parse_base_version(self, base_version: str) -> tuple[int, int, int]:
         """
         将 '0.1.6' 解析为 (0, 1, 6)，非法则返回 (0, 0, 0)
         """
-        parts = base_version.strip().split(".")
-        if len(parts) != 3 or not all(p.isdigit() for p in parts):
-            return 0, 0, 0
-        return int(parts[0]), int(parts[1]), int(parts[2])
+        from . import packer
+        return packer.parse_base_version(base_version) or (0, 0, 0)
 
     def _set_base_version(self, major: int, minor: int, patch: int):
         """
@@ -298,20 +287,9 @@ class PackerApp(qtbase.QApp):
         """
         part: 'major' / 'minor' / 'patch'
         """
+        from . import packer
         base = self.ui.mod_version.text().strip()
-        major, minor, patch = self._parse_base_version(base)
-
-        if part == "major":
-            major += 1
-            minor = 0
-            patch = 0
-        elif part == "minor":
-            minor += 1
-            patch = 0
-        elif part == "patch":
-            patch += 1
-
-        self._set_base_version(major, minor, patch)
+        self._set_base_version(*self._parse_base_version(packer.bump_base_version(base, part)))
 
     def on_bump_major(self):
         self._bump_version("major")
@@ -330,218 +308,350 @@ class PackerApp(qtbase.QApp):
             return
         ui.root_path.setText(directory)
 
-    # ---------- 运行加密逻辑（pyarmor + 依赖拷贝） ----------
+    # ---------- 后台任务（进度 / 输出 / 取消） ----------
+    def _is_busy(self) -> bool:
+        return self._worker is not None and self._worker.isRunning()
+
+    def _start_worker(self, title: str, fn, on_success, trace_base: str | None = None):
+        """
+        在后台线程中执行 fn(worker)，完成后在界面线程中调用 on_success(结果)
+        trace_base: 阶段计时文件的路径前缀，BENCHMARK / VERBOSE 开启计时时写出（见 tracing）
+        """
+        from . import tracing
+        ui = self.ui
+        if not tracing.enabled_by_cfg(APPCFG):
+            trace_base = None
+        worker = PipelineWorker(fn, parent=self, trace_base=trace_base)
+        worker.progress.connect(self._on_worker_progress)
+        worker.succeeded.connect(on_success)
+        worker.failed.connect(lambda err: QtWidgets.QMessageBox.critical(self, "错误", f"{title}失败：\n{err}"))
+        worker.cancelled.connect(lambda: ui.statusbar.showMessage(f"{title}已取消。", 5000))
+        worker.finished.connect(self._on_worker_finished)
+        self._worker = worker
+        self._worker_title = title
+        self._worker_t0 = time.perf_counter()
+
+        if not self._queue_workers:
+            ui.log_output.clear()
+        ui.btn_zip.setEnabled(False)
+        ui.btn_queue_zip.setEnabled(False)
+        ui.btn_cancel.setEnabled(True)
+        self._log_timer.start()
+        worker.start()
+
+    def _on_worker_progress(self, stage: str, done: int, total: int):
+        ui = self.ui
+        ui.label_stage.setText(stage)
+        # 总数未知时显示为忙碌状态
+        ui.progress_stage.setRange(0, total)
+        ui.progress_stage.setValue(done)
+
+    def _flush_worker_output(self):
+        lines = self._worker.drain_lines() if self._worker is not None else []
+        # 队列中同时发布的多个包，输出行前加上包名
+        for job, worker in self._queue_workers.items():
+            lines.extend(f"[{job.pkg_name}] {line}" for line in worker.drain_lines())
+        if lines:
+            self.ui.log_output.appendPlainText("\n".join(lines))
+        if self._queue_workers:
+            self.queue_model.refresh()
+
+    def _on_worker_finished(self):
+        ui = self.ui
+        self._flush_worker_output()
+        if APPCFG.get('BENCHMARK'):
+            logger.info(f"[BENCHMARK] {self._worker_title}耗时 {time.perf_counter() - self._worker_t0:.3f}s")
+        ui.btn_zip.setEnabled(True)
+        ui.btn_queue_zip.setEnabled(True)
+        self._worker = None
+        self._reset_progress()
+
+    def _reset_progress(self):
+        """没有任何后台任务时恢复空闲状态，否则显示发布队列的进度"""
+        ui = self.ui
+        if self._worker is not None:
+            return
+        if self._queue_workers:
+            batch = self._queue_batch
+            finished = sum(1 for job in batch if not job.active)
+            ui.label_stage.setText(f"发布队列 {finished}/{len(batch)}")
+            ui.progress_stage.setRange(0, len(batch))
+            ui.progress_stage.setValue(finished)
+            return
+        self._log_timer.stop()
+        ui.btn_cancel.setEnabled(False)
+        ui.label_stage.setText("空闲")
+        ui.progress_stage.setRange(0, 100)
+        ui.progress_stage.setValue(0)
+
+    def on_cancel(self):
+        """终止正在运行的 pyarmor 进程树并中止后台任务，发布队列中尚未开始的任务一并取消"""
+        if self._is_busy():
+            logger.warning("用户取消后台任务")
+            self._worker.cancel()
+        if self._queue_workers or self.release_queue.pending():
+            logger.warning("用户取消发布队列")
+            self.release_queue.cancel_pending()
+            for worker in self._queue_workers.values():
+                worker.cancel()
+            self.queue_model.refresh()
+
+    def closeEvent(self, event):
+        self.release_queue.cancel_pending()
+        self._stop_watch()
+        for worker in (self._worker, self._scan_worker, self._live_worker, *self._queue_workers.values()):
+            if worker is not None and worker.isRunning():
+                worker.cancel()
+                worker.wait()
+        super().closeEvent(event)
+
+    # ---------- 发布队列 ----------
     def on_release(self):
-        """使用 pyarmor 加密：对所选模块执行等价于 encrypt.sh 的逻辑"""
-        row = self._get_selected_row()
-        if row < 0:
-            QtWidgets.QMessageBox.warning(self, "提示", "请先在模块列表中选择一个包。")
+        """把所选的包（可多选）加入发布队列，由调度器在并发上限内后台发布"""
+        rows = self._get_selected_rows()
+        if not rows:
+            QtWidgets.QMessageBox.warning(self, "提示", "请先在模块列表中选择要发布的包（可多选）。")
             return
 
-        pkg_name, pkg_path = self._get_row_info(row)
-        if not pkg_name or not pkg_path:
-            QtWidgets.QMessageBox.warning(self, "错误", "无法获取所选包信息。")
+        if self.ui.is_batch_release.isChecked() and len(rows) > 1:
+            self._release_batch(rows)
             return
 
-        # TARGET 为项目名（如 realman_teleop）
-        pkg_name = os.path.basename(pkg_path)
-
-        # 仓库根目录（与示例脚本中相同，相对路径以此为基准）
-        #repo_root = "" # q_appcfg.ROOT
-        # repo_root = os.path.abspath("D:\\wk\\Codehub\\0\\phimate")  # 改为你的 phimate 绝对路径
-
-        # OUTPUT=dist/dist_${TARGET}_`date "+%Y-%m-%d-%H.%M.%S"`
-        ts = datetime.now().strftime("%Y-%m-%d-%H.%M.%S")
-        output_dir_name = f"dist_{pkg_name}_{ts}"
-        # input_path = os.path.normpath(os.path.join(repo_root, f"projects\\{target}"))  # 用 \\ 替代 /
-        input_path = self.ui.root_path.text()
-        pkg_full_name = os.path.normpath(os.path.join(input_path, pkg_name))  # 用 \\ 替代 /
-        repo_root = os.path.dirname(input_path)
-        output_root = os.path.join(repo_root, "dist", output_dir_name)
-
-        # 日志提示
-        msg1 = f"加密模块 {pkg_name} 到输出目录 {output_root}"
-        msg2 = "注：忽略 ERROR out of license，不影响程序运行"
-        logger.info(msg1)
-        logger.info(msg2)
-        self.ui.statusbar.showMessage(msg1, 5000)
-
-
-        # 4. 获取 pyarmor 的绝对路径（避免找不到可执行文件导致的路径错误）
-        def get_pyarmor_exe():
-            """获取 pyarmor 可执行文件的绝对路径"""
-            pyarmor_exe = "pyarmor.exe" if sys.platform == "win32" else "pyarmor"
-            # 优先从 Python 环境的 Scripts 目录找（uv/venv 环境）
-            scripts_dir = os.path.join(sys.prefix, "Scripts")
-            local_pyarmor = os.path.join(scripts_dir, pyarmor_exe)
-            if os.path.exists(local_pyarmor):
-                return local_pyarmor
-            # 其次找系统 PATH 中的 pyarmor
-            import shutil
-            pyarmor_path = shutil.which(pyarmor_exe)
-            if pyarmor_path:
-                return pyarmor_path
-            raise FileNotFoundError("未找到 pyarmor 可执行文件，请确认已安装：uv add pyarmor")
-
-
-        # 1) 加密模块（pyarmor gen）
-        try:
-            import subprocess
-            os.makedirs(output_root, exist_ok=True)
-            pyarmor_path = get_pyarmor_exe()
-
-            # 等价于：
-            # pyarmor --silent gen -O ${OUTPUT} -r -i projects/${TARGET}
-            logger.info("加密模块...")
-            cmd = [
-                # "pyarmor",
-                pyarmor_path,
-                # "--silent"
-                "gen",
-                "-O",
-                output_root,
-                "-r",
-                "-i",
-                pkg_full_name
-                # f"projects/{target}",
-            ]
-
-            if APPCFG['is_pyarmor_silent']:
-                printc("pyarmor 安静模式", 'warn')
-                cmd.insert(1, "--silent")
-
-            logger.info(f"运行命令: {' '.join(cmd)}  (cwd={repo_root})")
-            proc = subprocess.Popen(
-                cmd,
-                cwd=repo_root,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                shell=False,  # Windows 下必须为 False
-            )
-            out, err = proc.communicate(timeout=300)  # 5分钟超时
-            out = out or ""
-            err = err or ""
-
-            # 允许 out of license 错误继续后续流程
-            if proc.returncode != 0:
-                combined = (out + "\n" + err).lower()
-                if "out of license" in combined:
-                    logger.warning(
-                        f"pyarmor 返回码 {proc.returncode}，但检测到 'out of license'，按脚本约定忽略。\n"
-                        f"stdout:\n{out}\nstderr:\n{err}"
-                    )
-                else:
-                    logger.error(
-                        f"pyarmor 执行失败: 返回码 {proc.returncode}\nstdout:\n{out}\nstderr:\n{err}"
-                    )
-                    QtWidgets.QMessageBox.critical(
-                        self,
-                        "错误",
-                        f"pyarmor 执行失败（退出码 {proc.returncode}）：\n{err}",
-                    )
-                    return
+        root_path = self.ui.root_path.text()
+        stream = self.ui.is_stream_release.isChecked()
+        if self.release_queue.is_idle():
+            self._queue_batch = []
+        added, skipped = [], []
+        for row in rows:
+            pkg_name, pkg_path = self._get_row_info(row)
+            if not pkg_name or not pkg_path:
+                continue
+            # TARGET 为项目名（如 realman_teleop），递归扫描时包可能位于根路径的子目录中
+            job = self.queue_model.add(os.path.basename(pkg_path), os.path.normpath(pkg_path), root_path, stream)
+            if job is None:
+                skipped.append(pkg_name)
             else:
-                logger.info(f"pyarmor 执行成功。\nstdout:\n{out}")
+                added.append(pkg_name)
+                self._queue_batch.append(job)
+
+        msg = f"已加入发布队列 {len(added)} 个包"
+        if skipped:
+            msg += f"，跳过已在队列中的 {len(skipped)} 个：{', '.join(skipped)}"
+        logger.info(msg)
+        self.ui.statusbar.showMessage(msg, 5000)
+        if APPCFG['is_pyarmor_silent'] and added:
+            printc("pyarmor 安静模式", 'warn')
+        self._pump_queue()
+
+    def _release_batch(self, rows: list[int]):
+        """把所选的多个包合并为一个发布（只调用一次 pyarmor，共用运行时），见 packer.release_batch"""
+        from . import backends, packer, tracing
+        if self._is_busy():
+            QtWidgets.QMessageBox.warning(self, "提示", "已有任务正在执行，请等待完成或先取消。")
+            return
+        root_path = self.ui.root_path.text()
+        pkg_names = []
+        for row in rows:
+            _, pkg_path = self._get_row_info(row)
+            if pkg_path:
+                pkg_names.append(os.path.relpath(pkg_path, root_path))
+
+        def job(w: PipelineWorker):
+            result = packer.release_batch(
+                root_path, pkg_names, silent=bool(APPCFG['is_pyarmor_silent']),
+                use_cache=bool(APPCFG.get('is_build_cache', 1)),
+                mapp_mode=APPCFG.get('mapp_copy_mode', 'copy'),
+                store_mode=APPCFG.get('release_store_mode') or None,
+                prune=bool(APPCFG.get('is_prune_unreachable', 0)), trace=tracing.enabled_by_cfg(APPCFG),
+                on_line=w.on_line, stage=w.stage, cancel=w.cancel_token, backend=backends.from_cfg(APPCFG),
+            )
+            if not result.ok:
+                raise RuntimeError(result.error)
+            return result
+
+        def done(result: packer.ReleaseResult):
+            self.last_output_root = result.output_root
+            self.last_output_pkg_name = result.pkg_name
+            self.last_archive_path = None
+            msg = f"{len(pkg_names)} 个包已合并发布！输出目录：\n{result.output_root}"
+            logger.info(msg)
+            QtWidgets.QMessageBox.information(self, "完成", msg)
 
-        except Exception as e:  # noqa: BLE001
-            logger.exception(f"执行 pyarmor 过程异常: pkg_name={pkg_name}, err={e}")
-            QtWidgets.QMessageBox.critical(
-                self,
-                "错误",
-                f"执行 pyarmor 过程异常：\n{e}",
+        logger.info(f"合并发布 {len(pkg_names)} 个包：{', '.join(pkg_names)}")
+        self._start_worker("合并发布", job, done)
+
+    def on_queue_limit_changed(self, value: int):
+        self.release_queue.limit = max(1, value)
+        self._pump_queue()
+
+    def _pump_queue(self):
+        """在并发上限内启动排队中的发布任务"""
+        for job in self.release_queue.take():
+            self._start_release_job(job)
+        self.queue_model.refresh()
+        self._reset_progress()
+
+    def _release_job_fn(self, job: releasequeue.ReleaseJob):
+        """返回在后台线程中发布 job 的函数（见 packer.release_package），完成后把输出记录到 job 中"""
+        from . import backends, daemon, packer, tracing
+        pkg_name = os.path.relpath(job.pkg_path, job.root_path)
+        backend = backends.from_cfg(APPCFG)
+        # 本地发布与守护进程共用的选项，键即 daemon.RELEASE_OPTION_TYPES 中的发布选项（守护进程按其校验）
+        options = dict(
+            silent=bool(APPCFG['is_pyarmor_silent']), use_cache=bool(APPCFG.get('is_build_cache', 1)),
+            stream=job.stream, archive_format=APPCFG.get('archive_format', 'zip'),
+            archive_level=APPCFG.get('archive_level'), mapp_mode=APPCFG.get('mapp_copy_mode', 'copy'),
+            store_mode=APPCFG.get('release_store_mode') or None,
+            prune=bool(APPCFG.get('is_prune_unreachable', 0)),
+            shards=int(APPCFG.get('pyarmor_shards', 1) or 0),
+            archive_reuse=bool(APPCFG.get('is_archive_reuse', 1)), backend=backend.name,
+            pyz=bool(APPCFG.get('is_release_pyz', 0)) and not job.stream,
+            pyz_compress=bool(APPCFG.get('is_pyz_compress', 0)), pyz_optimize=int(APPCFG.get('pyc_optimize', 1)),
+        )
+
+        if self._use_daemon():
+            # 交给发布守护进程执行（并发上限与其他客户端共用），发布目录以守护进程的结果为准
+            params = dict(root=job.root_path, packages=[pkg_name], options=options)
+
+            def remote_job(w: PipelineWorker):
+                result = daemon.run_remote("release", params, self._daemon_address(), on_line=w.on_line,
+                                           stage=w.stage, cancel=w.cancel_token)
+                job.output_root, job.archive_path = result["output_root"], result["zip_path"]
+                return job.archive_path or job.output_root
+            return remote_job
+
+        def release_job(w: PipelineWorker):
+            # 加密 -> 拷贝 mapp.txt -> 清单 -> 去重 -> .pyz；stream 时直接发布为压缩包，不生成发布目录
+            result = packer.release_package(
+                job.root_path, pkg_name, **dict(options, backend=backend),
+                scratch_dir=APPCFG.get('scratch_dir') or None, trace=tracing.enabled_by_cfg(APPCFG),
+                on_line=w.on_line, stage=w.stage, cancel=w.cancel_token,
             )
+            if not result.ok:
+                raise RuntimeError(result.error)
+            job.output_root, job.archive_path = result.output_root or None, result.zip_path or None
+            return job.archive_path or job.output_root
+        return release_job
+
+    def _daemon_address(self) -> str | None:
+        return APPCFG.get('daemon_address') or None
+
+    def _use_daemon(self) -> bool:
+        """勾选 is_use_daemon 且守护进程在运行时，发布、压缩提交给守护进程执行"""
+        from . import daemon
+        return bool(APPCFG.get('is_use_daemon', 0)) and daemon.is_running(self._daemon_address())
+
+    def _start_release_job(self, job: releasequeue.ReleaseJob):
+        # 发布目录在任务开始时确定（见 packer.make_output_root），阶段计时由 release_package 写在发布目录旁
+        logger.info(f"开始发布模块 {job.pkg_name}")
+        logger.info("注：忽略 ERROR out of license，不影响程序运行")
+
+        worker = PipelineWorker(self._release_job_fn(job), parent=self)
+        worker.progress.connect(lambda stage, done, total: self._on_job_progress(job, stage))
+        worker.succeeded.connect(lambda _: self._on_job_end(job, releasequeue.DONE))
+        worker.failed.connect(lambda err: self._on_job_end(job, releasequeue.FAILED, err))
+        worker.cancelled.connect(lambda: self._on_job_end(job, releasequeue.CANCELLED))
+        worker.finished.connect(lambda: self._on_job_finished(job))
+        self._queue_workers[job] = worker
+        if not self._log_timer.isActive():
+            self.ui.log_output.clear()
+            self._log_timer.start()
+        self.ui.btn_cancel.setEnabled(True)
+        worker.start()
+
+    def _on_job_progress(self, job: releasequeue.ReleaseJob, stage: str):
+        if job.stage != stage:
+            job.stage = stage
+            self.queue_model.refresh(job)
+
+    def _on_job_end(self, job: releasequeue.ReleaseJob, state: str, error: str | None = None):
+        self.release_queue.finish(job, state, error)
+        if state == releasequeue.DONE:
+            # 记录最近一次发布的输出，供“压缩发布包”和“打开发布目录”使用
+            self.last_output_root = job.output_root
+            self.last_output_pkg_name = job.pkg_name
+            self.last_archive_path = job.archive_path
+            logger.info(f"模块 {job.pkg_name} 加密完成！输出：{job.archive_path or job.output_root}")
+        elif state == releasequeue.FAILED:
+            logger.error(f"模块 {job.pkg_name} 发布失败：{error}")
+        self.queue_model.refresh(job)
+
+    def _on_job_finished(self, job: releasequeue.ReleaseJob):
+        worker = self._queue_workers.pop(job, None)
+        if worker is not None:
+            lines = worker.drain_lines()
+            if lines:
+                self.ui.log_output.appendPlainText("\n".join(f"[{job.pkg_name}] {line}" for line in lines))
+            worker.deleteLater()
+        self._pump_queue()
+        if self.release_queue.is_idle():
+            self._on_queue_idle()
+
+    def _on_queue_idle(self):
+        """队列中的任务全部结束后只提示一次汇总结果"""
+        batch, self._queue_batch = self._queue_batch, []
+        if not batch:
             return
+        done = [j for j in batch if j.state == releasequeue.DONE]
+        failed = [j for j in batch if j.state == releasequeue.FAILED]
+        cancelled = [j for j in batch if j.state == releasequeue.CANCELLED]
+        msg = f"发布队列已完成：成功 {len(done)} 个，失败 {len(failed)} 个"
+        if cancelled:
+            msg += f"，取消 {len(cancelled)} 个"
+        if failed:
+            msg += "\n\n" + "\n".join(f"{j.pkg_name}：{(j.error or '').strip()[:200]}" for j in failed)
+        logger.info(msg)
+        self.ui.statusbar.showMessage(msg.splitlines()[0], 5000)
+        if failed:
+            QtWidgets.QMessageBox.warning(self, "完成", msg)
+        else:
+            QtWidgets.QMessageBox.information(self, "完成", msg)
 
-        # 2) 拷贝配置文件
-        # try:
-        #     logger.info("拷贝配置文件...")
-        #     src_appcfg = os.path.join(repo_root, "projects", target, "appcfg.yaml")
-        #     dst_target_root = os.path.join(output_root, target)
-        #     os.makedirs(dst_target_root, exist_ok=True)
-        #     if os.path.isfile(src_appcfg):
-        #         shutil.copy2(src_appcfg, os.path.join(dst_target_root, "appcfg.yaml"))
-        #     else:
-        #         logger.warning(f"未找到配置文件: {src_appcfg}")
-        # except Exception as e:  # noqa: BLE001
-        #     logger.exception(f"拷贝配置文件失败: target={target}, err={e}")
-
-        # 3) 拷贝机械臂依赖库：projects/${TARGET}/bgtask/common -> ${OUTPUT}/${TARGET}/bgtask/common
-        # try:
-        #     logger.info("拷贝机械臂依赖库...")
-        #     src_common = os.path.join(repo_root, "projects", target, "bgtask", "common")
-        #     dst_bgtask = os.path.join(output_root, target, "bgtask")
-        #     dst_common = os.path.join(dst_bgtask, "common")
-        #     if os.path.isdir(src_common):
-        #         os.makedirs(dst_bgtask, exist_ok=True)
-        #         # Python 3.8+ 支持 dirs_exist_ok
-        #         shutil.copytree(src_common, dst_common, dirs_exist_ok=True)
-        #     else:
-        #         logger.warning(f"未找到机械臂依赖库目录: {src_common}")
-        # except Exception as e:  # noqa: BLE001
-        #     logger.exception(f"拷贝机械臂依赖库失败: target={target}, err={e}")
-        
-        # 3) 拷贝映射文件指定的内容（例如：bgtask/common、appcfg.yaml 等）
-        try:
-            logger.info("拷贝映射文件指定的内容...")
-            mapp_path = os.path.join(pkg_full_name, "mapp.txt")
-            if not os.path.isfile(mapp_path):
-                logger.warning(f"未找到 mapp.txt 映射文件：{mapp_path}")
-            else:
-                with open(mapp_path, "r", encoding="utf-8") as f:
-                    for raw_line in f:
-                        line = raw_line.strip()
-                        # 跳过空行和注释行
-                        if not line or line.startswith("#"):
-                            continue
-
-                        # 相对路径，如 'bgtask/common' 或 'appcfg.yaml'
-                        rel_path = line.replace("\\", "/")
-                        src_path = os.path.join(input_path, pkg_name, rel_path)
-                        dst_path = os.path.join(output_root, pkg_name, rel_path)
-
-                        if os.path.isdir(src_path):
-                            # 目录拷贝
-                            logger.info(f"拷贝目录: {src_path} -> {dst_path}")
-                            os.makedirs(os.path.dirname(dst_path), exist_ok=True)
-                            shutil.copytree(src_path, dst_path, dirs_exist_ok=True)
-                        elif os.path.isfile(src_path):
-                            # 文件拷贝
-                            logger.info(f"拷贝文件: {src_path} -> {dst_path}")
-                            os.makedirs(os.path.dirname(dst_path), exist_ok=True)
-                            shutil.copy2(src_path, dst_path)
-                        else:
-                            logger.warning(f"mapp.txt 中的路径不存在，已跳过: {src_path}")
+    def on_queue_zip(self):
+        """把队列中已发布完成、尚未压缩的发布目录依次压缩"""
+        from . import archive, packer
+        if self._is_busy():
+            QtWidgets.QMessageBox.warning(self, "提示", "已有任务正在执行，请等待完成或先取消。")
+            return
+        jobs = self.release_queue.zippable()
+        if not jobs:
+            QtWidgets.QMessageBox.warning(self, "提示", "发布队列中没有待压缩的发布目录。")
+            return
+        fmt = APPCFG.get('archive_format', 'zip')
+        level = APPCFG.get('archive_level')
+        delete_src = self.ui.is_delete_zipped_folder.isChecked()
+        plan = [(job, job.output_root, archive.archive_path_for(job.output_root, fmt)) for job in jobs]
+
+        def job_fn(w: PipelineWorker):
+            for i, (job, output_root, zip_path) in enumerate(plan, 1):
+                packer.archive_dir(output_root, zip_path, delete_src=delete_src, fmt=fmt, level=level,
+                                   progress=w.stage(f"压缩 {job.pkg_name}（{i}/{len(plan)}）"),
+                                   cancel=w.cancel_token, reuse=bool(APPCFG.get('is_archive_reuse', 1)))
+            return plan
+
+        def done(_):
+            for job, _, zip_path in plan:
+                job.archive_path = zip_path
+            self.queue_model.refresh()
+            msg = f"已将 {len(plan)} 个发布目录压缩为 {fmt}"
+            logger.info(msg)
+            QtWidgets.QMessageBox.information(self, "完成", msg)
 
-        except Exception as e:  # noqa: BLE001
-            logger.exception(f"拷贝映射文件指定的内容失败: target={pkg_name}, err={e}")
-
-        # 4) 拷贝界面描述：projects/${pkg_name}/ui -> ${OUTPUT}/${pkg_name}/ui
-        # try:
-        #     logger.info("拷贝界面描述...")
-        #     src_ui = os.path.join(input_path, pkg_name, "ui")
-        #     dst_ui = os.path.join(output_root, pkg_name, "ui")
-        #     if os.path.isdir(src_ui):
-        #         shutil.copytree(src_ui, dst_ui, dirs_exist_ok=True)
-        #     else:
-        #         logger.warning(f"未找到界面描述目录: {src_ui}")
-        # except Exception as e:  # noqa: BLE001
-        #     logger.exception(f"拷贝界面描述失败: pkg_name={pkg_name}, err={e}")
-
-        # 记录最近一次发布输出目录和目标名，供压缩使用
-        self.last_output_root = output_root
-        self.last_output_pkg_name = pkg_name
-
-        # 完成提示
-        done_msg = f"模块 {pkg_name} 加密完成！输出目录：\n{output_root}"
-        logger.info(done_msg)
-        QtWidgets.QMessageBox.information(self, "完成", done_msg)
+        self._start_worker("压缩已完成的发布", job_fn, done)
+
+    def on_queue_clear(self):
+        """从队列面板中移除已结束（完成 / 失败 / 取消）的任务"""
+        self.queue_model.clear_finished()
 
     # ---------- 压缩发布包为 zip ----------
     def on_zip(self):
         """
-        将最近一次 on_release 生成的发布目录压缩为 zip 文件
+        将最近一次 on_release 生成的发布目录压缩为 zip 文件（后台线程执行）
         """
+        from . import archive, daemon, packer
+        if self._is_busy():
+            QtWidgets.QMessageBox.warning(self, "提示", "已有任务正在执行，请等待完成或先取消。")
+            return
         output_root = getattr(self, "last_output_root", None)
         target = getattr(self, "last_output_pkg_name", None)
         if not output_root or not target:
@@ -560,45 +670,163 @@ class PackerApp(qtbase.QApp):
             )
             return
 
-        # zip 文件放在 dist 目录下，名称类似 dist_TARGET_时间.zip
-        repo_root = os.path.abspath("D:\\wk\\Codehub\\0\\phimate")  # 与 on_release 保持一致
-        dist_dir = os.path.join(repo_root, "dist")
-        os.makedirs(dist_dir, exist_ok=True)
-
-        base_name = os.path.basename(output_root)  # dist_TARGET_YYYY-MM-DD-HH.MM.SS
-        zip_path = os.path.join(dist_dir, base_name + ".zip")
-
-        try:
-            # 如果已存在同名 zip，先删除
-            if os.path.exists(zip_path):
-                os.remove(zip_path)
-
-            import zipfile
-
-            logger.info(f"开始压缩发布目录为 zip：{output_root} -> {zip_path}")
-            with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) as zf:
-                for root, _, files in os.walk(output_root):
-                    for fname in files:
-                        fpath = os.path.join(root, fname)
-                        # 计算在 zip 中的相对路径（相对于 output_root）
-                        arcname = os.path.relpath(fpath, output_root)
-                        zf.write(fpath, arcname)
-
-            # 如果勾选了“压缩后删除文件夹”，则在压缩成功后删除源目录
-            if self.ui.is_delete_zipped_folder.isChecked():
-                logger.info(f"按勾选设置，压缩完成后删除源目录：{output_root}")
-                shutil.rmtree(output_root, ignore_errors=False)
-
-            msg = f"发布包已压缩为 zip：\n{zip_path}"
+        # 压缩包放在 dist 目录下，名称类似 dist_TARGET_时间.zip
+        fmt = APPCFG.get('archive_format', 'zip')
+        level = APPCFG.get('archive_level')
+        zip_path = archive.archive_path_for(output_root, fmt)
+        # 如果勾选了“压缩后删除文件夹”，则在压缩成功后删除源目录
+        delete_src = self.ui.is_delete_zipped_folder.isChecked()
+
+        use_daemon = self._use_daemon()
+
+        def job(w: PipelineWorker):
+            if use_daemon:
+                params = dict(output_root=output_root, fmt=fmt, level=level, delete_src=delete_src)
+                return daemon.run_remote("zip", params, self._daemon_address(), stage=w.stage,
+                                         cancel=w.cancel_token)["zip_path"]
+            return packer.archive_dir(output_root, zip_path, delete_src=delete_src, fmt=fmt, level=level,
+                                      progress=w.stage("压缩"), cancel=w.cancel_token,
+                                      reuse=bool(APPCFG.get('is_archive_reuse', 1)))
+
+        def done(_):
+            msg = f"发布包已压缩为 {fmt}：\n{zip_path}"
             logger.info(msg)
             QtWidgets.QMessageBox.information(self, "完成", msg)
-        except Exception as e:  # noqa: BLE001
-            logger.exception(f"压缩发布包失败: dir={output_root}, err={e}")
-            QtWidgets.QMessageBox.critical(
+
+        self._start_worker("压缩发布包", job, done, trace_base=f"{output_root}.archive")
+
+    # ---------- 增量包 ----------
+    def on_delta(self):
+        """
+        将最近一次 on_release 生成的发布目录与选择的旧发布清单比较，生成增量包（后台线程执行）
+        """
+        from . import delta
+        if self._is_busy():
+            QtWidgets.QMessageBox.warning(self, "提示", "已有任务正在执行，请等待完成或先取消。")
+            return
+        output_root = getattr(self, "last_output_root", None)
+        if not output_root or not os.path.isdir(output_root):
+            QtWidgets.QMessageBox.warning(
                 self,
-                "错误",
-                f"压缩发布包失败：\n{zip_path}\n\n{e}",
+                "提示",
+                "请先点击“发布包”完成一次发布（保留发布目录），再生成增量包。",
             )
+            return
+        base_path, _ = QtWidgets.QFileDialog.getOpenFileName(
+            self, "选择旧发布的清单", os.path.dirname(output_root),
+            f"发布清单 (*{delta.MANIFEST_SUFFIX});;所有文件 (*)",
+        )
+        if not base_path:
+            return
+        if delta.release_base(base_path) == delta.release_base(output_root):
+            QtWidgets.QMessageBox.warning(self, "提示", "请选择更早一次发布的清单。")
+            return
+        fmt = APPCFG.get('archive_format', 'zip')
+
+        def job(w: PipelineWorker):
+            w.stage("清单")
+            return delta.make_delta(output_root, base_path, fmt=fmt, level=APPCFG.get('archive_level'),
+                                    progress=w.stage("压缩"), cancel=w.cancel_token)
+
+        def done(res):
+            delta_path, info = res
+            msg = (f"增量包已生成：\n{delta_path}\n\n"
+                   f"修改 {len(info['changed'])} 个、新增 {len(info['added'])} 个、删除 {len(info['deleted'])} 个文件")
+            logger.info(msg)
+            QtWidgets.QMessageBox.information(self, "完成", msg)
+
+        self._start_worker("生成增量包", job, done)
+
+    # ---------- 监视模式 ----------
+    def on_watch_toggled(self, checked: bool):
+        """开启时把所选包完整加密到 dist/live_<包名>，之后监视改动并增量更新；关闭时停止监视"""
+        from . import watch
+        if not checked:
+            self._stop_watch()
+            self.ui.statusbar.showMessage("已停止监视。", 5000)
+            return
+        if self._live_worker is not None:
+            QtWidgets.QMessageBox.warning(self, "提示", "上一次监视的更新尚未结束，请稍后再试。")
+            self.ui.btn_watch.setChecked(False)
+            return
+        rows = self._get_selected_rows()
+        pkg_name, pkg_path = self._get_row_info(rows[0]) if len(rows) == 1 else (None, None)
+        if not pkg_name or not pkg_path:
+            QtWidgets.QMessageBox.warning(self, "提示", "请先在模块列表中选择一个要监视的包。")
+            self.ui.btn_watch.setChecked(False)
+            return
+        root_path = self.ui.root_path.text()
+        self._live_poll.setInterval(int(watch.POLL_INTERVAL * 1000))
+        self._live = watch.LiveBuild(
+            root_path, os.path.relpath(pkg_path, os.path.abspath(root_path)),
+            silent=bool(APPCFG['is_pyarmor_silent']), mapp_mode=APPCFG.get('mapp_copy_mode', 'copy'),
+        )
+        logger.info(f"开始监视 {self._live.pkg_name}，实时输出目录：{self._live.output_root}")
+        self._start_live_worker(lambda live, w: live.sync(on_line=w.on_line, cancel=w.cancel_token))
+
+    def _stop_watch(self):
+        self._live = None
+        self._live_pending = False
+        self._live_debounce.stop()
+        self._live_poll.stop()
+        paths = self._fs_watcher.files() + self._fs_watcher.directories()
+        if paths:
+            self._fs_watcher.removePaths(paths)
+        if self._live_worker is not None and self._live_worker.isRunning():
+            self._live_worker.cancel()
+
+    def _rewatch(self):
+        """按当前文件列表更新 QFileSystemWatcher 的监视路径（编辑器替换保存后文件需要重新加入）"""
+        if self._live is None:
+            return
+        wanted = set(self._live.watch_paths())
+        current = set(self._fs_watcher.files() + self._fs_watcher.directories())
+        if current - wanted:
+            self._fs_watcher.removePaths(list(current - wanted))
+        failed = self._fs_watcher.addPaths(list(wanted - current)) if wanted - current else []
+        if (failed or APPCFG.get('is_watch_polling', 0)) and not self._live_poll.isActive():
+            if failed:
+                logger.warning(f"{len(failed)} 个路径无法加入文件监视（可能超出 inotify 上限），改为轮询")
+            self._live_poll.start()
+
+    def _on_live_changed(self, *_):
+        """文件变化（或轮询）时重新开始去抖计时，连续保存只触发一次更新"""
+        if self._live is not None:
+            self._live_debounce.start()
+
+    def _run_live_update(self):
+        if self._live is None:
+            return
+        if self._live_worker is not None and self._live_worker.isRunning():
+            self._live_pending = True
+            return
+        self._start_live_worker(lambda live, w: live.update(on_line=w.on_line, cancel=w.cancel_token))
+
+    def _start_live_worker(self, fn):
+        """监视模式的更新在单独的后台线程中执行，不占用发布/压缩等任务"""
+        live = self._live
+        worker = PipelineWorker(lambda w: fn(live, w), parent=self)
+        worker.succeeded.connect(self._on_live_updated)
+        worker.failed.connect(
+            lambda err: self.ui.statusbar.showMessage(f"实时加密失败（保存后重试）：{err}", 10000))
+        worker.finished.connect(lambda: self._on_live_worker_finished(worker))
+        self._live_worker = worker
+        self.ui.statusbar.showMessage(f"正在更新 {live.output_root} ...")
+        worker.start()
+
+    def _on_live_updated(self, result: "watch.LiveUpdate"):
+        if self._live is not None and result.changed:
+            self.ui.statusbar.showMessage(f"{self._live.pkg_name} 已更新：{result.describe()}", 10000)
+
+    def _on_live_worker_finished(self, worker: PipelineWorker):
+        if self._live_worker is worker:
+            self._live_worker = None
+        if self._live is None:
+            return
+        self._rewatch()
+        if self._live_pending:
+            self._live_pending = False
+            self._live_debounce.start()
 
     # ---------- 打开发布目录 ----------
     def on_open_dist_dir(self):
@@ -606,6 +834,10 @@ class PackerApp(qtbase.QApp):
         打开最近一次 on_release 生成的发布目录
         """
         output_root = getattr(self, "last_output_root", None)
+        archive_path = getattr(self, "last_archive_path", None)
+        if not output_root and archive_path:
+            # 直接发布为压缩包时没有发布目录，打开压缩包所在的 dist 目录
+            output_root = os.path.dirname(archive_path)
         if not output_root:
             QtWidgets.QMessageBox.warning(
                 self,
@@ -643,6 +875,7 @@ class PackerApp(qtbase.QApp):
 
     # ---------- 更新版本号 ----------
     def on_update_version(self):
+        from . import packer
         ui = self.ui
         row = self._get_selected_row()
         if row < 0:
@@ -658,9 +891,11 @@ class PackerApp(qtbase.QApp):
         if not base_version:
             QtWidgets.QMessageBox.warning(self, "提示", "版本号不能为空。")
             return
+        if packer.parse_base_version(base_version) is None:
+            QtWidgets.QMessageBox.warning(self, "提示", f"版本号格式无效：{base_version}（应为 X.Y.Z）。")
+            return
 
-        today = date.today().strftime("%Y%m%d")
-        full_version = f"{base_version}.post{today}"
+        full_version = packer.post_version(base_version)
 
         version_file = self._version_file_path(pkg_path)
         try:
@@ -671,14 +906,81 @@ class PackerApp(qtbase.QApp):
             return
 
         # 更新表格中该行的完整版本号与更新时间
-        table = ui.table_mod
-        table.setItem(row, 3, QtWidgets.QTableWidgetItem(full_version))  # 版本号列现在是第4列（索引3）
-        table.setItem(row, 4, QtWidgets.QTableWidgetItem(ts))  # 更新时间列现在是第5列（索引4）
+        self.pkg_model.update_version(row, full_version, ts)
 
         msg = f"模块 {pkg_name} 的版本号已更新为 {full_version}"
         ui.statusbar.showMessage(msg, 5000)
         QtWidgets.QMessageBox.information(self, "完成", msg)
 
+    # 批量更新方式（与 bulk_version_mode 下拉框的顺序一致），None 表示设为 mod_version 中的版本号
+    BULK_VERSION_PARTS = ("patch", "minor", "major", None)
+
+    def _get_filtered_rows(self) -> list[int]:
+        """返回过滤后表格中全部行在模型中的行号（按表格中的显示顺序）"""
+        proxy = self.pkg_proxy
+        return [proxy.mapToSource(proxy.index(r, 0)).row() for r in range(proxy.rowCount())]
+
+    def on_update_versions_bulk(self):
+        """
+        批量更新版本号：有选中的包时只更新所选包（选中一个即只更新这一个），未选中时更新当前过滤后列表中的全部包；
+        在后台线程池中逐个原子写入 version.py，完成后只刷新受影响的行，最后汇总提示一次
+        """
+        from . import packer
+        ui = self.ui
+        if self._is_busy():
+            QtWidgets.QMessageBox.warning(self, "提示", "已有任务正在执行，请等待完成或先取消。")
+            return
+        rows = self._get_selected_rows() or self._get_filtered_rows()
+        paths = [pkg_path for pkg_path in (self._get_row_info(row)[1] for row in rows) if pkg_path]
+        if not paths:
+            QtWidgets.QMessageBox.warning(self, "提示", "模块列表中没有可更新的包。")
+            return
+
+        part = self.BULK_VERSION_PARTS[ui.bulk_version_mode.currentIndex()]
+        version = None
+        if part is None:
+            version = ui.mod_version.text().strip()
+            if not version:
+                QtWidgets.QMessageBox.warning(self, "提示", "版本号不能为空。")
+                return
+            if not packer.is_valid_version(version):
+                QtWidgets.QMessageBox.warning(self, "提示", f"版本号格式无效：{version}（应为 X.Y.Z 或 X.Y.Z.postN）。")
+                return
+        action = f"设为 {version}" if part is None else ui.bulk_version_mode.currentText()
+        reply = QtWidgets.QMessageBox.question(self, "确认", f"将 {len(paths)} 个包的版本号{action}，是否继续？")
+        if reply != QtWidgets.QMessageBox.StandardButton.Yes:
+            return
+
+        def job(w: PipelineWorker):
+            progress = w.stage("更新版本号", len(paths))
+            done = [0]
+
+            def on_done(_):
+                done[0] += 1
+                progress(done[0], len(paths))
+
+            return packer.update_versions(paths, part=part, version=version, on_done=on_done, cancel=w.cancel_token)
+
+        def done(results: list[packer.VersionUpdate]):
+            selected = self._get_selected_row()
+            for r in results:
+                row = self.pkg_model.row_of(r.pkg_path)
+                if not r.ok or row < 0:
+                    continue
+                self.pkg_model.update_version(row, r.new_version, r.timestamp)
+                if row == selected:
+                    ui.mod_version.setText(self._split_version(r.new_version)[0])
+            failed = [r for r in results if not r.ok]
+            msg = f"已更新 {len(results) - len(failed)} 个包的版本号"
+            logger.info(msg)
+            ui.statusbar.showMessage(msg, 5000)
+            if failed:
+                details = "\n".join(f"{os.path.basename(r.pkg_path)}：{r.error}" for r in failed[:20])
+                QtWidgets.QMessageBox.critical(self, "错误", f"{len(failed)} 个包更新失败：\n{details}")
+
+        logger.info(f"批量更新 {len(paths)} 个包的版本号：{action}")
+        self._start_worker("批量更新版本号", job, done)
+
 
 def main():
     LogHelper.init(q_appcfg.slot)
@@ -0,0 +1,373 @@
+"""
+发布包压缩引擎
+
+- zip：在线程池中并行压缩各文件（zlib 压缩时释放 GIL），主线程按顺序把预压缩好的数据
+  直接写入 zip，不再重复压缩（依赖 zipfile 内部实现，不可用时退回到由 zipfile 重新压缩）；
+  已是压缩格式的文件（.zip/.png/.so/.whl 等）直接存储；
+- tar.xz / tar.zst：整体打包为 tar 后压缩，tar.zst 需要可选依赖 zstandard（多线程压缩）；
+- 压缩包是确定的：条目按包内路径排序，时间戳固定为 1980-01-01，权限只保留可执行位（0644 / 0755），
+  相同输入总是得到相同字节的压缩包；
+- make_archive_reusing()：以输入内容的哈希为键缓存压缩包，输入相同时直接复用，
+  只有少量文件变化时（zip）从上一次的压缩包中原样拷贝未变条目，不再重新压缩。
+"""
+import hashlib
+import json
+import os
+import struct
+import sys
+import tarfile
+import tempfile
+import time
+import zipfile
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from loguru import logger
+from . import tracing
+
+FORMATS = ("zip", "tar.xz", "tar.zst")
+DEFAULT_LEVEL = 6
+
+# 已压缩格式，再次 deflate 几乎没有收益，直接存储
+STORED_SUFFIXES = frozenset({
+    ".zip", ".whl", ".egg", ".jar", ".7z", ".rar", ".gz", ".tgz", ".bz2", ".xz", ".zst", ".lz4",
+    ".png", ".jpg", ".jpeg", ".gif", ".webp", ".mp3", ".mp4", ".mkv", ".avi", ".ogg",
+    ".so", ".pyd", ".onnx", ".pt", ".pth",
+})
+
+_CHUNK = 1 << 20
+# 单个文件压缩结果超过该大小时落盘，避免大文件占满内存
+_SPOOL_MAX = 32 << 20
+# 确定性压缩包中统一使用的时间戳（zip 能表示的最早时间）
+FIXED_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+FIXED_MTIME = 315532800
+# 输入键的版本，压缩包内容的生成方式变化时递增，使旧缓存失效
+ARCHIVE_KEY_VERSION = 1
+# 直接写入预压缩数据依赖 zipfile 的内部实现（以下属性），只在验证过的 Python 版本上使用；
+# 更新的版本验证后再放宽 RAW_WRITE_MAX_PYTHON，否则退回到 ZipFile.open 写入（结果正确，失去并行压缩的收益）
+RAW_WRITE_ATTRS = ("_writecheck", "_didModify", "fp", "filelist", "NameToInfo", "start_dir")
+RAW_WRITE_MAX_PYTHON = (3, 14)
+
+
+def archive_path_for(output_root: str, fmt: str = "zip") -> str:
+    """压缩包放在发布目录同级（dist 目录）下，名称类似 dist_TARGET_时间.zip"""
+    output_root = os.path.abspath(output_root)
+    return os.path.join(os.path.dirname(output_root), f"{os.path.basename(output_root)}.{fmt}")
+
+
+def list_files(src_dir: str) -> list[tuple[str, str]]:
+    """返回 [(绝对路径, 包内相对路径)]，相对路径使用 '/' 分隔"""
+    files: list[tuple[str, str]] = []
+    for root, dirs, names in os.walk(src_dir):
+        dirs.sort()
+        for name in sorted(names):
+            fpath = os.path.join(root, name)
+            files.append((fpath, os.path.relpath(fpath, src_dir).replace(os.sep, "/")))
+    return files
+
+
+def is_stored(path: str) -> bool:
+    return os.path.splitext(path)[1].lower() in STORED_SUFFIXES
+
+
+def file_mode(path: str) -> int:
+    """压缩包中记录的权限：只保留可执行位"""
+    return 0o755 if os.stat(path).st_mode & 0o111 else 0o644
+
+
+def _zipinfo(fpath: str, arcname: str) -> zipfile.ZipInfo:
+    """确定性的 ZipInfo：固定时间戳、Unix 权限，不依赖文件的 mtime 和所在平台"""
+    zinfo = zipfile.ZipInfo(arcname, FIXED_DATE_TIME)
+    zinfo.create_system = 3
+    zinfo.external_attr = (0o100000 | file_mode(fpath)) << 16
+    zinfo.file_size = os.path.getsize(fpath)
+    return zinfo
+
+
+def _normalize_tarinfo(tarinfo: tarfile.TarInfo) -> tarfile.TarInfo:
+    """tar 条目去掉 mtime、属主等与构建环境相关的信息"""
+    tarinfo.mtime = FIXED_MTIME
+    tarinfo.uid = tarinfo.gid = 0
+    tarinfo.uname = tarinfo.gname = ""
+    tarinfo.mode = 0o755 if tarinfo.mode & 0o111 else 0o644
+    return tarinfo
+
+
+def _compress_entry(fpath: str, arcname: str, level: int):
+    """线程池中执行：计算 CRC 并（按需）压缩，返回 (ZipInfo, 压缩数据文件对象或 None)"""
+    zinfo = _zipinfo(fpath, arcname)
+    crc = 0
+    if is_stored(fpath) or level == 0:
+        zinfo.compress_type = zipfile.ZIP_STORED
+        with open(fpath, "rb") as f:
+            while chunk := f.read(_CHUNK):
+                crc = zlib.crc32(chunk, crc)
+        zinfo.CRC = crc
+        zinfo.compress_size = zinfo.file_size
+        return zinfo, None
+
+    zinfo.compress_type = zipfile.ZIP_DEFLATED
+    comp = zlib.compressobj(level, zlib.DEFLATED, -15)
+    spool = tempfile.SpooledTemporaryFile(max_size=_SPOOL_MAX)
+    with open(fpath, "rb") as f:
+        while chunk := f.read(_CHUNK):
+            crc = zlib.crc32(chunk, crc)
+            spool.write(comp.compress(chunk))
+    spool.write(comp.flush())
+    zinfo.CRC = crc
+    zinfo.compress_size = spool.tell()
+    spool.seek(0)
+    return zinfo, spool
+
+
+def raw_write_supported(zf: zipfile.ZipFile) -> bool:
+    """当前 Python 的 zipfile 是否可以直接写入预压缩数据（见 RAW_WRITE_ATTRS）"""
+    return (sys.version_info[:2] <= RAW_WRITE_MAX_PYTHON and hasattr(zipfile.ZipInfo, "FileHeader")
+            and all(hasattr(zf, attr) for attr in RAW_WRITE_ATTRS))
+
+
+def _write_raw_entry(zf: zipfile.ZipFile, zinfo: zipfile.ZipInfo, src, raw: bool = True):
+    """
+    把已压缩好的数据作为一个条目写入 zip（不经过 zipfile 的压缩器）
+    raw 为假时（zipfile 内部实现不可用）解压后经 ZipFile.open 重新写入，由 zipfile 重新压缩并计算 CRC
+    """
+    if not raw:
+        decomp = zlib.decompressobj(-15) if zinfo.compress_type == zipfile.ZIP_DEFLATED else None
+        with zf.open(zinfo, "w", force_zip64=zinfo.file_size > zipfile.ZIP64_LIMIT) as out:
+            while chunk := src.read(_CHUNK):
+                out.write(decomp.decompress(chunk) if decomp else chunk)
+            if decomp:
+                out.write(decomp.flush())
+        return
+    zip64 = zinfo.file_size > zipfile.ZIP64_LIMIT or zinfo.compress_size > zipfile.ZIP64_LIMIT
+    zf._writecheck(zinfo)
+    zf._didModify = True
+    zinfo.header_offset = zf.fp.tell()
+    zf.fp.write(zinfo.FileHeader(zip64))
+    while chunk := src.read(_CHUNK):
+        zf.fp.write(chunk)
+    zf.filelist.append(zinfo)
+    zf.NameToInfo[zinfo.filename] = zinfo
+    zf.start_dir = zf.fp.tell()
+
+
+class _Slice:
+    """只读取 fp 中从 start 开始的 size 个字节"""
+
+    def __init__(self, fp, start: int, size: int):
+        fp.seek(start)
+        self.fp = fp
+        self.left = size
+
+    def read(self, n: int) -> bytes:
+        data = self.fp.read(min(n, self.left))
+        self.left -= len(data)
+        return data
+
+
+def _raw_data(fp, zinfo: zipfile.ZipInfo) -> _Slice:
+    """zip 中一个条目的原始（压缩后）数据"""
+    fp.seek(zinfo.header_offset)
+    header = fp.read(zipfile.sizeFileHeader)
+    name_len, extra_len = struct.unpack("<HH", header[26:30])
+    return _Slice(fp, zinfo.header_offset + zipfile.sizeFileHeader + name_len + extra_len, zinfo.compress_size)
+
+
+def _make_zip(dest: str, files, level: int, jobs: int, progress, cancel, reuse=None):
+    """reuse 为 (旧 zip 路径, {包内路径: 旧 ZipInfo})，其中的条目原样拷贝，不重新压缩"""
+    old_path, old_entries = reuse or (None, {})
+    old_fp = open(old_path, "rb") if old_path else None
+    # 限制同时在途的文件数，控制内存占用
+    window = jobs * 4
+    try:
+        with zipfile.ZipFile(dest, "w", zipfile.ZIP_DEFLATED, allowZip64=True) as zf, \
+                ThreadPoolExecutor(max_workers=jobs) as pool:
+            raw = raw_write_supported(zf)
+            if not raw:
+                logger.warning(f"当前 Python（{sys.version.split()[0]}）不支持直接写入预压缩数据，改为由 zipfile 重新压缩")
+            pending = []
+            it = iter(files)
+            done = 0
+            while True:
+                while len(pending) < window:
+                    item = next(it, None)
+                    if item is None:
+                        break
+                    fut = None if item[1] in old_entries else pool.submit(_compress_entry, item[0], item[1], level)
+                    pending.append((item[0], item[1], fut))
+                if not pending:
+                    break
+                fpath, arcname, fut = pending.pop(0)
+                if cancel:
+                    cancel.check()
+                if fut is None:
+                    old = old_entries[arcname]
+                    zinfo = _zipinfo(fpath, arcname)
+                    zinfo.compress_type, zinfo.CRC, zinfo.compress_size = old.compress_type, old.CRC, old.compress_size
+                    _write_raw_entry(zf, zinfo, _raw_data(old_fp, old), raw)
+                else:
+                    zinfo, spool = fut.result()
+                    if spool is None:
+                        with open(fpath, "rb") as f:
+                            _write_raw_entry(zf, zinfo, f, raw)
+                    else:
+                        with spool:
+                            _write_raw_entry(zf, zinfo, spool, raw)
+                done += 1
+                if progress:
+                    progress(done, len(files))
+    finally:
+        if old_fp is not None:
+            old_fp.close()
+
+
+def _make_tar(dest: str, fmt: str, files, level: int, jobs: int, progress, cancel):
+    if fmt == "tar.xz":
+        fileobj = None
+        tf = tarfile.open(dest, "w:xz", preset=min(max(level, 0), 9))
+    else:
+        try:
+            import zstandard
+        except ImportError as e:
+            raise RuntimeError("tar.zst 格式需要安装 zstandard：uv add zstandard") from e
+        cctx = zstandard.ZstdCompressor(level=level, threads=jobs)
+        fileobj = cctx.stream_writer(open(dest, "wb"), closefd=True)
+        tf = tarfile.open(fileobj=fileobj, mode="w|")
+    try:
+        for i, (fpath, arcname) in enumerate(files):
+            if cancel:
+                cancel.check()
+            tf.add(fpath, arcname, recursive=False, filter=_normalize_tarinfo)
+            if progress:
+                progress(i + 1, len(files))
+    finally:
+        tf.close()
+        if fileobj is not None:
+            fileobj.close()
+
+
+def make_archive(src_dir: str, dest: str, fmt: str = "zip", level: int = DEFAULT_LEVEL,
+                 jobs: int | None = None, progress=None, cancel=None) -> str:
+    """
+    将 src_dir 压缩为 dest（格式见 FORMATS），包内路径相对于 src_dir，返回 dest
+    level: 压缩级别（zip/xz 为 0-9，zst 为 1-22）；jobs: 压缩线程数，默认 CPU 核数
+    progress(done, total) 按文件数上报进度；取消时删除未完成的压缩包
+    """
+    logger.info(f"压缩目录：{src_dir}")
+    return make_archive_from(list_files(src_dir), dest, fmt, level, jobs, progress, cancel)
+
+
+def make_archive_from(files: list[tuple[str, str]], dest: str, fmt: str = "zip",
+                      level: int = DEFAULT_LEVEL, jobs: int | None = None,
+                      progress=None, cancel=None, reuse=None) -> str:
+    """
+    将 [(源文件路径, 包内路径)] 直接写入压缩包 dest（按包内路径排序），参数同 make_archive
+    reuse 为 (旧 zip 路径, {包内路径: 旧 ZipInfo})，仅 zip 格式使用，见 make_archive_reusing
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"不支持的压缩格式: {fmt}，可选: {', '.join(FORMATS)}")
+    files = sorted(files, key=lambda item: item[1])
+    jobs = max(1, jobs or os.cpu_count() or 1)
+    logger.info(f"开始压缩（{fmt}, level={level}, jobs={jobs}）：-> {dest}，共 {len(files)} 个文件")
+    with tracing.span("archive", fmt=fmt, level=level, files=len(files)) as sp:
+        try:
+            if fmt == "zip":
+                _make_zip(dest, files, level, jobs, progress, cancel, reuse)
+            else:
+                _make_tar(dest, fmt, files, level, jobs, progress, cancel)
+        except BaseException:
+            if os.path.exists(dest):
+                os.remove(dest)
+            raise
+        if tracing.current() is not None:
+            sp.add(bytes=sum(os.path.getsize(f) for f, _ in files), out_bytes=os.path.getsize(dest))
+    return dest
+
+
+# ---------- 复用 ----------
+def input_key(files: list[tuple[str, str]], digests: dict[str, str], fmt: str, level: int) -> str:
+    """压缩输入的哈希：各文件的包内路径、大小、SHA-256、权限，以及格式和压缩级别"""
+    h = hashlib.sha256(json.dumps([ARCHIVE_KEY_VERSION, fmt, level]).encode())
+    for fpath, arcname in sorted(files, key=lambda item: item[1]):
+        h.update(json.dumps([arcname, os.path.getsize(fpath), digests[arcname], file_mode(fpath)]).encode())
+    return h.hexdigest()
+
+
+def _link_or_copy(src: str, dst: str):
+    """优先硬链接，不支持硬链接的文件系统上复制"""
+    try:
+        os.link(src, dst)
+    except OSError:
+        from .manifest import _fast_copyfile
+        _fast_copyfile(src, dst, os.path.getsize(src))
+
+
+def _load_index(path: str) -> dict | None:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _previous_zip(cache_dir: str, group: str, level: int) -> tuple[str, dict] | None:
+    """缓存中同一分组（包名）、同一压缩级别最近一次的 zip 及其索引"""
+    try:
+        indexes = [e for e in os.scandir(cache_dir) if e.name.endswith(".json")]
+    except OSError:
+        return None
+    for entry in sorted(indexes, key=lambda e: e.stat().st_mtime, reverse=True):
+        index = _load_index(entry.path)
+        if not index or index.get("group") != group or index.get("fmt") != "zip" or index.get("level") != level:
+            continue
+        path = os.path.join(cache_dir, f"{index['key']}.zip")
+        if os.path.isfile(path):
+            return path, index
+    return None
+
+
+def make_archive_reusing(files: list[tuple[str, str]], dest: str, digests: dict[str, str], cache_dir: str,
+                         group: str = "", fmt: str = "zip", level: int = DEFAULT_LEVEL, jobs: int | None = None,
+                         progress=None, cancel=None) -> tuple[str, str]:
+    """
+    可复用的压缩，digests 为 {包内路径: SHA-256}（如来自发布清单），返回 (dest, 方式)：
+    - "reused"：cache_dir 中已有相同输入（见 input_key）的压缩包，直接链接为 dest；
+    - "partial"：zip 格式时从同一分组（包名）最近一次的压缩包中原样拷贝内容未变的条目，只压缩变化的文件；
+    - "new"：全部重新压缩。
+    新生成的压缩包链接到 cache_dir/<键>.<格式>，并写出索引 <键>.json 供之后复用
+    """
+    key = input_key(files, digests, fmt, level)
+    cached = os.path.join(cache_dir, f"{key}.{fmt}")
+    if os.path.isfile(cached):
+        with tracing.span("archive.reuse", files=len(files)):
+            _link_or_copy(cached, dest)
+        logger.info(f"输入内容未变化，复用已有压缩包：{dest}")
+        if progress:
+            progress(len(files), len(files))
+        return dest, "reused"
+
+    reuse = None
+    if fmt == "zip":
+        previous = _previous_zip(cache_dir, group, level)
+        if previous is not None:
+            old_path, index = previous
+            old_digests = index.get("files", {})
+            with zipfile.ZipFile(old_path) as zf:
+                old_entries = {arcname: zf.getinfo(arcname) for _, arcname in files
+                               if old_digests.get(arcname) == digests[arcname] and arcname in zf.NameToInfo}
+            if old_entries:
+                reuse = (old_path, old_entries)
+                logger.info(f"从 {os.path.basename(old_path)} 复用 {len(old_entries)}/{len(files)} 个未变化的条目")
+    make_archive_from(files, dest, fmt, level, jobs, progress, cancel, reuse)
+
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        if not os.path.exists(cached):
+            _link_or_copy(dest, cached)
+        index = {"key": key, "group": group, "fmt": fmt, "level": level,
+                 "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+                 "files": {arcname: digests[arcname] for _, arcname in files}}
+        with open(os.path.join(cache_dir, f"{key}.json"), "w", encoding="utf-8") as f:
+            json.dump(index, f, ensure_ascii=False)
+    except OSError as e:
+        logger.warning(f"压缩包缓存写入失败（不影响本次压缩）: {cache_dir}, err={e}")
+    return dest, "partial" if reuse else "new"
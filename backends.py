@@ -0,0 +1,206 @@
+"""
+打包后端（不依赖 Qt）
+
+发布流程中“把包内 .py 变换为发布形式”这一步可替换：
+    prepare()                  检查工具是否可用（发布开始前调用，失败时尽早报错）
+    transform(...)             把一个包变换到 output_root/<包名>/
+    transform_batch(...)       把多个包变换到同一个 output_root（合并发布）
+    finalize(...)              补齐运行时等公共文件并检查输出
+内置两种后端：
+    pyarmor   pyarmor gen 加密（默认，支持构建缓存与分片，见 buildcache）
+    pyc       只编译为 .pyc（优化级别见 appcfg.yaml 的 pyc_optimize），多进程并行，不含源码也不需要运行时，
+              适合内部测试构建；.pyc 与编译时的 Python 版本绑定，需用相同版本运行
+"""
+import os
+import py_compile
+from concurrent.futures import ProcessPoolExecutor
+from loguru import logger
+from . import packer
+from . import tracing
+
+DEFAULT_BACKEND = "pyarmor"
+# 待编译文件少于该数量时在本进程内编译（启动进程池的开销大于编译本身）
+PYC_PARALLEL_MIN = 64
+# 每个进程一次处理的文件数
+PYC_CHUNK = 16
+
+BACKENDS: dict[str, type["Backend"]] = {}
+
+
+def register(cls: type["Backend"]) -> type["Backend"]:
+    BACKENDS[cls.name] = cls
+    return cls
+
+
+def names() -> list[str]:
+    return list(BACKENDS)
+
+
+def get_backend(backend: "str | Backend | None" = None, **options) -> "Backend":
+    """按名称创建后端（已是后端实例时原样返回），名称未知时抛出 ValueError"""
+    if isinstance(backend, Backend):
+        return backend
+    name = backend or DEFAULT_BACKEND
+    if name not in BACKENDS:
+        raise ValueError(f"未知的打包后端：{name}（可选：{', '.join(BACKENDS)}）")
+    return BACKENDS[name](**options)
+
+
+def from_cfg(cfg, name: str | None = None) -> "Backend":
+    """按 appcfg.yaml（packer_backend / pyc_optimize）创建后端，name 不为空时覆盖 packer_backend"""
+    name = name or cfg.get("packer_backend") or DEFAULT_BACKEND
+    if name == PycBackend.name:
+        return get_backend(name, optimize=int(cfg.get("pyc_optimize", 1)))
+    return get_backend(name)
+
+
+class Backend:
+    """打包后端基类，子类以 @register 注册"""
+    name = ""
+    label = ""
+
+    def __repr__(self) -> str:
+        return f"<{type(self).__name__} {self.name}>"
+
+    def prepare(self):
+        """检查工具是否可用，不可用时抛出异常"""
+
+    def transform(self, pkg_full_name: str, output_root: str, cwd: str, silent: bool = True,
+                  timeout: float = 300, use_cache: bool = True, cache_dir: str | None = None,
+                  on_line=None, cancel: packer.CancelToken | None = None,
+                  sources: list[str] | None = None, shards: int | None = 1):
+        """
+        把 pkg_full_name 变换到 output_root/<包名>/；sources 为包内要处理的 .py（相对路径），为空时处理全部
+        失败时抛出 BackendError（或其子类 PyarmorError），取消时抛出 CancelledError
+        """
+        raise NotImplementedError
+
+    def transform_batch(self, pkg_full_names: list[str], output_root: str, cwd: str, silent: bool = True,
+                        timeout: float = 300, use_cache: bool = True, cache_dir: str | None = None,
+                        on_line=None, cancel: packer.CancelToken | None = None,
+                        sources: dict[str, list[str]] | None = None):
+        """把多个包变换到同一个 output_root，sources 为 {包路径: 要处理的文件}；默认逐个 transform"""
+        for pkg_full_name in pkg_full_names:
+            self.transform(pkg_full_name, output_root, cwd, silent, timeout, use_cache, cache_dir,
+                           on_line=on_line, cancel=cancel, sources=(sources or {}).get(pkg_full_name))
+
+    def finalize(self, output_root: str, pkg_full_names: list[str]):
+        """全部包变换完成后调用：补齐运行时等公共文件，检查输出"""
+
+
+@register
+class PyarmorBackend(Backend):
+    """pyarmor gen 加密"""
+    name = "pyarmor"
+    label = "pyarmor 加密"
+
+    def prepare(self):
+        packer.get_pyarmor_exe()
+
+    def transform(self, pkg_full_name, output_root, cwd, silent=True, timeout=300, use_cache=True,
+                  cache_dir=None, on_line=None, cancel=None, sources=None, shards=1):
+        from . import buildcache
+        if use_cache:
+            buildcache.incremental_gen(pkg_full_name, output_root, cwd, cache_dir, silent, timeout,
+                                       on_line=on_line, cancel=cancel, sources=sources, shards=shards)
+            return
+        if sources is None and shards != 1:
+            # 需要分片时才列出文件，否则直接对源码目录执行
+            all_sources = buildcache.list_sources(pkg_full_name)
+            if buildcache.shard_count(shards, len(all_sources)) > 1:
+                sources = all_sources
+        if sources is not None:
+            buildcache.gen_subset(pkg_full_name, sources, output_root, cwd, silent, timeout,
+                                  on_line=on_line, cancel=cancel, shards=shards)
+        else:
+            packer.run_pyarmor(pkg_full_name, output_root, cwd, silent, timeout, on_line=on_line, cancel=cancel)
+
+    def transform_batch(self, pkg_full_names, output_root, cwd, silent=True, timeout=300, use_cache=True,
+                        cache_dir=None, on_line=None, cancel=None, sources=None):
+        from . import buildcache
+        # 一次 pyarmor 处理全部包，顶层共用一份运行时
+        buildcache.batch_gen(pkg_full_names, output_root, cwd, cache_dir, silent, timeout, on_line=on_line,
+                             cancel=cancel, sources=sources, use_cache=use_cache)
+
+    def finalize(self, output_root, pkg_full_names):
+        # 运行时由 pyarmor gen 生成（构建缓存命中时从缓存拷贝），这里只检查是否存在
+        for root, dirs, _ in os.walk(output_root):
+            if any(d.startswith("pyarmor_runtime_") for d in dirs):
+                return
+        logger.warning(f"输出目录中未找到 pyarmor_runtime_*，加密后的模块可能无法运行：{output_root}")
+
+
+def _compile_one(task: tuple[str, str, str, int]) -> str | None:
+    """编译单个文件（进程池中执行），成功返回 None，失败返回错误信息"""
+    src, dst, dfile, optimize = task
+    try:
+        py_compile.compile(src, cfile=dst, dfile=dfile, doraise=True, optimize=optimize,
+                           invalidation_mode=py_compile.PycInvalidationMode.UNCHECKED_HASH)
+    except py_compile.PyCompileError as e:
+        return e.msg.strip()
+    except OSError as e:
+        return f"{dfile}: {e}"
+    return None
+
+
+@register
+class PycBackend(Backend):
+    """
+    编译为 .pyc：每个 mod.py 输出为同目录的 mod.pyc（不放在 __pycache__ 中，无源码时可直接导入）
+    使用 UNCHECKED_HASH 模式，输出只取决于源码内容（不含 mtime），同一源码多次编译结果相同
+    """
+    name = "pyc"
+    label = "编译为 .pyc"
+
+    def __init__(self, optimize: int = 1, jobs: int | None = None):
+        self.optimize = optimize
+        self.jobs = jobs
+
+    def transform(self, pkg_full_name, output_root, cwd, silent=True, timeout=300, use_cache=True,
+                  cache_dir=None, on_line=None, cancel=None, sources=None, shards=1):
+        self.transform_batch([pkg_full_name], output_root, cwd, on_line=on_line, cancel=cancel,
+                             sources=None if sources is None else {pkg_full_name: sources})
+
+    def _compile(self, tasks: list[tuple[str, str, str, int]], cancel) -> list[str]:
+        for _, dst, _, _ in tasks:
+            os.makedirs(os.path.dirname(dst), exist_ok=True)
+        jobs = self.jobs or os.cpu_count() or 1
+        if len(tasks) < PYC_PARALLEL_MIN or jobs == 1:
+            results = []
+            for task in tasks:
+                if cancel:
+                    cancel.check()
+                results.append(_compile_one(task))
+            return [r for r in results if r]
+        errors = []
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            try:
+                for error in pool.map(_compile_one, tasks, chunksize=PYC_CHUNK):
+                    if cancel:
+                        cancel.check()
+                    if error:
+                        errors.append(error)
+            except packer.CancelledError:
+                pool.shutdown(wait=True, cancel_futures=True)
+                raise
+        return errors
+
+    def transform_batch(self, pkg_full_names, output_root, cwd, silent=True, timeout=300, use_cache=True,
+                        cache_dir=None, on_line=None, cancel=None, sources=None):
+        # 多个包合并到一个进程池中编译；编译很快，不使用构建缓存
+        from . import buildcache
+        tasks = []
+        for pkg_full_name in pkg_full_names:
+            pkg_name = os.path.basename(pkg_full_name)
+            rels = (sources or {}).get(pkg_full_name)
+            rels = buildcache.list_sources(pkg_full_name) if rels is None else rels
+            tasks += [(os.path.join(pkg_full_name, rel), os.path.join(output_root, pkg_name, rel + "c"),
+                       f"{pkg_name}/{rel}", self.optimize) for rel in rels]
+        with tracing.span("pyc.compile", "pyc", packages=len(pkg_full_names), files=len(tasks)):
+            errors = self._compile(tasks, cancel)
+        for message in errors:
+            (on_line or logger.error)(message)
+        if errors:
+            raise packer.BackendError(f"编译失败 {len(errors)} 个文件：\n" + "\n".join(errors[:20]))
+        label = ", ".join(os.path.basename(p) for p in pkg_full_names)
+        logger.info(f"已编译 {label}：{len(tasks)} 个文件（optimize={self.optimize}）")
@@ -0,0 +1,356 @@
+"""
+性能基准测试（不依赖 Qt，不需要真实的 pyarmor）
+
+- make_tree()：按 包数 × 模块数 × 资源文件大小 生成可复现的合成项目（固定随机种子）；
+- 用本地桩脚本代替 pyarmor（只做 .py 文件的拷贝和改写），排除许可证/网络等不稳定因素；
+- 依次计时：包扫描、版本号读取、完整发布、mapp.txt 拷贝、压缩，每项重复多次取中位数；
+- release 不使用加密缓存（冷发布），release_cached 在缓存预热后计时（源码未变化时的增量发布）；
+- startup：在新的解释器中用 -X importtime 统计命令行入口的导入耗时，并检查是否误加载了 Qt；
+- run_dir / run_pyz：可运行包从发布目录（python -m）和单文件 .pyz 启动的耗时（进程总耗时）；
+
+- 结果输出为 JSON，可与保存的基线比较，超出容差时返回非零退出码（供 CI 使用）。
+
+用法示例：
+    python -m py_app_packer bench --packages 20 --modules 50 --out bench.json
+    python -m py_app_packer bench --baseline bench_base.json --tolerance 0.2
+"""
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from loguru import logger
+from . import packer
+from . import versioninfo
+
+CASES = ("scan", "version", "release", "release_cached", "mapp_copy", "zip", "rezip", "startup", "run_dir", "run_pyz")
+# 命令行路径不应加载的模块（前缀）
+QT_MODULES = ("PySide6", "shiboken6", "toolbox.qt")
+BENCH_FORMAT_VERSION = 1
+
+# pyarmor 桩：gen [-O 输出目录] [-r] [-i] 路径，与 pyarmor gen 的输出结构一致
+_STUB_SOURCE = '''\
+import os, sys
+args = [a for a in sys.argv[1:] if a != "--silent"]
+if args[:1] in (["--version"], ["-v"]):
+    print("Pyarmor bench-stub")
+    sys.exit(0)
+out, paths, i = "dist", [], 1
+while i < len(args):
+    if args[i] == "-O":
+        out = args[i + 1]
+        i += 2
+        continue
+    if not args[i].startswith("-"):
+        paths.append(args[i].rstrip("/\\\\"))
+    i += 1
+for p in paths:
+    base = os.path.basename(p)
+    # -i：运行时放在包内（out/<包>/pyarmor_runtime_000000），否则放在输出目录顶层
+    runtime = os.path.join(out, base if "-i" in args else "", "pyarmor_runtime_000000")
+    os.makedirs(runtime, exist_ok=True)
+    with open(os.path.join(runtime, "__init__.py"), "w") as f:
+        f.write("# runtime\\n")
+    for root, _, names in os.walk(p):
+        for name in names:
+            if name.endswith(".py"):
+                src = os.path.join(root, name)
+                dst = os.path.join(out, base, os.path.relpath(src, p))
+                os.makedirs(os.path.dirname(dst), exist_ok=True)
+                with open(src, "rb") as fs, open(dst, "wb") as fd:
+                    fd.write(b"# armored\\n" + fs.read())
+    print("gen", p)
+'''
+
+
+def install_stub(bin_dir: str) -> str:
+    """在 bin_dir 中生成 pyarmor 桩并返回其路径（Windows 下为 .cmd 包装）"""
+    os.makedirs(bin_dir, exist_ok=True)
+    if sys.platform == "win32":
+        script = os.path.join(bin_dir, "pyarmor_stub.py")
+        with open(script, "w", encoding="utf-8") as f:
+            f.write(_STUB_SOURCE)
+        exe = os.path.join(bin_dir, "pyarmor.cmd")
+        with open(exe, "w", encoding="utf-8") as f:
+            f.write(f'@"{sys.executable}" "{script}" %*\n')
+    else:
+        exe = os.path.join(bin_dir, "pyarmor")
+        with open(exe, "w", encoding="utf-8") as f:
+            f.write(f"#!{sys.executable}\n")
+            f.write(_STUB_SOURCE)
+        os.chmod(exe, 0o755)
+    return exe
+
+
+def _module_source(rnd: random.Random, index: int, size_kb: int) -> str:
+    lines = [f'"""synthetic module {index}"""', "import os", ""]
+    n = 0
+    while sum(len(s) + 1 for s in lines) < size_kb * 1024:
+        a, b = rnd.randint(0, 999), rnd.randint(1, 99)
+        lines += [f"def func_{n}(x={a}):", f"    return (x * {b} + {a}) % {b + 7}", ""]
+        n += 1
+    return "\n".join(lines) + "\n"
+
+
+def make_tree(dest: str, packages: int = 20, modules: int = 30, module_kb: int = 4,
+              assets: int = 4, asset_kb: int = 256, seed: int = 0) -> str:
+    """
+    生成合成项目 dest/projects/pkg_XXX/，返回包根路径（dest/projects）
+    每个包：__init__.py、version.py、modules 个模块（一半放在子包 sub/ 中）、assets/ 下 assets 个资源文件、
+    appcfg.yaml 和 mapp.txt；偶数编号的包带有 __main__.py（可运行模块，导入全部模块）
+    """
+    rnd = random.Random(seed)
+    root = os.path.join(dest, "projects")
+    for p in range(packages):
+        pkg = os.path.join(root, f"pkg_{p:03d}")
+        os.makedirs(os.path.join(pkg, "sub"), exist_ok=True)
+        os.makedirs(os.path.join(pkg, "assets"), exist_ok=True)
+        with open(os.path.join(pkg, "__init__.py"), "w", encoding="utf-8") as f:
+            f.write("from . import mod_000\n" if modules else "")
+        if p % 2 == 0:
+            with open(os.path.join(pkg, "__main__.py"), "w", encoding="utf-8") as f:
+                f.writelines(f"from .{'sub' if m % 2 else ''} import mod_{m:03d}\n" for m in range(modules))
+        with open(os.path.join(pkg, "sub", "__init__.py"), "w", encoding="utf-8") as f:
+            f.write("")
+        with open(packer.version_file_path(pkg), "w", encoding="utf-8") as f:
+            f.write(f'__version__ = "0.{p}.0.post20260101"\n__update_timestamp__ = "2026-01-01 00:00:00"\n')
+        for m in range(modules):
+            sub = "sub" if m % 2 else ""
+            with open(os.path.join(pkg, sub, f"mod_{m:03d}.py"), "w", encoding="utf-8") as f:
+                f.write(_module_source(rnd, m, module_kb))
+        for a in range(assets):
+            # 一半随机数据（不可压缩）、一半重复文本（易压缩），接近真实的模型/配置文件组合
+            half = asset_kb * 512
+            with open(os.path.join(pkg, "assets", f"asset_{a:02d}.bin"), "wb") as f:
+                f.write(rnd.randbytes(half))
+                f.write((b"weights %d\n" % a) * (half // 10))
+        with open(os.path.join(pkg, "appcfg.yaml"), "w", encoding="utf-8") as f:
+            f.write(f"name: pkg_{p:03d}\n")
+        with open(os.path.join(pkg, "mapp.txt"), "w", encoding="utf-8") as f:
+            f.write("assets\nappcfg.yaml\n")
+    return root
+
+
+def import_time(module: str) -> tuple[float, list[str]]:
+    """
+    在新的解释器中以 -X importtime 导入 module，
+    返回 (module 的累计导入耗时秒数, 导入过程中加载的 Qt 相关模块)
+    """
+    pkg_parent = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(p for p in (pkg_parent, env.get("PYTHONPATH")) if p)
+    code = f"import sys, {module}; print('\\n'.join(sys.modules))"
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                          capture_output=True, text=True, env=env)
+    if proc.returncode != 0:
+        raise RuntimeError(f"导入 {module} 失败: {proc.stderr.strip().splitlines()[-1:]}")
+    cumulative = None
+    # 每行格式：import time: self [us] | cumulative | imported package
+    for line in proc.stderr.splitlines():
+        parts = line.split("|")
+        if len(parts) == 3 and parts[2].strip() == module:
+            cumulative = int(parts[1])
+    if cumulative is None:
+        raise RuntimeError(f"-X importtime 输出中没有 {module}")
+    qt = [m for m in proc.stdout.split() if m.startswith(QT_MODULES)]
+    return cumulative / 1e6, qt
+
+
+def _run_process(cmd: list[str], cwd: str, env: dict):
+    proc = subprocess.run(cmd, cwd=cwd, env=env, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"运行失败: {' '.join(cmd)}: {proc.stderr.strip().splitlines()[-1:]}")
+
+
+def _timeit(fn, repeat: int, setup=None, teardown=None) -> dict:
+    runs = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        t0 = time.perf_counter()
+        fn()
+        runs.append(time.perf_counter() - t0)
+        if teardown:
+            teardown()
+    return {"min": min(runs), "median": statistics.median(runs), "runs": runs}
+
+
+def run(packages: int = 20, modules: int = 30, module_kb: int = 4, assets: int = 4, asset_kb: int = 256,
+        repeat: int = 3, jobs: int = 1, cases: tuple[str, ...] = CASES, work_dir: str | None = None,
+        keep: bool = False, seed: int = 0) -> dict:
+    """执行基准测试，返回可写入 JSON 的结果"""
+    params = dict(packages=packages, modules=modules, module_kb=module_kb, assets=assets,
+                  asset_kb=asset_kb, repeat=repeat, jobs=jobs, seed=seed)
+    if work_dir:
+        os.makedirs(work_dir, exist_ok=True)
+    work = tempfile.mkdtemp(prefix="py_app_packer_bench_", dir=work_dir)
+    old_exe = os.environ.get(packer.PYARMOR_EXE_ENV)
+    results: dict[str, dict] = {}
+    try:
+        os.environ[packer.PYARMOR_EXE_ENV] = install_stub(os.path.join(work, "bin"))
+        t0 = time.perf_counter()
+        root = make_tree(os.path.join(work, "tree"), packages, modules, module_kb, assets, asset_kb, seed)
+        logger.info(f"合成项目已生成: {root}（{time.perf_counter() - t0:.2f}s）")
+        dist = os.path.join(os.path.dirname(root), "dist")
+        names = [name for name, _, _ in packer.scan_packages(root)]
+        pkg_paths = [os.path.join(root, name) for name in names]
+
+        def clean_dist():
+            shutil.rmtree(dist, ignore_errors=True)
+
+        if "scan" in cases:
+            results["scan"] = _timeit(lambda: packer.scan_packages(root), repeat)
+
+        if "version" in cases:
+            def read_versions():
+                for path in pkg_paths:
+                    packer.read_version_info(packer.version_file_path(path))
+            results["version"] = _timeit(read_versions, repeat, setup=versioninfo.clear_cache)
+
+        if "release" in cases:
+            def release():
+                failed = [r for r in packer.release_many(root, names, jobs=jobs, use_cache=False) if not r.ok]
+                if failed:
+                    raise RuntimeError(f"发布失败: {failed[0].pkg_name}: {failed[0].error}")
+            results["release"] = _timeit(release, repeat, setup=clean_dist, teardown=clean_dist)
+
+        if "release_cached" in cases:
+            # 加密缓存在 dist/.build_cache 中，每轮只清理发布输出；首次发布用于预热缓存，不计时
+            from . import buildcache
+
+            def clean_outputs():
+                for entry in os.scandir(dist) if os.path.isdir(dist) else ():
+                    if entry.name != buildcache.CACHE_DIR_NAME:
+                        shutil.rmtree(entry.path, ignore_errors=True)
+
+            def release_cached():
+                failed = [r for r in packer.release_many(root, names, jobs=jobs, use_cache=True) if not r.ok]
+                if failed:
+                    raise RuntimeError(f"发布失败: {failed[0].pkg_name}: {failed[0].error}")
+            clean_dist()
+            release_cached()
+            results["release_cached"] = _timeit(release_cached, repeat, setup=clean_outputs)
+            clean_dist()
+
+        if "mapp_copy" in cases:
+            copy_root = os.path.join(work, "mapp")
+
+            def copy_all():
+                for path in pkg_paths:
+                    packer.copy_mapp(path, copy_root)
+            results["mapp_copy"] = _timeit(copy_all, repeat, setup=lambda: shutil.rmtree(copy_root, True))
+
+        if "zip" in cases:
+            # 压缩对象为一次真实发布的输出目录（不计时）
+            clean_dist()
+            outputs = [r.output_root for r in packer.release_many(root, names, jobs=jobs, use_cache=False)]
+            zips = os.path.join(work, "zips")
+
+            def zip_all():
+                for out in outputs:
+                    packer.archive_dir(out, os.path.join(zips, os.path.basename(out) + ".zip"), reuse=False)
+            results["zip"] = _timeit(zip_all, repeat, setup=lambda: shutil.rmtree(zips, True))
+            clean_dist()
+
+        if "rezip" in cases:
+            # 发布内容未变化时再次压缩（复用缓存中的压缩包），首次压缩不计时
+            clean_dist()
+            outputs = [r.output_root for r in packer.release_many(root, names, jobs=jobs, use_cache=False)]
+            zips = os.path.join(work, "zips")
+            shutil.rmtree(zips, True)
+
+            def rezip_all():
+                for out in outputs:
+                    packer.archive_dir(out, os.path.join(zips, os.path.basename(out) + ".zip"))
+
+            def drop_zips():
+                for out in outputs:
+                    zip_path = os.path.join(zips, os.path.basename(out) + ".zip")
+                    if os.path.exists(zip_path):
+                        os.remove(zip_path)
+            rezip_all()
+            results["rezip"] = _timeit(rezip_all, repeat, setup=drop_zips)
+            shutil.rmtree(zips, True)
+            clean_dist()
+
+        if "startup" in cases:
+            # 取导入耗时而不是进程总耗时，排除解释器自身启动的波动
+            module = f"{__package__}.cli"
+            runs, qt = [], []
+            for _ in range(repeat):
+                seconds, qt = import_time(module)
+                runs.append(seconds)
+            results["startup"] = {"min": min(runs), "median": statistics.median(runs), "runs": runs,
+                                  "module": module, "qt_modules": qt}
+        if "run_dir" in cases or "run_pyz" in cases:
+            # 同一个可运行包的发布目录与 .pyz 各启动一次预热（.pyz 首次运行时解压运行时），之后计时
+            # 文件已在页缓存中；目标机冷启动时逐个读取小文件的开销更大，差距也更明显
+            from . import pyz
+            clean_dist()
+            runnable = next(name for name in names if os.path.isfile(os.path.join(root, name, "__main__.py")))
+            out = packer.release_package(root, runnable, use_cache=False).output_root
+            pyz_path = packer.build_pyz(out, os.path.join(root, runnable))
+            env = dict(os.environ)
+            env[pyz.CACHE_ENV] = os.path.join(work, "pyz_cache")
+            # -E -s：不受 PYTHONPATH 和用户 site-packages 影响
+            run_dir = [sys.executable, "-E", "-s", "-m", runnable]
+            run_pyz = [sys.executable, "-E", "-s", pyz_path]
+            for cmd in (run_dir, run_pyz):
+                _run_process(cmd, out, env)
+            if "run_dir" in cases:
+                results["run_dir"] = _timeit(lambda: _run_process(run_dir, out, env), repeat)
+            if "run_pyz" in cases:
+                results["run_pyz"] = _timeit(lambda: _run_process(run_pyz, out, env), repeat)
+            clean_dist()
+    finally:
+        if old_exe is None:
+            os.environ.pop(packer.PYARMOR_EXE_ENV, None)
+        else:
+            os.environ[packer.PYARMOR_EXE_ENV] = old_exe
+        if keep:
+            logger.info(f"已保留基准测试目录: {work}")
+        else:
+            shutil.rmtree(work, ignore_errors=True)
+
+    return {
+        "version": BENCH_FORMAT_VERSION,
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+        },
+        "params": params,
+        "results": results,
+    }
+
+
+def compare(current: dict, baseline: dict, tolerance: float = 0.2) -> list[tuple[str, float, float]]:
+    """
+    按中位数与基线比较，返回变慢超过容差的项 [(项目, 基线秒数, 当前秒数)]
+    参数不同的结果没有可比性，直接抛出 ValueError
+    """
+    if current.get("params") != baseline.get("params"):
+        raise ValueError(f"基准参数与基线不一致：{current.get('params')} != {baseline.get('params')}")
+    regressions = []
+    for case, cur in current["results"].items():
+        base = baseline.get("results", {}).get(case)
+        if base and cur["median"] > base["median"] * (1 + tolerance):
+            regressions.append((case, base["median"], cur["median"]))
+    return regressions
+
+
+def load(path: str) -> dict:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save(result: dict, path: str):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
@@ -0,0 +1,420 @@
+"""
+增量加密构建缓存
+
+以「源文件 SHA-256 + pyarmor 版本 + 命令选项 + 包内相对路径」为键缓存每个 .py 的加密结果，
+再次发布时未修改的模块直接复用缓存，只把有改动的文件交给 pyarmor。
+
+缓存目录结构（默认 <仓库根>/dist/.build_cache）：
+    objects/<键前两位>/<键>    单个文件的加密输出
+    runtime/v2/<选项键>/...     pyarmor 运行时等非源文件输出（pyarmor_runtime_*）；
+                              带 -i 时运行时位于 <包名>/ 下，缓存中以 @pkg/ 代替包名，拷贝时换成实际的包名
+
+batch_gen() 把多个包合并为一次 pyarmor 调用（见 packer.pyarmor_batch_cmd），缓存方式相同。
+待加密的文件较多时可按文件大小均衡分片，每片一个 pyarmor 进程并行执行，再合并为一份输出（见 _gen_files）。
+
+注：同一 pyarmor 版本/许可证下，运行时目录名与加密脚本对运行时的引用方式固定，
+因此可以单独复用；pyarmor 版本输出（含许可证信息）变化时缓存自动失效。
+"""
+import hashlib
+import heapq
+import os
+import shutil
+import subprocess
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from loguru import logger
+from . import packer
+from . import tracing
+
+CACHE_DIR_NAME = ".build_cache"
+# 命令选项（除输入/输出路径外），参与缓存键计算
+GEN_OPTIONS = ("gen", "-r", "-i")
+# 批量加密不带 -i（共用顶层运行时），加密脚本对运行时的引用方式不同，单独缓存
+BATCH_GEN_OPTIONS = ("gen", "-r")
+# 运行时缓存的目录布局版本（v1 按首次加密的包名保存，会把该包的运行时拷贝给其他包）
+RUNTIME_LAYOUT = "v2"
+# 运行时缓存中代表包目录的占位名
+PKG_PLACEHOLDER = "@pkg"
+# 分片加密时每片至少的文件数（pyarmor 进程启动约需 1 秒，文件太少时分片得不偿失）
+SHARD_MIN_FILES = 50
+
+
+@lru_cache(maxsize=None)
+def _pyarmor_version(exe: str, mtime_ns: int) -> str:
+    try:
+        proc = subprocess.run([exe, "--version"], capture_output=True, text=True, timeout=60)
+        return (proc.stdout or proc.stderr).strip()
+    except Exception as e:  # noqa: BLE001
+        logger.warning(f"获取 pyarmor 版本失败: {e}")
+        return ""
+
+
+def pyarmor_version() -> str:
+    """返回 pyarmor --version 的输出（按可执行文件路径和修改时间缓存）"""
+    exe = packer.get_pyarmor_exe()
+    return _pyarmor_version(exe, os.stat(exe).st_mtime_ns)
+
+
+def sha256_file(path: str, bufsize: int = 1 << 20) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(bufsize):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def list_sources(pkg_full_name: str) -> list[str]:
+    """列出包内全部 .py 文件（相对包目录，'/' 分隔），与 pyarmor gen -r 的输入一致"""
+    files: list[str] = []
+    for root, dirs, names in os.walk(pkg_full_name):
+        dirs[:] = sorted(d for d in dirs if d != "__pycache__")
+        for name in sorted(names):
+            if name.endswith(".py"):
+                rel = os.path.relpath(os.path.join(root, name), pkg_full_name)
+                files.append(rel.replace("\\", "/"))
+    return files
+
+
+def _copy_atomic(src: str, dst: str):
+    """先写临时文件再改名，避免多进程并行发布时读到写了一半的缓存"""
+    os.makedirs(os.path.dirname(dst), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(dst), prefix=".tmp_")
+    os.close(fd)
+    try:
+        shutil.copyfile(src, tmp)
+        os.replace(tmp, dst)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+class BuildCache:
+    """基于内容哈希的 pyarmor 输出缓存"""
+
+    def __init__(self, cache_dir: str):
+        self.cache_dir = os.path.abspath(cache_dir)
+
+    def options_key(self, version: str, options: tuple[str, ...] = GEN_OPTIONS) -> str:
+        return hashlib.sha256(f"{version}\0{' '.join(options)}".encode("utf-8")).hexdigest()
+
+    def file_key(self, opt_key: str, rel_path: str, content_hash: str) -> str:
+        return hashlib.sha256(f"{opt_key}\0{rel_path}\0{content_hash}".encode("utf-8")).hexdigest()
+
+    def _object_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, "objects", key[:2], key)
+
+    def get(self, key: str) -> str | None:
+        path = self._object_path(key)
+        return path if os.path.isfile(path) else None
+
+    def put(self, key: str, src_path: str):
+        _copy_atomic(src_path, self._object_path(key))
+
+    def runtime_dir(self, opt_key: str) -> str:
+        return os.path.join(self.cache_dir, "runtime", RUNTIME_LAYOUT, opt_key)
+
+    def has_runtime(self, opt_key: str) -> bool:
+        return os.path.isdir(self.runtime_dir(opt_key))
+
+    def put_runtime(self, opt_key: str, base_dir: str, rel_files: list[str], pkg_name: str | None = None):
+        """
+        缓存运行时文件：先写入临时目录，完整后再改名为正式目录
+        pkg_name 不为空时 <pkg_name>/ 下的文件以 @pkg/ 保存，与具体的包无关
+        """
+        dst = self.runtime_dir(opt_key)
+        if os.path.isdir(dst):
+            return
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+        tmp = tempfile.mkdtemp(dir=os.path.dirname(dst), prefix=".tmp_")
+        for rel in rel_files:
+            cached_rel = rel
+            if pkg_name and rel.startswith(f"{pkg_name}/"):
+                cached_rel = f"{PKG_PLACEHOLDER}/{rel[len(pkg_name) + 1:]}"
+            target = os.path.join(tmp, cached_rel)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            shutil.copyfile(os.path.join(base_dir, rel), target)
+        try:
+            os.rename(tmp, dst)
+        except OSError:
+            # 其它进程已抢先写入
+            shutil.rmtree(tmp, ignore_errors=True)
+
+    def copy_runtime(self, opt_key: str, output_root: str, pkg_name: str | None = None):
+        """把缓存的运行时拷贝到 output_root，@pkg/ 下的文件拷贝到 output_root/<pkg_name>/"""
+        src = self.runtime_dir(opt_key)
+        for entry in os.scandir(src):
+            if entry.name == PKG_PLACEHOLDER:
+                if not pkg_name:
+                    raise ValueError(f"运行时缓存属于单个包，需要指定包名：{src}")
+                shutil.copytree(entry.path, os.path.join(output_root, pkg_name), dirs_exist_ok=True)
+            elif entry.is_dir():
+                shutil.copytree(entry.path, os.path.join(output_root, entry.name), dirs_exist_ok=True)
+            else:
+                os.makedirs(output_root, exist_ok=True)
+                shutil.copyfile(entry.path, os.path.join(output_root, entry.name))
+
+
+def default_cache_dir(output_root: str) -> str:
+    """默认缓存目录：发布目录同级的 .build_cache（即 <仓库根>/dist/.build_cache）"""
+    return os.path.join(os.path.dirname(os.path.abspath(output_root)), CACHE_DIR_NAME)
+
+
+def _mirror_sources(pkg_full_name: str, rels: list[str], scratch: str) -> str:
+    """在 scratch 中按原相对路径重建一个只含 rels 的同名包，返回其路径"""
+    src_pkg = os.path.join(scratch, "src", os.path.basename(pkg_full_name))
+    for rel in rels:
+        dst = os.path.join(src_pkg, rel)
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+        shutil.copy2(os.path.join(pkg_full_name, rel), dst)
+    return src_pkg
+
+
+def shard_count(shards: int | None, n_files: int) -> int:
+    """实际分片数：shards 为 0 时取 CPU 核数；每片不少于 SHARD_MIN_FILES 个文件，不足两片时不分片"""
+    if shards is None or shards == 1:
+        return 1
+    if shards <= 0:
+        shards = os.cpu_count() or 1
+    return max(1, min(shards, n_files // SHARD_MIN_FILES))
+
+
+def split_shards(pkg_full_name: str, rels: list[str], n: int) -> list[list[str]]:
+    """按文件大小把 rels 均衡分为 n 片：从大到小依次放入当前总大小最小的分片"""
+    sizes = {rel: os.path.getsize(os.path.join(pkg_full_name, rel)) for rel in rels}
+    heap = [(0, i) for i in range(n)]
+    parts: list[list[str]] = [[] for _ in range(n)]
+    for rel in sorted(rels, key=lambda r: (-sizes[r], r)):
+        total, i = heapq.heappop(heap)
+        parts[i].append(rel)
+        heapq.heappush(heap, (total + sizes[rel], i))
+    return [sorted(part) for part in parts if part]
+
+
+def _merge_shards(pkg_name: str, parts: list[list[str]], shard_outs: list[str], output_root: str):
+    """
+    合并各分片的 pyarmor 输出并校验：
+    源文件的加密输出只能来自它所在的分片；其余文件（运行时）在各分片中必须完全一致，合并后只保留一份
+    """
+    owner = {f"{pkg_name}/{rel}": i for i, part in enumerate(parts) for rel in part}
+    runtime: dict[str, str] | None = None
+    for i, shard_out in enumerate(shard_outs):
+        shard_runtime = {}
+        for root, _, names in os.walk(shard_out):
+            for name in names:
+                path = os.path.join(root, name)
+                rel = os.path.relpath(path, shard_out).replace("\\", "/")
+                if rel not in owner:
+                    shard_runtime[rel] = sha256_file(path)
+                elif owner[rel] != i:
+                    raise RuntimeError(f"分片 {i} 输出了不属于它的文件，无法合并: {rel}")
+        if runtime is None:
+            runtime = shard_runtime
+        elif shard_runtime != runtime:
+            diff = sorted({rel for rel in runtime.keys() | shard_runtime.keys()
+                           if runtime.get(rel) != shard_runtime.get(rel)})
+            raise RuntimeError(f"分片 0 与分片 {i} 的运行时文件不一致，无法合并: {', '.join(diff[:5])}")
+        shutil.copytree(shard_out, output_root, dirs_exist_ok=True)
+
+
+def _gen_files(pkg_full_name: str, rels: list[str], scratch: str, output_root: str, cwd: str,
+               silent: bool = True, timeout: float = 300, on_line=None,
+               cancel: packer.CancelToken | None = None, shards: int | None = 1):
+    """
+    在 scratch 中重建只含 rels 的同名包并执行 pyarmor gen，输出写入 output_root（结构与整包加密相同）
+    shards 见 shard_count()：分片时每片一个 pyarmor 进程并行执行，完成后合并（见 _merge_shards）
+    """
+    n = shard_count(shards, len(rels))
+    if n <= 1:
+        src_pkg = _mirror_sources(pkg_full_name, rels, scratch)
+        packer.run_pyarmor(src_pkg, output_root, cwd, silent, timeout, on_line=on_line, cancel=cancel)
+        return
+
+    pkg_name = os.path.basename(pkg_full_name)
+    parts = split_shards(pkg_full_name, rels, n)
+    shard_dirs = [os.path.join(scratch, f"shard_{i:02d}") for i in range(len(parts))]
+    logger.info(f"分片加密: {pkg_name} {len(rels)} 个文件分为 {len(parts)} 片并行执行")
+
+    def _run(i: int):
+        src_pkg = _mirror_sources(pkg_full_name, parts[i], shard_dirs[i])
+        packer.run_pyarmor(src_pkg, os.path.join(shard_dirs[i], "out"), cwd, silent, timeout,
+                           on_line=on_line, cancel=cancel)
+
+    with ThreadPoolExecutor(max_workers=len(parts)) as pool:
+        futures = [pool.submit(tracing.bind(_run), i) for i in range(len(parts))]
+    # 等全部分片结束后再抛出第一个错误，避免残留的 pyarmor 进程继续写临时目录
+    for fut in futures:
+        fut.result()
+    with tracing.span("shard.merge", "pyarmor", shards=len(parts)):
+        _merge_shards(pkg_name, parts, [os.path.join(d, "out") for d in shard_dirs], output_root)
+
+
+def gen_subset(pkg_full_name: str, sources: list[str], output_root: str, cwd: str, silent: bool = True,
+               timeout: float = 300, on_line=None, cancel: packer.CancelToken | None = None,
+               shards: int | None = 1):
+    """不使用缓存，只对包内指定的文件执行 pyarmor gen（输出结构与整包加密相同），shards 见 shard_count()"""
+    pkg_full_name = os.path.abspath(pkg_full_name)
+    scratch = tempfile.mkdtemp(prefix=f"pyarmor_{os.path.basename(pkg_full_name)}_")
+    try:
+        _gen_files(pkg_full_name, sources, scratch, output_root, cwd, silent, timeout, on_line, cancel, shards)
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+
+def incremental_gen(pkg_full_name: str, output_root: str, cwd: str, cache_dir: str | None = None,
+                    silent: bool = True, timeout: float = 300,
+                    on_line=None, cancel: packer.CancelToken | None = None,
+                    sources: list[str] | None = None, shards: int | None = 1) -> tuple[int, int]:
+    """
+    增量加密：命中缓存的文件直接拷贝到 ${OUTPUT}/${pkg_name}/，
+    其余文件放入临时目录中的同名包内，只对它们执行 pyarmor gen。
+    sources 为要加密的文件（相对包目录），默认为包内全部 .py 文件；shards 见 shard_count()
+    返回 (命中数, 重新加密数)
+    """
+    pkg_full_name = os.path.abspath(pkg_full_name)
+    pkg_name = os.path.basename(pkg_full_name)
+    cache = BuildCache(cache_dir or default_cache_dir(output_root))
+    opt_key = cache.options_key(pyarmor_version())
+
+    with tracing.span("cache.lookup", "cache") as sp:
+        if sources is None:
+            sources = list_sources(pkg_full_name)
+        keys = {
+            rel: cache.file_key(opt_key, f"{pkg_name}/{rel}", sha256_file(os.path.join(pkg_full_name, rel)))
+            for rel in sources
+        }
+        has_runtime = cache.has_runtime(opt_key)
+        misses = [rel for rel in sources if not has_runtime or cache.get(keys[rel]) is None]
+        miss_set = set(misses)
+        hits = [rel for rel in sources if rel not in miss_set]
+        sp.set(files=len(sources), hits=len(hits), misses=len(misses))
+    logger.info(f"构建缓存: {pkg_name} 命中 {len(hits)} 个文件，需重新加密 {len(misses)} 个文件")
+
+    os.makedirs(output_root, exist_ok=True)
+    for rel in hits:
+        dst = os.path.join(output_root, pkg_name, rel)
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+        shutil.copyfile(cache.get(keys[rel]), dst)
+
+    if misses:
+        scratch = tempfile.mkdtemp(prefix=f"pyarmor_{pkg_name}_")
+        try:
+            # 在临时目录中按原相对路径重建一个只含改动文件的同名包
+            scratch_out = os.path.join(scratch, "out")
+            _gen_files(pkg_full_name, misses, scratch, scratch_out, cwd, silent, timeout, on_line, cancel, shards)
+
+            generated: set[str] = set()
+            for rel in misses:
+                out_rel = f"{pkg_name}/{rel}"
+                out_path = os.path.join(scratch_out, out_rel)
+                if not os.path.isfile(out_path):
+                    logger.warning(f"pyarmor 未生成加密文件，未写入缓存: {out_rel}")
+                    continue
+                generated.add(out_rel)
+                cache.put(keys[rel], out_path)
+
+            # 除源文件对应的输出外，其余均视为运行时文件
+            runtime_files = []
+            for root, _, names in os.walk(scratch_out):
+                for name in names:
+                    rel = os.path.relpath(os.path.join(root, name), scratch_out).replace("\\", "/")
+                    if rel not in generated:
+                        runtime_files.append(rel)
+            cache.put_runtime(opt_key, scratch_out, runtime_files, pkg_name)
+            shutil.copytree(scratch_out, output_root, dirs_exist_ok=True)
+        finally:
+            shutil.rmtree(scratch, ignore_errors=True)
+    else:
+        cache.copy_runtime(opt_key, output_root, pkg_name)
+
+    return len(hits), len(misses)
+
+
+def batch_gen(pkg_full_names: list[str], output_root: str, cwd: str, cache_dir: str | None = None,
+              silent: bool = True, timeout: float = 300, on_line=None,
+              cancel: packer.CancelToken | None = None, sources: dict[str, list[str]] | None = None,
+              use_cache: bool = True) -> tuple[int, int]:
+    """
+    批量加密：多个包的输出写入同一个 output_root（${OUTPUT}/<包名>/...），顶层只有一份运行时。
+    use_cache 时命中缓存的文件直接拷贝，所有包中未命中的文件合并后只执行一次 pyarmor gen。
+    sources 为 {包路径: 要加密的文件（相对包目录）}，未列出的包加密全部 .py 文件
+    返回 (命中数, 重新加密数)
+    """
+    pkgs = [os.path.abspath(p) for p in pkg_full_names]
+    names = [os.path.basename(p) for p in pkgs]
+    dup = sorted({n for n in names if names.count(n) > 1})
+    if dup:
+        raise ValueError(f"批量加密的包名重复（输出目录会互相覆盖）：{', '.join(dup)}")
+    sources = {os.path.abspath(k): v for k, v in (sources or {}).items()}
+    cache = BuildCache(cache_dir or default_cache_dir(output_root)) if use_cache else None
+    opt_key = cache.options_key(pyarmor_version(), BATCH_GEN_OPTIONS) if cache else ""
+
+    # 包路径 -> (各文件缓存键, 需要加密的文件)
+    plan: dict[str, tuple[dict[str, str], list[str]]] = {}
+    with tracing.span("cache.lookup", "cache", packages=len(pkgs)) as sp:
+        has_runtime = cache is not None and cache.has_runtime(opt_key)
+        for pkg, name in zip(pkgs, names):
+            rels = sources.get(pkg)
+            if rels is None:
+                rels = list_sources(pkg)
+            keys = {}
+            if cache is not None:
+                keys = {rel: cache.file_key(opt_key, f"{name}/{rel}", sha256_file(os.path.join(pkg, rel)))
+                        for rel in rels}
+            misses = [rel for rel in rels if not has_runtime or cache.get(keys[rel]) is None]
+            plan[pkg] = (keys, misses)
+            sp.add(files=len(rels), hits=len(rels) - len(misses), misses=len(misses))
+    total_misses = sum(len(m) for _, m in plan.values())
+    total_hits = sum(len(k) for k, _ in plan.values()) - (total_misses if cache is not None else 0)
+    logger.info(f"批量加密: {len(pkgs)} 个包，命中缓存 {total_hits} 个文件，需加密 {total_misses} 个文件")
+
+    os.makedirs(output_root, exist_ok=True)
+    for pkg, name in zip(pkgs, names):
+        keys, misses = plan[pkg]
+        miss_set = set(misses)
+        for rel, key in keys.items():
+            if rel not in miss_set:
+                dst = os.path.join(output_root, name, rel)
+                os.makedirs(os.path.dirname(dst), exist_ok=True)
+                shutil.copyfile(cache.get(key), dst)
+
+    if cache is None and not sources:
+        # 不使用缓存也不裁剪时直接对源码目录执行
+        packer.run_pyarmor_batch(pkgs, output_root, cwd, silent, timeout, on_line=on_line, cancel=cancel)
+        return 0, total_misses
+    if not total_misses:
+        cache.copy_runtime(opt_key, output_root)
+        return total_hits, 0
+
+    scratch = tempfile.mkdtemp(prefix="pyarmor_batch_")
+    try:
+        # 每个包只重建需要加密的文件，所有包合并为一次 pyarmor 调用
+        src_pkgs = [_mirror_sources(pkg, plan[pkg][1], scratch) for pkg in pkgs if plan[pkg][1]]
+        scratch_out = os.path.join(scratch, "out")
+        packer.run_pyarmor_batch(src_pkgs, scratch_out, cwd, silent, timeout, on_line=on_line, cancel=cancel)
+
+        generated: set[str] = set()
+        for pkg, name in zip(pkgs, names):
+            keys, misses = plan[pkg]
+            for rel in misses:
+                out_rel = f"{name}/{rel}"
+                out_path = os.path.join(scratch_out, out_rel)
+                if not os.path.isfile(out_path):
+                    logger.warning(f"pyarmor 未生成加密文件，未写入缓存: {out_rel}")
+                    continue
+                generated.add(out_rel)
+                if cache is not None:
+                    cache.put(keys[rel], out_path)
+        if cache is not None:
+            runtime_files = []
+            for root, _, files in os.walk(scratch_out):
+                for fname in files:
+                    rel = os.path.relpath(os.path.join(root, fname), scratch_out).replace("\\", "/")
+                    if rel not in generated:
+                        runtime_files.append(rel)
+            cache.put_runtime(opt_key, scratch_out, runtime_files)
+        shutil.copytree(scratch_out, output_root, dirs_exist_ok=True)
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+    return total_hits, total_misses
@@ -0,0 +1,532 @@
+"""
+命令行入口（不启动 Qt 界面）
+
+用法示例：
+    python -m py_app_packer release --root D:/wk/phimate/projects pkgA pkgB -j 4 --zip
+    python -m py_app_packer release --root D:/wk/phimate/projects --all --batch --bundle-name phimate --zip
+    python -m py_app_packer delta D:/wk/phimate/dist/dist_pkgA_<时间> --base D:/wk/phimate/dist/dist_pkgA_<旧时间>.manifest.json
+    python -m py_app_packer apply-delta dist_pkgA_<时间>.delta_<旧时间>.zip --target D:/deploy/pkgA
+    python -m py_app_packer watch pkgA --root D:/wk/phimate/projects
+    python -m py_app_packer version --root D:/wk/phimate/projects --all --match "phimate_*" --patch
+    python -m py_app_packer daemon -j 2                    # 本机共用的发布守护进程，之后 release --daemon 提交到它
+    python -m py_app_packer release --daemon --root D:/wk/phimate/projects pkgA pkgB --zip
+    python -m py_app_packer gc --dist D:/wk/phimate/dist --keep 5 --max-size 20G
+    python -m py_app_packer bench --out bench.json --baseline bench_base.json
+"""
+import argparse
+import fnmatch
+import os
+import sys
+import time
+from . import __version__
+
+# 解析参数时用到的取值（与 archive.FORMATS、bench.CASES 等一致，见 tests/test_cli.py）：
+# 各子命令的模块在其处理函数中才导入，--help 和其他子命令不加载它们（及 yaml、zipfile、multiprocessing 等）
+ARCHIVE_FORMATS = ("zip", "tar.xz", "tar.zst")
+COPY_MODES = ("copy", "hardlink")
+BACKEND_NAMES = ("pyarmor", "pyc")
+BENCH_CASES = ("scan", "version", "release", "release_cached", "mapp_copy", "zip", "rezip", "startup", "run_dir", "run_pyz")
+PYZ_INTERPRETER = "/usr/bin/env python3"
+POLL_INTERVAL = 1.0
+VERSION_UPDATE_JOBS = 8
+
+
+def _cfg() -> dict:
+    """appcfg.yaml 的内容（首次调用时读取）"""
+    from . import APPCFG
+    return APPCFG
+
+
+def _parse_size(text: str) -> int:
+    from . import store
+    return store.parse_size(text)
+
+
+def _print_result(r: "packer.ReleaseResult"):
+    status = "OK" if r.ok else "FAIL"
+    print(f"[{status}] {r.pkg_name:<30} {r.elapsed:8.2f}s  exit={r.returncode}  {r.zip_path or r.output_root}",
+          flush=True)
+    if r.pyz_path:
+        print(f"       {r.pyz_path}", flush=True)
+    if r.error:
+        print(f"       {r.error.strip()}", flush=True)
+
+
+def _scan_options(args) -> "scanner.ScanOptions":
+    from . import scanner
+    opts = scanner.ScanOptions.from_cfg(_cfg())
+    return scanner.ScanOptions(
+        depth=args.depth if args.depth is not None else opts.depth,
+        excludes=opts.excludes + tuple(args.exclude or ()),
+        gitignore=opts.gitignore and not args.no_gitignore,
+    )
+
+
+def cmd_release(args) -> int:
+    from . import tracing
+    trace = args.trace or tracing.enabled_by_cfg(_cfg())
+    with tracing.session(trace) as tracer:
+        code = _release(args, trace)
+    if tracer is not None:
+        # 整体流程（扫描 + 各包发布）的计时，各包自己的计时在其发布目录旁
+        ts = time.strftime("%Y-%m-%d-%H.%M.%S")
+        tracer.write(os.path.join(os.path.dirname(os.path.abspath(args.root)), "dist", f"release_{ts}"))
+    return code
+
+
+def _release(args, trace: bool) -> int:
+    from . import backends, packer, scanner
+    pkg_names = args.packages
+    if args.all:
+        pkg_names = [r[0] for r in scanner.scan_rows(args.root, options=_scan_options(args))]
+    if not pkg_names:
+        print("未指定要发布的包（可使用 --all 发布根路径下全部包）", file=sys.stderr)
+        return 2
+
+    silent = bool(_cfg().get("is_pyarmor_silent", 1)) if args.silent is None else args.silent
+    options = dict(
+        silent=silent, do_zip=args.zip, delete_src=args.delete_src, timeout=args.timeout,
+        use_cache=bool(_cfg().get("is_build_cache", 1)) and not args.no_cache,
+        archive_format=args.format or _cfg().get("archive_format", "zip"),
+        archive_level=args.level if args.level is not None else _cfg().get("archive_level"),
+        mapp_mode=args.mapp_mode or _cfg().get("mapp_copy_mode", "copy"),
+        store_mode=None if args.no_store else _cfg().get("release_store_mode") or None,
+        prune=bool(_cfg().get("is_prune_unreachable", 0)) if args.prune is None else args.prune,
+        trace=trace,
+        archive_reuse=bool(_cfg().get("is_archive_reuse", 1)) and not args.no_archive_reuse,
+        backend=backends.from_cfg(_cfg(), args.backend),
+    )
+    shards = args.shards if args.shards is not None else int(_cfg().get("pyarmor_shards", 1) or 0)
+    t0 = time.perf_counter()
+    if args.batch and args.stream:
+        print("--batch 不支持 --stream，请改用 --zip", file=sys.stderr)
+        return 2
+    if (args.batch or args.stream) and args.pyz:
+        print("--pyz 不支持 --batch / --stream", file=sys.stderr)
+        return 2
+    # .pyz 只用于单个包的目录发布（合并发布不传）
+    pyz_options = dict(pyz=bool(args.pyz or (_cfg().get("is_release_pyz", 0) and not args.stream)),
+                       pyz_compress=bool(_cfg().get("is_pyz_compress", 0)),
+                       pyz_optimize=int(_cfg().get("pyc_optimize", 1)))
+    if args.daemon:
+        if not args.batch:
+            options.update(pyz_options)
+        return _release_via_daemon(args, pkg_names, options, shards)
+    if args.batch:
+        result = packer.release_batch(args.root, pkg_names, bundle_name=args.bundle_name, **options)
+        _print_result(result)
+        print(f"共 {len(pkg_names)} 个包合并发布，{'成功' if result.ok else '失败'}，"
+              f"总耗时 {time.perf_counter() - t0:.2f}s")
+        return 0 if result.ok else 1
+
+    results = packer.release_many(
+        args.root, pkg_names, jobs=args.jobs, on_done=_print_result,
+        stream=args.stream or bool(_cfg().get("is_stream_release", 0)),
+        scratch_dir=_cfg().get("scratch_dir") or None, shards=shards, **options, **pyz_options,
+    )
+    failed = [r for r in results if not r.ok]
+    print(f"共 {len(results)} 个包，成功 {len(results) - len(failed)}，失败 {len(failed)}，"
+          f"总耗时 {time.perf_counter() - t0:.2f}s")
+    return 1 if failed else 0
+
+
+def _daemon_address(args) -> str | None:
+    return args.address or _cfg().get("daemon_address") or None
+
+
+def _release_via_daemon(args, pkg_names: list[str], options: dict, shards: int) -> int:
+    """提交到守护进程，跟随输出直到全部任务结束；Ctrl+C 时取消已提交的任务"""
+    from . import daemon, packer
+    client = daemon.connect(_daemon_address(args))
+    if client is None:
+        print(f"无法连接发布守护进程：{_daemon_address(args) or daemon.default_address()}"
+              f"（先执行 python -m py_app_packer daemon）", file=sys.stderr)
+        return 2
+    t0 = time.perf_counter()
+    # 各阶段耗时由守护进程自己决定是否记录；后端按名称提交，选项（如 pyc_optimize）取守护进程的配置
+    options.pop("trace", None)
+    options["backend"] = options["backend"].name
+    options.update(stream=args.stream or bool(_cfg().get("is_stream_release", 0)), shards=shards)
+    with client:
+        jobs = client.call("release", root=os.path.abspath(args.root), packages=pkg_names, options=options,
+                           batch=args.batch, bundle_name=args.bundle_name)
+        for job in jobs:
+            note = "（该包已在守护进程中发布，跟随已有任务）" if job["duplicate"] else ""
+            print(f"[#{job['id']}] {job['title']} {job['state_label']}{note}", flush=True)
+        try:
+            infos = client.follow([job["id"] for job in jobs],
+                                  on_line=lambda job_id, line: print(f"[#{job_id}] {line}", flush=True))
+        except KeyboardInterrupt:
+            with daemon.DaemonClient(client.address) as canceller:
+                for job in jobs:
+                    canceller.call("cancel", job=job["id"])
+            print("已取消", file=sys.stderr)
+            return 130
+    failed = 0
+    for info in infos:
+        if info["result"]:
+            result = packer.ReleaseResult(**info["result"])
+        else:
+            result = packer.ReleaseResult(pkg_name=info["title"], returncode=1,
+                                          error=info["error"] or info["state_label"])
+        failed += not result.ok
+        _print_result(result)
+    print(f"共 {len(infos)} 个任务，成功 {len(infos) - failed}，失败 {failed}，总耗时 {time.perf_counter() - t0:.2f}s")
+    return 1 if failed else 0
+
+
+def cmd_daemon(args) -> int:
+    from . import daemon
+    limit = args.jobs if args.jobs is not None else int(_cfg().get("daemon_jobs", 0) or 0)
+    mode = int(str(_cfg().get("daemon_socket_mode", "660") or "660"), 8)
+    try:
+        daemon.serve(_daemon_address(args), limit or None, _cfg(), mode)
+    except (OSError, RuntimeError) as e:
+        print(f"无法启动发布守护进程：{e}", file=sys.stderr)
+        return 2
+    return 0
+
+
+def cmd_status(args) -> int:
+    from . import daemon
+    client = daemon.connect(_daemon_address(args))
+    if client is None:
+        print(f"发布守护进程未运行：{_daemon_address(args) or daemon.default_address()}", file=sys.stderr)
+        return 1
+    with client:
+        if args.cancel is not None:
+            client.call("cancel", job=args.cancel)
+        info = client.call("ping")
+        jobs = client.call("status")
+    print(f"守护进程 pid={info['pid']} 版本 {info['version']}，并发上限 {info['limit']}，任务 {len(jobs)} 个")
+    for job in jobs:
+        elapsed = f"{job['elapsed']:8.2f}s" if job["elapsed"] is not None else " " * 9
+        stage = f"[{job['stage']}]" if job["stage"] else ""
+        print(f"#{job['id']:<5} {job['state_label']:<4} {elapsed}  {job['title']} {stage} {job['client']}".rstrip())
+        if job["error"]:
+            print(f"       {job['error'].strip()}")
+    return 0
+
+
+def cmd_pyz(args) -> int:
+    from . import pyz
+    output_root = os.path.abspath(args.release)
+    if not os.path.isdir(output_root):
+        print(f"发布目录不存在：{output_root}", file=sys.stderr)
+        return 2
+    runnable = pyz.find_runnable(output_root)
+    pkg_name = args.package or (runnable[0] if len(runnable) == 1 else None)
+    if pkg_name is None:
+        print(f"请用 --package 指定要运行的包（可运行包：{', '.join(runnable) or '无'}）", file=sys.stderr)
+        return 2
+    optimize = args.optimize if args.optimize is not None else int(_cfg().get("pyc_optimize", 1))
+    try:
+        path = pyz.make_pyz(output_root, pkg_name, args.out, source_pkg=args.source,
+                            compressed=args.compress or bool(_cfg().get("is_pyz_compress", 0)), optimize=optimize,
+                            interpreter=args.interpreter or None)
+    except (OSError, ValueError, SyntaxError) as e:
+        print(f"生成 .pyz 失败：{e}", file=sys.stderr)
+        return 1
+    print(path)
+    return 0
+
+
+def cmd_version(args) -> int:
+    from . import packer, scanner
+    pkg_names = args.packages
+    if not pkg_names and (args.all or args.match):
+        pkg_names = [r[0] for r in scanner.scan_rows(args.root, options=_scan_options(args))]
+    if args.match:
+        # 包名或其最后一级匹配任一 glob 即选中
+        pkg_names = [name for name in pkg_names
+                     if any(fnmatch.fnmatch(name, m) or fnmatch.fnmatch(os.path.basename(name), m) for m in args.match)]
+    if not pkg_names:
+        print("未指定要更新的包（可使用 --all 或 --match 选择根路径下的包）", file=sys.stderr)
+        return 2
+    root = os.path.abspath(args.root)
+    paths = [os.path.normpath(os.path.join(root, name)) for name in pkg_names]
+    invalid = [p for p in paths if not os.path.isfile(os.path.join(p, "__init__.py"))]
+    if invalid:
+        print(f"不是有效的包（缺少 __init__.py）：{', '.join(invalid)}", file=sys.stderr)
+        return 2
+
+    if args.part is None and args.set is None:
+        for name, path in zip(pkg_names, paths):
+            version, ts = packer.read_version_info(packer.version_file_path(path))
+            print(f"{name:<30} {version or '-':<24} {ts or ''}")
+        return 0
+    try:
+        results = packer.update_versions(paths, part=args.part, version=args.set, jobs=args.jobs,
+                                         dry_run=args.dry_run)
+    except ValueError as e:
+        print(str(e), file=sys.stderr)
+        return 2
+    for name, r in zip(pkg_names, results):
+        status = "OK" if r.ok else "FAIL"
+        print(f"[{status}] {name:<30} {r.old_version or '-'} -> {r.new_version or '-'}", flush=True)
+        if r.error:
+            print(f"       {r.error}", flush=True)
+    failed = sum(not r.ok for r in results)
+    print(f"共 {len(results)} 个包，{'将' if args.dry_run else ''}更新 {len(results) - failed}，失败 {failed}")
+    return 1 if failed else 0
+
+
+def cmd_gc(args) -> int:
+    from . import store
+    if not os.path.isdir(args.dist):
+        print(f"dist 目录不存在：{args.dist}", file=sys.stderr)
+        return 2
+    if args.max_age is None and args.keep is None and args.max_size is None:
+        print("未指定保留策略（--max-age / --keep / --max-size），只删除不再被引用的去重数据", file=sys.stderr)
+    victims = store.gc(args.dist, max_age_days=args.max_age, keep_per_package=args.keep,
+                       max_total_bytes=args.max_size, dry_run=args.dry_run)
+    for rel in victims:
+        print(f"{'[dry-run] ' if args.dry_run else ''}{rel.name}")
+    print(f"共{'将' if args.dry_run else '已'}清理 {len(victims)} 个发布")
+    return 0
+
+
+def cmd_delta(args) -> int:
+    from . import delta
+    try:
+        delta_path, info = delta.make_delta(
+            args.release, args.base, args.out, fmt=args.format or _cfg().get('archive_format', 'zip'),
+            level=args.level if args.level is not None else _cfg().get('archive_level'))
+    except (OSError, ValueError) as e:
+        print(f"生成增量包失败：{e}", file=sys.stderr)
+        return 2
+    print(f"{info['base']} -> {info['target']}：修改 {len(info['changed'])}，新增 {len(info['added'])}，"
+          f"删除 {len(info['deleted'])}")
+    print(delta_path)
+    return 0
+
+
+def cmd_apply_delta(args) -> int:
+    from . import delta
+    try:
+        info = delta.apply_delta(args.delta, args.target, check=not args.no_verify)
+    except (OSError, ValueError, RuntimeError) as e:
+        print(f"应用增量包失败：{e}", file=sys.stderr)
+        return 1
+    print(f"已将 {args.target} 更新到 {info['target']}")
+    return 0
+
+
+def cmd_watch(args) -> int:
+    from . import packer, watch
+    if not os.path.isfile(os.path.join(args.root, args.package, "__init__.py")):
+        print(f"不是有效的包（缺少 __init__.py）：{os.path.join(args.root, args.package)}", file=sys.stderr)
+        return 2
+    silent = bool(_cfg().get("is_pyarmor_silent", 1)) if args.silent is None else args.silent
+    live = watch.LiveBuild(args.root, args.package, args.out, silent=silent,
+                           mapp_mode=_cfg().get("mapp_copy_mode", "copy"))
+    print(f"监视 {live.pkg_full_name} -> {live.output_root}（Ctrl+C 结束）", flush=True)
+    debounce = args.debounce if args.debounce is not None else int(_cfg().get("watch_debounce_ms", 300) or 0) / 1000
+    try:
+        watch.poll(live, args.interval, debounce,
+                   on_update=lambda r: print(f"[{time.strftime('%H:%M:%S')}] {r.describe()}", flush=True),
+                   on_error=lambda e: print(f"[{time.strftime('%H:%M:%S')}] 更新失败：{e}", file=sys.stderr, flush=True))
+    except KeyboardInterrupt:
+        pass
+    except packer.PyarmorError as e:
+        print(f"初次加密失败：{e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+def cmd_bench(args) -> int:
+    from . import bench
+    if args.work_dir:
+        try:
+            os.makedirs(args.work_dir, exist_ok=True)
+        except OSError as e:
+            print(f"无法创建工作目录 {args.work_dir}：{e}", file=sys.stderr)
+            return 2
+    result = bench.run(packages=args.packages, modules=args.modules, module_kb=args.module_kb,
+                       assets=args.assets, asset_kb=args.asset_kb, repeat=args.repeat, jobs=args.jobs,
+                       cases=tuple(args.cases), work_dir=args.work_dir, keep=args.keep, seed=args.seed)
+    for case, r in result["results"].items():
+        print(f"{case:<10} median {r['median']:9.4f}s  min {r['min']:9.4f}s")
+    if args.out:
+        bench.save(result, args.out)
+        print(f"结果已写入 {args.out}")
+    qt = result["results"].get("startup", {}).get("qt_modules")
+    if qt:
+        print(f"[FAIL] 命令行入口加载了 Qt 相关模块：{', '.join(qt[:5])}", file=sys.stderr)
+        return 1
+    if not args.baseline:
+        return 0
+    try:
+        regressions = bench.compare(result, bench.load(args.baseline), args.tolerance)
+    except (OSError, ValueError) as e:
+        print(f"无法与基线比较：{e}", file=sys.stderr)
+        return 2
+    for case, base, cur in regressions:
+        print(f"[SLOWER] {case}: {base:.3f}s -> {cur:.3f}s（+{(cur / base - 1) * 100:.0f}%）")
+    if not regressions:
+        print(f"与基线相比没有超过 {args.tolerance * 100:.0f}% 的变慢")
+    return 1 if regressions else 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="py_app_packer", description="Python App Packer 命令行")
+    parser.add_argument("-V", "--version", action="version", version=f"%(prog)s {__version__}")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("release", help="加密（pyarmor）+ 拷贝 mapp.txt + 压缩，支持多包并行")
+    p.add_argument("packages", nargs="*", help="要发布的包名（root 下的子文件夹名）")
+    p.add_argument("--root", required=True, help="项目根路径（包所在目录）")
+    p.add_argument("--all", action="store_true", help="发布 root 下扫描到的全部包")
+    p.add_argument("--depth", type=int, default=None,
+                   help="--all 时的查找深度，1 为只看第一层（默认读取 appcfg.yaml 中的 scan_depth）")
+    p.add_argument("--exclude", action="append", metavar="GLOB",
+                   help="--all 时额外排除的目录（.gitignore 语法，相对 root，可重复指定）")
+    p.add_argument("--no-gitignore", action="store_true", help="--all 时不读取 .gitignore")
+    p.add_argument("-j", "--jobs", type=int, default=None, help="并行进程数，默认且最多为 CPU 核数")
+    p.add_argument("--zip", action="store_true", help="发布后压缩（格式见 --format）")
+    p.add_argument("--format", choices=ARCHIVE_FORMATS, default=None,
+                   help="压缩格式（默认读取 appcfg.yaml 中的 archive_format）")
+    p.add_argument("--level", type=int, default=None, help="压缩级别（默认读取 appcfg.yaml 中的 archive_level）")
+    p.add_argument("--no-archive-reuse", action="store_true",
+                   help="压缩时不复用已有压缩包，全部重新压缩（默认读取 appcfg.yaml 中的 is_archive_reuse）")
+    p.add_argument("--stream", action="store_true",
+                   help="直接发布为压缩包，不生成中间发布目录（pyarmor 输出写入 tmpfs 临时目录）")
+    p.add_argument("--batch", action="store_true",
+                   help="合并为一个发布：只调用一次 pyarmor，各包共用一份运行时（输出 dist_<bundle-name>_<时间>）")
+    p.add_argument("--bundle-name", default="bundle", help="--batch 时的发布名（默认 bundle）")
+    p.add_argument("--mapp-mode", choices=COPY_MODES, default=None,
+                   help="mapp.txt 内容的拷贝方式（默认读取 appcfg.yaml 中的 mapp_copy_mode）")
+    p.add_argument("--delete-src", action="store_true", help="压缩后删除发布目录")
+    p.add_argument("--silent", dest="silent", action="store_true", default=None,
+                   help="pyarmor 安静模式（默认读取 appcfg.yaml 中的 is_pyarmor_silent）")
+    p.add_argument("--no-silent", dest="silent", action="store_false")
+    p.add_argument("--no-cache", action="store_true", help="不使用增量构建缓存，整包重新加密")
+    p.add_argument("--backend", choices=BACKEND_NAMES, default=None,
+                   help="打包后端：pyarmor 加密，或 pyc 只编译为 .pyc（多进程并行，用于内部测试构建）"
+                        "（默认读取 appcfg.yaml 中的 packer_backend）")
+    p.add_argument("--timeout", type=float, default=300, help="单个包 pyarmor 超时时间（秒）")
+    p.add_argument("--shards", type=int, default=None,
+                   help="单个包分片并行加密的 pyarmor 进程数，1 为不分片，0 为按 CPU 核数"
+                        "（默认读取 appcfg.yaml 中的 pyarmor_shards）")
+    p.add_argument("--trace", action="store_true",
+                   help="记录各阶段耗时（Chrome trace + 汇总 JSON，写在发布目录旁），"
+                        "appcfg.yaml 中 BENCHMARK: 1 或 VERBOSE: 2 时默认开启")
+    p.add_argument("--prune", dest="prune", action="store_true", default=None,
+                   help="只加密从 __init__.py/__main__.py 可达的模块（默认读取 appcfg.yaml 中的 is_prune_unreachable）")
+    p.add_argument("--no-prune", dest="prune", action="store_false")
+    p.add_argument("--no-store", action="store_true",
+                   help="发布目录不收入 dist/.store 去重（默认读取 appcfg.yaml 中的 release_store_mode）")
+    p.add_argument("--pyz", action="store_true",
+                   help="可运行包另外打包为单文件 dist_<包名>_<时间>.pyz（预编译、按导入顺序排列，"
+                        "默认读取 appcfg.yaml 中的 is_release_pyz）")
+    p.add_argument("--daemon", action="store_true",
+                   help="提交到发布守护进程执行并跟随输出（-j 不生效，并发数由守护进程决定）")
+    p.add_argument("--address", default=None,
+                   help="--daemon 时守护进程的地址（默认读取 appcfg.yaml 中的 daemon_address）")
+    p.set_defaults(func=cmd_release)
+
+    p = sub.add_parser("gc", help="按保留策略清理 dist 下的旧发布，并删除不再被引用的去重数据")
+    p.add_argument("--dist", required=True, help="dist 目录（包含 dist_<包名>_<时间> 发布目录/压缩包）")
+    p.add_argument("--max-age", type=float, default=None, help="删除早于该天数的发布")
+    p.add_argument("--keep", type=int, default=None, help="每个包只保留最新的 N 个发布")
+    p.add_argument("--max-size", type=_parse_size, default=None,
+                   help="dist 总大小上限（如 500M、20G），超出时从最旧的发布开始删除")
+    p.add_argument("--dry-run", action="store_true", help="只列出将被删除的发布，不实际删除")
+    p.set_defaults(func=cmd_gc)
+
+    p = sub.add_parser("delta", help="与旧发布的清单比较，只打包新增、修改的文件和删除列表")
+    p.add_argument("release", help="新发布目录（dist_<包名>_<时间>）")
+    p.add_argument("--base", required=True,
+                   help="旧发布的清单（dist_<包名>_<时间>.manifest.json），也可以是旧发布目录或压缩包")
+    p.add_argument("--out", default=None, help="增量包路径（默认 <发布目录>.delta_<旧发布时间>.<格式>）")
+    p.add_argument("--format", choices=ARCHIVE_FORMATS, default=None,
+                   help="压缩格式（默认读取 appcfg.yaml 中的 archive_format）")
+    p.add_argument("--level", type=int, default=None, help="压缩级别（默认读取 appcfg.yaml 中的 archive_level）")
+    p.set_defaults(func=cmd_delta)
+
+    p = sub.add_parser("apply-delta", help="在旧发布的安装目录上应用增量包，并按新发布的清单校验")
+    p.add_argument("delta", help="增量包路径")
+    p.add_argument("--target", required=True, help="安装目录（旧发布解压后的目录）")
+    p.add_argument("--no-verify", action="store_true", help="应用后不校验")
+    p.set_defaults(func=cmd_apply_delta)
+
+    p = sub.add_parser("pyz", help="把已有的发布目录打包为可直接运行的单文件 .pyz")
+    p.add_argument("release", help="发布目录（dist_<包名>_<时间>）")
+    p.add_argument("--package", default=None, help="要运行的包（发布目录中只有一个可运行包时可省略）")
+    p.add_argument("--source", default=None, help="包的源码目录，用于按导入顺序排列条目（加密输出无法分析导入）")
+    p.add_argument("--out", default=None, help=".pyz 路径（默认 <发布目录>.pyz）")
+    p.add_argument("--compress", action="store_true",
+                   help="压缩条目（默认只存储，启动更快；默认读取 appcfg.yaml 中的 is_pyz_compress）")
+    p.add_argument("--optimize", type=int, choices=(0, 1, 2), default=None,
+                   help=".pyc 优化级别（默认读取 appcfg.yaml 中的 pyc_optimize）")
+    p.add_argument("--interpreter", default=PYZ_INTERPRETER,
+                   help="写入 #! 行的解释器，传空字符串则不写（默认 %(default)s）")
+    p.set_defaults(func=cmd_pyz)
+
+    p = sub.add_parser("version", help="批量查看或更新包的版本号（version.py 原子写入，并行处理）")
+    p.add_argument("packages", nargs="*", help="要更新的包名（root 下的子文件夹名）")
+    p.add_argument("--root", required=True, help="项目根路径（包所在目录）")
+    p.add_argument("--all", action="store_true", help="选择 root 下扫描到的全部包")
+    p.add_argument("--match", action="append", metavar="GLOB",
+                   help="只选择包名匹配的包（fnmatch，可重复指定；未指定包名时在扫描结果中筛选）")
+    p.add_argument("--depth", type=int, default=None,
+                   help="扫描时的查找深度，1 为只看第一层（默认读取 appcfg.yaml 中的 scan_depth）")
+    p.add_argument("--exclude", action="append", metavar="GLOB",
+                   help="扫描时额外排除的目录（.gitignore 语法，相对 root，可重复指定）")
+    p.add_argument("--no-gitignore", action="store_true", help="扫描时不读取 .gitignore")
+    g = p.add_mutually_exclusive_group()
+    for part, label in (("major", "大版本"), ("minor", "中版本"), ("patch", "小版本")):
+        g.add_argument(f"--{part}", dest="part", action="store_const", const=part, help=f"{label} +1")
+    g.add_argument("--set", default=None, metavar="VERSION",
+                   help="设为指定版本号（不带 .post 时加上当天的 .post 后缀）")
+    p.set_defaults(part=None)
+    p.add_argument("-j", "--jobs", type=int, default=None, help=f"并行线程数（默认 {VERSION_UPDATE_JOBS}）")
+    p.add_argument("--dry-run", action="store_true", help="只显示新版本号，不写入")
+    p.set_defaults(func=cmd_version)
+
+    p = sub.add_parser("watch", help="监视包的改动，只把变化的文件增量加密到 dist/live_<包名>（轮询）")
+    p.add_argument("package", help="要监视的包名（root 下的子文件夹名）")
+    p.add_argument("--root", required=True, help="项目根路径（包所在目录）")
+    p.add_argument("--out", default=None, help="实时输出目录（默认 <仓库根>/dist/live_<包名>）")
+    p.add_argument("--interval", type=float, default=POLL_INTERVAL, help="轮询间隔（秒）")
+    p.add_argument("--debounce", type=float, default=None,
+                   help="发现变化后等待多少秒无新变化再更新（默认读取 appcfg.yaml 中的 watch_debounce_ms）")
+    p.add_argument("--silent", dest="silent", action="store_true", default=None,
+                   help="pyarmor 安静模式（默认读取 appcfg.yaml 中的 is_pyarmor_silent）")
+    p.add_argument("--no-silent", dest="silent", action="store_false")
+    p.set_defaults(func=cmd_watch)
+
+    p = sub.add_parser("daemon", help="启动本机发布守护进程：所有客户端共用一个任务队列、并发上限和内存缓存")
+    p.add_argument("--address", default=None,
+                   help="监听地址：Unix socket 路径或 tcp://主机:端口（默认读取 appcfg.yaml 中的 daemon_address）")
+    p.add_argument("-j", "--jobs", type=int, default=None,
+                   help="同时执行的任务数（默认读取 appcfg.yaml 中的 daemon_jobs）")
+    p.set_defaults(func=cmd_daemon)
+
+    p = sub.add_parser("status", help="查看发布守护进程中的任务")
+    p.add_argument("--address", default=None, help="守护进程的地址（默认读取 appcfg.yaml 中的 daemon_address）")
+    p.add_argument("--cancel", type=int, default=None, metavar="ID", help="取消指定的任务")
+    p.set_defaults(func=cmd_status)
+
+    p = sub.add_parser("bench", help="在合成项目上对扫描/版本读取/发布/mapp 拷贝/压缩计时（使用 pyarmor 桩）")
+    p.add_argument("--packages", type=int, default=20, help="包数")
+    p.add_argument("--modules", type=int, default=30, help="每个包的模块数")
+    p.add_argument("--module-kb", type=int, default=4, help="每个模块的大小（KB）")
+    p.add_argument("--assets", type=int, default=4, help="每个包 mapp.txt 拷贝的资源文件数")
+    p.add_argument("--asset-kb", type=int, default=256, help="每个资源文件的大小（KB）")
+    p.add_argument("--repeat", type=int, default=3, help="每项重复次数（取中位数）")
+    p.add_argument("-j", "--jobs", type=int, default=1, help="发布时的并行进程数")
+    p.add_argument("--cases", nargs="+", choices=BENCH_CASES, default=list(BENCH_CASES), help="要执行的项目")
+    p.add_argument("--seed", type=int, default=0, help="合成数据的随机种子")
+    p.add_argument("--out", default=None, help="结果 JSON 输出路径")
+    p.add_argument("--baseline", default=None, help="基线 JSON，变慢超过容差时退出码为 1")
+    p.add_argument("--tolerance", type=float, default=0.2, help="允许的变慢比例（默认 0.2 即 20%%）")
+    p.add_argument("--work-dir", default=None, help="合成项目所在目录（默认系统临时目录，不存在时自动创建）")
+    p.add_argument("--keep", action="store_true", help="保留合成项目目录")
+    p.set_defaults(func=cmd_bench)
+    return parser
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = build_parser().parse_args(argv)
+    return args.func(args)
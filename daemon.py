@@ -0,0 +1,687 @@
+"""
+本机发布守护进程与客户端（不依赖 Qt）
+
+    python -m py_app_packer daemon                          # 启动守护进程（默认 <临时目录>/py_app_packer.sock）
+    python -m py_app_packer release --daemon --root ... pkgA  # 提交到守护进程并跟随日志
+    python -m py_app_packer status                          # 查看守护进程中的任务
+
+同一台构建机上的多个客户端（界面、命令行、多个用户）共用一个进程：
+- 发布、压缩任务都在同一个线程池中执行，并发上限全局生效（appcfg.yaml 的 daemon_jobs），
+  多人同时发布时不会启动过多的 pyarmor 进程；同一个包已在排队或发布中时不重复提交，返回已有任务；
+- 进程常驻，扫描快照、version.py 元数据（versioninfo）、pyarmor 版本（buildcache）等内存缓存一直有效；
+- 协议：每行一个 JSON-RPC 2.0 消息。方法见 PackerDaemon 中的 rpc_*；
+  服务端主动推送通知 log {job, line}（pyarmor 输出与日志）和 job {任务信息}（阶段或状态变化）。
+"""
+import itertools
+import json
+import os
+import socket
+import socketserver
+import tempfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field, replace
+from loguru import logger
+from . import backends
+from . import packer
+from . import releasequeue
+from .releasequeue import CANCELLED, DONE, FAILED, QUEUED, RUNNING, STATE_LABELS
+
+PROTOCOL_VERSION = 1
+TCP_PREFIX = "tcp://"
+DEFAULT_TCP_ADDRESS = "tcp://127.0.0.1:47321"
+# 已结束的任务保留多少个（供 status 查询）
+KEEP_FINISHED = 200
+# 进度通知最短间隔（秒）
+PROGRESS_INTERVAL = 0.5
+
+# JSON-RPC 错误码
+PARSE_ERROR = -32700
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+APP_ERROR = -32000
+
+_NONE = type(None)
+# 客户端可传入的发布选项及其类型，其余键（如 scratch_dir、回调）一律拒绝；取值范围见 _check_release_options
+RELEASE_OPTION_TYPES = {
+    "silent": bool, "do_zip": bool, "delete_src": bool, "use_cache": bool, "prune": bool,
+    "archive_reuse": bool, "stream": bool, "pyz": bool, "pyz_compress": bool,
+    "timeout": (int, float), "archive_level": (int, _NONE), "shards": int, "pyz_optimize": int,
+    "archive_format": str, "mapp_mode": str, "store_mode": (str, _NONE), "backend": (str, _NONE),
+}
+
+
+class DaemonError(RuntimeError):
+    """守护进程返回的错误"""
+
+    def __init__(self, code: int, message: str):
+        super().__init__(message)
+        self.code = code
+
+
+def _check_release_options(options) -> dict:
+    """校验客户端传入的发布选项（键、类型和取值范围），不符合时抛出 DaemonError(INVALID_PARAMS)"""
+    from . import archive, manifest, store
+    if options is None:
+        return {}
+    if not isinstance(options, dict):
+        raise DaemonError(INVALID_PARAMS, "options 必须为对象")
+    unknown = sorted(set(options) - set(RELEASE_OPTION_TYPES))
+    if unknown:
+        raise DaemonError(INVALID_PARAMS, f"不支持的发布选项：{', '.join(map(str, unknown))}")
+    choices = {"archive_format": archive.FORMATS, "mapp_mode": manifest.COPY_MODES,
+               "store_mode": (None, *store.LINK_MODES), "pyz_optimize": (-1, 0, 1, 2)}
+    for key, value in options.items():
+        types = RELEASE_OPTION_TYPES[key]
+        # bool 是 int 的子类，数值选项不接受 true/false
+        if not isinstance(value, types) or (isinstance(value, bool) and types is not bool):
+            raise DaemonError(INVALID_PARAMS, f"发布选项 {key} 的类型无效：{value!r}")
+        if key in choices and value not in choices[key]:
+            raise DaemonError(INVALID_PARAMS, f"发布选项 {key} 的取值无效：{value!r}"
+                                              f"（可选：{', '.join(map(str, choices[key]))}）")
+        if key in ("timeout", "archive_level", "shards") and value is not None and value < 0:
+            raise DaemonError(INVALID_PARAMS, f"发布选项 {key} 不能为负数：{value!r}")
+    return dict(options)
+
+
+def _check_packages(root: str, packages, bundle_name) -> list[str]:
+    """包名必须是根路径下的相对路径，合并发布的名称不能含路径分隔符"""
+    if not isinstance(packages, list) or not packages or not all(isinstance(p, str) and p for p in packages):
+        raise DaemonError(INVALID_PARAMS, "packages 必须为非空的包名列表")
+    for name in packages:
+        path = os.path.normpath(os.path.join(root, name))
+        if os.path.isabs(name) or os.path.commonpath([root, path]) != root or path == root:
+            raise DaemonError(INVALID_PARAMS, f"包不在根路径下：{name}")
+    if not isinstance(bundle_name, str) or not bundle_name or any(c in bundle_name for c in "/\\") \
+            or bundle_name in (".", ".."):
+        raise DaemonError(INVALID_PARAMS, f"合并发布的名称无效：{bundle_name!r}")
+    return packages
+
+
+def default_address() -> str:
+    """默认地址：支持 Unix socket 的平台为 <临时目录>/py_app_packer.sock，否则为本机 TCP 端口"""
+    if hasattr(socket, "AF_UNIX") and os.name != "nt":
+        return os.path.join(tempfile.gettempdir(), "py_app_packer.sock")
+    return DEFAULT_TCP_ADDRESS
+
+
+def _tcp_address(address: str) -> tuple[str, int] | None:
+    if not address.startswith(TCP_PREFIX):
+        return None
+    host, _, port = address[len(TCP_PREFIX):].rpartition(":")
+    return host or "127.0.0.1", int(port)
+
+
+def _connect_socket(address: str, timeout: float | None = None) -> socket.socket:
+    tcp = _tcp_address(address)
+    if tcp is not None:
+        return socket.create_connection(tcp, timeout=timeout)
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+    try:
+        sock.connect(address)
+    except BaseException:
+        sock.close()
+        raise
+    return sock
+
+
+# ---------- 任务 ----------
+@dataclass(eq=False)
+class DaemonJob:
+    id: int
+    kind: str
+    title: str
+    # 去重键（发布任务为包路径），为空不去重
+    key: str = ""
+    client: str = ""
+    state: str = QUEUED
+    stage: str = ""
+    progress: tuple[int, int] = (0, 0)
+    result: dict | None = None
+    error: str | None = None
+    submitted: float = field(default_factory=time.time)
+    started: float | None = None
+    elapsed: float | None = None
+    lines: deque = field(default_factory=lambda: deque(maxlen=packer.OUTPUT_RING_LINES))
+    cancel_token: packer.CancelToken = field(default_factory=packer.CancelToken)
+    finished: threading.Event = field(default_factory=threading.Event)
+    future: object = None
+
+    @property
+    def active(self) -> bool:
+        return self.state in (QUEUED, RUNNING)
+
+    def info(self) -> dict:
+        elapsed = self.elapsed
+        if elapsed is None and self.started is not None:
+            elapsed = time.perf_counter() - self.started
+        return {
+            "id": self.id, "kind": self.kind, "title": self.title, "client": self.client,
+            "state": self.state, "state_label": STATE_LABELS[self.state], "stage": self.stage,
+            "progress": list(self.progress), "result": self.result, "error": self.error,
+            "submitted": self.submitted, "elapsed": elapsed,
+        }
+
+
+class _Connection:
+    """一个客户端连接：多个线程（请求处理、任务通知）写入时加锁"""
+
+    def __init__(self, wfile, peer: str):
+        self.wfile = wfile
+        self.peer = peer
+        self.closed = False
+        self._lock = threading.Lock()
+
+    def send(self, message: dict):
+        data = (json.dumps(message, ensure_ascii=False) + "\n").encode("utf-8")
+        with self._lock:
+            if self.closed:
+                return
+            try:
+                self.wfile.write(data)
+                self.wfile.flush()
+            except OSError:
+                self.closed = True
+
+    def notify(self, method: str, params: dict):
+        self.send({"jsonrpc": "2.0", "method": method, "params": params})
+
+
+class PackerDaemon:
+    """任务调度与 RPC 方法实现，与传输层无关"""
+
+    def __init__(self, limit: int | None = None, cfg: dict | None = None):
+        self.cfg = cfg if cfg is not None else {}
+        self.limit = max(1, limit or releasequeue.default_limit(tempfile.gettempdir()))
+        self._pool = ThreadPoolExecutor(max_workers=self.limit, thread_name_prefix="packer-job")
+        self._jobs: dict[int, DaemonJob] = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        # 任务 id（None 表示全部任务）-> 订阅日志的连接
+        self._subscribers: dict[int | None, set[_Connection]] = {}
+        # 执行任务的线程 -> 任务，用于把该线程中的日志归入任务
+        self._thread_jobs: dict[int, DaemonJob] = {}
+        self._log_sink = logger.add(self._on_log, level="INFO", format="{message}",
+                                    filter=lambda record: record["thread"].id in self._thread_jobs)
+        self.started = time.time()
+
+    def close(self):
+        with self._lock:
+            jobs = [j for j in self._jobs.values() if j.active]
+        for job in jobs:
+            self._cancel(job)
+        self._pool.shutdown(wait=True)
+        logger.remove(self._log_sink)
+
+    # ---------- 通知 ----------
+    def _connections_for(self, job: DaemonJob) -> list[_Connection]:
+        # 调用方持有 self._lock
+        conns = self._subscribers.get(job.id, set()) | self._subscribers.get(None, set())
+        return [c for c in conns if not c.closed]
+
+    def _notify_job(self, job: DaemonJob):
+        info = job.info()
+        with self._lock:
+            conns = self._connections_for(job)
+        for conn in conns:
+            conn.notify("job", info)
+
+    def _emit_line(self, job: DaemonJob, line: str):
+        # 与 rpc_logs 的订阅在同一把锁内，订阅前的行在返回的缓冲中，之后的行以通知推送，不重复也不遗漏
+        with self._lock:
+            job.lines.append(line)
+            conns = self._connections_for(job)
+        for conn in conns:
+            conn.notify("log", {"job": job.id, "line": line})
+
+    def _on_log(self, message):
+        job = self._thread_jobs.get(message.record["thread"].id)
+        if job is not None:
+            self._emit_line(job, str(message).rstrip("\n"))
+
+    def _stage(self, job: DaemonJob):
+        """返回 packer 的阶段回调 stage(name) -> progress(done, total)，阶段变化时通知，进度节流"""
+
+        def stage(name: str):
+            job.stage, job.progress = name, (0, 0)
+            self._notify_job(job)
+            last = [0.0]
+
+            def progress(done: int, total: int):
+                job.progress = (done, total)
+                now = time.monotonic()
+                if done >= total or now - last[0] >= PROGRESS_INTERVAL:
+                    last[0] = now
+                    self._notify_job(job)
+            return progress
+        return stage
+
+    # ---------- 调度 ----------
+    def submit(self, kind: str, title: str, fn, key: str = "", client: str = "") -> tuple[DaemonJob, bool]:
+        """
+        提交任务 fn(job) -> 结果 dict，返回 (任务, 是否为已有的重复任务)
+        同一个 key 的任务在排队或执行中时不重复提交
+        """
+        with self._lock:
+            if key:
+                for job in self._jobs.values():
+                    if job.key == key and job.active:
+                        return job, True
+            job = DaemonJob(next(self._ids), kind, title, key, client)
+            self._jobs[job.id] = job
+            self._trim()
+        job.future = self._pool.submit(self._run, job, fn)
+        logger.info(f"任务 #{job.id} 已提交：{title}（{client or '本机'}）")
+        self._notify_job(job)
+        return job, False
+
+    def _trim(self):
+        finished = [j.id for j in self._jobs.values() if not j.active]
+        for job_id in finished[:max(0, len(finished) - KEEP_FINISHED)]:
+            del self._jobs[job_id]
+            self._subscribers.pop(job_id, None)
+
+    def _run(self, job: DaemonJob, fn):
+        if job.cancel_token.cancelled:
+            self._finish(job, CANCELLED)
+            return
+        job.state = RUNNING
+        job.started = time.perf_counter()
+        self._notify_job(job)
+        self._thread_jobs[threading.get_ident()] = job
+        try:
+            job.result = fn(job)
+        except packer.CancelledError:
+            self._finish(job, CANCELLED)
+        except Exception as e:  # noqa: BLE001
+            logger.exception(f"任务 #{job.id} 失败: {e}")
+            self._finish(job, FAILED, f"{type(e).__name__}: {e}")
+        else:
+            error = (job.result or {}).get("error")
+            self._finish(job, FAILED if error else DONE, error or None)
+        finally:
+            self._thread_jobs.pop(threading.get_ident(), None)
+
+    def _finish(self, job: DaemonJob, state: str, error: str | None = None):
+        job.state, job.stage, job.error = state, "", error
+        if job.started is not None:
+            job.elapsed = time.perf_counter() - job.started
+        job.finished.set()
+        self._notify_job(job)
+
+    def _cancel(self, job: DaemonJob):
+        job.cancel_token.cancel()
+        if job.future is not None and job.future.cancel():
+            self._finish(job, CANCELLED)
+
+    def _job(self, job_id: int) -> DaemonJob:
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None:
+            raise DaemonError(APP_ERROR, f"任务不存在：#{job_id}")
+        return job
+
+    # ---------- RPC 方法（conn 为发起请求的连接） ----------
+    def rpc_ping(self, conn: _Connection) -> dict:
+        from . import __version__
+        return {"version": __version__, "protocol": PROTOCOL_VERSION, "pid": os.getpid(),
+                "limit": self.limit, "started": self.started}
+
+    def rpc_scan(self, conn: _Connection, root: str, depth: int | None = None) -> list:
+        """扫描包并读取版本号（进程内缓存一直有效），返回 [[包名, 路径, 类型, 版本号, 更新时间]]"""
+        from . import scanner
+        opts = scanner.ScanOptions.from_cfg(self.cfg)
+        if depth is not None:
+            opts = replace(opts, depth=max(1, depth))
+        return [list(row) for row in scanner.scan_rows(root, options=opts)]
+
+    def release_options(self, options: dict | None = None) -> dict:
+        """发布选项：未指定的读取 appcfg.yaml（与命令行 release 的默认值一致）"""
+        cfg = self.cfg
+        opts = dict(
+            silent=bool(cfg.get("is_pyarmor_silent", 1)), use_cache=bool(cfg.get("is_build_cache", 1)),
+            archive_format=cfg.get("archive_format", "zip"), archive_level=cfg.get("archive_level"),
+            mapp_mode=cfg.get("mapp_copy_mode", "copy"), store_mode=cfg.get("release_store_mode") or None,
+            prune=bool(cfg.get("is_prune_unreachable", 0)),
+            archive_reuse=bool(cfg.get("is_archive_reuse", 1)),
+            pyz=bool(cfg.get("is_release_pyz", 0)), pyz_compress=bool(cfg.get("is_pyz_compress", 0)),
+            pyz_optimize=int(cfg.get("pyc_optimize", 1)),
+        )
+        opts.update(options or {})
+        # 后端以名称传输，按守护进程的配置创建（未知名称时抛出 ValueError）
+        opts["backend"] = backends.from_cfg(cfg, opts.get("backend"))
+        return opts
+
+    def rpc_release(self, conn: _Connection, root: str, packages: list[str], options: dict | None = None,
+                    batch: bool = False, bundle_name: str = "bundle") -> list[dict]:
+        """提交发布任务（每个包一个任务；batch 为真时合并为一个发布），返回任务信息（重复的 duplicate 为真）"""
+        if not isinstance(root, str) or not root:
+            raise DaemonError(INVALID_PARAMS, "root 必须为路径")
+        root = os.path.abspath(root)
+        packages = _check_packages(root, packages, bundle_name)
+        try:
+            opts = self.release_options(_check_release_options(options))
+        except ValueError as e:
+            # 未知的后端名称
+            raise DaemonError(INVALID_PARAMS, str(e)) from e
+        stream = bool(opts.pop("stream", False))
+        shards = opts.pop("shards", int(self.cfg.get("pyarmor_shards", 1) or 0))
+        # 多个任务并行时自动分片只分到 CPU 核数 / 并发上限 片
+        if shards == 0 and self.limit > 1:
+            shards = max(1, (os.cpu_count() or 1) // self.limit)
+        submitted = []
+        if batch:
+            # 合并发布不生成 .pyz
+            for key in ("pyz", "pyz_compress", "pyz_optimize"):
+                opts.pop(key, None)
+
+            def batch_fn(job: DaemonJob) -> dict:
+                return asdict(packer.release_batch(
+                    root, packages, bundle_name, **opts, on_line=lambda line: self._emit_line(job, line),
+                    stage=self._stage(job), cancel=job.cancel_token))
+            submitted.append(self.submit("batch", f"合并发布 {bundle_name}（{len(packages)} 个包）", batch_fn,
+                                         client=conn.peer))
+        else:
+            for name in packages:
+                pkg_full_name = os.path.normpath(os.path.join(root, name))
+
+                def release_fn(job: DaemonJob, name=name) -> dict:
+                    return asdict(packer.release_package(
+                        root, name, **opts, stream=stream, shards=shards,
+                        scratch_dir=self.cfg.get("scratch_dir") or None,
+                        on_line=lambda line: self._emit_line(job, line), stage=self._stage(job),
+                        cancel=job.cancel_token))
+                submitted.append(self.submit("release", f"发布 {name}", release_fn,
+                                             key=os.path.normcase(pkg_full_name), client=conn.peer))
+        return [dict(job.info(), duplicate=dup) for job, dup in submitted]
+
+    def rpc_zip(self, conn: _Connection, output_root: str, fmt: str | None = None, level: int | None = None,
+                delete_src: bool = False) -> dict:
+        """提交压缩发布目录的任务，与发布任务共用并发上限"""
+        output_root = os.path.abspath(output_root)
+        fmt = fmt or self.cfg.get("archive_format", "zip")
+        level = self.cfg.get("archive_level") if level is None else level
+        reuse = bool(self.cfg.get("is_archive_reuse", 1))
+
+        def zip_fn(job: DaemonJob) -> dict:
+            path = packer.archive_dir(output_root, delete_src=delete_src, fmt=fmt, level=level,
+                                      progress=self._stage(job)("压缩"), cancel=job.cancel_token, reuse=reuse)
+            return {"output_root": output_root, "zip_path": path}
+        job, dup = self.submit("zip", f"压缩 {os.path.basename(output_root)}", zip_fn,
+                               key=f"zip:{os.path.normcase(output_root)}", client=conn.peer)
+        return dict(job.info(), duplicate=dup)
+
+    def rpc_status(self, conn: _Connection, job: int | None = None) -> dict | list[dict]:
+        if job is not None:
+            return self._job(job).info()
+        with self._lock:
+            jobs = list(self._jobs.values())
+        return [j.info() for j in jobs]
+
+    def rpc_logs(self, conn: _Connection, job: int | None = None, follow: bool = False) -> list[str]:
+        """返回任务已有的输出行；follow 为真时之后的输出以 log 通知推送到本连接（job 为空时订阅全部任务）"""
+        target = self._job(job) if job is not None else None
+        with self._lock:
+            lines = list(target.lines) if target is not None else []
+            if follow:
+                self._subscribers.setdefault(job, set()).add(conn)
+        return lines
+
+    def rpc_wait(self, conn: _Connection, job: int, timeout: float | None = None) -> dict:
+        """等待任务结束（期间本连接仍会收到订阅的通知），返回任务信息"""
+        target = self._job(job)
+        target.finished.wait(timeout)
+        return target.info()
+
+    def rpc_cancel(self, conn: _Connection, job: int) -> dict:
+        target = self._job(job)
+        if target.active:
+            logger.warning(f"取消任务 #{target.id}（{conn.peer or '本机'}）")
+            self._cancel(target)
+        return target.info()
+
+    def unsubscribe(self, conn: _Connection):
+        conn.closed = True
+        with self._lock:
+            for conns in self._subscribers.values():
+                conns.discard(conn)
+
+    def dispatch(self, conn: _Connection, message: dict) -> dict | None:
+        """处理一条 JSON-RPC 请求，返回响应（通知类请求返回 None）"""
+        msg_id = message.get("id")
+        method = message.get("method")
+        params = message.get("params") or {}
+        fn = getattr(self, f"rpc_{method}", None) if isinstance(method, str) else None
+        try:
+            if fn is None:
+                raise DaemonError(METHOD_NOT_FOUND, f"未知方法：{method}")
+            if not isinstance(params, dict):
+                raise DaemonError(INVALID_PARAMS, "params 必须为对象")
+            try:
+                result = fn(conn, **params)
+            except TypeError as e:
+                raise DaemonError(INVALID_PARAMS, str(e)) from e
+        except DaemonError as e:
+            response = {"jsonrpc": "2.0", "id": msg_id, "error": {"code": e.code, "message": str(e)}}
+        except Exception as e:  # noqa: BLE001
+            logger.exception(f"处理请求失败: method={method}, err={e}")
+            response = {"jsonrpc": "2.0", "id": msg_id,
+                        "error": {"code": APP_ERROR, "message": f"{type(e).__name__}: {e}"}}
+        else:
+            response = {"jsonrpc": "2.0", "id": msg_id, "result": result}
+        return None if msg_id is None else response
+
+
+# ---------- 服务端 ----------
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        daemon: PackerDaemon = self.server.daemon
+        peer = self.client_address if isinstance(self.client_address, str) else ""
+        if not peer and isinstance(self.client_address, tuple):
+            peer = f"{self.client_address[0]}:{self.client_address[1]}"
+        conn = _Connection(self.wfile, peer or _peer_user(self.request))
+        try:
+            for raw in self.rfile:
+                try:
+                    message = json.loads(raw)
+                except ValueError:
+                    conn.send({"jsonrpc": "2.0", "id": None,
+                               "error": {"code": PARSE_ERROR, "message": "无效的 JSON"}})
+                    continue
+                response = daemon.dispatch(conn, message)
+                if response is not None:
+                    conn.send(response)
+        except OSError:
+            pass
+        finally:
+            daemon.unsubscribe(conn)
+
+
+def _peer_user(sock: socket.socket) -> str:
+    """Unix socket 对端的用户名（Linux SO_PEERCRED），取不到时为空"""
+    try:
+        import pwd
+        import struct
+        creds = sock.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize("3i"))
+        _, uid, _ = struct.unpack("3i", creds)
+        return pwd.getpwuid(uid).pw_name
+    except (AttributeError, ImportError, KeyError, OSError):
+        return ""
+
+
+class _ThreadingTCPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+if hasattr(socketserver, "UnixStreamServer"):
+    class _ThreadingUnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+        daemon_threads = True
+
+
+def is_running(address: str | None = None) -> bool:
+    try:
+        _connect_socket(address or default_address(), timeout=1).close()
+        return True
+    except OSError:
+        return False
+
+
+def make_server(daemon: PackerDaemon, address: str | None = None, mode: int = 0o660):
+    """
+    创建监听 address 的服务端（尚未开始处理请求）
+    Unix socket 的权限为 mode（默认同组用户可连接）；地址已有守护进程在运行时抛出 RuntimeError
+    """
+    address = address or default_address()
+    if is_running(address):
+        raise RuntimeError(f"守护进程已在运行：{address}")
+    tcp = _tcp_address(address)
+    if tcp is not None:
+        server = _ThreadingTCPServer(tcp, _Handler)
+    else:
+        if os.path.exists(address):
+            # 上次异常退出留下的 socket 文件
+            os.remove(address)
+        server = _ThreadingUnixServer(address, _Handler)
+        os.chmod(address, mode)
+    server.daemon = daemon
+    return server
+
+
+def serve(address: str | None = None, limit: int | None = None, cfg: dict | None = None, mode: int = 0o660):
+    """启动守护进程并一直运行，Ctrl+C / SIGTERM 时取消未完成的任务后退出"""
+    import signal
+    address = address or default_address()
+    daemon = PackerDaemon(limit, cfg)
+    server = make_server(daemon, address, mode)
+
+    def _stop(*_):
+        threading.Thread(target=server.shutdown, daemon=True).start()
+    if hasattr(signal, "SIGTERM"):
+        signal.signal(signal.SIGTERM, _stop)
+    logger.info(f"发布守护进程已启动：{address}，并发上限 {daemon.limit}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        daemon.close()
+        if _tcp_address(address) is None and os.path.exists(address):
+            os.remove(address)
+        logger.info("发布守护进程已退出")
+
+
+# ---------- 客户端 ----------
+class DaemonClient:
+    """
+    守护进程客户端：call() 发送请求并等待响应，期间收到的通知交给 on_notify(method, params)
+    一个连接同一时刻只能有一个未完成的请求（多线程使用时各自创建客户端）
+    """
+
+    def __init__(self, address: str | None = None, timeout: float | None = None, on_notify=None):
+        self.address = address or default_address()
+        self.on_notify = on_notify
+        self._sock = _connect_socket(self.address, timeout)
+        self._sock.settimeout(None)
+        self._rfile = self._sock.makefile("r", encoding="utf-8")
+        self._ids = itertools.count(1)
+
+    def close(self):
+        self._rfile.close()
+        self._sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def call(self, method: str, **params):
+        msg_id = next(self._ids)
+        data = json.dumps({"jsonrpc": "2.0", "id": msg_id, "method": method, "params": params}, ensure_ascii=False)
+        self._sock.sendall((data + "\n").encode("utf-8"))
+        for raw in self._rfile:
+            message = json.loads(raw)
+            if "id" not in message:
+                if self.on_notify:
+                    self.on_notify(message.get("method"), message.get("params") or {})
+                continue
+            if message["id"] != msg_id:
+                continue
+            if "error" in message:
+                raise DaemonError(message["error"].get("code", APP_ERROR), message["error"].get("message", ""))
+            return message.get("result")
+        raise ConnectionError(f"守护进程断开了连接：{self.address}")
+
+    def follow(self, job_ids: list[int], on_line=None, on_job=None) -> list[dict]:
+        """
+        跟随任务直到全部结束，返回各任务的最终信息
+        on_line(job_id, line) 接收输出行（包括提交前已产生的），on_job(info) 接收阶段/状态变化
+        """
+        def _notify(method: str, params: dict):
+            if method == "log" and on_line:
+                on_line(params["job"], params["line"])
+            elif method == "job" and on_job:
+                on_job(params)
+        self.on_notify = _notify
+        for job_id in job_ids:
+            for line in self.call("logs", job=job_id, follow=True):
+                if on_line:
+                    on_line(job_id, line)
+        return [self.call("wait", job=job_id) for job_id in job_ids]
+
+
+def connect(address: str | None = None, timeout: float = 2) -> DaemonClient | None:
+    """连接守护进程，未运行时返回 None"""
+    try:
+        return DaemonClient(address, timeout)
+    except OSError:
+        return None
+
+
+def run_remote(method: str, params: dict, address: str | None = None, on_line=None, stage=None,
+               cancel: packer.CancelToken | None = None) -> dict | None:
+    """
+    提交一个任务（release 只发布一个包）并跟随到结束，返回任务结果；界面的后台线程借此把执行交给守护进程
+    on_line / stage / cancel 同 packer.release_package：输出行和阶段进度转发到本机，cancel 取消时同时取消远端任务
+    任务失败时抛出 RuntimeError，取消时抛出 CancelledError
+    """
+    with DaemonClient(address) as client:
+        info = client.call(method, **params)
+        job_id = (info[0] if isinstance(info, list) else info)["id"]
+        current = {"stage": "", "progress": None}
+
+        def on_job(job: dict):
+            if job["id"] != job_id or not stage or not job["stage"]:
+                return
+            if job["stage"] != current["stage"]:
+                current["stage"], current["progress"] = job["stage"], stage(job["stage"])
+            done, total = job["progress"]
+            if current["progress"] and total:
+                current["progress"](done, total)
+
+        finished = threading.Event()
+
+        def watch_cancel():
+            while not finished.wait(0.2):
+                if cancel.cancelled:
+                    with DaemonClient(client.address) as canceller:
+                        canceller.call("cancel", job=job_id)
+                    return
+        if cancel is not None:
+            threading.Thread(target=watch_cancel, name="daemon-cancel", daemon=True).start()
+        try:
+            final = client.follow([job_id], on_line=(lambda _, line: on_line(line)) if on_line else None,
+                                  on_job=on_job)[0]
+        finally:
+            finished.set()
+    if final["state"] == CANCELLED:
+        raise packer.CancelledError("已取消")
+    if final["state"] == FAILED:
+        raise RuntimeError(final["error"] or "守护进程中的任务失败")
+    return final["result"]
@@ -0,0 +1,356 @@
+"""
+发布清单与增量包
+
+- 每次发布在发布目录旁写出 <发布目录名>.manifest.json，记录每个文件的相对路径、大小和 SHA-256
+  （线程池并行计算，大文件用 mmap 读取）；
+- make_delta()：与指定的旧发布清单比较，只把新增、修改的文件和删除列表打成增量包
+  <发布目录名>.delta_<旧发布时间>.<格式>，包内 __delta__/delta.json 记录变更和新发布的完整清单；
+- apply_delta()：先读取并校验变更信息，再在安装目录上应用增量包（写入新文件并恢复权限、删除已移除的文件），
+  最后按完整清单校验结果。
+"""
+import hashlib
+import json
+import mmap
+import os
+import shutil
+import tarfile
+import tempfile
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from loguru import logger
+from . import archive
+from . import tracing
+
+MANIFEST_VERSION = 1
+MANIFEST_SUFFIX = ".manifest.json"
+DELTA_DIR = "__delta__"
+DELTA_INFO = f"{DELTA_DIR}/delta.json"
+DELTA_DELETED = f"{DELTA_DIR}/deleted.txt"
+# 不小于该大小的文件用 mmap 计算哈希，不把整个文件读入内存
+MMAP_MIN_SIZE = 8 << 20
+_CHUNK = 1 << 20
+
+
+def hash_file(path: str) -> tuple[int, str]:
+    """返回 (文件大小, SHA-256)"""
+    size = os.path.getsize(path)
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        if size >= MMAP_MIN_SIZE:
+            # hashlib 处理大块数据时释放 GIL，多个线程可同时计算
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+                h.update(m)
+        else:
+            while chunk := f.read(_CHUNK):
+                h.update(chunk)
+    return size, h.hexdigest()
+
+
+def _file_entry(path: str) -> dict:
+    """清单中的一项：大小、SHA-256 和 mtime（先取 mtime，计算哈希期间被修改时下次比较会发现不一致）"""
+    mtime_ns = os.stat(path).st_mtime_ns
+    size, digest = hash_file(path)
+    return {"size": size, "sha256": digest, "mtime_ns": mtime_ns}
+
+
+def _hash_entries(files: list[tuple[str, str]], jobs: int | None = None) -> dict[str, dict]:
+    jobs = max(1, jobs or min(32, (os.cpu_count() or 1) * 2))
+    with tracing.span("manifest", files=len(files)) as sp, ThreadPoolExecutor(max_workers=jobs) as pool:
+        entries = list(pool.map(lambda item: _file_entry(item[0]), files))
+        sp.set(bytes=sum(e["size"] for e in entries))
+    return {rel: e for (_, rel), e in zip(files, entries)}
+
+
+def build_manifest(files: list[tuple[str, str]], name: str = "", jobs: int | None = None) -> dict:
+    """按 [(源文件路径, 发布目录内相对路径)] 计算清单"""
+    entries = _hash_entries(files, jobs)
+    return {
+        "version": MANIFEST_VERSION,
+        "name": name,
+        "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "files": dict(sorted(entries.items())),
+    }
+
+
+def release_base(path: str) -> str:
+    """发布目录、压缩包或清单路径 -> 发布目录路径（dist/dist_<包名>_<时间>，不要求存在）"""
+    path = os.path.abspath(path)
+    for suffix in (MANIFEST_SUFFIX, *(f".{fmt}" for fmt in archive.FORMATS)):
+        if path.endswith(suffix):
+            return path[:-len(suffix)]
+    return path
+
+
+def manifest_path(output_root: str) -> str:
+    return release_base(output_root) + MANIFEST_SUFFIX
+
+
+def _write_json(path: str, data: dict, indent: int | None = None):
+    """先写临时文件再改名，避免读到写了一半的清单"""
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp_")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=indent)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def write_manifest(output_root: str, files: list[tuple[str, str]] | None = None,
+                   jobs: int | None = None) -> dict:
+    """
+    为发布目录写出 <发布目录>.manifest.json 并返回清单内容
+    files 为 [(源文件路径, 相对路径)]，直接发布为压缩包（没有发布目录）时由调用方给出
+    """
+    base = release_base(output_root)
+    if files is None:
+        files = archive.list_files(base)
+    manifest = build_manifest(files, os.path.basename(base), jobs)
+    path = manifest_path(base)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    _write_json(path, manifest)
+    logger.info(f"发布清单已写入: {path}（{len(files)} 个文件）")
+    return manifest
+
+
+def load_manifest(path: str) -> dict:
+    """
+    读取清单：path 可以是 .manifest.json，也可以是发布目录或压缩包（读取其旁边的清单）；
+    没有清单的旧发布目录当场计算
+    """
+    mpath = path if path.endswith(MANIFEST_SUFFIX) else manifest_path(path)
+    if os.path.isfile(mpath):
+        with open(mpath, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest.get("version") != MANIFEST_VERSION:
+            raise ValueError(f"不支持的清单版本: {manifest.get('version')}（{mpath}）")
+        return manifest
+    base = release_base(path)
+    if os.path.isdir(base):
+        logger.warning(f"没有找到发布清单，按发布目录重新计算: {base}")
+        return build_manifest(archive.list_files(base), os.path.basename(base))
+    raise FileNotFoundError(f"发布清单不存在: {mpath}")
+
+
+def current_manifest(output_root: str, jobs: int | None = None) -> dict:
+    """
+    发布目录的清单：已有清单时只对大小或 mtime 与清单不一致的文件重新计算哈希（大小不变的原地修改也能发现），
+    有变化时写回；没有清单或文件列表不一致时整体重新计算并写出
+    """
+    files = archive.list_files(output_root)
+    try:
+        manifest = load_manifest(manifest_path(output_root))
+    except (OSError, ValueError):
+        manifest = None
+    if manifest is None or {rel for _, rel in files} != set(manifest["files"]):
+        if manifest is not None:
+            logger.warning(f"发布目录与清单的文件列表不一致，重新计算清单: {output_root}")
+        return write_manifest(output_root, files, jobs)
+
+    entries = manifest["files"]
+    stale = []
+    for fpath, rel in files:
+        st = os.stat(fpath)
+        if (st.st_size, st.st_mtime_ns) != (entries[rel]["size"], entries[rel].get("mtime_ns")):
+            stale.append((fpath, rel))
+    if not stale:
+        return manifest
+    fresh = _hash_entries(stale, jobs)
+    modified = [rel for rel, e in fresh.items() if e["sha256"] != entries[rel]["sha256"]]
+    if modified:
+        logger.warning(f"发布目录中有 {len(modified)} 个文件与清单不一致（已更新清单）: {', '.join(modified[:5])}")
+    entries.update(fresh)
+    _write_json(manifest_path(output_root), manifest)
+    return manifest
+
+
+def restat_manifest(output_root: str):
+    """
+    按当前文件更新清单中的 mtime，不重新计算哈希；只在确认内容未变时调用
+    （如 store.ingest 用内容相同的 blob 替换发布目录中的文件后），否则之后的 current_manifest 会全部重新计算
+    """
+    path = manifest_path(output_root)
+    manifest = load_manifest(path)
+    for rel, e in manifest["files"].items():
+        try:
+            st = os.stat(os.path.join(output_root, rel))
+        except OSError:
+            continue
+        if st.st_size == e["size"]:
+            e["mtime_ns"] = st.st_mtime_ns
+    _write_json(path, manifest)
+
+
+def diff(base: dict, new: dict) -> tuple[list[str], list[str], list[str]]:
+    """比较两个清单，返回 (修改的文件, 新增的文件, 删除的文件)"""
+    old_files, new_files = base["files"], new["files"]
+    changed = [rel for rel, e in new_files.items() if rel in old_files and old_files[rel]["sha256"] != e["sha256"]]
+    added = [rel for rel in new_files if rel not in old_files]
+    deleted = [rel for rel in old_files if rel not in new_files]
+    return changed, added, deleted
+
+
+def delta_path_for(output_root: str, base: dict, fmt: str = "zip") -> str:
+    """增量包放在发布目录同级：dist_<包名>_<时间>.delta_<旧发布时间>.<格式>"""
+    from .store import RELEASE_RE
+    m = RELEASE_RE.match(base.get("name", ""))
+    tag = m["ts"] if m else (base.get("name") or "base")
+    root = release_base(output_root)
+    return os.path.join(os.path.dirname(root), f"{os.path.basename(root)}.delta_{tag}.{fmt}")
+
+
+def make_delta(output_root: str, base: dict | str, dest: str | None = None, fmt: str = "zip",
+               level: int | None = None, jobs: int | None = None, progress=None, cancel=None) -> tuple[str, dict]:
+    """
+    生成 output_root 相对 base（旧发布的清单，或清单/发布目录/压缩包路径）的增量包，
+    返回 (增量包路径, 变更信息)
+    """
+    if isinstance(base, str):
+        base = load_manifest(base)
+    output_root = release_base(output_root)
+    if not os.path.isdir(output_root):
+        raise FileNotFoundError(f"发布目录不存在，无法生成增量包：{output_root}")
+    current = current_manifest(output_root, jobs)
+    changed, added, deleted = diff(base, current)
+    info = {
+        "version": MANIFEST_VERSION,
+        "base": base.get("name", ""),
+        "target": current["name"],
+        "changed": changed,
+        "added": added,
+        "deleted": deleted,
+        # 只带大小和哈希（不带 mtime），相同内容生成相同的增量包
+        "manifest": {rel: {"size": e["size"], "sha256": e["sha256"]} for rel, e in current["files"].items()},
+    }
+    dest = dest or delta_path_for(output_root, base, fmt)
+    payload = sum(current["files"][rel]["size"] for rel in changed + added)
+    logger.info(f"增量包：修改 {len(changed)} 个、新增 {len(added)} 个、删除 {len(deleted)} 个文件，"
+                f"共 {payload / 1048576:.1f} MB -> {dest}")
+
+    meta = tempfile.mkdtemp(prefix="delta_meta_")
+    try:
+        info_path = os.path.join(meta, "delta.json")
+        _write_json(info_path, info, indent=2)
+        deleted_path = os.path.join(meta, "deleted.txt")
+        with open(deleted_path, "w", encoding="utf-8") as f:
+            f.writelines(f"{rel}\n" for rel in deleted)
+        files = [(os.path.join(output_root, rel), rel) for rel in sorted(changed + added)]
+        files += [(info_path, DELTA_INFO), (deleted_path, DELTA_DELETED)]
+        os.makedirs(os.path.dirname(os.path.abspath(dest)), exist_ok=True)
+        if os.path.exists(dest):
+            os.remove(dest)
+        archive.make_archive_from(files, dest, fmt, archive.DEFAULT_LEVEL if level is None else level,
+                                  jobs, progress, cancel)
+    finally:
+        shutil.rmtree(meta, ignore_errors=True)
+    return dest, info
+
+
+# ---------- 应用增量包 ----------
+def _safe_target(target_dir: str, rel: str) -> str:
+    """rel 在 target_dir 内的路径，拒绝绝对路径和 .. 越界"""
+    path = os.path.normpath(os.path.join(target_dir, rel))
+    if os.path.isabs(rel) or os.path.commonpath([target_dir, path]) != target_dir:
+        raise ValueError(f"增量包中的路径越界: {rel}")
+    return path
+
+
+def _iter_members(delta_path: str):
+    """依次产出 (包内路径, 可读文件对象, 权限位)，只包含普通文件；压缩包中没有记录权限时权限位为 None"""
+    if delta_path.endswith(".zip"):
+        with zipfile.ZipFile(delta_path) as zf:
+            for zinfo in zf.infolist():
+                if not zinfo.is_dir():
+                    mode = (zinfo.external_attr >> 16) & 0o7777
+                    with zf.open(zinfo) as f:
+                        yield zinfo.filename, f, mode or None
+        return
+    if delta_path.endswith(".tar.zst"):
+        try:
+            import zstandard
+        except ImportError as e:
+            raise RuntimeError("tar.zst 格式需要安装 zstandard：uv add zstandard") from e
+        raw = open(delta_path, "rb")
+        fileobj = zstandard.ZstdDecompressor().stream_reader(raw, closefd=True)
+        tf = tarfile.open(fileobj=fileobj, mode="r|")
+    else:
+        fileobj = None
+        tf = tarfile.open(delta_path, "r:*")
+    try:
+        for member in tf:
+            if member.isfile():
+                yield member.name, tf.extractfile(member), member.mode
+    finally:
+        tf.close()
+        if fileobj is not None:
+            fileobj.close()
+
+
+def read_delta_info(delta_path: str, target_dir: str) -> dict:
+    """
+    读取并校验增量包中的变更信息，不写入任何文件：
+    缺少 __delta__/delta.json、版本不支持、包内或变更信息中有越界路径时抛出 ValueError
+    （tar 格式需要完整读一遍压缩包，delta.json 在包的末尾）
+    """
+    info = None
+    names = []
+    for name, f, _ in _iter_members(delta_path):
+        if name == DELTA_INFO:
+            info = json.load(f)
+        elif not name.startswith(f"{DELTA_DIR}/"):
+            names.append(name)
+    if info is None:
+        raise ValueError(f"不是增量包（缺少 {DELTA_INFO}）：{delta_path}")
+    if info.get("version") != MANIFEST_VERSION:
+        raise ValueError(f"不支持的增量包版本: {info.get('version')}（{delta_path}）")
+    for rel in names + info["deleted"]:
+        _safe_target(target_dir, rel)
+    return info
+
+
+def verify(target_dir: str, files: dict, jobs: int | None = None) -> list[str]:
+    """按清单校验目录，返回缺失或内容不一致的文件（清单以外的文件不检查）"""
+    target_dir = os.path.abspath(target_dir)
+    present = [(os.path.join(target_dir, rel), rel) for rel in files if os.path.isfile(os.path.join(target_dir, rel))]
+    missing = sorted(set(files) - {rel for _, rel in present})
+    actual = build_manifest(present, jobs=jobs)["files"]
+    return missing + [rel for rel, e in actual.items() if e["sha256"] != files[rel]["sha256"]]
+
+
+def apply_delta(delta_path: str, target_dir: str, check: bool = True, jobs: int | None = None) -> dict:
+    """
+    在 target_dir（旧发布的安装目录）上应用增量包：写入新增/修改的文件，删除已移除的文件，
+    check 为真时再按增量包中的完整清单校验，不一致时抛出 ValueError。返回增量包中的变更信息
+    """
+    target_dir = os.path.abspath(target_dir)
+    if not os.path.isdir(target_dir):
+        raise FileNotFoundError(f"安装目录不存在：{target_dir}")
+    # 先读取并校验变更信息，普通压缩包或含越界路径的增量包不会改动安装目录
+    info = read_delta_info(delta_path, target_dir)
+    written = 0
+    for name, f, mode in _iter_members(delta_path):
+        if name.startswith(f"{DELTA_DIR}/"):
+            continue
+        dst = _safe_target(target_dir, name)
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+        with open(dst, "wb") as out:
+            shutil.copyfileobj(f, out, _CHUNK)
+        if mode is not None:
+            # 恢复压缩包中记录的权限（可执行脚本保持可执行）
+            os.chmod(dst, mode & 0o777)
+        written += 1
+    for rel in info["deleted"]:
+        path = _safe_target(target_dir, rel)
+        if os.path.isfile(path):
+            os.remove(path)
+    logger.info(f"已应用增量包 {os.path.basename(delta_path)}：写入 {written} 个文件，删除 {len(info['deleted'])} 个文件")
+    if check:
+        bad = verify(target_dir, info["manifest"], jobs)
+        if bad:
+            raise ValueError(f"应用增量包后有 {len(bad)} 个文件与 {info['target']} 的清单不一致"
+                             f"（安装目录可能不是 {info['base']}）：{', '.join(bad[:10])}")
+        logger.info(f"校验通过：安装目录与 {info['target']} 一致")
+    return info
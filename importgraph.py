@@ -0,0 +1,231 @@
+"""
+包内静态导入图与可达性分析
+
+从 __init__.py / __main__.py（及 mapp.txt 中列出的包内 .py 文件）出发，用 ast 解析 import 语句，
+得到运行时可能被加载的模块集合，只把这些模块交给 pyarmor。
+- 识别 import / from ... import（含相对导入）以及字面量参数的 importlib.import_module / __import__；
+- 导入 a.b.c 时 a、a.b 的 __init__.py 同样可达；from x import y 时 y 若是子模块也视为可达；
+- 参数不是字面量的动态导入无法静态分析，会在报告中列出，需要时请把对应模块写入 mapp.txt；
+- 每个文件的解析结果按 (路径, mtime_ns, 文件大小) 缓存。
+"""
+import ast
+import os
+import threading
+from loguru import logger
+
+# 导入引用：(相对导入层级, 模块名, 导入的名称)；层级为 0 表示绝对导入
+ImportRef = tuple[int, str, tuple[str, ...]]
+
+# 路径 -> ((mtime_ns, size), (导入引用, 无法解析的动态导入行号))
+_cache: dict[str, tuple[tuple[int, int], tuple[list[ImportRef], list[int]]]] = {}
+_lock = threading.Lock()
+
+
+def _literal_module(node: ast.Call) -> str | None:
+    """importlib.import_module("x") / import_module("x") / __import__("x") 的字面量模块名"""
+    func = node.func
+    if isinstance(func, ast.Attribute):
+        name = func.attr
+    elif isinstance(func, ast.Name):
+        name = func.id
+    else:
+        return None
+    if name not in ("import_module", "__import__"):
+        return None
+    if node.args and isinstance(node.args[0], ast.Constant) and isinstance(node.args[0].value, str):
+        return node.args[0].value
+    return ""
+
+
+def parse_imports_source(code: str | bytes) -> tuple[list[ImportRef], list[int]]:
+    """解析源码中的导入引用，返回 (导入引用列表, 无法静态解析的动态导入行号)"""
+    refs: list[ImportRef] = []
+    dynamic: list[int] = []
+    for node in ast.walk(ast.parse(code)):
+        if isinstance(node, ast.Import):
+            refs.extend((0, alias.name, ()) for alias in node.names)
+        elif isinstance(node, ast.ImportFrom):
+            refs.append((node.level, node.module or "", tuple(a.name for a in node.names)))
+        elif isinstance(node, ast.Call):
+            module = _literal_module(node)
+            if module:
+                level = len(module) - len(module.lstrip("."))
+                refs.append((level, module[level:], ()))
+            elif module == "":
+                dynamic.append(node.lineno)
+    return refs, dynamic
+
+
+def parse_imports(path: str) -> tuple[list[ImportRef], list[int]]:
+    """解析 .py 文件中的导入引用（带缓存），语法错误时视为没有导入"""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return [], []
+    key = (st.st_mtime_ns, st.st_size)
+    path = os.path.abspath(path)
+    with _lock:
+        cached = _cache.get(path)
+    if cached and cached[0] == key:
+        return cached[1]
+    try:
+        with open(path, "rb") as f:
+            info = parse_imports_source(f.read())
+    except (SyntaxError, ValueError) as e:
+        logger.warning(f"解析导入失败，按无导入处理: {path}, err={e}")
+        info = ([], [])
+    with _lock:
+        _cache[path] = (key, info)
+    return info
+
+
+def clear_cache():
+    with _lock:
+        _cache.clear()
+
+
+class _Resolver:
+    def __init__(self, pkg_full_name: str):
+        self.root = pkg_full_name
+        self.pkg_name = os.path.basename(pkg_full_name)
+
+    def module_file(self, parts: list[str]) -> str | None:
+        """包内模块路径（相对包目录）-> 对应的 .py 文件，不存在返回 None"""
+        if not parts:
+            candidates = ["__init__.py"]
+        else:
+            base = "/".join(parts)
+            candidates = [f"{base}.py", f"{base}/__init__.py"]
+        for rel in candidates:
+            if os.path.isfile(os.path.join(self.root, rel)):
+                return rel
+        return None
+
+    @staticmethod
+    def package_parts(rel: str) -> list[str]:
+        """模块文件所在的包（相对包目录的各级名称）"""
+        return rel.split("/")[:-1]
+
+    def resolve(self, rel: str, ref: ImportRef) -> list[str]:
+        """把 rel 文件中的一条导入引用解析为包内文件列表（含各级 __init__.py）"""
+        level, module, names = ref
+        mod_parts = module.split(".") if module else []
+        if level:
+            base = self.package_parts(rel)
+            if level - 1 > len(base):
+                return []
+            base = base[:len(base) - (level - 1)]
+        else:
+            if not mod_parts or mod_parts[0] != self.pkg_name:
+                return []
+            base, mod_parts = [], mod_parts[1:]
+        target = base + mod_parts
+
+        files = []
+        # 导入 a.b.c 会依次执行 a、a.b 的 __init__.py
+        for i in range(len(target) + 1):
+            f = self.module_file(target[:i])
+            if f and f.endswith("__init__.py"):
+                files.append(f)
+        f = self.module_file(target)
+        if f:
+            files.append(f)
+        for name in names:
+            if name != "*":
+                sub = self.module_file(target + [name])
+                if sub:
+                    files.append(sub)
+        return files
+
+
+def reachable(pkg_full_name: str, extra_roots: list[str] | None = None) -> tuple[set[str], dict[str, list[int]]]:
+    """
+    计算包内可达的 .py 文件（相对包目录，'/' 分隔）
+    入口为 __init__.py、__main__.py 和 extra_roots；返回 (可达文件集合, {文件: 无法解析的动态导入行号})
+    """
+    pkg_full_name = os.path.abspath(pkg_full_name)
+    resolver = _Resolver(pkg_full_name)
+    roots = ["__init__.py", "__main__.py"] + list(extra_roots or [])
+    todo = [r for r in roots if os.path.isfile(os.path.join(pkg_full_name, r))]
+    seen: set[str] = set()
+    dynamic: dict[str, list[int]] = {}
+    while todo:
+        rel = todo.pop()
+        if rel in seen:
+            continue
+        seen.add(rel)
+        refs, dyn = parse_imports(os.path.join(pkg_full_name, rel))
+        if dyn:
+            dynamic[rel] = dyn
+        for ref in refs:
+            todo.extend(f for f in resolver.resolve(rel, ref) if f not in seen)
+        # 子模块被导入时其所在各级包的 __init__.py 也会执行
+        for i in range(len(resolver.package_parts(rel))):
+            init = resolver.module_file(resolver.package_parts(rel)[:i + 1])
+            if init and init not in seen:
+                todo.append(init)
+    return seen, dynamic
+
+
+def import_order(pkg_full_name: str, roots: list[str] | None = None) -> list[str]:
+    """
+    按首次导入的先后列出包内可达的 .py 文件（深度优先，近似运行时的实际加载顺序）
+    入口默认为 __init__.py、__main__.py；用于按导入顺序排列 .pyz 中的条目
+    """
+    pkg_full_name = os.path.abspath(pkg_full_name)
+    resolver = _Resolver(pkg_full_name)
+    order: list[str] = []
+    seen: set[str] = set()
+    # 每层为一个文件中尚未处理的导入目标
+    stack = []
+
+    def enter(rel: str):
+        seen.add(rel)
+        order.append(rel)
+        refs, _ = parse_imports(os.path.join(pkg_full_name, rel))
+        stack.append(iter([f for ref in refs for f in resolver.resolve(rel, ref)]))
+
+    for root in roots or ["__init__.py", "__main__.py"]:
+        if root in seen or not os.path.isfile(os.path.join(pkg_full_name, root)):
+            continue
+        enter(root)
+        while stack:
+            for rel in stack[-1]:
+                if rel not in seen:
+                    enter(rel)
+                    break
+            else:
+                stack.pop()
+    return order
+
+
+def prune_sources(pkg_full_name: str, sources: list[str], report_path: str | None = None) -> list[str]:
+    """
+    从 sources（相对包目录的 .py 文件）中只保留可达模块和 mapp.txt 中列出的包内 .py 文件，
+    其余文件记录到日志（及 report_path 指定的报告文件）中，返回保留的文件列表
+    """
+    from . import manifest
+    mapp = manifest.resolve(pkg_full_name, warn=False) or []
+    mapp_py = [rel for src, rel in mapp if rel.endswith(".py") and not rel.startswith("../")]
+    keep, dynamic = reachable(pkg_full_name, mapp_py)
+    keep.update(mapp_py)
+    kept = [rel for rel in sources if rel in keep]
+    dropped = [rel for rel in sources if rel not in keep]
+
+    pkg_name = os.path.basename(os.path.abspath(pkg_full_name))
+    logger.info(f"可达性裁剪: {pkg_name} 保留 {len(kept)} 个模块，跳过 {len(dropped)} 个未被引用的模块")
+    for rel, lines in dynamic.items():
+        logger.warning(f"{rel} 第 {', '.join(map(str, lines))} 行存在无法静态分析的动态导入，"
+                       f"其导入的模块需写入 mapp.txt")
+    if report_path:
+        os.makedirs(os.path.dirname(os.path.abspath(report_path)), exist_ok=True)
+        with open(report_path, "w", encoding="utf-8") as f:
+            f.write(f"# {pkg_name}: 保留 {len(kept)} 个模块，跳过 {len(dropped)} 个模块\n")
+            if dynamic:
+                f.write("\n# 无法静态分析的动态导入（文件: 行号）\n")
+                for rel, lines in sorted(dynamic.items()):
+                    f.write(f"{rel}: {', '.join(map(str, lines))}\n")
+            f.write("\n# 未加密（不可达）的模块\n")
+            f.writelines(f"{rel}\n" for rel in dropped)
+        logger.info(f"裁剪报告已写入: {report_path}")
+    return kept
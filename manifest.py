@@ -0,0 +1,267 @@
+"""
+mapp.txt 清单引擎
+
+mapp.txt 每行一条规则（相对包目录，'/' 或 '\\' 分隔，# 开头为注释）：
+    bgtask/common        字面路径：文件或整个目录（与旧格式兼容）
+    assets/**/*.onnx     glob：* 匹配单级，** 匹配任意多级，? 和 [...] 同 fnmatch
+    !assets/**/*.tmp     以 ! 开头为排除规则
+规则按顺序生效，后面的规则覆盖前面的（与 .gitignore 相同）；匹配到目录即包含/排除其下全部文件。
+
+解析时只遍历一次包目录（按规则的固定前缀剪枝），得到拷贝计划后在线程池中执行：
+优先 reflink（写时复制），其次 copy_file_range，可选硬链接；目标文件大小和 mtime 一致时跳过。
+"""
+import errno
+import os
+import re
+import shutil
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from loguru import logger
+from . import tracing
+
+COPY_MODES = ("copy", "hardlink")
+_GLOB_CHARS = re.compile(r"[*?\[]")
+# Linux FICLONE ioctl
+_FICLONE = 0x40049409
+
+
+class Rule:
+    """一条清单规则"""
+
+    def __init__(self, pattern: str, exclude: bool, lineno: int):
+        self.pattern = pattern
+        self.exclude = exclude
+        self.lineno = lineno
+        self.is_glob = bool(_GLOB_CHARS.search(pattern))
+        self.regex = re.compile(glob_to_regex(pattern)) if self.is_glob else None
+        # 第一个通配段之前的固定前缀，用于遍历时剪枝
+        prefix = []
+        for seg in pattern.split("/"):
+            if _GLOB_CHARS.search(seg):
+                break
+            prefix.append(seg)
+        self.prefix = "/".join(prefix)
+        self.matched = 0
+
+    def match(self, rel: str) -> bool:
+        if self.regex is not None:
+            return self.regex.fullmatch(rel) is not None
+        return rel == self.pattern
+
+
+def glob_to_regex(pattern: str) -> str:
+    """把 glob 转为正则（不含首尾锚点）：* 和 ? 不跨越 '/'，** 匹配任意多级；mapp.txt 与扫描的忽略规则共用"""
+    out = []
+    i, n = 0, len(pattern)
+    while i < n:
+        c = pattern[i]
+        if pattern.startswith("**/", i):
+            out.append("(?:.*/)?")
+            i += 3
+        elif pattern.startswith("**", i):
+            out.append(".*")
+            i += 2
+        elif c == "*":
+            out.append("[^/]*")
+            i += 1
+        elif c == "?":
+            out.append("[^/]")
+            i += 1
+        elif c == "[":
+            j = pattern.find("]", i + 1)
+            if j < 0:
+                out.append(re.escape(c))
+                i += 1
+            else:
+                body = pattern[i + 1:j]
+                if body.startswith("!"):
+                    body = "^" + body[1:]
+                out.append(f"[{body}]")
+                i = j + 1
+        else:
+            out.append(re.escape(c))
+            i += 1
+    return "".join(out)
+
+
+def parse_manifest(mapp_path: str) -> list[Rule]:
+    rules: list[Rule] = []
+    with open(mapp_path, "r", encoding="utf-8") as f:
+        for lineno, raw_line in enumerate(f, 1):
+            line = raw_line.strip()
+            # 跳过空行和注释行
+            if not line or line.startswith("#"):
+                continue
+            exclude = line.startswith("!")
+            if exclude:
+                line = line[1:].strip()
+            pattern = line.replace("\\", "/").strip("/")
+            if pattern.startswith("./"):
+                pattern = pattern[2:]
+            if pattern:
+                rules.append(Rule(pattern, exclude, lineno))
+    return rules
+
+
+def _decide(rules: list[Rule], rel: str) -> Rule | None:
+    """返回对 rel（含其各级上级目录）生效的最后一条规则"""
+    parts = rel.split("/")
+    candidates = ["/".join(parts[:i]) for i in range(1, len(parts) + 1)]
+    for rule in reversed(rules):
+        for cand in candidates:
+            if rule.match(cand):
+                return rule
+    return None
+
+
+def _worth_descending(includes: list[Rule], rel_dir: str) -> bool:
+    for rule in includes:
+        p = rule.prefix
+        if not p or rel_dir == p or rel_dir.startswith(p + "/") or p.startswith(rel_dir + "/"):
+            return True
+    return False
+
+
+def resolve(pkg_full_name: str, rules: list[Rule] | None = None,
+            warn: bool = True) -> list[tuple[str, str]] | None:
+    """
+    按 mapp.txt 解析出要拷贝的文件 [(源文件路径, 相对包目录的路径)]，mapp.txt 不存在返回 None
+    指向包目录之外的字面路径（如 ../common）单独展开，保持与旧格式一致
+    """
+    if rules is None:
+        mapp_path = os.path.join(pkg_full_name, "mapp.txt")
+        if not os.path.isfile(mapp_path):
+            return None
+        rules = parse_manifest(mapp_path)
+
+    inside = [r for r in rules if not r.pattern.startswith("../")]
+    outside = [r for r in rules if r.pattern.startswith("../") and not r.exclude and not r.is_glob]
+    includes = [r for r in inside if not r.exclude]
+
+    files: dict[str, str] = {}
+    if includes:
+        for root, dirs, names in os.walk(pkg_full_name):
+            rel_root = os.path.relpath(root, pkg_full_name).replace(os.sep, "/")
+            rel_root = "" if rel_root == "." else rel_root
+            dirs[:] = sorted(
+                d for d in dirs
+                if d != "__pycache__" and _worth_descending(includes, f"{rel_root}/{d}" if rel_root else d)
+            )
+            for name in sorted(names):
+                rel = f"{rel_root}/{name}" if rel_root else name
+                rule = _decide(inside, rel)
+                if rule is not None:
+                    rule.matched += 1
+                    if not rule.exclude:
+                        files[rel] = os.path.join(root, name)
+
+    for rule in outside:
+        src = os.path.normpath(os.path.join(pkg_full_name, rule.pattern))
+        if os.path.isdir(src):
+            for root, dirs, names in os.walk(src):
+                dirs.sort()
+                for name in sorted(names):
+                    sub = os.path.relpath(os.path.join(root, name), src).replace(os.sep, "/")
+                    files[f"{rule.pattern}/{sub}"] = os.path.join(root, name)
+                    rule.matched += 1
+        elif os.path.isfile(src):
+            files[rule.pattern] = src
+            rule.matched += 1
+
+    for rule in (includes + outside) if warn else ():
+        if rule.is_glob and not rule.matched:
+            logger.warning(f"mapp.txt 第 {rule.lineno} 行未匹配到任何文件，已跳过: {rule.pattern}")
+        elif not rule.is_glob and not os.path.exists(os.path.join(pkg_full_name, rule.pattern)):
+            logger.warning(f"mapp.txt 中的路径不存在，已跳过: {os.path.join(pkg_full_name, rule.pattern)}")
+    return [(src, rel) for rel, src in files.items()]
+
+
+# ---------- 拷贝 ----------
+def _is_up_to_date(src_st: os.stat_result, dst: str) -> bool:
+    try:
+        dst_st = os.stat(dst)
+    except OSError:
+        return False
+    # 部分文件系统 mtime 精度只有秒级
+    return dst_st.st_size == src_st.st_size and int(dst_st.st_mtime) == int(src_st.st_mtime)
+
+
+def _fast_copyfile(src: str, dst: str, size: int):
+    """reflink -> copy_file_range -> shutil.copyfile 逐级回退"""
+    if sys.platform.startswith("linux"):
+        import fcntl
+        with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+            try:
+                fcntl.ioctl(fdst.fileno(), _FICLONE, fsrc.fileno())
+                return
+            except OSError:
+                pass
+            if hasattr(os, "copy_file_range"):
+                try:
+                    copied = 0
+                    while copied < size:
+                        n = os.copy_file_range(fsrc.fileno(), fdst.fileno(), size - copied)
+                        if n == 0:
+                            break
+                        copied += n
+                    if copied == size:
+                        return
+                except OSError as e:
+                    if e.errno not in (errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP):
+                        raise
+                fdst.seek(0)
+                fdst.truncate()
+    shutil.copyfile(src, dst)
+
+
+def copy_one(src: str, dst: str, mode: str = "copy") -> bool:
+    """拷贝单个文件，返回 False 表示目标已是最新而跳过"""
+    st = os.stat(src)
+    if _is_up_to_date(st, dst):
+        return False
+    os.makedirs(os.path.dirname(dst), exist_ok=True)
+    if os.path.lexists(dst):
+        os.remove(dst)
+    if mode == "hardlink":
+        try:
+            os.link(src, dst)
+            return True
+        except OSError:
+            # 跨设备等情况回退为拷贝
+            pass
+    _fast_copyfile(src, dst, st.st_size)
+    shutil.copystat(src, dst)
+    return True
+
+
+def execute(files: list[tuple[str, str]], dst_root: str, mode: str = "copy", jobs: int | None = None,
+            progress=None, cancel=None) -> tuple[int, int]:
+    """在线程池中执行拷贝计划，目标为 dst_root/<相对路径>，返回 (拷贝数, 跳过数)"""
+    if mode not in COPY_MODES:
+        raise ValueError(f"不支持的拷贝方式: {mode}，可选: {', '.join(COPY_MODES)}")
+    jobs = max(1, jobs or min(32, (os.cpu_count() or 1) * 2))
+    copied = skipped = done = 0
+
+    def _task(item):
+        if cancel is not None and cancel.cancelled:
+            return None
+        src, rel = item
+        with tracing.span("mapp.copy", "mapp", path=rel) as sp:
+            ok = copy_one(src, os.path.join(dst_root, rel), mode)
+            if ok and tracing.current() is not None:
+                sp.add(files=1, bytes=os.path.getsize(src))
+        return ok
+
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        for ok in pool.map(tracing.bind(_task), files):
+            if cancel:
+                cancel.check()
+            if ok:
+                copied += 1
+            else:
+                skipped += 1
+            done += 1
+            if progress:
+                progress(done, len(files))
+    logger.info(f"mapp.txt 拷贝完成：拷贝 {copied} 个文件，跳过未变化的 {skipped} 个文件（{mode}）")
+    return copied, skipped
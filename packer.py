@@ -0,0 +1,981 @@
+"""
+打包核心逻辑（不依赖 Qt）
+
+GUI（app.py）与命令行（cli.py）共用此模块：扫描包、读写版本号、pyarmor 加密（或其他打包后端，见 backends）、
+按 mapp.txt 拷贝依赖、压缩发布包，以及多包并行发布。
+出错时抛出异常或在结果中记录错误信息，由调用方决定如何提示用户。
+"""
+import itertools
+import os
+import re
+import sys
+import shutil
+import signal
+import subprocess
+import tempfile
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from datetime import date, datetime
+from loguru import logger
+from . import tracing
+
+
+class BackendError(RuntimeError):
+    """打包后端执行失败（见 backends），returncode 为记录到 ReleaseResult 中的退出码"""
+    returncode = 1
+
+
+class PyarmorError(BackendError):
+    """pyarmor 执行失败（非 out of license 的非零退出码）"""
+
+    def __init__(self, returncode: int, out: str, err: str):
+        super().__init__(f"pyarmor 执行失败（退出码 {returncode}）：\n{err}")
+        self.returncode = returncode
+        self.out = out
+        self.err = err
+
+
+class CancelledError(RuntimeError):
+    """发布流程被用户取消"""
+
+
+# pyarmor 输出只保留最近的若干行，避免长时间运行时占用大量内存
+OUTPUT_RING_LINES = 2000
+# 指定 pyarmor 可执行文件的环境变量
+PYARMOR_EXE_ENV = "PY_APP_PACKER_PYARMOR"
+
+
+def kill_process_tree(proc: subprocess.Popen):
+    """终止子进程及其派生的全部子进程"""
+    if proc.poll() is not None:
+        return
+    try:
+        if sys.platform == "win32":
+            subprocess.run(["taskkill", "/F", "/T", "/PID", str(proc.pid)],
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        else:
+            # 子进程以新会话启动，进程组号即其 pid
+            os.killpg(proc.pid, signal.SIGKILL)
+    except (OSError, subprocess.SubprocessError) as e:
+        logger.warning(f"终止进程树失败，改为终止主进程: pid={proc.pid}, err={e}")
+        proc.kill()
+
+
+class CancelToken:
+    """跨线程取消令牌：cancel() 时终止已登记的子进程树，流程各阶段通过 check() 检查"""
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._procs: set[subprocess.Popen] = set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self):
+        self._event.set()
+        with self._lock:
+            procs = list(self._procs)
+        for proc in procs:
+            kill_process_tree(proc)
+
+    def check(self):
+        if self._event.is_set():
+            raise CancelledError("已取消")
+
+    def attach(self, proc: subprocess.Popen):
+        with self._lock:
+            self._procs.add(proc)
+        # 登记前已取消的情况
+        if self._event.is_set():
+            kill_process_tree(proc)
+
+    def detach(self, proc: subprocess.Popen):
+        with self._lock:
+            self._procs.discard(proc)
+
+
+# ---------- 包扫描 ----------
+def scan_packages(root_path: str, options=None) -> list[tuple[str, str, str]]:
+    """
+    扫描 root_path 下包含 __init__.py 的包，默认只看第一层级（排除 tests），
+    options 为 scanner.ScanOptions，可递归查找并指定排除规则
+    返回: list[tuple[str, str, str]]，每个元素为 (包名, 路径, 类型)，递归找到的包名为相对 root_path 的路径
+    类型: 'runnable' 表示可运行模块（同时有 __init__.py 和 __main__.py），'normal' 表示普通模块（只有 __init__.py）
+    """
+    from . import scanner
+    return scanner.scan_packages(root_path, options)
+
+
+# ---------- 版本号 ----------
+def version_file_path(pkg_path: str) -> str:
+    return os.path.join(pkg_path, "version.py")
+
+
+def read_version_info(version_file: str) -> tuple[str | None, str | None]:
+    """从 version.py 中读取 (__version__, __update_timestamp__)，任一不存在则为 None（不执行代码，结果有缓存）"""
+    from . import versioninfo
+    return versioninfo.read_version_info(version_file)
+
+
+def default_version() -> str:
+    today = date.today().strftime("%Y%m%d")
+    return f"0.0.1.post{today}"
+
+
+def split_version(full_version: str) -> tuple[str, str]:
+    """拆分完整版本号为 (主版本, 后缀)，如 0.1.6.post20260114 -> ('0.1.6', '20260114')"""
+    if not full_version:
+        return "", ""
+    parts = full_version.split(".post", 1)
+    base = parts[0]
+    suffix = parts[1] if len(parts) > 1 else ""
+    return base, suffix
+
+
+def write_version_file(version_file: str, full_version: str) -> str:
+    """
+    写入 version.py，包含版本号和更新时间，返回写入的时间戳字符串
+    先写同目录下的临时文件再改名替换，中途失败或被打断时原文件保持不变，不会留下写了一半的文件
+    """
+    ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    dirname = os.path.dirname(version_file) or "."
+    os.makedirs(dirname, exist_ok=True)
+    from . import versioninfo
+    fd, tmp = tempfile.mkstemp(prefix=".version.", suffix=".tmp", dir=dirname)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(f'__version__ = "{full_version}"\n')
+            f.write(f'__update_timestamp__ = "{ts}"\n')
+            f.flush()
+            os.fsync(f.fileno())
+        try:
+            # mkstemp 创建的文件权限为 0600，沿用原文件的权限
+            shutil.copymode(version_file, tmp)
+        except OSError:
+            os.chmod(tmp, 0o644)
+        os.replace(tmp, version_file)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    finally:
+        versioninfo.invalidate(version_file)
+    return ts
+
+
+def ensure_version_info(pkg_path: str) -> tuple[str | None, str | None]:
+    """
+    获取包的 (完整版本号, 更新时间)，version.py 不存在时按默认规则创建并返回；
+    version.py 存在但读不出版本号时返回 (None, 更新时间)，不修改该文件
+    """
+    version_file = version_file_path(pkg_path)
+    full_version, ts = read_version_info(version_file)
+    if full_version is not None or os.path.exists(version_file):
+        return full_version, ts
+    # 不存在时自动创建默认版本文件
+    full_version = default_version()
+    try:
+        ts = write_version_file(version_file, full_version)
+    except Exception as e:  # noqa: BLE001
+        logger.exception(f"创建默认版本文件失败: {version_file}, err={e}")
+    return full_version, ts
+
+
+def ensure_version(pkg_path: str) -> str | None:
+    """获取包的完整版本号，如不存在则按默认规则创建 version.py 并返回；读不出版本号时返回 None"""
+    return ensure_version_info(pkg_path)[0]
+
+
+BUMP_PARTS = ("major", "minor", "patch")
+# 版本号格式：三段数字的主版本号，可带 .post 后缀（如 0.1.6、0.1.6.post20260114）
+VERSION_RE = re.compile(r"(?P<base>\d+\.\d+\.\d+)(?:\.post(?P<post>\d+))?", re.ASCII)
+# 批量更新版本号的默认线程数（只读写很小的 version.py，受磁盘延迟而非 CPU 限制）
+VERSION_UPDATE_JOBS = 8
+
+
+def parse_base_version(base_version: str) -> tuple[int, int, int] | None:
+    """将 '0.1.6' 解析为 (0, 1, 6)，格式不是三段数字时返回 None"""
+    m = VERSION_RE.fullmatch(base_version.strip())
+    if m is None or m["post"] is not None:
+        return None
+    major, minor, patch = m["base"].split(".")
+    return int(major), int(minor), int(patch)
+
+
+def is_valid_version(version: str) -> bool:
+    """是否为可写入 version.py 的版本号（见 VERSION_RE）"""
+    return VERSION_RE.fullmatch(version) is not None
+
+
+def bump_base_version(base_version: str, part: str) -> str:
+    """
+    按 part（'major' / 'minor' / 'patch'）提升主版本号，如 ('0.1.6', 'minor') -> '0.2.0'
+    格式无法识别时从 0.0.0 开始提升；part 未知时抛出 ValueError
+    """
+    if part not in BUMP_PARTS:
+        raise ValueError(f"未知的版本号提升方式：{part}（可选：{', '.join(BUMP_PARTS)}）")
+    major, minor, patch = parse_base_version(base_version) or (0, 0, 0)
+    if part == "major":
+        return f"{major + 1}.0.0"
+    if part == "minor":
+        return f"{major}.{minor + 1}.0"
+    return f"{major}.{minor}.{patch + 1}"
+
+
+def post_version(base_version: str) -> str:
+    """主版本号加上当天的 .post 后缀，如 0.1.6 -> 0.1.6.post20260114"""
+    return f"{base_version}.post{date.today().strftime('%Y%m%d')}"
+
+
+@dataclass
+class VersionUpdate:
+    """一个包的版本号更新结果"""
+    pkg_path: str
+    old_version: str | None = None
+    new_version: str = ""
+    timestamp: str | None = None
+    error: str = ""
+
+    @property
+    def ok(self) -> bool:
+        return not self.error
+
+
+def update_version(pkg_path: str, part: str | None = None, version: str | None = None,
+                   dry_run: bool = False) -> VersionUpdate:
+    """
+    更新一个包的 version.py：part 为 'major' / 'minor' / 'patch' 时在当前主版本号上提升，
+    否则设为 version（不带 .post 时加上当天的 .post 后缀）；没有 version.py 时以默认版本为当前版本，
+    version.py 存在但读不出版本号（非字面量）时不覆盖，记为失败。
+    dry_run 为真时只计算新版本号，不写入。出错时记录在 VersionUpdate.error 中，不抛出异常
+    """
+    result = VersionUpdate(pkg_path=pkg_path)
+    version_file = version_file_path(pkg_path)
+    old_version, _ = read_version_info(version_file)
+    result.old_version = old_version
+    try:
+        if old_version is None and os.path.exists(version_file):
+            raise ValueError("无法读取当前版本号（__version__ 不是字面量），为避免覆盖未修改 version.py")
+        if part:
+            base, _ = split_version(old_version or default_version())
+            if parse_base_version(base) is None:
+                raise ValueError(f"当前版本号格式无法识别：{old_version}")
+            new_base = bump_base_version(base, part)
+        else:
+            new_base = (version or "").strip()
+            if not is_valid_version(new_base):
+                raise ValueError(f"版本号格式无效：{version!r}（应为 X.Y.Z 或 X.Y.Z.postN）")
+        result.new_version = new_base if ".post" in new_base else post_version(new_base)
+        if not dry_run:
+            result.timestamp = write_version_file(version_file, result.new_version)
+    except Exception as e:  # noqa: BLE001
+        result.error = f"{type(e).__name__}: {e}"
+        logger.error(f"更新版本号失败: {pkg_path}, err={e}")
+    return result
+
+
+def update_versions(pkg_paths: list[str], part: str | None = None, version: str | None = None,
+                    jobs: int | None = None, dry_run: bool = False, on_done=None,
+                    cancel: CancelToken | None = None) -> list[VersionUpdate]:
+    """
+    批量更新多个包的版本号（参数同 update_version），在线程池中并行读写
+    on_done: 可选回调，每完成一个包调用一次 on_done(VersionUpdate)；返回结果顺序与 pkg_paths 一致
+    各包互不影响，某个包失败不会中止其他包；取消时已提交的写入完成后抛出 CancelledError
+    """
+    if part is None and not version:
+        raise ValueError("需要指定版本号提升方式或版本号")
+    if part is None and not is_valid_version(version.strip()):
+        raise ValueError(f"版本号格式无效：{version!r}（应为 X.Y.Z 或 X.Y.Z.postN）")
+    if part is not None and part not in BUMP_PARTS:
+        raise ValueError(f"未知的版本号提升方式：{part}（可选：{', '.join(BUMP_PARTS)}）")
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+    results: dict[str, VersionUpdate] = {}
+    with tracing.span("version.update", packages=len(pkg_paths)):
+        with ThreadPoolExecutor(max_workers=max(1, min(jobs or VERSION_UPDATE_JOBS, len(pkg_paths) or 1))) as pool:
+            futures = {pool.submit(update_version, path, part, version, dry_run): path for path in pkg_paths}
+            try:
+                for fut in as_completed(futures):
+                    results[futures[fut]] = fut.result()
+                    if on_done:
+                        on_done(results[futures[fut]])
+                    if cancel:
+                        cancel.check()
+            except CancelledError:
+                pool.shutdown(wait=True, cancel_futures=True)
+                raise
+    return [results[path] for path in pkg_paths]
+
+
+# ---------- 发布（pyarmor + 依赖拷贝） ----------
+def get_pyarmor_exe() -> str:
+    """获取 pyarmor 可执行文件的绝对路径（环境变量 PY_APP_PACKER_PYARMOR 可指定，基准测试用它替换为桩）"""
+    override = os.environ.get(PYARMOR_EXE_ENV)
+    if override:
+        return override
+    pyarmor_exe = "pyarmor.exe" if sys.platform == "win32" else "pyarmor"
+    # 优先从 Python 环境的 Scripts 目录找（uv/venv 环境）
+    scripts_dir = os.path.join(sys.prefix, "Scripts")
+    local_pyarmor = os.path.join(scripts_dir, pyarmor_exe)
+    if os.path.exists(local_pyarmor):
+        return local_pyarmor
+    # 其次找系统 PATH 中的 pyarmor
+    pyarmor_path = shutil.which(pyarmor_exe)
+    if pyarmor_path:
+        return pyarmor_path
+    raise FileNotFoundError("未找到 pyarmor 可执行文件，请确认已安装：uv add pyarmor")
+
+
+def make_output_root(root_path: str, pkg_name: str, ts: str | None = None, claim: bool = False) -> str:
+    """
+    计算发布目录：<root_path 的上级>/dist/dist_<包名>_<时间>
+    等价于 OUTPUT=dist/dist_${TARGET}_`date "+%Y-%m-%d-%H.%M.%S"`
+    claim 为真时创建该目录以占用名称：同一秒内已有同名发布（目录或压缩包等）时在时间后加 -2、-3……，
+    并行发布（线程或进程）同一个包时各自得到不同的目录
+    """
+    ts = ts or datetime.now().strftime("%Y-%m-%d-%H.%M.%S")
+    repo_root = os.path.dirname(os.path.abspath(root_path))
+    dist_dir = os.path.join(repo_root, "dist")
+    base = os.path.join(dist_dir, f"dist_{pkg_name}_{ts}")
+    if not claim:
+        return base
+    os.makedirs(dist_dir, exist_ok=True)
+    for seq in itertools.count(1):
+        output_root = base if seq == 1 else f"{base}-{seq}"
+        prefix = f"{os.path.basename(output_root)}."
+        # 直接发布为压缩包的旧发布没有目录，只有 <发布目录>.<格式> 等文件
+        if any(name.startswith(prefix) for name in os.listdir(dist_dir)):
+            continue
+        try:
+            os.mkdir(output_root)
+        except FileExistsError:
+            continue
+        return output_root
+
+
+def _remove_if_empty(path: str) -> bool:
+    """删除 make_output_root(claim=True) 占用后仍为空的发布目录，返回是否已删除"""
+    try:
+        os.rmdir(path)
+    except OSError:
+        return False
+    return True
+
+
+def pyarmor_cmd(pkg_full_name: str, output_root: str, silent: bool = True) -> list[str]:
+    """
+    构造 pyarmor 命令行，等价于：
+    pyarmor --silent gen -O ${OUTPUT} -r -i projects/${TARGET}
+    """
+    cmd = [get_pyarmor_exe(), "gen", "-O", output_root, "-r", "-i", pkg_full_name]
+    if silent:
+        cmd.insert(1, "--silent")
+    return cmd
+
+
+def pyarmor_batch_cmd(pkg_full_names: list[str], output_root: str, silent: bool = True) -> list[str]:
+    """
+    批量加密的命令行：多个包一次 pyarmor gen，不带 -i，
+    运行时只在输出目录顶层生成一份 pyarmor_runtime_*，各包共用
+    """
+    cmd = [get_pyarmor_exe(), "gen", "-O", output_root, "-r", *pkg_full_names]
+    if silent:
+        cmd.insert(1, "--silent")
+    return cmd
+
+
+def check_pyarmor_result(returncode: int, out: str, err: str):
+    """检查 pyarmor 退出码，允许 out of license 错误继续后续流程，否则抛出 PyarmorError"""
+    if returncode == 0:
+        logger.info(f"pyarmor 执行成功。\nstdout:\n{out}")
+        return
+    combined = (out + "\n" + err).lower()
+    if "out of license" in combined:
+        logger.warning(
+            f"pyarmor 返回码 {returncode}，但检测到 'out of license'，按脚本约定忽略。\n"
+            f"stdout:\n{out}\nstderr:\n{err}"
+        )
+        return
+    logger.error(f"pyarmor 执行失败: 返回码 {returncode}\nstdout:\n{out}\nstderr:\n{err}")
+    raise PyarmorError(returncode, out, err)
+
+
+def run_pyarmor(pkg_full_name: str, output_root: str, cwd: str,
+                silent: bool = True, timeout: float = 300,
+                on_line=None, cancel: CancelToken | None = None) -> int:
+    """
+    对 pkg_full_name 执行 pyarmor gen，输出到 output_root，返回 pyarmor 退出码
+    输出逐行读取（stderr 合并到 stdout）：on_line(line) 为每行回调，默认写入日志；
+    只保留最近 OUTPUT_RING_LINES 行用于出错提示。超时或取消时终止整个进程树。
+    """
+    return _run_pyarmor_cmd(pyarmor_cmd(pkg_full_name, output_root, silent), os.path.basename(pkg_full_name),
+                            output_root, cwd, timeout, on_line, cancel)
+
+
+def run_pyarmor_batch(pkg_full_names: list[str], output_root: str, cwd: str,
+                      silent: bool = True, timeout: float = 300,
+                      on_line=None, cancel: CancelToken | None = None) -> int:
+    """对多个包执行一次 pyarmor gen（共用一份运行时，见 pyarmor_batch_cmd），其余同 run_pyarmor"""
+    label = ",".join(os.path.basename(p) for p in pkg_full_names)
+    return _run_pyarmor_cmd(pyarmor_batch_cmd(pkg_full_names, output_root, silent), label,
+                            output_root, cwd, timeout, on_line, cancel)
+
+
+def _run_pyarmor_cmd(cmd: list[str], label: str, output_root: str, cwd: str, timeout: float,
+                     on_line, cancel: CancelToken | None) -> int:
+    os.makedirs(output_root, exist_ok=True)
+    logger.info(f"运行命令: {' '.join(cmd)}  (cwd={cwd})")
+    if cancel:
+        cancel.check()
+    popen_kwargs = {}
+    if sys.platform == "win32":
+        popen_kwargs["creationflags"] = subprocess.CREATE_NEW_PROCESS_GROUP
+    else:
+        popen_kwargs["start_new_session"] = True
+    with tracing.span("pyarmor.spawn", "pyarmor"):
+        proc = subprocess.Popen(
+            cmd,
+            cwd=cwd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            errors="replace",
+            bufsize=1,
+            shell=False,  # Windows 下必须为 False
+            **popen_kwargs,
+        )
+    timed_out = threading.Event()
+
+    def _on_timeout():
+        timed_out.set()
+        kill_process_tree(proc)
+
+    watchdog = threading.Timer(timeout, _on_timeout)
+    watchdog.daemon = True
+    watchdog.start()
+    if cancel:
+        cancel.attach(proc)
+    ring: deque[str] = deque(maxlen=OUTPUT_RING_LINES)
+    run_span = tracing.span("pyarmor.run", "pyarmor", package=label)
+    try:
+        with run_span:
+            assert proc.stdout is not None
+            for line in proc.stdout:
+                line = line.rstrip("\r\n")
+                ring.append(line)
+                run_span.add(lines=1)
+                if on_line:
+                    on_line(line)
+                else:
+                    logger.info(f"[pyarmor] {line}")
+            proc.wait()
+            run_span.set(returncode=proc.returncode)
+    finally:
+        watchdog.cancel()
+        if cancel:
+            cancel.detach(proc)
+        if proc.poll() is None:
+            kill_process_tree(proc)
+            proc.wait()
+
+    if cancel and cancel.cancelled:
+        raise CancelledError(f"已取消 pyarmor: {label}")
+    if timed_out.is_set():
+        raise subprocess.TimeoutExpired(cmd, timeout)
+    tail = "\n".join(ring)
+    check_pyarmor_result(proc.returncode, "", tail)
+    return proc.returncode
+
+
+def encrypt_package(pkg_full_name: str, output_root: str, cwd: str, silent: bool = True,
+                    timeout: float = 300, use_cache: bool = True, cache_dir: str | None = None,
+                    on_line=None, cancel: CancelToken | None = None,
+                    prune: bool = False, report_path: str | None = None, shards: int | None = 1,
+                    backend=None):
+    """
+    加密模块：启用构建缓存时只对改动的文件执行 pyarmor，否则整包执行 pyarmor gen
+    prune 为真时只加密从 __init__.py/__main__.py 可达的模块及 mapp.txt 中列出的 .py 文件（见 importgraph），
+    未加密的模块写入 report_path 指定的报告
+    shards 不为 1 时待加密文件较多的包分片并行执行 pyarmor（0 为按 CPU 核数，见 buildcache.shard_count）
+    backend 为打包后端名称或实例（见 backends），默认 pyarmor；pyc 后端只编译为 .pyc，忽略缓存与分片
+    """
+    from . import backends, buildcache
+    backend = backends.get_backend(backend)
+    with tracing.span("encrypt", package=os.path.basename(pkg_full_name), backend=backend.name) as sp:
+        backend.prepare()
+        sources = None
+        if prune:
+            from . import importgraph
+            with tracing.span("prune"):
+                sources = importgraph.prune_sources(pkg_full_name, buildcache.list_sources(pkg_full_name),
+                                                   report_path)
+            sp.set(files=len(sources))
+        backend.transform(pkg_full_name, output_root, cwd, silent, timeout, use_cache, cache_dir,
+                          on_line=on_line, cancel=cancel, sources=sources, shards=shards)
+        backend.finalize(output_root, [pkg_full_name])
+
+
+def encrypt_batch(pkg_full_names: list[str], output_root: str, cwd: str, silent: bool = True,
+                  timeout: float = 300, use_cache: bool = True, cache_dir: str | None = None,
+                  on_line=None, cancel: CancelToken | None = None, prune: bool = False, backend=None):
+    """
+    批量加密多个包到同一个 output_root，只启动一次 pyarmor，顶层共用一份运行时（见 buildcache.batch_gen）
+    prune 为真时每个包的裁剪报告写入 <output_root>.<包名>.pruned.txt；backend 同 encrypt_package
+    """
+    from . import backends, buildcache
+    backend = backends.get_backend(backend)
+    with tracing.span("encrypt", packages=len(pkg_full_names), backend=backend.name):
+        backend.prepare()
+        sources = None
+        if prune:
+            from . import importgraph
+            with tracing.span("prune"):
+                sources = {
+                    pkg: importgraph.prune_sources(
+                        pkg, buildcache.list_sources(pkg),
+                        prune_report_path(f"{output_root}.{os.path.basename(os.path.abspath(pkg))}"))
+                    for pkg in pkg_full_names
+                }
+        backend.transform_batch(pkg_full_names, output_root, cwd, silent, timeout, use_cache, cache_dir,
+                                on_line=on_line, cancel=cancel, sources=sources)
+        backend.finalize(output_root, pkg_full_names)
+
+
+def prune_report_path(output_root: str) -> str:
+    """可达性裁剪报告：发布目录同级的 <发布目录名>.pruned.txt（随发布一起被 gc 清理）"""
+    return f"{os.path.abspath(output_root)}.pruned.txt"
+
+
+def copy_mapp(pkg_full_name: str, output_root: str, progress=None, cancel: CancelToken | None = None,
+              mode: str = "copy", jobs: int | None = None) -> int:
+    """
+    拷贝映射文件 mapp.txt 指定的内容（例如：bgtask/common、appcfg.yaml、assets/**/*.onnx 等）
+    到 ${OUTPUT}/${pkg_name}/ 下，返回拷贝的文件数（未变化而跳过的不计）
+    mode: 'copy'（reflink/copy_file_range）或 'hardlink'；progress(done, total) 为可选的进度回调
+    """
+    from . import manifest
+    with tracing.span("mapp", package=os.path.basename(pkg_full_name)) as sp:
+        files = manifest.resolve(pkg_full_name)
+        if files is None:
+            logger.warning(f"未找到 mapp.txt 映射文件：{os.path.join(pkg_full_name, 'mapp.txt')}")
+            return 0
+        dst_root = os.path.join(output_root, os.path.basename(pkg_full_name))
+        copied, skipped = manifest.execute(files, dst_root, mode, jobs, progress, cancel)
+        sp.set(copied=copied, skipped=skipped)
+    return copied
+
+
+def mapp_files(pkg_full_name: str) -> list[tuple[str, str]]:
+    """
+    按 mapp.txt 解析出的文件 [(源文件路径, 发布目录内相对路径)]，
+    发布目录内相对路径形如 '<包名>/bgtask/common/x.py'，使用 '/' 分隔
+    """
+    from . import manifest
+    pkg_name = os.path.basename(pkg_full_name)
+    return [(src, f"{pkg_name}/{rel}") for src, rel in manifest.resolve(pkg_full_name) or []]
+
+
+def scratch_root(preferred: str | None = None) -> str | None:
+    """
+    临时工作目录：优先使用 preferred，其次 Linux 下的 tmpfs（/dev/shm），
+    都不可用时返回 None（即系统默认临时目录）
+    """
+    for d in (preferred, "/dev/shm"):
+        if d and os.path.isdir(d) and os.access(d, os.W_OK):
+            return d
+    return None
+
+
+# ---------- 压缩发布包 ----------
+def zip_path_for(output_root: str) -> str:
+    """zip 文件放在发布目录同级（dist 目录）下，名称类似 dist_TARGET_时间.zip"""
+    from . import archive
+    return archive.archive_path_for(output_root, "zip")
+
+
+def _archive_files(files: list[tuple[str, str]], archive_path: str, digests: dict[str, str] | None,
+                   fmt: str, level: int | None, jobs: int | None, progress, cancel):
+    """digests 不为空时按输入内容复用已有压缩包（见 archive.make_archive_reusing），否则全部重新压缩"""
+    from . import archive, store
+    level = archive.DEFAULT_LEVEL if level is None else level
+    if digests is None:
+        archive.make_archive_from(files, archive_path, fmt, level, jobs, progress, cancel)
+        return
+    dist_dir = os.path.dirname(os.path.abspath(archive_path))
+    m = store.RELEASE_RE.match(os.path.basename(archive_path))
+    archive.make_archive_reusing(files, archive_path, digests, store.archive_cache_dir(dist_dir),
+                                 m["pkg"] if m else "", fmt, level, jobs, progress, cancel)
+
+
+def archive_dir(output_root: str, archive_path: str | None = None, delete_src: bool = False,
+                fmt: str = "zip", level: int | None = None, jobs: int | None = None,
+                progress=None, cancel: CancelToken | None = None, reuse: bool = True) -> str:
+    """
+    将发布目录压缩为 zip / tar.xz / tar.zst，返回压缩包路径；delete_src 为真时压缩成功后删除源目录
+    progress(done, total) 为可选的进度回调（按文件数）；取消时删除未完成的压缩包
+    reuse 为真时按发布清单复用内容相同的已有压缩包，或从上一次的压缩包中拷贝未变条目
+    """
+    from . import archive, delta
+    if not os.path.isdir(output_root):
+        raise FileNotFoundError(f"发布目录不存在，无法压缩：{output_root}")
+    archive_path = archive_path or archive.archive_path_for(output_root, fmt)
+    os.makedirs(os.path.dirname(archive_path), exist_ok=True)
+
+    # 如果已存在同名压缩包，先删除
+    if os.path.exists(archive_path):
+        os.remove(archive_path)
+
+    logger.info(f"压缩目录：{output_root}")
+    files = archive.list_files(output_root)
+    digests = manifest_digests(delta.current_manifest(output_root)) if reuse else None
+    _archive_files(files, archive_path, digests, fmt, level, jobs, progress, cancel)
+
+    if delete_src:
+        logger.info(f"压缩完成后删除源目录：{output_root}")
+        with tracing.span("rmtree", path=output_root):
+            shutil.rmtree(output_root, ignore_errors=False)
+    return archive_path
+
+
+def zip_dir(output_root: str, zip_path: str | None = None, delete_src: bool = False,
+            progress=None, cancel: CancelToken | None = None, **kwargs) -> str:
+    """将发布目录压缩为 zip 文件，见 archive_dir"""
+    return archive_dir(output_root, zip_path, delete_src, "zip",
+                       progress=progress, cancel=cancel, **kwargs)
+
+
+def release_to_archive(pkg_full_name: str, archive_path: str, cwd: str, silent: bool = True,
+                       timeout: float = 300, use_cache: bool = True, fmt: str = "zip",
+                       level: int | None = None, jobs: int | None = None, scratch_dir: str | None = None,
+                       on_line=None, stage=None, cancel: CancelToken | None = None,
+                       prune: bool = False, shards: int | None = 1, reuse: bool = True, backend=None) -> str:
+    """
+    直接发布为压缩包，不生成中间的 dist_<包名>_<时间> 目录：
+    pyarmor 输出写入临时目录（优先 tmpfs），mapp.txt 指定的内容从源路径直接写入压缩包。
+    stage(name) 为可选的阶段回调，返回该阶段的进度回调 progress(done, total)
+    reuse 见 archive_dir，backend 见 encrypt_package
+    """
+    from . import archive, buildcache
+    scratch = tempfile.mkdtemp(prefix="pyarmor_out_", dir=scratch_root(scratch_dir))
+    try:
+        if stage:
+            stage("加密")
+        # 构建缓存仍放在压缩包所在的 dist 目录下，而不是临时目录中
+        cache_dir = buildcache.default_cache_dir(archive_path)
+        # 裁剪报告写在压缩包旁（去掉扩展名后的同名 .pruned.txt）
+        base = archive_path[:-len(fmt) - 1] if archive_path.endswith(f".{fmt}") else archive_path
+        report_path = prune_report_path(base) if prune else None
+        encrypt_package(pkg_full_name, scratch, cwd, silent, timeout, use_cache, cache_dir,
+                        on_line=on_line, cancel=cancel, prune=prune, report_path=report_path, shards=shards,
+                        backend=backend)
+        # 与拷贝到发布目录时一致：mapp.txt 中的内容覆盖同名的加密输出
+        entries = dict((arcname, fpath) for fpath, arcname in archive.list_files(scratch))
+        for fpath, arcname in mapp_files(pkg_full_name):
+            entries[arcname] = fpath
+        files = [(fpath, arcname) for arcname, fpath in entries.items()]
+
+        # 清单放在压缩包旁，临时目录删除前计算；复用压缩包时也以清单中的哈希为输入
+        if stage:
+            stage("清单")
+        manifest = write_release_manifest(base, files)
+
+        os.makedirs(os.path.dirname(archive_path), exist_ok=True)
+        if os.path.exists(archive_path):
+            os.remove(archive_path)
+        _archive_files(files, archive_path, manifest_digests(manifest) if reuse else None, fmt, level, jobs,
+                       stage("压缩") if stage else None, cancel)
+    finally:
+        with tracing.span("rmtree", path=scratch):
+            shutil.rmtree(scratch, ignore_errors=True)
+    return archive_path
+
+
+# ---------- 发布清单 ----------
+def write_release_manifest(output_root: str, files: list[tuple[str, str]] | None = None) -> dict | None:
+    """
+    写出 <发布目录>.manifest.json（各文件的路径、大小和 SHA-256，见 delta.write_manifest），
+    失败只记录日志，返回清单内容或 None
+    """
+    from . import delta
+    try:
+        return delta.write_manifest(output_root, files)
+    except Exception as e:  # noqa: BLE001
+        logger.exception(f"写入发布清单失败: {output_root}, err={e}")
+        return None
+
+
+def manifest_digests(manifest: dict | None) -> dict[str, str] | None:
+    """发布清单 -> {相对路径: SHA-256}，供 store_release 复用"""
+    if not manifest:
+        return None
+    return {rel: e["sha256"] for rel, e in manifest["files"].items()}
+
+
+# ---------- 去重存储 ----------
+def store_release(output_root: str, mode: str = "hardlink", jobs: int | None = None,
+                  digests: dict[str, str] | None = None):
+    """把发布目录收入 dist/.store 去重，失败只记录日志，不影响发布结果"""
+    from . import delta, store
+    try:
+        store.ingest(output_root, mode=mode, jobs=jobs, digests=digests)
+    except Exception as e:  # noqa: BLE001
+        logger.exception(f"发布目录去重失败（发布目录保持原样）: {output_root}, err={e}")
+        return
+    if digests is not None:
+        # 文件被替换为内容相同的 blob 后 mtime 改变，同步到清单中，之后复用清单时不必重新计算哈希
+        try:
+            delta.restat_manifest(output_root)
+        except (OSError, ValueError) as e:
+            logger.warning(f"更新发布清单的 mtime 失败: {output_root}, err={e}")
+
+
+# ---------- 单文件 .pyz ----------
+def build_pyz(output_root: str, pkg_full_name: str, compressed: bool = False, optimize: int = 1,
+              progress=None, cancel: CancelToken | None = None) -> str:
+    """
+    可运行包的发布目录打包为 <发布目录>.pyz（见 pyz.make_pyz），按源码中的导入顺序排列条目，返回 .pyz 路径
+    不是可运行包（没有 __main__.py）时只记录警告并返回空字符串
+    """
+    from . import pyz
+    pkg_name = os.path.basename(pkg_full_name)
+    if not os.path.isfile(os.path.join(pkg_full_name, "__main__.py")):
+        logger.warning(f"{pkg_name} 不是可运行包（缺少 __main__.py），不生成 .pyz")
+        return ""
+    return pyz.make_pyz(output_root, pkg_name, source_pkg=pkg_full_name, compressed=compressed,
+                        optimize=optimize, progress=progress, cancel=cancel)
+
+
+# ---------- 完整发布流程 ----------
+@dataclass
+class ReleaseResult:
+    """单个包的发布结果；returncode 为 0 表示成功"""
+    pkg_name: str
+    output_root: str = ""
+    zip_path: str = ""
+    pyz_path: str = ""
+    returncode: int = 0
+    elapsed: float = 0.0
+    error: str = ""
+
+    @property
+    def ok(self) -> bool:
+        return self.returncode == 0
+
+
+def release_package(root_path: str, pkg_name: str, silent: bool = True,
+                    do_zip: bool = False, delete_src: bool = False,
+                    timeout: float = 300, use_cache: bool = True,
+                    archive_format: str = "zip", archive_level: int | None = None,
+                    archive_jobs: int | None = None, stream: bool = False,
+                    scratch_dir: str | None = None, mapp_mode: str = "copy",
+                    store_mode: str | None = None, prune: bool = False,
+                    trace: bool = False, shards: int | None = 1, archive_reuse: bool = True,
+                    on_line=None, stage=None, cancel: CancelToken | None = None, backend=None,
+                    pyz: bool = False, pyz_compress: bool = False, pyz_optimize: int = 1) -> ReleaseResult:
+    """
+    对单个包执行完整发布流程：pyarmor 加密 -> 拷贝 mapp.txt 内容 -> 写出发布清单 -> （可选）收入内容寻址存储 -> （可选）压缩
+    stream 为真时直接发布为压缩包（见 release_to_archive），不保留发布目录
+    store_mode 为 hardlink / reflink 时发布目录去重到 dist/.store（见 store.ingest），为空则不去重
+    prune 为真时只加密可达模块，shards 不为 1 时大包分片并行加密（见 encrypt_package）
+    archive_reuse 为真时压缩可复用内容相同的已有压缩包（见 archive_dir）
+    backend 为打包后端名称或实例（pyarmor / pyc，见 backends），默认 pyarmor
+    pyz 为真时可运行包另外打包为单文件 <发布目录>.pyz（见 build_pyz），直接发布为压缩包时不支持
+    trace 为真时记录各阶段耗时，写出 dist_<包名>_<时间>.trace.json / .summary.json（见 tracing）
+    on_line / stage / cancel 为可选的 pyarmor 输出、阶段回调和取消令牌（同 release_batch）
+    除取消（CancelledError）外不抛出异常，错误记录在 ReleaseResult 中
+    """
+    t0 = time.perf_counter()
+    result = ReleaseResult(pkg_name=pkg_name)
+    root_path = os.path.abspath(root_path)
+    pkg_full_name = os.path.normpath(os.path.join(root_path, pkg_name))
+    repo_root = os.path.dirname(root_path)
+    if not os.path.isfile(os.path.join(pkg_full_name, "__init__.py")):
+        result.returncode = 1
+        result.error = f"不是有效的包（缺少 __init__.py）：{pkg_full_name}"
+        logger.error(result.error)
+        return result
+    trace_base = ""
+    finished = False
+    with tracing.session(trace) as tracer:
+        with tracing.span("release", package=pkg_name):
+            try:
+                # 递归扫描得到的包名可能带有子路径，发布目录只用末级包名
+                trace_base = make_output_root(root_path, os.path.basename(pkg_full_name), claim=True)
+                result.output_root = trace_base
+                if stream:
+                    from . import archive
+                    result.zip_path = archive.archive_path_for(result.output_root, archive_format)
+                    result.output_root = ""
+                    logger.info(f"加密模块 {pkg_name} 并直接压缩到 {result.zip_path}")
+                    if pyz:
+                        logger.warning("直接发布为压缩包时不生成 .pyz")
+                    release_to_archive(pkg_full_name, result.zip_path, repo_root, silent, timeout, use_cache,
+                                       archive_format, archive_level, archive_jobs, scratch_dir, on_line=on_line,
+                                       stage=stage, cancel=cancel, prune=prune, shards=shards, reuse=archive_reuse,
+                                       backend=backend)
+                else:
+                    logger.info(f"加密模块 {pkg_name} 到输出目录 {result.output_root}")
+                    if stage:
+                        stage("加密")
+                    encrypt_package(pkg_full_name, result.output_root, repo_root, silent, timeout, use_cache,
+                                    on_line=on_line, cancel=cancel, prune=prune,
+                                    report_path=prune_report_path(result.output_root), shards=shards,
+                                    backend=backend)
+                    try:
+                        copy_mapp(pkg_full_name, result.output_root, mode=mapp_mode, cancel=cancel,
+                                  progress=stage("拷贝") if stage else None)
+                    except CancelledError:
+                        raise
+                    except Exception as e:  # noqa: BLE001
+                        logger.exception(f"拷贝映射文件指定的内容失败: target={pkg_name}, err={e}")
+                    if stage:
+                        stage("清单")
+                    manifest = write_release_manifest(result.output_root)
+                    if store_mode and not (do_zip and delete_src):
+                        if stage:
+                            stage("去重")
+                        store_release(result.output_root, store_mode, digests=manifest_digests(manifest))
+                    if pyz:
+                        result.pyz_path = build_pyz(result.output_root, pkg_full_name, pyz_compress, pyz_optimize,
+                                                    progress=stage(".pyz") if stage else None, cancel=cancel)
+                    if do_zip:
+                        result.zip_path = archive_dir(result.output_root, delete_src=delete_src,
+                                                      fmt=archive_format, level=archive_level, jobs=archive_jobs,
+                                                      progress=stage("压缩") if stage else None, cancel=cancel,
+                                                      reuse=archive_reuse)
+                finished = True
+            except CancelledError:
+                raise
+            except BackendError as e:
+                result.returncode = e.returncode
+                result.error = str(e)
+            except Exception as e:  # noqa: BLE001
+                logger.exception(f"发布失败: pkg_name={pkg_name}, err={e}")
+                result.returncode = 1
+                result.error = f"{type(e).__name__}: {e}"
+            finally:
+                # 直接发布为压缩包时占位的空目录不再需要（压缩包本身占用了这个名称）；
+                # 失败或取消时占用的目录如果仍为空也删除，不留下空的发布目录
+                if trace_base and (stream or not finished) and _remove_if_empty(trace_base):
+                    if result.output_root == trace_base:
+                        result.output_root = ""
+        if tracer is not None and trace_base:
+            tracer.write(trace_base)
+    result.elapsed = time.perf_counter() - t0
+    return result
+
+
+def release_many(root_path: str, pkg_names: list[str], jobs: int | None = None,
+                 on_done=None, **kwargs) -> list[ReleaseResult]:
+    """
+    在进程池中并行发布多个包，并发数不超过 CPU 核数
+    on_done: 可选回调，每完成一个包调用一次 on_done(ReleaseResult)
+    返回结果顺序与 pkg_names 一致
+    """
+    cpu = os.cpu_count() or 1
+    jobs = max(1, min(jobs or cpu, cpu, len(pkg_names) or 1))
+    # 多个包并行时平分压缩线程，避免与进程池争抢 CPU
+    kwargs.setdefault("archive_jobs", max(1, cpu // jobs))
+    # 分片加密同理：自动分片（0）时每个进程只分到 CPU 核数 / 并行数 片
+    if kwargs.get("shards") == 0 and jobs > 1:
+        kwargs["shards"] = max(1, cpu // jobs)
+    results: dict[str, ReleaseResult] = {}
+    if jobs == 1:
+        for name in pkg_names:
+            results[name] = release_package(root_path, name, **kwargs)
+            if on_done:
+                on_done(results[name])
+    else:
+        # 进程池会加载 multiprocessing，只在并行发布时导入
+        from concurrent.futures import ProcessPoolExecutor, as_completed
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            futures = {pool.submit(release_package, root_path, name, **kwargs): name
+                       for name in pkg_names}
+            for fut in as_completed(futures):
+                name = futures[fut]
+                try:
+                    results[name] = fut.result()
+                except Exception as e:  # noqa: BLE001
+                    results[name] = ReleaseResult(pkg_name=name, returncode=1,
+                                                  error=f"{type(e).__name__}: {e}")
+                if on_done:
+                    on_done(results[name])
+    return [results[name] for name in pkg_names]
+
+
+def release_batch(root_path: str, pkg_names: list[str], bundle_name: str = "bundle", silent: bool = True,
+                  do_zip: bool = False, delete_src: bool = False, timeout: float = 300,
+                  use_cache: bool = True, archive_format: str = "zip", archive_level: int | None = None,
+                  archive_jobs: int | None = None, mapp_mode: str = "copy", store_mode: str | None = None,
+                  prune: bool = False, trace: bool = False, archive_reuse: bool = True, on_line=None, stage=None,
+                  cancel: CancelToken | None = None, backend=None) -> ReleaseResult:
+    """
+    把多个包合并为一个发布：dist/dist_<bundle_name>_<时间>/ 下为各包的加密输出和 mapp.txt 内容，
+    只调用一次 pyarmor，顶层共用一份 pyarmor_runtime_*（运行时需把发布目录加入 sys.path）。
+    其余参数同 release_package；stage(name) 为可选的阶段回调。除取消（CancelledError）外不抛出异常，错误记录在 ReleaseResult 中
+    """
+    t0 = time.perf_counter()
+    result = ReleaseResult(pkg_name=bundle_name)
+    root_path = os.path.abspath(root_path)
+    repo_root = os.path.dirname(root_path)
+    pkg_full_names = [os.path.normpath(os.path.join(root_path, name)) for name in pkg_names]
+    invalid = [p for p in pkg_full_names if not os.path.isfile(os.path.join(p, "__init__.py"))]
+    if invalid:
+        result.returncode = 1
+        result.error = f"不是有效的包（缺少 __init__.py）：{', '.join(invalid)}"
+        logger.error(result.error)
+        return result
+    finished = False
+    with tracing.session(trace) as tracer:
+        with tracing.span("release", package=bundle_name, packages=len(pkg_names)):
+            try:
+                result.output_root = make_output_root(root_path, bundle_name, claim=True)
+                logger.info(f"批量加密 {len(pkg_names)} 个包到输出目录 {result.output_root}")
+                if stage:
+                    stage("加密")
+                # 一次 pyarmor 处理全部包，超时按包数累加
+                encrypt_batch(pkg_full_names, result.output_root, repo_root, silent, timeout * len(pkg_full_names),
+                              use_cache, on_line=on_line, cancel=cancel, prune=prune, backend=backend)
+                for i, pkg_full_name in enumerate(pkg_full_names, 1):
+                    label = f"拷贝 {os.path.basename(pkg_full_name)}（{i}/{len(pkg_full_names)}）"
+                    try:
+                        copy_mapp(pkg_full_name, result.output_root, mode=mapp_mode, cancel=cancel,
+                                  progress=stage(label) if stage else None)
+                    except CancelledError:
+                        raise
+                    except Exception as e:  # noqa: BLE001
+                        logger.exception(f"拷贝映射文件指定的内容失败: target={pkg_full_name}, err={e}")
+                if stage:
+                    stage("清单")
+                manifest = write_release_manifest(result.output_root)
+                if store_mode and not (do_zip and delete_src):
+                    if stage:
+                        stage("去重")
+                    store_release(result.output_root, store_mode, digests=manifest_digests(manifest))
+                if do_zip:
+                    result.zip_path = archive_dir(result.output_root, delete_src=delete_src, fmt=archive_format,
+                                                  level=archive_level, jobs=archive_jobs,
+                                                  progress=stage("压缩") if stage else None, cancel=cancel,
+                                                  reuse=archive_reuse)
+                finished = True
+            except CancelledError:
+                raise
+            except BackendError as e:
+                result.returncode = e.returncode
+                result.error = str(e)
+            except Exception as e:  # noqa: BLE001
+                logger.exception(f"批量发布失败: bundle={bundle_name}, err={e}")
+                result.returncode = 1
+                result.error = f"{type(e).__name__}: {e}"
+            finally:
+                # 失败或取消时占用的目录如果仍为空则删除
+                trace_base = result.output_root
+                if trace_base and not finished and _remove_if_empty(trace_base):
+                    result.output_root = ""
+        if tracer is not None and trace_base:
+            tracer.write(trace_base)
+    result.elapsed = time.perf_counter() - t0
+    return result
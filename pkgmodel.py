@@ -0,0 +1,241 @@
+"""
+模块列表的数据模型
+
+- PackageTableModel：以扫描结果行 (包名, 路径, 类型, 版本号, 更新时间) 的列表为底层数据，
+  按路径建立索引，重新扫描时按差异增删改行，不重建整个表格；
+- 图标只渲染一次并缓存（可运行模块用 play.svg，普通模块用内置文件夹 SVG）；
+- 排序与按包名过滤交给 QSortFilterProxyModel；
+- ReleaseQueueModel：发布队列面板，每行对应一个 releasequeue.ReleaseJob。
+"""
+import os
+from PySide6 import QtCore, QtGui
+from toolbox.qt import qtbase_future as qtbase
+from . import releasequeue
+
+COL_ICON, COL_NAME, COL_PATH, COL_VERSION, COL_TS = range(5)
+HEADERS = ["", "包名", "路径", "版本号", "更新时间"]
+ICON_SIZE = 20
+
+# 普通模块图标（文件夹图标）的 SVG 字符串
+ICON_FOLDER_SVG = """<svg width="24" height="24" viewBox="0 0 24 24" fill="none" xmlns="http://www.w3.org/2000/svg">
+  <path d="M4 5h6l2 2h8a1 1 0 0 1 1 1v11a1 1 0 0 1-1 1H4a1 1 0 0 1-1-1V6a1 1 0 0 1 1-1z" stroke="#666666" stroke-width="2" stroke-linecap="round" stroke-linejoin="round"/>
+</svg>"""
+
+_icon_cache: dict[str, QtGui.QIcon] = {}
+
+
+def _play_icon_path() -> str:
+    # 当前文件路径：projects/py_app_packer/pkgmodel.py，向上两级到仓库根
+    current_file_dir = os.path.dirname(os.path.abspath(__file__))
+    repo_root = os.path.dirname(os.path.dirname(current_file_dir))
+    return os.path.join(repo_root, "data", "assets", "play.svg")
+
+
+def package_icon(pkg_type: str) -> QtGui.QIcon:
+    """按模块类型返回图标，首次使用时渲染并缓存"""
+    icon = _icon_cache.get(pkg_type)
+    if icon is not None:
+        return icon
+    icon = QtGui.QIcon()
+    if pkg_type == "runnable":
+        icon_play = _play_icon_path()
+        if os.path.exists(icon_play):
+            icon = qtbase.get_icon(icon_play, ICON_SIZE)
+    else:
+        pixmap = QtGui.QPixmap()
+        pixmap.loadFromData(QtCore.QByteArray(ICON_FOLDER_SVG.encode("utf-8")), format="SVG")  # type: ignore
+        if pixmap.size().width() > 0:
+            pixmap = pixmap.scaled(ICON_SIZE, ICON_SIZE, QtCore.Qt.AspectRatioMode.KeepAspectRatio,
+                                   QtCore.Qt.TransformationMode.SmoothTransformation)
+            icon = QtGui.QIcon(pixmap)
+    _icon_cache[pkg_type] = icon
+    return icon
+
+
+class PackageTableModel(QtCore.QAbstractTableModel):
+    """模块列表模型，每行为 (包名, 路径, 类型, 版本号, 更新时间)"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._rows: list[tuple] = []
+        self._index: dict[str, int] = {}  # 路径 -> 行号
+
+    # ---------- Qt 接口 ----------
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else len(HEADERS)
+
+    def headerData(self, section, orientation, role=QtCore.Qt.ItemDataRole.DisplayRole):
+        if orientation == QtCore.Qt.Orientation.Horizontal and role == QtCore.Qt.ItemDataRole.DisplayRole:
+            return HEADERS[section]
+        return None
+
+    def data(self, index, role=QtCore.Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        name, path, pkg_type, version, ts = self._rows[index.row()]
+        col = index.column()
+        if role == QtCore.Qt.ItemDataRole.DisplayRole:
+            if col == COL_NAME:
+                return name
+            if col == COL_PATH:
+                return path
+            if col == COL_VERSION:
+                return version or ""
+            if col == COL_TS:
+                return ts or ""
+        elif role == QtCore.Qt.ItemDataRole.DecorationRole and col == COL_ICON:
+            return package_icon(pkg_type)
+        elif role == QtCore.Qt.ItemDataRole.ToolTipRole and col in (COL_ICON, COL_NAME):
+            return path
+        elif role == QtCore.Qt.ItemDataRole.UserRole:
+            # 排序用：图标列按类型排序
+            return pkg_type if col == COL_ICON else self.data(index)
+        return None
+
+    # ---------- 数据访问 ----------
+    def record(self, row: int) -> tuple | None:
+        if 0 <= row < len(self._rows):
+            return self._rows[row]
+        return None
+
+    def records(self) -> list[tuple]:
+        return list(self._rows)
+
+    def row_of(self, pkg_path: str) -> int:
+        return self._index.get(pkg_path, -1)
+
+    # ---------- 数据更新 ----------
+    def clear(self):
+        self.beginResetModel()
+        self._rows = []
+        self._index = {}
+        self.endResetModel()
+
+    def append_rows(self, rows: list[tuple]):
+        """追加新行，已存在的路径改为原地更新"""
+        new_rows = []
+        for r in rows:
+            row = self._index.get(r[1])
+            if row is None:
+                new_rows.append(tuple(r))
+            else:
+                self._set_row(row, tuple(r))
+        if not new_rows:
+            return
+        first = len(self._rows)
+        self.beginInsertRows(QtCore.QModelIndex(), first, first + len(new_rows) - 1)
+        for i, r in enumerate(new_rows):
+            self._rows.append(r)
+            self._index[r[1]] = first + i
+        self.endInsertRows()
+
+    def set_rows(self, rows: list[tuple]):
+        """按路径与当前数据做差异更新：删除消失的行、原地更新变化的行、追加新行"""
+        keep = {r[1] for r in rows}
+        removed = [i for i, r in enumerate(self._rows) if r[1] not in keep]
+        # 从后往前按连续区间删除，避免行号错位
+        while removed:
+            last = removed.pop()
+            first = last
+            while removed and removed[-1] == first - 1:
+                first = removed.pop()
+            self.beginRemoveRows(QtCore.QModelIndex(), first, last)
+            del self._rows[first:last + 1]
+            self.endRemoveRows()
+        self._index = {r[1]: i for i, r in enumerate(self._rows)}
+        self.append_rows(rows)
+
+    def update_version(self, row: int, version: str | None, ts: str | None):
+        r = self._rows[row]
+        self._set_row(row, (r[0], r[1], r[2], version, ts))
+
+    def _set_row(self, row: int, record: tuple):
+        if self._rows[row] == record:
+            return
+        self._rows[row] = record
+        self.dataChanged.emit(self.index(row, 0), self.index(row, len(HEADERS) - 1))
+
+
+class PackageFilterProxy(QtCore.QSortFilterProxyModel):
+    """按包名过滤（不区分大小写），按 UserRole 排序"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setFilterKeyColumn(COL_NAME)
+        self.setFilterCaseSensitivity(QtCore.Qt.CaseSensitivity.CaseInsensitive)
+        self.setSortRole(QtCore.Qt.ItemDataRole.UserRole)
+        self.setDynamicSortFilter(True)
+
+
+class ReleaseQueueModel(QtCore.QAbstractTableModel):
+    """发布队列模型：包名 / 状态 / 耗时 / 输出路径，数据直接取自 ReleaseQueue.jobs"""
+    HEADERS = ["包名", "状态", "耗时", "输出"]
+
+    def __init__(self, queue: releasequeue.ReleaseQueue, parent=None):
+        super().__init__(parent)
+        self.queue = queue
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else len(self.queue.jobs)
+
+    def columnCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def headerData(self, section, orientation, role=QtCore.Qt.ItemDataRole.DisplayRole):
+        if orientation == QtCore.Qt.Orientation.Horizontal and role == QtCore.Qt.ItemDataRole.DisplayRole:
+            return self.HEADERS[section]
+        return None
+
+    def data(self, index, role=QtCore.Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        job = self.queue.jobs[index.row()]
+        col = index.column()
+        if role == QtCore.Qt.ItemDataRole.DisplayRole:
+            if col == 0:
+                return job.pkg_name
+            if col == 1:
+                label = releasequeue.STATE_LABELS[job.state]
+                return f"{label} · {job.stage}" if job.stage else label
+            if col == 2:
+                seconds = job.duration()
+                return "" if seconds is None else f"{seconds:.1f}s"
+            if col == 3:
+                return job.archive_path or job.output_root or ""
+        elif role == QtCore.Qt.ItemDataRole.ToolTipRole:
+            return job.error or job.pkg_path
+        return None
+
+    def job(self, row: int) -> releasequeue.ReleaseJob | None:
+        if 0 <= row < len(self.queue.jobs):
+            return self.queue.jobs[row]
+        return None
+
+    def add(self, pkg_name: str, pkg_path: str, root_path: str = "",
+            stream: bool = False) -> releasequeue.ReleaseJob | None:
+        """加入队列，同一个包已在排队或发布中时返回 None"""
+        if self.queue.contains(pkg_path):
+            return None
+        row = len(self.queue.jobs)
+        self.beginInsertRows(QtCore.QModelIndex(), row, row)
+        job = self.queue.add(pkg_name, pkg_path, root_path, stream)
+        self.endInsertRows()
+        return job
+
+    def refresh(self, job: releasequeue.ReleaseJob | None = None):
+        """刷新某个任务所在行（不指定时刷新全部行，用于更新运行中的耗时）"""
+        if not self.queue.jobs:
+            return
+        if job is None:
+            first, last = 0, len(self.queue.jobs) - 1
+        else:
+            first = last = self.queue.jobs.index(job)
+        self.dataChanged.emit(self.index(first, 0), self.index(last, len(self.HEADERS) - 1))
+
+    def clear_finished(self):
+        self.beginResetModel()
+        self.queue.clear_finished()
+        self.endResetModel()
@@ -0,0 +1,386 @@
+"""
+单文件 .pyz 发布（zipapp，不依赖 Qt）
+
+可运行包（带 __main__.py）的发布目录打包为一个 dist_<包名>_<时间>.pyz，目标机上 python app.pyz 直接运行，
+导入时只需读取一个文件，不再逐个 stat 成千上万的小文件（eMMC 等慢存储上冷启动明显变快）：
+- .py 预编译为 .pyc（基于源码哈希、不校验源码，zipimport 直接加载，不含源码）；
+- 条目按导入顺序排列：从 __init__.py/__main__.py 出发按首次导入先后排列的模块、其余模块、数据文件、
+  需要解压的文件，最后是启动脚本；
+- 默认只存储不压缩：模块连续存放，启动脚本记录各模块的偏移，一次读入全部模块后从内存导入
+  （zipimport 每导入一个模块都要重新打开并定位文件）；可选压缩以减小体积，此时由 zipimport 逐个加载；
+- 原生扩展（.so/.pyd/.dll/.dylib）和 pyarmor_runtime_* 无法从 zip 中加载，首次运行时解压到缓存目录
+  （按内容哈希区分版本，环境变量 PY_APP_PACKER_PYZ_CACHE 可指定位置），之后的运行直接使用；
+- 与 archive 中的压缩包一样是确定的：相同输入得到相同字节。
+注：包内的数据文件仍在 .pyz 中，需通过 importlib.resources / pkgutil.get_data 读取，不能按 __file__ 拼接路径。
+"""
+import hashlib
+import importlib.util
+import marshal
+import os
+import stat
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from loguru import logger
+from . import archive
+from . import delta
+from . import tracing
+
+PYZ_SUFFIX = "pyz"
+DEFAULT_INTERPRETER = "/usr/bin/env python3"
+# 不能从 zip 中加载、需要解压的文件
+NATIVE_SUFFIXES = (".so", ".pyd", ".dll", ".dylib")
+RUNTIME_PREFIX = "pyarmor_runtime_"
+# 指定解压缓存目录的环境变量
+CACHE_ENV = "PY_APP_PACKER_PYZ_CACHE"
+# 待编译文件少于该数量时在本进程内编译
+COMPILE_PARALLEL_MIN = 64
+
+# 启动脚本：解压原生文件后以 __main__ 运行包（同 python -m <包名>）
+_BOOTSTRAP = '''\
+# 由 py_app_packer 生成：首次运行时解压原生文件到缓存目录，再以 __main__ 运行 {pkg}
+import os
+import sys
+
+_PKG = {pkg!r}
+_KEY = {key!r}
+# 需要解压的条目
+_EXTRACT = {extract!r}
+# 模块名 -> 所在目录（相对解压目录），从解压目录导入
+_MODULES = {modules!r}
+# 模块名 -> (在模块区中的偏移, 长度, 是否为包)；为空时（压缩的 .pyz）由 zipimport 加载
+_INDEX = {index!r}
+# 模块区在 .pyz 中的 (起始偏移, 结束偏移) 及编译时的 .pyc 版本号
+_SPAN = {span!r}
+_MAGIC = {magic!r}
+
+
+def _cache_dir():
+    base = os.environ.get({cache_env!r})
+    if not base:
+        if sys.platform == "win32":
+            base = os.path.join(os.environ.get("LOCALAPPDATA") or os.path.expanduser("~"), "py_app_packer", "pyz")
+        else:
+            base = os.path.join(os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"),
+                                "py_app_packer", "pyz")
+    return os.path.join(base, _PKG + "-" + _KEY)
+
+
+def _extract(pyz, dest):
+    if os.path.isdir(dest):
+        return
+    import shutil
+    import zipfile
+    tmp = "%s.tmp%d" % (dest, os.getpid())
+    with zipfile.ZipFile(pyz) as zf:
+        for name in _EXTRACT:
+            path = zf.extract(name, tmp)
+            mode = (zf.getinfo(name).external_attr >> 16) & 0o777
+            if mode:
+                os.chmod(path, mode)
+    try:
+        os.rename(tmp, dest)
+    except OSError:
+        # 其他进程已经解压
+        shutil.rmtree(tmp, ignore_errors=True)
+        if not os.path.isdir(dest):
+            raise
+
+
+class _ExtractedFinder:
+    def __init__(self, root):
+        self.root = root
+
+    def find_spec(self, fullname, path=None, target=None):
+        rel = _MODULES.get(fullname)
+        if rel is None:
+            return None
+        from importlib.machinery import PathFinder
+        return PathFinder.find_spec(fullname, [os.path.join(self.root, rel)])
+
+
+class _PyzLoader:
+    """按 _INDEX 从内存中的模块区导入；数据文件与资源交给 zipimport"""
+
+    def __init__(self, pyz, blob):
+        self.pyz = pyz
+        self.blob = blob
+
+    def find_spec(self, fullname, path=None, target=None):
+        entry = _INDEX.get(fullname)
+        if entry is None:
+            return None
+        from importlib.machinery import ModuleSpec
+        rel = os.path.join(self.pyz, *fullname.split("."))
+        spec = ModuleSpec(fullname, self, origin=os.path.join(rel, "__init__.pyc") if entry[2] else rel + ".pyc",
+                          is_package=entry[2])
+        spec.has_location = True
+        if entry[2]:
+            spec.submodule_search_locations = [rel]
+        return spec
+
+    def create_module(self, spec):
+        return None
+
+    def exec_module(self, module):
+        exec(self.get_code(module.__spec__.name), module.__dict__)
+
+    def get_code(self, fullname):
+        import marshal
+        offset, size, _ = _INDEX[fullname]
+        return marshal.loads(self.blob[offset + 16:offset + size])
+
+    def is_package(self, fullname):
+        return _INDEX[fullname][2]
+
+    def get_source(self, fullname):
+        return None
+
+    def get_filename(self, fullname):
+        return self.find_spec(fullname).origin
+
+    def _zipimporter(self, fullname):
+        import zipimport
+        parts = fullname.split(".")
+        return zipimport.zipimporter(os.path.join(self.pyz, *parts[:-1]))
+
+    def get_data(self, path):
+        import zipimport
+        return zipimport.zipimporter(self.pyz).get_data(path)
+
+    def get_resource_reader(self, fullname):
+        return self._zipimporter(fullname).get_resource_reader(fullname)
+
+
+def _load_modules(pyz):
+    from importlib.util import MAGIC_NUMBER
+    if not _INDEX or _MAGIC != MAGIC_NUMBER:
+        # 压缩的 .pyz 或 Python 版本不同，交给 zipimport（版本不同时报错与 zipimport 一致）
+        return
+    with open(pyz, "rb") as f:
+        f.seek(_SPAN[0])
+        blob = memoryview(f.read(_SPAN[1] - _SPAN[0]))
+    sys.meta_path.insert(0, _PyzLoader(pyz, blob))
+
+
+def _main():
+    pyz = os.path.dirname(os.path.abspath(__file__))
+    _load_modules(pyz)
+    if _EXTRACT:
+        root = _cache_dir()
+        _extract(pyz, root)
+        sys.meta_path.insert(0, _ExtractedFinder(root))
+        if sys.platform == "win32":
+            for rel in {{os.path.dirname(name) for name in _EXTRACT if name.lower().endswith(".dll")}}:
+                os.add_dll_directory(os.path.join(root, rel))
+    import runpy
+    runpy.run_module(_PKG, run_name="__main__", alter_sys=True)
+
+
+_main()
+'''
+
+
+def pyz_path_for(output_root: str) -> str:
+    """.pyz 放在发布目录同级（dist 目录）下：dist_<包名>_<时间>.pyz"""
+    return archive.archive_path_for(output_root, PYZ_SUFFIX)
+
+
+def find_runnable(output_root: str) -> list[str]:
+    """发布目录中的可运行包（顶层带 __main__.py 或 __main__.pyc 的目录）"""
+    return sorted(name for name in os.listdir(output_root)
+                  if os.path.isdir(os.path.join(output_root, name)) and not name.startswith(RUNTIME_PREFIX)
+                  and any(os.path.isfile(os.path.join(output_root, name, f"__main__.{ext}")) for ext in ("py", "pyc")))
+
+
+def _extract_root(arcname: str) -> str | None:
+    """需要解压的条目返回其解压单元：pyarmor_runtime_* 目录整体解压，原生文件单独解压；其余返回 None"""
+    parts = arcname.split("/")
+    for i, part in enumerate(parts[:-1]):
+        if part.startswith(RUNTIME_PREFIX):
+            return "/".join(parts[:i + 1])
+    if arcname.lower().endswith(NATIVE_SUFFIXES):
+        return arcname
+    return None
+
+
+def _module_name(unit: str) -> tuple[str, str]:
+    """解压单元 -> (模块名, 所在目录)：目录为包，原生文件取第一个 '.' 之前的部分（如 _x.cpython-311-x86_64-linux-gnu.so）"""
+    parent, _, name = unit.rpartition("/")
+    name = name.split(".", 1)[0]
+    return ".".join(p for p in (parent.replace("/", "."), name) if p), parent
+
+
+def _import_name(arcname: str) -> tuple[str, bool]:
+    """模块条目 -> (模块名, 是否为包)，如 app/sub/__init__.pyc -> ("app.sub", True)"""
+    parts = arcname[:-4].split("/")
+    if parts[-1] == "__init__":
+        return ".".join(parts[:-1]), True
+    return ".".join(parts), False
+
+
+def pyc_bytes(source: bytes, dfile: str, optimize: int = 1) -> bytes:
+    """编译为基于源码哈希、不校验源码的 .pyc（与 py_compile 的 UNCHECKED_HASH 模式相同）"""
+    code = compile(source, dfile, "exec", dont_inherit=True, optimize=optimize)
+    return (importlib.util.MAGIC_NUMBER + (0b01).to_bytes(4, "little") + importlib.util.source_hash(source)
+            + marshal.dumps(code))
+
+
+def _read(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def _compile_task(task: tuple[str, str, int]) -> tuple[bytes | None, str | None]:
+    """编译单个文件（进程池中执行），返回 (.pyc 内容, 错误信息)"""
+    path, dfile, optimize = task
+    try:
+        with open(path, "rb") as f:
+            return pyc_bytes(f.read(), dfile, optimize), None
+    except (SyntaxError, ValueError) as e:
+        return None, f"{dfile}: {e}"
+
+
+def _compile_all(tasks: list[tuple[str, str, int]], jobs: int | None, cancel) -> list[bytes]:
+    jobs = jobs or os.cpu_count() or 1
+    if len(tasks) < COMPILE_PARALLEL_MIN or jobs == 1:
+        results = []
+        for task in tasks:
+            if cancel:
+                cancel.check()
+            results.append(_compile_task(task))
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            results = list(pool.map(_compile_task, tasks, chunksize=16))
+    errors = [err for _, err in results if err]
+    if errors:
+        raise SyntaxError(f"编译失败 {len(errors)} 个文件：\n" + "\n".join(errors[:20]))
+    return [data for data, _ in results]
+
+
+def plan(output_root: str, pkg_name: str, source_pkg: str | None = None) -> tuple[list, list[str]]:
+    """
+    计算 .pyz 的条目顺序，返回 ([(包内路径, 源文件, 是否需编译)], 需要解压的条目)
+    source_pkg 为包的源码目录，用于按导入顺序排列模块（加密输出无法分析导入）；为空时分析发布目录中的 .py
+    """
+    files = archive.list_files(output_root)
+    # mod.py 与 mod.pyc 同时存在时（mapp.txt 覆盖了编译输出）以 .py 为准，与从目录导入时一致
+    py = {arc[:-3] for _, arc in files if arc.endswith(".py")}
+    modules: dict[str, tuple[str, bool]] = {}
+    data, extract = [], []
+    for fpath, arc in files:
+        if _extract_root(arc):
+            extract.append((arc, fpath, False))
+        elif arc.endswith(".py"):
+            modules[arc[:-3]] = (fpath, True)
+        elif arc.endswith(".pyc") and arc[:-4] not in py:
+            modules[arc[:-4]] = (fpath, False)
+        else:
+            data.append((arc, fpath, False))
+
+    from . import importgraph
+    order_root = source_pkg or os.path.join(output_root, pkg_name)
+    ordered = []
+    for rel in importgraph.import_order(order_root) if os.path.isdir(order_root) else []:
+        key = f"{pkg_name}/{rel[:-3]}"
+        if key in modules:
+            ordered.append(key)
+    rest = sorted(set(modules) - set(ordered))
+    entries = [(f"{key}.pyc", *modules[key]) for key in ordered + rest]
+    return entries + sorted(data) + sorted(extract), [arc for arc, _, _ in sorted(extract)]
+
+
+def _info(arcname: str, size: int, mode: int, compress: int) -> zipfile.ZipInfo:
+    zinfo = zipfile.ZipInfo(arcname, archive.FIXED_DATE_TIME)
+    zinfo.create_system = 3
+    zinfo.external_attr = (0o100000 | mode) << 16
+    zinfo.file_size = size
+    zinfo.compress_type = compress
+    return zinfo
+
+
+def make_pyz(output_root: str, pkg_name: str, dest: str | None = None, source_pkg: str | None = None,
+             compressed: bool = False, level: int | None = None, optimize: int = 1,
+             interpreter: str | None = DEFAULT_INTERPRETER, jobs: int | None = None,
+             progress=None, cancel=None) -> str:
+    """
+    把发布目录打包为可直接运行的 .pyz（pkg_name 为其中带 __main__ 的包），返回 .pyz 路径
+    compressed 为假时只存储不压缩；optimize 为 .pyc 的优化级别；interpreter 不为空时写入 #! 行并加可执行权限
+    progress(done, total) 为可选的进度回调；取消时删除未完成的文件
+    """
+    output_root = os.path.abspath(output_root)
+    dest = dest or pyz_path_for(output_root)
+    if pkg_name not in find_runnable(output_root):
+        raise ValueError(f"不是可运行包（缺少 __main__.py），无法生成 .pyz：{os.path.join(output_root, pkg_name)}")
+    level = archive.DEFAULT_LEVEL if level is None else level
+
+    with tracing.span("pyz", package=pkg_name) as sp:
+        entries, extract = plan(output_root, pkg_name, source_pkg)
+        to_compile = [(fpath, arc[:-1]) for arc, fpath, need in entries if need]
+        with tracing.span("pyz.compile", files=len(to_compile)):
+            compiled = dict(zip((arc for _, arc in to_compile),
+                                _compile_all([(f, arc, optimize) for f, arc in to_compile], jobs, cancel)))
+
+        # 解压目录按需解压内容的哈希区分版本
+        digest = hashlib.sha256()
+        for arc, fpath, _ in entries:
+            if arc in extract:
+                digest.update(arc.encode() + b"\0" + delta.hash_file(fpath)[1].encode() + b"\n")
+        units = sorted({_extract_root(arc) for arc in extract})
+        modules = dict(_module_name(unit) for unit in units)
+
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        tmp = f"{dest}.tmp"
+        compress = zipfile.ZIP_DEFLATED if compressed else zipfile.ZIP_STORED
+        total = len(entries) + 2
+        # 模块 -> (在模块区中的偏移, 长度, 是否为包)，只存储不压缩时写入启动脚本
+        index: dict[str, tuple[int, int, bool]] = {}
+        span = [0, 0]
+        try:
+            with open(tmp, "wb") as fp:
+                if interpreter:
+                    fp.write(b"#!" + interpreter.encode("utf-8") + b"\n")
+                with zipfile.ZipFile(fp, "w", compresslevel=level) as zf:
+                    for done, (arc, fpath, need) in enumerate(entries, 1):
+                        if cancel:
+                            cancel.check()
+                        if arc.endswith(".pyc") and not _extract_root(arc):
+                            data = compiled[arc[:-1]] if need else _read(fpath)
+                            zf.writestr(_info(arc, len(data), 0o644, compress), data)
+                            # 存储时数据紧跟在本地文件头之后，写完后的位置减去长度即数据的起始偏移
+                            offset = fp.tell() - len(data)
+                            if not index:
+                                span[0] = offset
+                            name, is_pkg = _import_name(arc)
+                            index[name] = (offset - span[0], len(data), is_pkg)
+                            span[1] = fp.tell()
+                        else:
+                            mode = archive.file_mode(fpath)
+                            entry_compress = zipfile.ZIP_STORED if archive.is_stored(fpath) else compress
+                            with open(fpath, "rb") as src, zf.open(
+                                    _info(arc, os.path.getsize(fpath), mode, entry_compress), "w") as out:
+                                while chunk := src.read(1 << 20):
+                                    out.write(chunk)
+                        if progress:
+                            progress(done, total)
+                    if compressed:
+                        index, span = {}, [0, 0]
+                    # 启动脚本放在最后（zipimport 经中央目录找到它），同时存 .pyc（优先加载）和源码（便于排查）
+                    bootstrap = _BOOTSTRAP.format(pkg=pkg_name, key=digest.hexdigest()[:16], extract=extract,
+                                                  modules=modules, index=index, span=tuple(span),
+                                                  magic=importlib.util.MAGIC_NUMBER,
+                                                  cache_env=CACHE_ENV).encode("utf-8")
+                    zf.writestr(_info("__main__.pyc", 0, 0o644, compress), pyc_bytes(bootstrap, "__main__.py", optimize))
+                    zf.writestr(_info("__main__.py", 0, 0o644, compress), bootstrap)
+                    if progress:
+                        progress(total, total)
+            if interpreter and os.name != "nt":
+                os.chmod(tmp, os.stat(tmp).st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+            os.replace(tmp, dest)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        sp.set(entries=total, compiled=len(to_compile), extract=len(extract), size=os.path.getsize(dest))
+    logger.info(f".pyz 已生成：{dest}（{total} 个条目，预编译 {len(to_compile)} 个模块，"
+                f"首次运行解压 {len(extract)} 个文件，{'压缩' if compressed else '不压缩'}）")
+    return dest
@@ -0,0 +1,149 @@
+"""
+发布队列（不依赖 Qt）
+
+界面中多选的包依次加入队列，调度器在并发上限内取出排队的任务执行：
+- 同一个包已在排队或发布中时不重复加入；
+- 并发上限默认按 CPU 核数与发布目录所在磁盘的类型估算（机械硬盘上并发写入反而更慢），
+  可在 appcfg.yaml 的 release_queue_limit 中指定；
+- 每个任务记录状态、耗时和输出路径，发布完成的任务可统一压缩。
+"""
+import os
+import sys
+import time
+from dataclasses import dataclass
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+STATE_LABELS = {QUEUED: "排队中", RUNNING: "发布中", DONE: "完成", FAILED: "失败", CANCELLED: "已取消"}
+# 机械硬盘上的并发上限
+ROTATIONAL_LIMIT = 2
+
+
+@dataclass(eq=False)
+class ReleaseJob:
+    pkg_name: str
+    pkg_path: str
+    # 加入队列时的项目根路径和“直接发布为压缩包”选项
+    root_path: str = ""
+    stream: bool = False
+    state: str = QUEUED
+    stage: str = ""
+    output_root: str | None = None
+    archive_path: str | None = None
+    error: str | None = None
+    started: float | None = None
+    elapsed: float | None = None
+
+    @property
+    def key(self) -> str:
+        return os.path.normcase(os.path.normpath(self.pkg_path))
+
+    @property
+    def active(self) -> bool:
+        return self.state in (QUEUED, RUNNING)
+
+    def duration(self) -> float | None:
+        """已结束的任务返回总耗时，运行中的任务返回已运行时间"""
+        if self.elapsed is not None:
+            return self.elapsed
+        if self.started is not None:
+            return time.perf_counter() - self.started
+        return None
+
+
+class ReleaseQueue:
+    def __init__(self, limit: int = 1):
+        self.limit = max(1, limit)
+        self.jobs: list[ReleaseJob] = []
+
+    def contains(self, pkg_path: str) -> bool:
+        """同一个包是否已在排队或发布中"""
+        key = ReleaseJob("", pkg_path).key
+        return any(j.active and j.key == key for j in self.jobs)
+
+    def add(self, pkg_name: str, pkg_path: str, root_path: str = "", stream: bool = False) -> ReleaseJob | None:
+        """加入队列；同一个包已在排队或发布中时返回 None"""
+        if self.contains(pkg_path):
+            return None
+        job = ReleaseJob(pkg_name, pkg_path, root_path, stream)
+        self.jobs.append(job)
+        return job
+
+    def running(self) -> list[ReleaseJob]:
+        return [j for j in self.jobs if j.state == RUNNING]
+
+    def pending(self) -> list[ReleaseJob]:
+        return [j for j in self.jobs if j.state == QUEUED]
+
+    def is_idle(self) -> bool:
+        return not any(j.active for j in self.jobs)
+
+    def take(self) -> list[ReleaseJob]:
+        """取出并发上限内可以开始的排队任务（按加入顺序），标记为发布中"""
+        free = self.limit - len(self.running())
+        started = self.pending()[:max(0, free)]
+        for job in started:
+            job.state = RUNNING
+            job.started = time.perf_counter()
+        return started
+
+    def finish(self, job: ReleaseJob, state: str, error: str | None = None):
+        job.state = state
+        job.stage = ""
+        job.error = error
+        if job.started is not None:
+            job.elapsed = time.perf_counter() - job.started
+
+    def cancel_pending(self) -> list[ReleaseJob]:
+        """取消所有尚未开始的任务，返回被取消的任务"""
+        jobs = self.pending()
+        for job in jobs:
+            self.finish(job, CANCELLED)
+        return jobs
+
+    def clear_finished(self):
+        self.jobs = [j for j in self.jobs if j.active]
+
+    def zippable(self) -> list[ReleaseJob]:
+        """已发布完成、发布目录仍存在且尚未压缩的任务"""
+        return [j for j in self.jobs if j.state == DONE and not j.archive_path
+                and j.output_root and os.path.isdir(j.output_root)]
+
+    def summary(self) -> dict[str, int]:
+        counts = {state: 0 for state in STATE_LABELS}
+        for job in self.jobs:
+            counts[job.state] += 1
+        return counts
+
+
+def _is_rotational(path: str) -> bool:
+    """path 所在的块设备是否为机械硬盘（只在 Linux 上能判断，其它平台返回 False）"""
+    if not sys.platform.startswith("linux"):
+        return False
+    # 发布目录可能还不存在，取最近的已存在上级目录
+    path = os.path.abspath(path)
+    while not os.path.exists(path) and os.path.dirname(path) != path:
+        path = os.path.dirname(path)
+    try:
+        dev = os.stat(path).st_dev
+        sys_dev = os.path.realpath(f"/sys/dev/block/{os.major(dev)}:{os.minor(dev)}")
+    except OSError:
+        return False
+    # 分区本身没有 queue/，需要看所在磁盘
+    for d in (sys_dev, os.path.dirname(sys_dev)):
+        try:
+            with open(os.path.join(d, "queue", "rotational"), "r", encoding="ascii") as f:
+                return f.read().strip() == "1"
+        except OSError:
+            continue
+    return False
+
+
+def default_limit(dist_dir: str) -> int:
+    """
+    默认并发上限：CPU 核数的一半（pyarmor 与压缩都会占满 CPU），
+    发布目录在机械硬盘上时最多 ROTATIONAL_LIMIT 个
+    """
+    limit = max(1, (os.cpu_count() or 1) // 2)
+    if _is_rotational(dist_dir):
+        limit = min(limit, ROTATIONAL_LIMIT)
+    return limit
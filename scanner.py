@@ -0,0 +1,322 @@
+"""
+包扫描器（不依赖 Qt）
+
+- 基于 os.scandir 遍历根路径下的子文件夹，目录判断使用目录项自带的类型信息，
+  每个子文件夹只对 __init__.py / __main__.py 各做一次 stat；
+- 递归模式（depth > 1）下按深度限制向下查找包（找到包后不再进入其内部），遵循各级 .gitignore
+  和配置的排除规则，隐藏目录、虚拟环境等提前剪枝，各子树在线程池中并行遍历；
+- 扫描结果（含版本号）保存为磁盘快照，以根路径及已遍历子文件夹的 mtime 作为有效性依据，
+  重启后可立即显示上次结果，再在后台校验刷新。
+"""
+import hashlib
+import json
+import os
+import re
+import tempfile
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from loguru import logger
+from . import packer
+from . import tracing
+
+SNAPSHOT_VERSION = 3
+
+# 扫描结果行：(包名, 路径, 类型, 版本号, 更新时间)，递归模式下包名为相对根路径的路径（'/' 分隔）
+Row = tuple[str, str, str, str | None, str | None]
+
+# 始终跳过的目录（不区分大小写）
+SKIP_DIRS = {"tests"}
+# 不递归进入的目录（不区分大小写，以及以 . 开头的目录）；与旧版扫描一致，第一层的这些目录若本身是包仍会列出
+PRUNE_DIRS = {"__pycache__", "node_modules", "site-packages", "dist", "build"}
+# 存在其中之一即视为虚拟环境/conda 环境目录
+VENV_MARKERS = ("pyvenv.cfg", "conda-meta")
+
+
+@dataclass(frozen=True)
+class ScanOptions:
+    """扫描选项：depth 为查找深度（1 表示只看第一层）；excludes 为 .gitignore 语法的排除规则（相对根路径）"""
+    depth: int = 1
+    excludes: tuple[str, ...] = ()
+    gitignore: bool = True
+    jobs: int | None = None
+
+    @classmethod
+    def from_cfg(cls, cfg) -> "ScanOptions":
+        """从 appcfg.yaml（scan_depth / scan_excludes / is_scan_gitignore）读取"""
+        return cls(depth=max(1, int(cfg.get("scan_depth", 1) or 1)),
+                   excludes=tuple(cfg.get("scan_excludes") or ()),
+                   gitignore=bool(cfg.get("is_scan_gitignore", 1)))
+
+    def key(self) -> dict:
+        """写入快照的选项摘要，选项变化后快照失效"""
+        return {"depth": self.depth, "excludes": list(self.excludes), "gitignore": self.gitignore}
+
+
+def _exists(path: str) -> bool:
+    try:
+        os.stat(path)
+        return True
+    except OSError:
+        return False
+
+
+def probe_package(dirpath: str) -> str | None:
+    """判断文件夹类型：'runnable'（有 __init__.py 和 __main__.py）/ 'normal'（只有 __init__.py）/ None（不是包）"""
+    if not _exists(os.path.join(dirpath, "__init__.py")):
+        return None
+    return "runnable" if _exists(os.path.join(dirpath, "__main__.py")) else "normal"
+
+
+def _is_venv(dirpath: str) -> bool:
+    return any(_exists(os.path.join(dirpath, m)) for m in VENV_MARKERS)
+
+
+# ---------- 忽略规则 ----------
+class IgnoreRule:
+    """一条 .gitignore 语法的规则，base 为规则所在目录（相对扫描根路径）"""
+
+    def __init__(self, pattern: str, negate: bool = False, base: str = ""):
+        from .manifest import glob_to_regex
+        self.negate = negate
+        self.dir_only = pattern.endswith("/")
+        body = pattern.rstrip("/")
+        # 不含 '/' 的规则匹配任意层级的同名项，含 '/' 的规则相对 base 锚定
+        anchored = "/" in body
+        regex = glob_to_regex(body.lstrip("/"))
+        self.regex = re.compile(regex if anchored else f"(?:.*/)?{regex}")
+        self.base = base
+
+    def match(self, rel: str, is_dir: bool) -> bool:
+        if self.dir_only and not is_dir:
+            return False
+        if self.base:
+            if not rel.startswith(self.base + "/"):
+                return False
+            rel = rel[len(self.base) + 1:]
+        return self.regex.fullmatch(rel) is not None
+
+
+def parse_ignore_lines(lines, base: str = "") -> list[IgnoreRule]:
+    rules = []
+    for line in lines:
+        line = line.rstrip("\n").rstrip()
+        if not line or line.startswith("#"):
+            continue
+        negate = line.startswith("!")
+        if negate:
+            line = line[1:]
+        elif line.startswith("\\"):
+            # 转义的 \# / \!
+            line = line[1:]
+        if line.strip("/"):
+            rules.append(IgnoreRule(line, negate, base))
+    return rules
+
+
+def _read_gitignore(path: str, base: str) -> list[IgnoreRule]:
+    try:
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            return parse_ignore_lines(f, base)
+    except OSError:
+        return []
+
+
+def is_ignored(rules: list[IgnoreRule], rel: str, is_dir: bool = True) -> bool:
+    """按顺序匹配，最后一条命中的规则生效（与 .gitignore 相同）"""
+    ignored = False
+    for rule in rules:
+        if rule.match(rel, is_dir):
+            ignored = not rule.negate
+    return ignored
+
+
+# ---------- 遍历 ----------
+def _scan_dir(dirpath: str, rel_dir: str, depth_left: int, rules: list[IgnoreRule], opts: ScanOptions):
+    """
+    扫描一个目录，返回 (包列表, 待继续遍历的子目录, mtime 记录)
+    包列表元素为 (包名, 路径, 类型)；子目录元素为 (路径, 相对路径, 剩余深度, 生效的忽略规则)
+    """
+    packages, subdirs, mtimes = [], [], {}
+    try:
+        with os.scandir(dirpath) as it:
+            entries = list(it)
+    except OSError:
+        return packages, subdirs, mtimes
+
+    if opts.gitignore:
+        for e in entries:
+            if e.name == ".gitignore" and e.is_file():
+                rel = f"{rel_dir}/.gitignore" if rel_dir else ".gitignore"
+                try:
+                    mtimes[rel] = e.stat().st_mtime_ns
+                except OSError:
+                    pass
+                rules = rules + _read_gitignore(e.path, rel_dir)
+                break
+
+    for e in sorted(entries, key=lambda x: x.name):
+        name = e.name
+        pruned = name.startswith(".") or name.lower() in PRUNE_DIRS
+        if name.lower() in SKIP_DIRS or (pruned and rel_dir) or not e.is_dir():
+            continue
+        rel = f"{rel_dir}/{name}" if rel_dir else name
+        if rules and is_ignored(rules, rel):
+            continue
+        try:
+            mtimes[rel] = e.stat().st_mtime_ns
+        except OSError:
+            continue
+        pkg_type = probe_package(e.path)
+        if pkg_type:
+            packages.append((rel, e.path, pkg_type))
+        elif depth_left > 1 and not pruned and not _is_venv(e.path):
+            subdirs.append((e.path, rel, depth_left - 1, rules))
+    return packages, subdirs, mtimes
+
+
+def iter_packages(root_path: str, dir_mtimes: dict[str, int] | None = None, options: ScanOptions | None = None):
+    """
+    逐个产出 root_path 下的包 (包名, 路径, 类型)，默认只看第一层（options.depth 控制递归深度）
+    dir_mtimes 不为 None 时顺便记录已遍历子文件夹及 .gitignore 的 mtime（用于扫描快照）
+    """
+    opts = options or ScanOptions()
+    root_path = os.path.abspath(root_path)
+    base_rules = parse_ignore_lines(opts.excludes)
+    record = dir_mtimes.update if dir_mtimes is not None else (lambda _: None)
+
+    packages, pending, mtimes = _scan_dir(root_path, "", opts.depth, base_rules, opts)
+    record(mtimes)
+    yield from packages
+    if not pending:
+        return
+
+    jobs = max(1, opts.jobs or min(16, (os.cpu_count() or 1) * 2))
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        running = {pool.submit(_scan_dir, *sub, opts) for sub in pending}
+        while running:
+            finished, running = wait(running, return_when=FIRST_COMPLETED)
+            for fut in finished:
+                packages, subdirs, mtimes = fut.result()
+                record(mtimes)
+                yield from packages
+                running |= {pool.submit(_scan_dir, *sub, opts) for sub in subdirs}
+
+
+def scan_packages(root_path: str, options: ScanOptions | None = None) -> list[tuple[str, str, str]]:
+    return sorted(iter_packages(root_path, options=options))
+
+
+# ---------- 扫描快照 ----------
+def snapshot_dir() -> str:
+    return os.path.join(os.path.expanduser("~"), ".cache", "py_app_packer", "scan")
+
+
+def snapshot_path(root_path: str) -> str:
+    key = hashlib.sha1(os.path.abspath(root_path).encode("utf-8")).hexdigest()
+    return os.path.join(snapshot_dir(), f"{key}.json")
+
+
+def _mtime_ns(path: str) -> int | None:
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def load_snapshot(root_path: str, options: ScanOptions | None = None) -> dict | None:
+    """读取扫描快照，不存在、格式不符或扫描选项不同返回 None（不校验是否过期）"""
+    path = snapshot_path(root_path)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            snap = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if snap.get("version") != SNAPSHOT_VERSION or snap.get("root") != os.path.abspath(root_path):
+        return None
+    if snap.get("options") != (options or ScanOptions()).key():
+        return None
+    snap["rows"] = [tuple(r) for r in snap.get("rows", [])]
+    return snap
+
+
+def snapshot_rows(root_path: str, options: ScanOptions | None = None) -> list[Row] | None:
+    snap = load_snapshot(root_path, options)
+    return snap["rows"] if snap else None
+
+
+def is_snapshot_fresh(snap: dict) -> bool:
+    """
+    根路径、所有已遍历的子文件夹（不只是包）及 .gitignore 的 mtime 均未变化时，包列表仍然有效：
+    增删子文件夹会改变上级目录的 mtime，子文件夹中增删 __init__.py/__main__.py 会改变其自身的 mtime
+    """
+    root = snap["root"]
+    if _mtime_ns(root) != snap.get("root_mtime_ns"):
+        return False
+    dirs: dict = snap.get("dirs", {})
+    for name, mtime in dirs.items():
+        if _mtime_ns(os.path.join(root, name)) != mtime:
+            return False
+    return True
+
+
+def save_snapshot(root_path: str, rows: list[Row], dirs: dict[str, int], root_mtime_ns: int | None,
+                  options: ScanOptions | None = None):
+    path = snapshot_path(root_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    data = {
+        "version": SNAPSHOT_VERSION,
+        "root": os.path.abspath(root_path),
+        "root_mtime_ns": root_mtime_ns,
+        "options": (options or ScanOptions()).key(),
+        "dirs": dirs,
+        "rows": [list(r) for r in rows],
+    }
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp_")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp, path)
+    except OSError as e:
+        logger.warning(f"保存扫描快照失败: {path}, err={e}")
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def scan_rows(root_path: str, on_batch=None, batch_size: int = 32,
+              cancel: packer.CancelToken | None = None, options: ScanOptions | None = None) -> list[Row]:
+    """
+    扫描包并读取版本号，返回 [(包名, 路径, 类型, 版本号, 更新时间)]，并更新磁盘快照
+    快照仍有效时复用其中的包列表，不再列目录；on_batch(rows) 为分批回调，用于边扫描边显示
+    """
+    with tracing.span("scan", "scan", root=root_path) as sp:
+        root_path = os.path.abspath(root_path)
+        root_mtime_ns = _mtime_ns(root_path)
+        snap = load_snapshot(root_path, options)
+        if snap and is_snapshot_fresh(snap):
+            sp.set(snapshot=True)
+            dirs = snap["dirs"]
+            packages = [(r[0], r[1], r[2]) for r in snap["rows"]]
+        else:
+            dirs = {}
+            packages = iter_packages(root_path, dirs, options)
+
+        rows: list[Row] = []
+        batch: list[Row] = []
+        for pkg_name, pkg_path, pkg_type in packages:
+            if cancel:
+                cancel.check()
+            # 尝试读取现有版本信息（不在这里强制创建文件）
+            with tracing.span("version_read", "scan", package=pkg_name):
+                version, ts = packer.read_version_info(packer.version_file_path(pkg_path))
+            row = (pkg_name, pkg_path, pkg_type, version, ts)
+            rows.append(row)
+            batch.append(row)
+            if on_batch and len(batch) >= batch_size:
+                on_batch(batch)
+                batch = []
+        if on_batch and batch:
+            on_batch(batch)
+
+        save_snapshot(root_path, rows, dirs, root_mtime_ns, options)
+        sp.add(packages=len(rows), dirs=len(dirs))
+    return rows
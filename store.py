@@ -0,0 +1,328 @@
+"""
+发布目录的内容寻址存储与清理
+
+- ingest()：把发布目录中的文件按 SHA-256 收入 dist/.store/blobs，发布目录中的文件替换为指向
+  blob 的硬链接（或 reflink），相同内容在多次发布之间只占用一份空间；
+- gc()：按保留天数、每个包保留的发布数、dist 总大小预算清理旧发布（目录及其压缩包），
+  最后删除不再被任何发布引用的 blob 和压缩包缓存（dist/.store/archives，见 archive.make_archive_reusing）。
+  blob 是否仍被引用：硬链接数大于 1，或其哈希出现在某个保留中的发布清单（<发布>.manifest.json）中
+  （reflink 不增加硬链接数，只能按清单判断）。
+
+注：硬链接模式下发布目录中的文件与 blob 共享同一份数据，不要原地修改发布目录中的文件。
+"""
+import os
+import re
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from loguru import logger
+from . import tracing
+from .buildcache import sha256_file
+
+STORE_DIR_NAME = ".store"
+LINK_MODES = ("hardlink", "reflink")
+# dist_<包名>_<YYYY-MM-DD-HH.MM.SS>[.zip|.tar.xz|...]
+# 同一秒内的多个发布在时间后带 -2、-3……（见 packer.make_output_root）
+RELEASE_RE = re.compile(r"^dist_(?P<pkg>.+)_(?P<ts>\d{4}-\d{2}-\d{2}-\d{2}\.\d{2}\.\d{2}(?:-(?P<seq>\d+))?)(?P<ext>\..+)?$")
+RELEASE_TS_FORMAT = "%Y-%m-%d-%H.%M.%S"
+
+
+def store_dir(dist_dir: str) -> str:
+    return os.path.join(dist_dir, STORE_DIR_NAME)
+
+
+def archive_cache_dir(dist_dir: str) -> str:
+    """按输入内容缓存的压缩包（与 dist 下的压缩包互为硬链接）"""
+    return os.path.join(store_dir(dist_dir), "archives")
+
+
+def _blob_path(dist_dir: str, digest: str) -> str:
+    return os.path.join(store_dir(dist_dir), "blobs", digest[:2], digest)
+
+
+def _link_into(blob: str, dst: str, mode: str):
+    """用指向 blob 的链接原子替换 dst"""
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(dst), prefix=".tmp_")
+    os.close(fd)
+    os.remove(tmp)
+    try:
+        if mode == "hardlink":
+            os.link(blob, tmp)
+        else:
+            from .manifest import _fast_copyfile
+            _fast_copyfile(blob, tmp, os.path.getsize(blob))
+            shutil.copystat(dst, tmp)
+        os.replace(tmp, dst)
+    except BaseException:
+        if os.path.lexists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def _ingest_file(dist_dir: str, fpath: str, mode: str, digest: str | None = None) -> int:
+    """收入单个文件，返回因去重节省的字节数；digest 为已知的 SHA-256（如来自发布清单）"""
+    st = os.stat(fpath)
+    digest = digest or sha256_file(fpath)
+    blob = _blob_path(dist_dir, digest)
+    if os.path.exists(blob):
+        if mode == "hardlink" and os.path.samefile(blob, fpath):
+            return 0
+        _link_into(blob, fpath, mode)
+        return st.st_size
+
+    os.makedirs(os.path.dirname(blob), exist_ok=True)
+    if mode == "hardlink" and st.st_nlink == 1:
+        # 文件本身成为 blob
+        try:
+            os.link(fpath, blob)
+            return 0
+        except FileExistsError:
+            _link_into(blob, fpath, mode)
+            return st.st_size
+    # reflink 模式下 blob 克隆自该文件（两者已共享数据块，文件无需替换）；
+    # 硬链接模式下已与其它位置（如源码目录）硬链接的文件不能直接作为 blob，先复制一份
+    from .manifest import _fast_copyfile
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(blob), prefix=".tmp_")
+    os.close(fd)
+    try:
+        _fast_copyfile(fpath, tmp, st.st_size)
+        os.replace(tmp, blob)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    if mode == "hardlink":
+        _link_into(blob, fpath, mode)
+    return 0
+
+
+def ingest(release_dir: str, mode: str = "hardlink", jobs: int | None = None,
+           digests: dict[str, str] | None = None) -> int:
+    """
+    把发布目录收入同级 dist 目录下的内容寻址存储，返回去重节省的字节数
+    digests 为 {相对路径（'/' 分隔）: SHA-256}，已写出发布清单时传入以免重复计算哈希
+    """
+    if mode not in LINK_MODES:
+        raise ValueError(f"不支持的链接方式: {mode}，可选: {', '.join(LINK_MODES)}")
+    release_dir = os.path.abspath(release_dir)
+    dist_dir = os.path.dirname(release_dir)
+    files = [os.path.join(root, name) for root, _, names in os.walk(release_dir) for name in names]
+    jobs = max(1, jobs or min(32, (os.cpu_count() or 1) * 2))
+    with tracing.span("store.ingest", "store", files=len(files)) as sp, ThreadPoolExecutor(max_workers=jobs) as pool:
+        digests = digests or {}
+
+        def _one(fpath: str) -> int:
+            rel = os.path.relpath(fpath, release_dir).replace(os.sep, "/")
+            return _ingest_file(dist_dir, fpath, mode, digests.get(rel))
+
+        saved = sum(pool.map(_one, files))
+        sp.set(saved_bytes=saved)
+    logger.info(f"发布目录已收入存储：{release_dir}，{len(files)} 个文件，去重节省 {saved / 1048576:.1f} MB")
+    return saved
+
+
+# ---------- 清理 ----------
+@dataclass
+class Release:
+    """一次发布：发布目录及同名压缩包"""
+    name: str
+    pkg: str
+    created: float
+    paths: list[str] = field(default_factory=list)
+
+
+def list_releases(dist_dir: str) -> list[Release]:
+    """列出 dist 目录下的全部发布，按时间从新到旧排序"""
+    releases: dict[str, Release] = {}
+    try:
+        entries = list(os.scandir(dist_dir))
+    except OSError:
+        return []
+    for entry in entries:
+        m = RELEASE_RE.match(entry.name)
+        if not m:
+            continue
+        name = f"dist_{m['pkg']}_{m['ts']}"
+        rel = releases.get(name)
+        if rel is None:
+            try:
+                # 同一秒内的发布按序号排在后面
+                created = time.mktime(time.strptime(m["ts"][:19], RELEASE_TS_FORMAT)) + int(m["seq"] or 0) * 1e-3
+            except ValueError:
+                created = entry.stat().st_mtime
+            rel = releases[name] = Release(name, m["pkg"], created)
+        rel.paths.append(entry.path)
+    return sorted(releases.values(), key=lambda r: r.created, reverse=True)
+
+
+def _inodes(path: str) -> dict[tuple[int, int], int]:
+    """返回路径下所有文件的 {(设备号, inode): 大小}"""
+    result = {}
+    if os.path.isdir(path):
+        files = (os.path.join(root, n) for root, _, names in os.walk(path) for n in names)
+    else:
+        files = iter([path])
+    for f in files:
+        try:
+            st = os.stat(f)
+        except OSError:
+            continue
+        result[(st.st_dev, st.st_ino)] = st.st_size
+    return result
+
+
+def parse_size(text: str) -> int:
+    """解析 '500M'、'20G' 之类的大小"""
+    text = text.strip().upper().rstrip("B")
+    units = {"K": 1 << 10, "M": 1 << 20, "G": 1 << 30, "T": 1 << 40}
+    if text and text[-1] in units:
+        return int(float(text[:-1]) * units[text[-1]])
+    return int(text)
+
+
+def gc(dist_dir: str, max_age_days: float | None = None, keep_per_package: int | None = None,
+       max_total_bytes: int | None = None, dry_run: bool = False) -> list[Release]:
+    """
+    清理旧发布，返回被删除（dry_run 时为将要删除）的发布列表：
+    1) 早于 max_age_days 的发布；2) 每个包超出最新 keep_per_package 个的发布；
+    3) 仍超出 max_total_bytes 时从最旧的发布开始删除。
+    大小按 inode 去重计算，只有不再被任何发布引用的数据才算作释放。
+    """
+    dist_dir = os.path.abspath(dist_dir)
+    releases = list_releases(dist_dir)
+    now = time.time()
+    evict: dict[str, Release] = {}
+
+    if max_age_days is not None:
+        for rel in releases:
+            if now - rel.created > max_age_days * 86400:
+                evict[rel.name] = rel
+    if keep_per_package is not None:
+        seen: dict[str, int] = {}
+        for rel in releases:
+            seen[rel.pkg] = seen.get(rel.pkg, 0) + 1
+            if seen[rel.pkg] > keep_per_package:
+                evict[rel.name] = rel
+
+    if max_total_bytes is not None:
+        # 统计每个 inode 被多少个保留中的发布引用
+        refs: dict[tuple[int, int], int] = {}
+        sizes: dict[tuple[int, int], int] = {}
+        per_release: dict[str, dict] = {}
+        for rel in releases:
+            inodes: dict = {}
+            for p in rel.paths:
+                inodes.update(_inodes(p))
+            per_release[rel.name] = inodes
+            sizes.update(inodes)
+            if rel.name not in evict:
+                for key in inodes:
+                    refs[key] = refs.get(key, 0) + 1
+        total = sum(sizes[k] for k in refs)
+        for rel in reversed(releases):
+            if total <= max_total_bytes:
+                break
+            if rel.name in evict:
+                continue
+            evict[rel.name] = rel
+            for key in per_release[rel.name]:
+                refs[key] -= 1
+                if refs[key] == 0:
+                    total -= sizes[key]
+                    del refs[key]
+
+    victims = [rel for rel in releases if rel.name in evict]
+    for rel in victims:
+        logger.info(f"{'[dry-run] ' if dry_run else ''}清理发布：{rel.name}")
+        if dry_run:
+            continue
+        for p in rel.paths:
+            if os.path.isdir(p):
+                shutil.rmtree(p, ignore_errors=True)
+            elif os.path.exists(p):
+                os.remove(p)
+    if not dry_run:
+        prune_blobs(dist_dir)
+        prune_archives(dist_dir)
+    return victims
+
+
+def referenced_digests(dist_dir: str) -> set[str]:
+    """dist 目录下全部发布清单中出现的 SHA-256（无法读取的清单跳过）"""
+    from . import delta
+    digests: set[str] = set()
+    try:
+        entries = list(os.scandir(dist_dir))
+    except OSError:
+        return digests
+    for entry in entries:
+        if not entry.name.endswith(delta.MANIFEST_SUFFIX) or not RELEASE_RE.match(entry.name):
+            continue
+        try:
+            manifest = delta.load_manifest(entry.path)
+        except (OSError, ValueError) as e:
+            logger.warning(f"读取发布清单失败，跳过: {entry.path}, err={e}")
+            continue
+        digests.update(e["sha256"] for e in manifest.get("files", {}).values())
+    return digests
+
+
+def prune_blobs(dist_dir: str) -> int:
+    """
+    删除不再被引用的 blob（硬链接数为 1 且不在任何发布清单中），返回释放的字节数
+    reflink 模式下 blob 只作为去重来源，删除后不影响已有发布（数据块由文件系统按引用回收）；
+    没有清单的发布不保留其 blob，之后的发布只是少了去重来源
+    """
+    freed = 0
+    blobs_root = os.path.join(store_dir(dist_dir), "blobs")
+    if not os.path.isdir(blobs_root):
+        return 0
+    live = referenced_digests(dist_dir)
+    for root, _, names in os.walk(blobs_root, topdown=False):
+        for name in names:
+            path = os.path.join(root, name)
+            try:
+                st = os.stat(path)
+                if st.st_nlink <= 1 and name not in live:
+                    os.remove(path)
+                    freed += st.st_size
+            except OSError:
+                continue
+        if root != blobs_root and not os.listdir(root):
+            os.rmdir(root)
+    if freed:
+        logger.info(f"已删除未被引用的 blob，释放 {freed / 1048576:.1f} MB")
+    return freed
+
+
+def prune_archives(dist_dir: str) -> int:
+    """删除不再有发布引用（硬链接数为 1）的缓存压缩包及其索引，返回释放的字节数"""
+    freed = 0
+    cache_dir = archive_cache_dir(dist_dir)
+    try:
+        entries = list(os.scandir(cache_dir))
+    except OSError:
+        return 0
+    keys = set()
+    for entry in entries:
+        if entry.name.endswith(".json"):
+            continue
+        try:
+            st = entry.stat()
+            if st.st_nlink <= 1:
+                os.remove(entry.path)
+                freed += st.st_size
+            else:
+                keys.add(entry.name.split(".", 1)[0])
+        except OSError:
+            continue
+    for entry in entries:
+        if entry.name.endswith(".json") and entry.name[:-len(".json")] not in keys:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                continue
+    if freed:
+        logger.info(f"已删除未被引用的缓存压缩包，释放 {freed / 1048576:.1f} MB")
+    return freed
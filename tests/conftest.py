@@ -0,0 +1,17 @@
+"""
+测试公共设置
+
+仓库根目录即 py_app_packer 包本身；未安装（如直接在克隆目录中运行 pytest）时按包名导入仓库根目录
+"""
+import importlib.util
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+if importlib.util.find_spec("py_app_packer") is None:
+    spec = importlib.util.spec_from_file_location("py_app_packer", os.path.join(ROOT, "__init__.py"),
+                                                  submodule_search_locations=[ROOT])
+    module = importlib.util.module_from_spec(spec)
+    sys.modules["py_app_packer"] = module
+    spec.loader.exec_module(module)
@@ -0,0 +1,136 @@
+import hashlib
+import io
+import os
+import zipfile
+
+import pytest
+
+from py_app_packer import archive
+
+
+class _Cancelled(Exception):
+    pass
+
+
+class _CancelAfter:
+    def __init__(self, n: int):
+        self.n = n
+
+    def check(self):
+        self.n -= 1
+        if self.n < 0:
+            raise _Cancelled()
+
+
+def _tree(root, mtime: int) -> list[tuple[str, str]]:
+    files = {"pkg/__init__.py": b"", "pkg/a.py": b"print('a')\n" * 200, "pkg/data/blob.zip": os.urandom(4096),
+             "run.sh": b"#!/bin/sh\n"}
+    for rel, data in files.items():
+        path = root / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(data)
+        os.utime(path, (mtime, mtime))
+    os.chmod(root / "run.sh", 0o755)
+    return [(str(root / rel), rel) for rel in files]
+
+
+def _copy_tree(src, dst, mtime: int) -> list[tuple[str, str]]:
+    files = []
+    for fpath, rel in archive.list_files(str(src)):
+        path = dst / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(open(fpath, "rb").read())
+        os.chmod(path, os.stat(fpath).st_mode & 0o777)
+        os.utime(path, (mtime, mtime))
+        files.append((str(path), rel))
+    return files
+
+
+def _digest(path) -> str:
+    return hashlib.sha256(open(path, "rb").read()).hexdigest()
+
+
+@pytest.mark.parametrize("fmt", ["zip", "tar.xz"])
+def test_archive_is_deterministic(tmp_path, fmt):
+    files_a = _tree(tmp_path / "a", 1_600_000_000)
+    files_b = _copy_tree(tmp_path / "a", tmp_path / "b", 1_700_000_000)
+    dest_a = archive.make_archive_from(files_a, str(tmp_path / f"a.{fmt}"), fmt, jobs=1)
+    # 不同的 mtime、输入顺序和线程数得到逐字节相同的压缩包
+    dest_b = archive.make_archive_from(list(reversed(files_b)), str(tmp_path / f"b.{fmt}"), fmt, jobs=4)
+    assert _digest(dest_a) == _digest(dest_b)
+
+
+def test_zip_entries(tmp_path):
+    files = _tree(tmp_path / "src", 1_600_000_000)
+    dest = archive.make_archive(str(tmp_path / "src"), str(tmp_path / "out.zip"), jobs=2)
+    with zipfile.ZipFile(dest) as zf:
+        assert zf.testzip() is None
+        assert zf.namelist() == sorted(rel for _, rel in files)
+        infos = {info.filename: info for info in zf.infolist()}
+        assert all(info.date_time == archive.FIXED_DATE_TIME for info in infos.values())
+        # 已压缩格式原样存储，其余 deflate
+        assert infos["pkg/data/blob.zip"].compress_type == zipfile.ZIP_STORED
+        assert infos["pkg/a.py"].compress_type == zipfile.ZIP_DEFLATED
+        assert infos["run.sh"].external_attr >> 16 & 0o777 == 0o755
+        assert infos["pkg/a.py"].external_attr >> 16 & 0o777 == 0o644
+        for fpath, rel in files:
+            assert zf.read(rel) == open(fpath, "rb").read()
+
+
+def test_raw_write_uses_zipfile_internals():
+    # 这些 zipfile 内部属性变化（或 Python 版本超出 RAW_WRITE_MAX_PYTHON）时压缩会静默退回到重新压缩，
+    # 此处直接失败，提醒检查 _write_raw_entry 后再更新 RAW_WRITE_ATTRS / RAW_WRITE_MAX_PYTHON
+    with zipfile.ZipFile(io.BytesIO(), "w") as zf:
+        missing = [attr for attr in archive.RAW_WRITE_ATTRS if not hasattr(zf, attr)]
+        assert missing == [], f"zipfile 缺少内部属性: {missing}"
+        assert archive.raw_write_supported(zf)
+
+
+def test_zip_without_raw_write(tmp_path, monkeypatch):
+    files = _tree(tmp_path / "src", 1_600_000_000)
+    cache = str(tmp_path / "cache")
+    digests = {rel: _digest(fpath) for fpath, rel in files}
+    archive.make_archive_reusing(files, str(tmp_path / "1.zip"), digests, cache, group="pkg")
+    monkeypatch.setattr(archive, "raw_write_supported", lambda zf: False)
+
+    (tmp_path / "src" / "pkg" / "a.py").write_bytes(b"print('changed')\n")
+    digests["pkg/a.py"] = _digest(tmp_path / "src" / "pkg" / "a.py")
+    reused, how = archive.make_archive_reusing(files, str(tmp_path / "2.zip"), digests, cache, group="pkg")
+    assert how == "partial"
+    for dest in (archive.make_archive_from(files, str(tmp_path / "fresh.zip")), reused):
+        with zipfile.ZipFile(dest) as zf:
+            assert zf.testzip() is None
+            assert zf.namelist() == sorted(rel for _, rel in files)
+            assert zf.getinfo("run.sh").external_attr >> 16 & 0o777 == 0o755
+            for fpath, rel in files:
+                assert zf.read(rel) == open(fpath, "rb").read()
+
+
+def test_reusing_matches_fresh_archive(tmp_path):
+    files = _tree(tmp_path / "src", 1_600_000_000)
+    cache = str(tmp_path / "cache")
+    digests = {rel: _digest(fpath) for fpath, rel in files}
+    _, how = archive.make_archive_reusing(files, str(tmp_path / "1.zip"), digests, cache, group="pkg")
+    assert how == "new"
+    _, how = archive.make_archive_reusing(files, str(tmp_path / "2.zip"), digests, cache, group="pkg")
+    assert how == "reused"
+
+    (tmp_path / "src" / "pkg" / "a.py").write_bytes(b"print('changed')\n")
+    digests["pkg/a.py"] = _digest(tmp_path / "src" / "pkg" / "a.py")
+    _, how = archive.make_archive_reusing(files, str(tmp_path / "3.zip"), digests, cache, group="pkg")
+    assert how == "partial"
+    fresh = archive.make_archive_from(files, str(tmp_path / "fresh.zip"))
+    assert _digest(tmp_path / "3.zip") == _digest(fresh)
+
+
+def test_cancel_removes_partial_archive(tmp_path):
+    files = _tree(tmp_path / "src", 1_600_000_000)
+    dest = tmp_path / "out.zip"
+    with pytest.raises(_Cancelled):
+        archive.make_archive_from(files, str(dest), cancel=_CancelAfter(2))
+    assert not dest.exists()
+
+
+def test_unknown_format(tmp_path):
+    with pytest.raises(ValueError):
+        archive.make_archive_from([], str(tmp_path / "x.rar"), "rar")
@@ -0,0 +1,135 @@
+import os
+import sys
+
+import pytest
+
+from py_app_packer import buildcache, packer
+
+
+def _write(path: str, data: bytes):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def test_shard_count():
+    n = buildcache.SHARD_MIN_FILES
+    assert buildcache.shard_count(None, 10 * n) == 1
+    assert buildcache.shard_count(1, 10 * n) == 1
+    assert buildcache.shard_count(4, 10 * n) == 4
+    # 每片至少 SHARD_MIN_FILES 个文件
+    assert buildcache.shard_count(4, 2 * n + 1) == 2
+    assert buildcache.shard_count(4, n - 1) == 1
+
+
+def test_split_shards_balances_by_size(tmp_path):
+    sizes = {"big.py": 900, "a.py": 400, "b.py": 300, "c.py": 200, "sub/d.py": 100, "sub/e.py": 0}
+    for rel, size in sizes.items():
+        _write(str(tmp_path / rel), b"x" * size)
+
+    parts = buildcache.split_shards(str(tmp_path), list(sizes), 2)
+    assert sorted(rel for part in parts for rel in part) == sorted(sizes)
+    assert all(part == sorted(part) for part in parts)
+    totals = sorted(sum(sizes[rel] for rel in part) for part in parts)
+    assert totals == [900, 1000]
+    # 结果与输入顺序无关
+    assert buildcache.split_shards(str(tmp_path), sorted(sizes, reverse=True), 2) == parts
+    # 文件数少于分片数时不产生空分片
+    assert len(buildcache.split_shards(str(tmp_path), ["a.py"], 3)) == 1
+
+
+def _shard_output(root, pkg: str, rels: list[str], runtime: bytes = b"rt"):
+    for rel in rels:
+        _write(str(root / pkg / rel), f"enc {rel}".encode())
+    _write(str(root / "pyarmor_runtime_000000" / "__init__.py"), runtime)
+    return str(root)
+
+
+def test_merge_shards(tmp_path):
+    parts = [["a.py"], ["sub/b.py"]]
+    outs = [_shard_output(tmp_path / f"s{i}", "pkg", part) for i, part in enumerate(parts)]
+    dest = tmp_path / "out"
+
+    buildcache._merge_shards("pkg", parts, outs, str(dest))
+    assert (dest / "pkg" / "a.py").read_bytes() == b"enc a.py"
+    assert (dest / "pkg" / "sub" / "b.py").read_bytes() == b"enc sub/b.py"
+    assert (dest / "pyarmor_runtime_000000" / "__init__.py").read_bytes() == b"rt"
+
+
+def test_merge_shards_rejects_foreign_output(tmp_path):
+    parts = [["a.py"], ["b.py"]]
+    outs = [_shard_output(tmp_path / "s0", "pkg", ["a.py", "b.py"]),
+            _shard_output(tmp_path / "s1", "pkg", ["b.py"])]
+    with pytest.raises(RuntimeError, match="b.py"):
+        buildcache._merge_shards("pkg", parts, outs, str(tmp_path / "out"))
+
+
+def test_merge_shards_rejects_runtime_mismatch(tmp_path):
+    parts = [["a.py"], ["b.py"]]
+    outs = [_shard_output(tmp_path / "s0", "pkg", ["a.py"]),
+            _shard_output(tmp_path / "s1", "pkg", ["b.py"], runtime=b"other")]
+    with pytest.raises(RuntimeError, match="pyarmor_runtime_000000/__init__.py"):
+        buildcache._merge_shards("pkg", parts, outs, str(tmp_path / "out"))
+
+
+# 与 pyarmor gen 的输出结构一致：带 -i 时运行时放在 <输出>/<包名>/ 下，否则放在输出目录顶层
+_PYARMOR_STUB = '''\
+import os, sys
+args = [a for a in sys.argv[1:] if a != "--silent"]
+if args[:1] in (["--version"], ["-v"]):
+    print("Pyarmor test-stub")
+    sys.exit(0)
+out = args[args.index("-O") + 1]
+paths = [a for i, a in enumerate(args[1:], 1) if not a.startswith("-") and args[i - 1] != "-O"]
+for p in paths:
+    base = os.path.basename(p.rstrip("/"))
+    runtime = os.path.join(out, base if "-i" in args else "", "pyarmor_runtime_000000")
+    os.makedirs(runtime, exist_ok=True)
+    with open(os.path.join(runtime, "__init__.py"), "w") as f:
+        f.write("# runtime\\n")
+    for root, _, names in os.walk(p):
+        for name in names:
+            if name.endswith(".py"):
+                src = os.path.join(root, name)
+                dst = os.path.join(out, base, os.path.relpath(src, p))
+                os.makedirs(os.path.dirname(dst), exist_ok=True)
+                with open(src, "rb") as fs, open(dst, "wb") as fd:
+                    fd.write(b"# armored\\n" + fs.read())
+'''
+
+
+@pytest.fixture
+def pyarmor_stub(tmp_path, monkeypatch):
+    exe = tmp_path / "bin" / "pyarmor"
+    exe.parent.mkdir()
+    exe.write_text(f"#!{sys.executable}\n{_PYARMOR_STUB}")
+    exe.chmod(0o755)
+    monkeypatch.setenv(packer.PYARMOR_EXE_ENV, str(exe))
+    return str(exe)
+
+
+def _files(root: str) -> list[str]:
+    return sorted(os.path.relpath(os.path.join(d, n), root).replace(os.sep, "/")
+                  for d, _, names in os.walk(root) for n in names)
+
+
+def test_cached_runtime_follows_package(tmp_path, pyarmor_stub):
+    src = tmp_path / "repo" / "src"
+    for name in ("pkgA", "pkgB"):
+        _write(str(src / name / "__init__.py"), b"")
+        _write(str(src / name / "m.py"), f"NAME = {name!r}\n".encode())
+
+    outputs = []
+    for name in ("pkgA", "pkgB", "pkgB"):
+        result = packer.release_package(str(src), name)
+        assert result.ok, result.error
+        outputs.append(result.output_root)
+        expected = [f"{name}/__init__.py", f"{name}/m.py", f"{name}/pyarmor_runtime_000000/__init__.py"]
+        assert [f for f in _files(result.output_root) if not f.endswith(".json")] == expected
+
+    # 第二次发布 pkgB 时全部命中缓存，运行时由缓存拷贝到 pkgB/ 下
+    cache = buildcache.BuildCache(buildcache.default_cache_dir(outputs[-1]))
+    assert cache.has_runtime(cache.options_key(buildcache.pyarmor_version()))
+    again = str(tmp_path / "again")
+    assert buildcache.incremental_gen(str(src / "pkgB"), again, str(tmp_path), cache.cache_dir) == (2, 0)
+    assert _files(again) == ["pkgB/__init__.py", "pkgB/m.py", "pkgB/pyarmor_runtime_000000/__init__.py"]
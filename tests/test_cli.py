@@ -0,0 +1,94 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from py_app_packer import archive, backends, bench, cli, manifest, packer, pyz, watch
+
+# --help 不应加载的模块（前缀）：各子命令的实现、Qt 以及只有发布时才需要的重量级标准库
+HEAVY_MODULES = (
+    "py_app_packer.archive", "py_app_packer.backends", "py_app_packer.bench", "py_app_packer.buildcache",
+    "py_app_packer.daemon", "py_app_packer.delta", "py_app_packer.manifest", "py_app_packer.packer",
+    "py_app_packer.pyz", "py_app_packer.scanner", "py_app_packer.store", "py_app_packer.watch",
+    "PySide6", "shiboken6", "toolbox.qt", "yaml", "loguru", "zipfile", "tarfile", "multiprocessing",
+    "concurrent.futures.process", "subprocess",
+)
+
+
+@pytest.fixture(scope="module")
+def import_root(tmp_path_factory) -> str:
+    """可以导入 py_app_packer 的目录：检出目录名不是 py_app_packer 时在临时目录中建立同名符号链接"""
+    pkg_dir = os.path.dirname(os.path.abspath(cli.__file__))
+    if os.path.basename(pkg_dir) == "py_app_packer":
+        return os.path.dirname(pkg_dir)
+    root = tmp_path_factory.mktemp("import_root")
+    try:
+        os.symlink(pkg_dir, root / "py_app_packer", target_is_directory=True)
+    except OSError as e:
+        pytest.skip(f"无法创建符号链接: {e}")
+    return str(root)
+
+
+def _imported_modules(import_root: str, *argv: str) -> list[str]:
+    """在子进程中以 -X importtime 运行命令行，返回导入的全部模块名"""
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([import_root, *(p for p in sys.path if p)]))
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-m", "py_app_packer", *argv],
+                          capture_output=True, text=True, env=env, cwd=import_root)
+    assert proc.returncode == 0, proc.stderr[-2000:]
+    names = []
+    for line in proc.stderr.splitlines():
+        if line.startswith("import time:") and "|" in line:
+            names.append(line.rsplit("|", 1)[1].strip())
+    assert names, "没有 -X importtime 输出"
+    return names
+
+
+@pytest.mark.parametrize("argv", [("--help",), ("release", "--help"), ("version", "--help")])
+def test_help_does_not_import_heavy_modules(import_root, argv):
+    names = _imported_modules(import_root, *argv)
+    assert "py_app_packer.cli" in names
+    heavy = [n for n in names if n.startswith(HEAVY_MODULES)]
+    assert heavy == []
+
+
+def test_parser_choices_match_modules():
+    assert cli.ARCHIVE_FORMATS == archive.FORMATS
+    assert cli.COPY_MODES == manifest.COPY_MODES
+    assert list(cli.BACKEND_NAMES) == backends.names()
+    assert cli.BENCH_CASES == bench.CASES
+    assert cli.PYZ_INTERPRETER == pyz.DEFAULT_INTERPRETER
+    assert cli.POLL_INTERVAL == watch.POLL_INTERVAL
+    assert cli.VERSION_UPDATE_JOBS == packer.VERSION_UPDATE_JOBS
+
+
+def test_bench_creates_missing_dirs(tmp_path, capsys):
+    work = tmp_path / "missing" / "work"
+    out = tmp_path / "results" / "bench.json"
+    rc = cli.main(["bench", "--work-dir", str(work), "--packages", "2", "--modules", "2", "--repeat", "1",
+                   "--cases", "scan", "--out", str(out)])
+    assert rc == 0
+    assert work.is_dir() and out.is_file()
+
+
+def test_bench_stub_places_runtime_like_pyarmor(tmp_path, monkeypatch):
+    monkeypatch.setenv(packer.PYARMOR_EXE_ENV, bench.install_stub(str(tmp_path / "bin")))
+    root = bench.make_tree(str(tmp_path / "tree"), packages=1, modules=2, assets=0)
+    for use_cache in (False, True, True):
+        result = packer.release_package(root, "pkg_000", use_cache=use_cache)
+        assert result.ok, result.error
+        assert os.path.isfile(os.path.join(result.output_root, "pkg_000", "pyarmor_runtime_000000", "__init__.py"))
+        assert not os.path.exists(os.path.join(result.output_root, "pyarmor_runtime_000000"))
+
+
+def test_bench_release_cached_case(tmp_path):
+    result = bench.run(packages=2, modules=2, assets=0, repeat=1, cases=("release_cached",),
+                       work_dir=str(tmp_path))
+    assert result["results"]["release_cached"]["runs"]
+
+
+def test_bench_rejects_unusable_work_dir(tmp_path, capsys):
+    blocker = tmp_path / "file"
+    blocker.write_text("")
+    assert cli.main(["bench", "--work-dir", str(blocker / "work"), "--cases", "scan"]) == 2
+    assert "无法创建工作目录" in capsys.readouterr().err
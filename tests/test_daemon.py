@@ -0,0 +1,74 @@
+import pytest
+
+from py_app_packer import daemon
+
+
+class _Conn:
+    peer = "test"
+    closed = False
+
+    def notify(self, method, params):
+        pass
+
+
+@pytest.fixture
+def server():
+    d = daemon.PackerDaemon(limit=1, cfg={})
+    yield d
+    d.close()
+
+
+def _pkg(tmp_path):
+    pkg = tmp_path / "src" / "app"
+    pkg.mkdir(parents=True)
+    (pkg / "__init__.py").write_text("VALUE = 1\n")
+    return str(tmp_path / "src")
+
+
+def _call(server, method, **params) -> dict:
+    return server.dispatch(_Conn(), {"jsonrpc": "2.0", "id": 1, "method": method, "params": params})
+
+
+@pytest.mark.parametrize("options, message", [
+    ({"scratch_dir": "/"}, "不支持的发布选项"),
+    ({"on_line": None}, "不支持的发布选项"),
+    ({"silent": "yes"}, "类型无效"),
+    ({"shards": True}, "类型无效"),
+    ({"timeout": "10"}, "类型无效"),
+    ({"timeout": -1}, "不能为负数"),
+    ({"archive_format": "rar"}, "取值无效"),
+    ({"mapp_mode": "symlink"}, "取值无效"),
+    ({"store_mode": "copy"}, "取值无效"),
+    ({"pyz_optimize": 3}, "取值无效"),
+    ({"backend": "nope"}, "nope"),
+    ([], "必须为对象"),
+])
+def test_release_rejects_bad_options(server, tmp_path, options, message):
+    response = _call(server, "release", root=_pkg(tmp_path), packages=["app"], options=options)
+    assert response["error"]["code"] == daemon.INVALID_PARAMS
+    assert message in response["error"]["message"]
+    assert _call(server, "status")["result"] == []
+
+
+@pytest.mark.parametrize("params", [
+    dict(packages=[]),
+    dict(packages="app"),
+    dict(packages=["../outside"]),
+    dict(packages=["/etc"]),
+    dict(packages=["."]),
+    dict(packages=["app"], batch=True, bundle_name="../x"),
+])
+def test_release_rejects_bad_packages(server, tmp_path, params):
+    response = _call(server, "release", root=_pkg(tmp_path), **params)
+    assert response["error"]["code"] == daemon.INVALID_PARAMS
+
+
+def test_release_with_valid_options(server, tmp_path):
+    root = _pkg(tmp_path)
+    response = _call(server, "release", root=root, packages=["app"],
+                     options={"backend": "pyc", "stream": False, "shards": 1, "timeout": 30.0, "store_mode": None,
+                              "archive_level": None, "pyz": False})
+    job = response["result"][0]
+    info = _call(server, "wait", job=job["id"], timeout=30)["result"]
+    assert info["state"] == daemon.DONE, info
+    assert (tmp_path / "dist").is_dir()
@@ -0,0 +1,172 @@
+import json
+import os
+import sys
+import zipfile
+
+import pytest
+
+from py_app_packer import archive, delta, packer
+
+
+def _write(path, data: bytes):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def _edit_same_size(path: str, data: bytes):
+    """原地改写为同样大小的内容，并确保 mtime 与之前不同（不依赖文件系统的时间精度）"""
+    st = os.stat(path)
+    assert len(data) == st.st_size
+    _write(path, data)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+
+
+def _release(dist, ts: str, files: dict[str, bytes]) -> str:
+    root = os.path.join(str(dist), f"dist_app_{ts}")
+    for rel, data in files.items():
+        _write(os.path.join(root, rel), data)
+    delta.write_manifest(root)
+    return root
+
+
+def test_current_manifest_sees_same_size_edit(tmp_path):
+    root = _release(tmp_path, "2026-01-01-00.00.00", {"app/cfg.yaml": b"flag: 0\n", "app/a.py": b"x = 1\n"})
+    before = delta.current_manifest(root)
+    _edit_same_size(os.path.join(root, "app/cfg.yaml"), b"flag: 1\n")
+
+    after = delta.current_manifest(root)
+    assert after["files"]["app/cfg.yaml"]["sha256"] == delta.hash_file(os.path.join(root, "app/cfg.yaml"))[1]
+    assert after["files"]["app/cfg.yaml"]["sha256"] != before["files"]["app/cfg.yaml"]["sha256"]
+    assert after["files"]["app/a.py"] == before["files"]["app/a.py"]
+    # 写回后的清单再次读取时直接使用
+    assert delta.load_manifest(root)["files"] == after["files"]
+
+
+def test_archive_reuse_ships_same_size_edit(tmp_path):
+    root = _release(tmp_path, "2026-01-01-00.00.00", {"app/cfg.yaml": b"flag: 0\n", "app/a.py": b"x = 1\n"})
+    first = packer.archive_dir(root, reuse=True)
+    os.remove(first)
+    _edit_same_size(os.path.join(root, "app/cfg.yaml"), b"flag: 1\n")
+
+    second = packer.archive_dir(root, reuse=True)
+    with zipfile.ZipFile(second) as zf:
+        assert zf.read("app/cfg.yaml") == b"flag: 1\n"
+
+
+def test_make_delta_sees_same_size_edit(tmp_path):
+    base = _release(tmp_path, "2026-01-01-00.00.00", {"app/cfg.yaml": b"flag: 0\n"})
+    new = _release(tmp_path, "2026-01-02-00.00.00", {"app/cfg.yaml": b"flag: 0\n"})
+    _edit_same_size(os.path.join(new, "app/cfg.yaml"), b"flag: 1\n")
+
+    _, info = delta.make_delta(new, base)
+    assert info["changed"] == ["app/cfg.yaml"]
+
+
+def test_store_release_keeps_manifest_current(tmp_path, monkeypatch):
+    _release(tmp_path, "2026-01-01-00.00.00", {"app/a.py": b"shared\n"})
+    root = _release(tmp_path, "2026-01-02-00.00.00", {"app/a.py": b"shared\n"})
+    packer.store_release(os.path.join(str(tmp_path), "dist_app_2026-01-01-00.00.00"), "hardlink",
+                         digests=packer.manifest_digests(delta.load_manifest(root)))
+    packer.store_release(root, "hardlink", digests=packer.manifest_digests(delta.load_manifest(root)))
+
+    def _no_rehash(*args, **kwargs):
+        raise AssertionError("去重后的发布不应重新计算哈希")
+
+    monkeypatch.setattr(delta, "_hash_entries", _no_rehash)
+    assert delta.current_manifest(root)["files"]["app/a.py"]["size"] == len(b"shared\n")
+
+
+def _install(tmp_path, release: str):
+    """模拟安装：把发布目录的内容复制到一个独立目录"""
+    target = os.path.join(str(tmp_path), "install")
+    for fpath, rel in archive.list_files(release):
+        with open(fpath, "rb") as f:
+            _write(os.path.join(target, rel), f.read())
+    return target
+
+
+@pytest.mark.parametrize("fmt", ["zip", "tar.xz"])
+def test_apply_delta_round_trip(tmp_path, fmt):
+    base = _release(tmp_path, "2026-01-01-00.00.00",
+                    {"app/a.py": b"a = 1\n", "app/old.py": b"old\n", "app/same.py": b"same\n"})
+    new = _release(tmp_path, "2026-01-02-00.00.00",
+                   {"app/a.py": b"a = 2\n", "app/sub/new.py": b"new\n", "app/same.py": b"same\n"})
+    target = _install(tmp_path, base)
+
+    path, info = delta.make_delta(new, base, fmt=fmt)
+    assert path.endswith(f".delta_2026-01-01-00.00.00.{fmt}")
+    assert (info["changed"], info["added"], info["deleted"]) == (["app/a.py"], ["app/sub/new.py"], ["app/old.py"])
+
+    applied = delta.apply_delta(path, target)
+    assert applied["target"] == "dist_app_2026-01-02-00.00.00"
+    assert delta.verify(target, delta.load_manifest(new)["files"]) == []
+    assert not os.path.exists(os.path.join(target, "app/old.py"))
+
+
+def test_apply_delta_detects_wrong_base(tmp_path):
+    base = _release(tmp_path, "2026-01-01-00.00.00", {"app/a.py": b"a = 1\n", "app/b.py": b"b = 1\n"})
+    new = _release(tmp_path, "2026-01-02-00.00.00", {"app/a.py": b"a = 2\n", "app/b.py": b"b = 1\n"})
+    target = _install(tmp_path, base)
+    _write(os.path.join(target, "app/b.py"), b"local edit\n")
+
+    path, _ = delta.make_delta(new, base)
+    with pytest.raises(ValueError, match="app/b.py"):
+        delta.apply_delta(path, target)
+
+
+def _crafted_delta(path: str, members: dict[str, bytes], deleted: list[str] = ()) -> str:
+    info = {"version": delta.MANIFEST_VERSION, "base": "a", "target": "b", "changed": [], "added": [],
+            "deleted": list(deleted), "manifest": {}}
+    with zipfile.ZipFile(path, "w") as zf:
+        zf.writestr(delta.DELTA_INFO, json.dumps(info))
+        for name, data in members.items():
+            zf.writestr(name, data)
+    return path
+
+
+@pytest.mark.parametrize("name", ["../evil.py", "app/../../evil.py", "/tmp/evil.py"])
+def test_apply_delta_rejects_path_traversal(tmp_path, name):
+    target = os.path.join(str(tmp_path), "install")
+    os.makedirs(target)
+    path = _crafted_delta(os.path.join(str(tmp_path), "evil.zip"), {"app/ok.py": b"ok\n", name: b"pwned\n"})
+    with pytest.raises(ValueError, match="越界"):
+        delta.apply_delta(path, target)
+    assert not os.path.exists(os.path.join(str(tmp_path), "evil.py"))
+    # 校验在写入之前完成，越界路径之前的成员也不会写入
+    assert os.listdir(target) == []
+
+
+def test_apply_delta_rejects_deleting_outside_target(tmp_path):
+    target = os.path.join(str(tmp_path), "install")
+    os.makedirs(target)
+    victim = os.path.join(str(tmp_path), "victim.txt")
+    _write(victim, b"keep\n")
+    path = _crafted_delta(os.path.join(str(tmp_path), "evil.zip"), {}, deleted=["../victim.txt"])
+    with pytest.raises(ValueError, match="越界"):
+        delta.apply_delta(path, target)
+    assert os.path.exists(victim)
+
+
+def test_apply_delta_requires_info(tmp_path):
+    target = os.path.join(str(tmp_path), "install")
+    os.makedirs(target)
+    path = os.path.join(str(tmp_path), "plain.zip")
+    with zipfile.ZipFile(path, "w") as zf:
+        zf.writestr("app/a.py", b"a\n")
+    with pytest.raises(ValueError, match="不是增量包"):
+        delta.apply_delta(path, target)
+    assert os.listdir(target) == []
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="Windows 没有可执行权限位")
+@pytest.mark.parametrize("fmt", ["zip", "tar.xz"])
+def test_apply_delta_restores_exec_bit(tmp_path, fmt):
+    base = _release(tmp_path, "2026-01-01-00.00.00", {"app/a.py": b"a = 1\n"})
+    new = _release(tmp_path, "2026-01-02-00.00.00", {"app/a.py": b"a = 1\n", "app/run.sh": b"#!/bin/sh\n"})
+    os.chmod(os.path.join(new, "app/run.sh"), 0o755)
+    target = _install(tmp_path, base)
+
+    path, _ = delta.make_delta(new, base, fmt=fmt)
+    delta.apply_delta(path, target)
+    assert os.stat(os.path.join(target, "app/run.sh")).st_mode & 0o111
@@ -0,0 +1,97 @@
+import os
+
+import pytest
+
+from py_app_packer import manifest
+
+
+def _tree(root, rels):
+    for rel in rels:
+        path = root / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(rel)
+
+
+def _write_mapp(pkg, lines: str) -> str:
+    path = pkg / "mapp.txt"
+    path.write_text(lines, encoding="utf-8")
+    return str(path)
+
+
+def _resolve(pkg, lines: str) -> list[str]:
+    _write_mapp(pkg, lines)
+    return sorted(rel for _, rel in manifest.resolve(str(pkg)))
+
+
+@pytest.mark.parametrize("pattern, matches, misses", [
+    ("*.py", ["a.py"], ["sub/a.py", "a.pyc"]),
+    ("**/*.onnx", ["m.onnx", "a/m.onnx", "a/b/m.onnx"], ["m.onnx.bak"]),
+    ("assets/**", ["assets/x", "assets/a/b"], ["assets", "other/x"]),
+    ("a/**/b", ["a/b", "a/x/b", "a/x/y/b"], ["a/xb"]),
+    ("f?.txt", ["f1.txt"], ["f12.txt", "f/.txt"]),
+    ("[!a]*.py", ["b.py"], ["a.py"]),
+    ("[abc].py", ["a.py", "c.py"], ["d.py"]),
+])
+def test_glob_rules(pattern, matches, misses):
+    rule = manifest.Rule(pattern, False, 1)
+    assert rule.is_glob
+    assert all(rule.match(rel) for rel in matches)
+    assert not any(rule.match(rel) for rel in misses)
+
+
+def test_parse_manifest(tmp_path):
+    path = tmp_path / "mapp.txt"
+    path.write_text("# 注释\n\nbgtask\\common\\\n./assets/**/*.onnx\n! assets/**/tmp.onnx\n", encoding="utf-8")
+    rules = manifest.parse_manifest(str(path))
+    assert [(r.pattern, r.exclude, r.lineno) for r in rules] == [
+        ("bgtask/common", False, 3), ("assets/**/*.onnx", False, 4), ("assets/**/tmp.onnx", True, 5)]
+    assert [r.prefix for r in rules] == ["bgtask/common", "assets", "assets"]
+
+
+def test_resolve_last_rule_wins(tmp_path):
+    pkg = tmp_path / "pkg"
+    _tree(pkg, ["assets/a.onnx", "assets/tmp/b.onnx", "assets/tmp/keep.onnx", "assets/c.txt",
+                "common/x.py", "common/__pycache__/x.pyc", "other/y.py"])
+    files = _resolve(pkg, "assets/**/*.onnx\n!assets/tmp\nassets/tmp/keep.onnx\ncommon\n")
+    assert files == ["assets/a.onnx", "assets/tmp/keep.onnx", "common/x.py"]
+
+
+def test_resolve_exclude_inside_literal_dir(tmp_path):
+    pkg = tmp_path / "pkg"
+    _tree(pkg, ["conf/a.yaml", "conf/local.yaml", "conf/secret/key"])
+    assert _resolve(pkg, "conf\n!conf/local.yaml\n!conf/secret\n") == ["conf/a.yaml"]
+
+
+def test_resolve_outside_package(tmp_path):
+    pkg = tmp_path / "pkg"
+    _tree(tmp_path, ["common/a.py", "common/sub/b.py", "pkg/main.py"])
+    _write_mapp(pkg, "../common\nmain.py\n")
+    files = {rel: src for src, rel in manifest.resolve(str(pkg))}
+    assert sorted(files) == ["../common/a.py", "../common/sub/b.py", "main.py"]
+    assert files["../common/sub/b.py"] == os.path.join(str(tmp_path), "common", "sub", "b.py")
+
+
+def test_resolve_without_mapp(tmp_path):
+    assert manifest.resolve(str(tmp_path)) is None
+
+
+@pytest.mark.parametrize("mode", manifest.COPY_MODES)
+def test_execute_skips_unchanged(tmp_path, mode):
+    pkg = tmp_path / "pkg"
+    _tree(pkg, ["a.py", "sub/b.py"])
+    files = manifest.resolve(str(pkg), manifest.parse_manifest(_write_mapp(pkg, "**/*.py\n")))
+    dst = tmp_path / "out"
+    assert manifest.execute(files, str(dst), mode) == (2, 0)
+    assert (dst / "sub" / "b.py").read_text() == "sub/b.py"
+    assert manifest.execute(files, str(dst), mode) == (0, 2)
+
+    # 与编辑器保存一样写新文件再替换，硬链接模式下也不会改到目标
+    (pkg / "a.py.new").write_text("changed!")
+    os.replace(pkg / "a.py.new", pkg / "a.py")
+    assert manifest.execute(files, str(dst), mode) == (1, 1)
+    assert (dst / "a.py").read_text() == "changed!"
+
+
+def test_execute_unknown_mode(tmp_path):
+    with pytest.raises(ValueError):
+        manifest.execute([], str(tmp_path), "symlink")
@@ -0,0 +1,127 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from py_app_packer import packer, store
+
+TS = "2026-01-01-00.00.00"
+
+
+def _pkg(root, name: str = "app"):
+    pkg = root / "src" / name
+    pkg.mkdir(parents=True)
+    (pkg / "__init__.py").write_text("VALUE = 1\n")
+    (pkg / "__main__.py").write_text("from . import VALUE\nprint(VALUE)\n")
+    return str(root / "src")
+
+
+def test_make_output_root_is_unique(tmp_path):
+    root = str(tmp_path / "src")
+    assert packer.make_output_root(root, "app", TS) == str(tmp_path / "dist" / f"dist_app_{TS}")
+    assert not (tmp_path / "dist").exists()
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        roots = list(pool.map(lambda _: packer.make_output_root(root, "app", TS, claim=True), range(8)))
+    assert len(set(roots)) == 8
+    assert all(os.path.isdir(p) for p in roots)
+    names = sorted(os.path.basename(p) for p in roots)
+    assert names[0] == f"dist_app_{TS}" and f"dist_app_{TS}-8" in names
+
+
+def test_make_output_root_skips_archive_only_release(tmp_path):
+    root = str(tmp_path / "src")
+    (tmp_path / "dist").mkdir()
+    (tmp_path / "dist" / f"dist_app_{TS}.zip").write_bytes(b"")
+    assert packer.make_output_root(root, "app", TS, claim=True).endswith(f"dist_app_{TS}-2")
+
+
+def test_list_releases_orders_same_second(tmp_path):
+    dist = tmp_path / "dist"
+    for name in (f"dist_app_{TS}", f"dist_app_{TS}-2", f"dist_app_{TS}-10.zip", "dist_app_2025-12-31-23.59.59"):
+        (dist / name).mkdir(parents=True)
+    releases = store.list_releases(str(dist))
+    assert [r.name for r in releases] == [f"dist_app_{TS}-10", f"dist_app_{TS}-2", f"dist_app_{TS}",
+                                          "dist_app_2025-12-31-23.59.59"]
+    assert {r.pkg for r in releases} == {"app"}
+
+
+def test_release_package_stream_leaves_no_directory(tmp_path):
+    root = _pkg(tmp_path)
+    first = packer.release_package(root, "app", stream=True, backend="pyc")
+    second = packer.release_package(root, "app", stream=True, backend="pyc")
+    assert first.ok and second.ok, (first.error, second.error)
+    assert first.output_root == second.output_root == ""
+    assert first.zip_path != second.zip_path
+    assert all(os.path.isfile(r.zip_path) for r in (first, second))
+    assert [e for e in os.listdir(tmp_path / "dist") if os.path.isdir(tmp_path / "dist" / e)
+            and not e.startswith(".")] == []
+
+
+@pytest.mark.parametrize("version, ok", [
+    ("0.1.6", True), ("10.20.30", True), ("0.1.6.post20260114", True),
+    ("", False), ("1.2", False), ("1.2.3.4", False), ("v1.2.3", False), ("1.2.3.dev1", False),
+    ("1.2.3\n", False), ('1.2.3"; import os', False), ("１.2.3", False),
+])
+def test_is_valid_version(version, ok):
+    assert packer.is_valid_version(version) is ok
+
+
+def test_parse_base_version():
+    assert packer.parse_base_version(" 0.1.6 ") == (0, 1, 6)
+    assert packer.parse_base_version("0.1.6.post20260114") is None
+    assert packer.parse_base_version("0.1") is None
+
+
+def test_update_versions_rejects_invalid_set(tmp_path):
+    pkg = tmp_path / "app"
+    pkg.mkdir()
+    (pkg / "version.py").write_text('__version__ = "0.1.6.post20260101"\n')
+    with pytest.raises(ValueError, match="格式无效"):
+        packer.update_versions([str(pkg)], version="1.2.3-beta")
+    result = packer.update_version(str(pkg), version="latest")
+    assert not result.ok and "格式无效" in result.error
+    assert (pkg / "version.py").read_text() == '__version__ = "0.1.6.post20260101"\n'
+
+    result = packer.update_version(str(pkg), version="1.2.3")
+    assert result.ok and result.new_version.startswith("1.2.3.post")
+
+
+def _release_dirs(tmp_path) -> list[str]:
+    dist = tmp_path / "dist"
+    return [e for e in os.listdir(dist) if os.path.isdir(dist / e) and not e.startswith(".")] if dist.is_dir() else []
+
+
+def test_release_package_reports_unusable_dist(tmp_path):
+    root = _pkg(tmp_path)
+    (tmp_path / "dist").write_text("")
+    result = packer.release_package(root, "app", backend="pyc")
+    assert not result.ok
+    assert "FileExistsError" in result.error
+
+
+def test_failed_release_removes_empty_output_root(tmp_path, monkeypatch):
+    root = _pkg(tmp_path)
+
+    def _fail(*args, **kwargs):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(packer, "encrypt_package", _fail)
+    monkeypatch.setattr(packer, "encrypt_batch", _fail)
+    for result in (packer.release_package(root, "app", backend="pyc"),
+                   packer.release_batch(root, ["app"], backend="pyc")):
+        assert not result.ok and "boom" in result.error
+        assert result.output_root == ""
+    assert _release_dirs(tmp_path) == []
+
+
+def test_cancelled_release_removes_empty_output_root(tmp_path, monkeypatch):
+    root = _pkg(tmp_path)
+
+    def _cancel(*args, **kwargs):
+        raise packer.CancelledError()
+
+    monkeypatch.setattr(packer, "encrypt_package", _cancel)
+    with pytest.raises(packer.CancelledError):
+        packer.release_package(root, "app", backend="pyc")
+    assert _release_dirs(tmp_path) == []
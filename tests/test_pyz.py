@@ -0,0 +1,90 @@
+import hashlib
+import os
+import subprocess
+import sys
+import zipfile
+
+import pytest
+
+from py_app_packer import pyz
+
+MAIN = b"""\
+import importlib.resources
+import sys
+from pyarmor_runtime_000000 import RUNTIME
+from . import helper
+from .sub import deep
+
+data = importlib.resources.files("app").joinpath("data/cfg.txt").read_text()
+print(helper.NAME, deep.VALUE, RUNTIME, data.strip(), sys.argv[1:])
+"""
+
+
+def _release(root) -> str:
+    files = {
+        "app/__init__.py": b"",
+        "app/__main__.py": MAIN,
+        "app/helper.py": b"NAME = 'helper'\n",
+        "app/sub/__init__.py": b"",
+        "app/sub/deep.py": b"VALUE = 42\n",
+        "app/data/cfg.txt": b"cfg-ok\n",
+        "pyarmor_runtime_000000/__init__.py": b"import os\nRUNTIME = os.path.isfile(__file__)\n",
+    }
+    for rel, data in files.items():
+        path = root / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(data)
+    return str(root)
+
+
+def _run(path: str, cache) -> str:
+    env = dict(os.environ, **{pyz.CACHE_ENV: str(cache)})
+    proc = subprocess.run([sys.executable, path, "x", "y"], capture_output=True, text=True, env=env)
+    assert proc.returncode == 0, proc.stderr
+    return proc.stdout.strip()
+
+
+@pytest.mark.parametrize("compressed", [False, True])
+def test_make_pyz_runs(tmp_path, compressed):
+    root = _release(tmp_path / "dist_app_2026-01-01-00.00.00")
+    dest = pyz.make_pyz(root, "app", compressed=compressed)
+    assert dest == str(tmp_path / "dist_app_2026-01-01-00.00.00.pyz")
+
+    with zipfile.ZipFile(dest) as zf:
+        names = zf.namelist()
+    # 模块只带 .pyc；运行时放在最后、启动脚本紧随其后
+    assert "app/helper.pyc" in names and "app/helper.py" not in names
+    assert names[-2:] == ["__main__.pyc", "__main__.py"]
+    assert names[-3] == "pyarmor_runtime_000000/__init__.py"
+
+    expected = "helper 42 True cfg-ok ['x', 'y']"
+    assert _run(dest, tmp_path / "cache") == expected
+    # 第二次运行复用已解压的运行时
+    assert _run(dest, tmp_path / "cache") == expected
+    assert len(os.listdir(tmp_path / "cache")) == 1
+
+
+def test_make_pyz_is_executable_and_deterministic(tmp_path):
+    root = _release(tmp_path / "dist_app_2026-01-01-00.00.00")
+    first = pyz.make_pyz(root, "app", dest=str(tmp_path / "a.pyz"))
+    second = pyz.make_pyz(root, "app", dest=str(tmp_path / "b.pyz"), jobs=1)
+    assert open(first, "rb").read(2) == b"#!"
+    assert os.stat(first).st_mode & 0o111
+    digest = [hashlib.sha256(open(p, "rb").read()).hexdigest() for p in (first, second)]
+    assert digest[0] == digest[1]
+
+
+def test_make_pyz_requires_runnable(tmp_path):
+    root = _release(tmp_path / "rel")
+    os.remove(os.path.join(root, "app", "__main__.py"))
+    with pytest.raises(ValueError):
+        pyz.make_pyz(root, "app")
+
+
+def test_make_pyz_reports_syntax_errors(tmp_path):
+    root = _release(tmp_path / "rel")
+    (tmp_path / "rel" / "app" / "bad.py").write_text("def (:\n")
+    dest = tmp_path / "out.pyz"
+    with pytest.raises(SyntaxError, match="app/bad.py"):
+        pyz.make_pyz(root, "app", dest=str(dest))
+    assert not dest.exists() and not os.path.exists(f"{dest}.tmp")
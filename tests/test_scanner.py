@@ -0,0 +1,101 @@
+import pytest
+
+from py_app_packer import scanner
+
+
+def _pkg(root, rel: str, runnable: bool = False):
+    path = root / rel
+    path.mkdir(parents=True, exist_ok=True)
+    (path / "__init__.py").write_text("")
+    if runnable:
+        (path / "__main__.py").write_text("")
+
+
+def _names(root, **kwargs) -> list[str]:
+    return [name for name, _, _ in scanner.scan_packages(str(root), scanner.ScanOptions(**kwargs))]
+
+
+@pytest.mark.parametrize("pattern, is_dir, matches, misses", [
+    ("build", True, ["build", "a/build", "a/b/build"], ["builds", "a/build2"]),
+    ("build/", True, ["build", "a/build"], []),
+    ("/build", True, ["build"], ["a/build"]),
+    ("a/*/c", True, ["a/b/c"], ["a/b/d/c", "x/a/b/c"]),
+    ("**/gen", True, ["gen", "x/y/gen"], ["gen2"]),
+    ("*.egg-info", True, ["x.egg-info", "a/x.egg-info"], ["x.egg"]),
+])
+def test_ignore_rule_match(pattern, is_dir, matches, misses):
+    rule = scanner.IgnoreRule(pattern)
+    assert all(rule.match(rel, is_dir) for rel in matches)
+    assert not any(rule.match(rel, is_dir) for rel in misses)
+
+
+def test_ignore_rule_dir_only():
+    rule = scanner.IgnoreRule("out/")
+    assert rule.match("out", True)
+    assert not rule.match("out", False)
+
+
+def test_ignore_rule_base():
+    # 子目录 .gitignore 中的规则只作用于该目录之下
+    rule = scanner.IgnoreRule("/gen", base="apps")
+    assert rule.match("apps/gen", True)
+    assert not rule.match("gen", True)
+    assert not rule.match("apps/x/gen", True)
+    assert scanner.IgnoreRule("gen", base="apps").match("apps/x/gen", True)
+
+
+def test_parse_ignore_lines_and_negation():
+    rules = scanner.parse_ignore_lines(["# 注释", "", "vendor/", "!vendor/keep", "\\!literal", "/", "tmp*  "])
+    assert [(r.negate, r.dir_only) for r in rules] == [(False, True), (True, False), (False, False), (False, False)]
+    assert scanner.is_ignored(rules, "vendor")
+    assert not scanner.is_ignored(rules, "vendor/keep")
+    assert scanner.is_ignored(rules, "!literal")
+    assert scanner.is_ignored(rules, "a/tmp_x")
+    assert not scanner.is_ignored(rules, "src")
+
+
+def test_top_level_matches_legacy_scan(tmp_path):
+    for name in ("app", "dist", "build", ".hidden", "node_modules", "tests"):
+        _pkg(tmp_path, name)
+    _pkg(tmp_path, "runner", runnable=True)
+    (tmp_path / "plain").mkdir()
+    # 与旧版一致：第一层只排除 tests
+    assert _names(tmp_path) == [".hidden", "app", "build", "dist", "node_modules", "runner"]
+    types = {name: kind for name, _, kind in scanner.scan_packages(str(tmp_path))}
+    assert types["runner"] == "runnable" and types["app"] == "normal"
+
+
+def test_recursive_scan_prunes_below_top(tmp_path):
+    _pkg(tmp_path, "apps/a")
+    _pkg(tmp_path, "apps/build/b")
+    _pkg(tmp_path, "apps/.cache/c")
+    _pkg(tmp_path, "apps/tests/t")
+    _pkg(tmp_path, "apps/deep/x/y")
+    # 第一层不是包的 dist/build 不进入（其中是加密后的发布）
+    _pkg(tmp_path, "dist/dist_app_2026-01-01-00.00.00/app")
+    _pkg(tmp_path, ".git/hooks")
+    (tmp_path / "venv").mkdir()
+    (tmp_path / "venv" / "pyvenv.cfg").write_text("")
+    _pkg(tmp_path, "venv/lib/pkg")
+
+    assert _names(tmp_path, depth=1) == []
+    assert _names(tmp_path, depth=2) == ["apps/a"]
+    assert _names(tmp_path, depth=3) == ["apps/a"]
+    assert _names(tmp_path, depth=4) == ["apps/a", "apps/deep/x/y"]
+    assert _names(tmp_path, depth=4, excludes=("deep/",)) == ["apps/a"]
+
+
+def test_recursive_scan_reads_gitignore(tmp_path):
+    _pkg(tmp_path, "apps/a")
+    _pkg(tmp_path, "apps/gen/g")
+    _pkg(tmp_path, "apps/gen/keep")
+    (tmp_path / "apps" / ".gitignore").write_text("gen/*\n!gen/keep\n")
+    assert _names(tmp_path, depth=3) == ["apps/a", "apps/gen/keep"]
+    assert _names(tmp_path, depth=3, gitignore=False) == ["apps/a", "apps/gen/g", "apps/gen/keep"]
+
+
+def test_snapshot_records_scan_dirs(tmp_path):
+    _pkg(tmp_path, "app")
+    dirs = {}
+    list(scanner.iter_packages(str(tmp_path), dirs))
+    assert set(dirs) == {"app"}
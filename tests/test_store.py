@@ -0,0 +1,65 @@
+import hashlib
+import os
+
+import pytest
+
+from py_app_packer import delta, store
+
+
+def _make_release(dist: str, ts: str, files: dict[str, bytes]) -> str:
+    root = os.path.join(dist, f"dist_app_{ts}")
+    for rel, data in files.items():
+        path = os.path.join(root, rel)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(data)
+    delta.write_manifest(root)
+    return root
+
+
+def _blob(dist: str, data: bytes) -> str:
+    digest = hashlib.sha256(data).hexdigest()
+    return os.path.join(dist, store.STORE_DIR_NAME, "blobs", digest[:2], digest)
+
+
+@pytest.mark.parametrize("mode", store.LINK_MODES)
+def test_gc_keeps_blobs_of_remaining_releases(tmp_path, mode):
+    dist = str(tmp_path / "dist")
+    old = _make_release(dist, "2026-01-01-00.00.00", {"app/a.py": b"shared", "app/old.py": b"old only"})
+    new = _make_release(dist, "2026-01-02-00.00.00", {"app/a.py": b"shared", "app/new.py": b"new only"})
+    store.ingest(old, mode)
+    assert store.ingest(new, mode) == len(b"shared")
+    if mode == "hardlink":
+        assert os.path.samefile(os.path.join(old, "app/a.py"), os.path.join(new, "app/a.py"))
+
+    victims = store.gc(dist, keep_per_package=1)
+
+    assert [r.name for r in victims] == [os.path.basename(old)]
+    assert not os.path.exists(old) and not os.path.exists(old + delta.MANIFEST_SUFFIX)
+    # reflink 不增加硬链接数，仍被保留的发布清单引用的 blob 也不能删除
+    assert os.path.isfile(_blob(dist, b"shared"))
+    assert os.path.isfile(_blob(dist, b"new only"))
+    assert not os.path.exists(_blob(dist, b"old only"))
+    with open(os.path.join(new, "app/a.py"), "rb") as f:
+        assert f.read() == b"shared"
+
+
+def test_gc_dry_run_and_size_budget(tmp_path):
+    dist = str(tmp_path / "dist")
+    releases = [_make_release(dist, f"2026-01-0{i}-00.00.00", {"app/big.bin": bytes([i]) * 1000})
+                for i in range(1, 4)]
+    for root in releases:
+        store.ingest(root, "hardlink")
+
+    planned = store.gc(dist, max_total_bytes=2500, dry_run=True)
+    assert [r.name for r in planned] == [os.path.basename(releases[0])]
+    assert all(os.path.isdir(r) for r in releases)
+
+    store.gc(dist, max_total_bytes=2500)
+    assert [r.name for r in store.list_releases(dist)] == [os.path.basename(r) for r in reversed(releases[1:])]
+
+
+def test_parse_size():
+    assert store.parse_size("500M") == 500 << 20
+    assert store.parse_size("1.5g") == int(1.5 * (1 << 30))
+    assert store.parse_size("1024") == 1024
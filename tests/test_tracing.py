@@ -0,0 +1,61 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from py_app_packer import tracing
+
+
+def _names(tracer) -> list[str]:
+    return sorted(s.name for s in tracer.spans)
+
+
+def test_span_without_session_is_noop():
+    assert tracing.current() is None
+    with tracing.span("x") as sp:
+        sp.add(files=1)
+    assert tracing.current() is None
+
+
+def test_concurrent_sessions_keep_own_spans():
+    both_open = threading.Barrier(2)
+    tracers = {}
+
+    def run(tag: str):
+        with tracing.session() as tracer:
+            tracers[tag] = tracer
+            both_open.wait()
+            with tracing.span(f"work_{tag}"):
+                both_open.wait()
+            both_open.wait()
+
+    threads = [threading.Thread(target=run, args=(tag,)) for tag in ("A", "C")]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert _names(tracers["A"]) == ["work_A"]
+    assert _names(tracers["C"]) == ["work_C"]
+
+
+def test_nested_session_merges_into_outer():
+    with tracing.session() as outer:
+        with tracing.session() as inner:
+            with tracing.span("inner"):
+                pass
+        assert tracing.current() is outer
+        with tracing.span("outer"):
+            pass
+    assert _names(inner) == ["inner"]
+    assert _names(outer) == ["inner", "outer"]
+    assert tracing.current() is None
+
+
+def test_bind_records_pool_work_into_submitting_session():
+    def work(i: int):
+        with tracing.span(f"job{i}"):
+            return i
+
+    with tracing.session() as tracer, ThreadPoolExecutor(max_workers=4) as pool:
+        assert list(pool.map(tracing.bind(work), range(4))) == [0, 1, 2, 3]
+        # 未 bind 的线程池任务不记录到会话中
+        list(pool.map(work, range(2)))
+    assert _names(tracer) == ["job0", "job1", "job2", "job3"]
@@ -0,0 +1,65 @@
+import os
+
+import pytest
+
+from py_app_packer import packer, versioninfo
+
+
+@pytest.fixture(autouse=True)
+def _clear_cache():
+    versioninfo.clear_cache()
+    yield
+    versioninfo.clear_cache()
+
+
+def _pkg(tmp_path, version_source: str | None):
+    pkg = tmp_path / "pkg"
+    pkg.mkdir()
+    (pkg / "__init__.py").write_text("")
+    if version_source is not None:
+        (pkg / "version.py").write_text(version_source, encoding="utf-8")
+    return str(pkg)
+
+
+def test_literal_version_is_read_without_exec():
+    code = '__version__ = "1.2.3.post20260101"\n__update_timestamp__: str = "2026-01-01 00:00:00"\nraise SystemExit\n'
+    assert versioninfo.parse_version_source(code) == ("1.2.3.post20260101", "2026-01-01 00:00:00")
+
+
+def test_computed_version_is_unknown_and_never_executed(tmp_path):
+    marker = tmp_path / "executed"
+    pkg = _pkg(tmp_path, f'open({str(marker)!r}, "w").close()\nMAJOR = 2\n__version__ = f"{{MAJOR}}.0.1"\n'
+                         '__update_timestamp__ = "2026-01-01 00:00:00"\n')
+    assert packer.read_version_info(packer.version_file_path(pkg)) == (None, "2026-01-01 00:00:00")
+    assert not marker.exists()
+
+
+def test_unreadable_version_file_is_never_overwritten(tmp_path):
+    source = "from ._meta import __version__\n"
+    pkg = _pkg(tmp_path, source)
+    version_file = packer.version_file_path(pkg)
+
+    assert packer.ensure_version_info(pkg) == (None, None)
+    result = packer.update_version(pkg, part="patch")
+    assert not result.ok
+    with open(version_file, encoding="utf-8") as f:
+        assert f.read() == source
+
+
+def test_missing_version_file_is_created(tmp_path):
+    pkg = _pkg(tmp_path, None)
+    full_version, ts = packer.ensure_version_info(pkg)
+    assert full_version == packer.default_version() and ts
+    assert packer.read_version_info(packer.version_file_path(pkg))[0] == full_version
+
+
+def test_write_version_file_keeps_mode_and_invalidates_cache(tmp_path):
+    pkg = _pkg(tmp_path, '__version__ = "0.1.0"\n')
+    version_file = packer.version_file_path(pkg)
+    os.chmod(version_file, 0o640)
+    assert packer.read_version_info(version_file)[0] == "0.1.0"
+
+    packer.write_version_file(version_file, "0.2.0.post20260101")
+    assert packer.read_version_info(version_file)[0] == "0.2.0.post20260101"
+    assert os.stat(version_file).st_mode & 0o777 == 0o640
+    assert [n for n in os.listdir(pkg) if n.endswith(".tmp")] == []
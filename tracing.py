@@ -0,0 +1,186 @@
+"""
+流水线阶段计时（不依赖 Qt）
+
+    with tracing.session() as tracer:          # 开始记录（未开启时 span 几乎没有开销）
+        with tracing.span("zip") as sp:
+            ...
+            sp.add(files=n, bytes=size)
+        tracer.write("dist/dist_pkg_xxx")      # -> .trace.json（Chrome trace）和 .summary.json
+
+trace.json 可直接在 chrome://tracing 或 https://ui.perfetto.dev 中打开；
+summary.json 按阶段汇总次数、耗时、字节数和文件数。
+是否记录由 appcfg.yaml 的 BENCHMARK / VERBOSE 决定，见 enabled_by_cfg()。
+"""
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from loguru import logger
+
+
+class Span:
+    """一个计时区间，args 中的数值型统计（bytes/files 等）可用 add() 累加"""
+    __slots__ = ("tracer", "name", "cat", "start", "end", "tid", "args")
+
+    def __init__(self, tracer: "Tracer", name: str, cat: str, args: dict):
+        self.tracer = tracer
+        self.name = name
+        self.cat = cat
+        self.args = args
+        self.start = self.end = 0
+        self.tid = 0
+
+    def add(self, **counters):
+        for key, value in counters.items():
+            self.args[key] = self.args.get(key, 0) + value
+
+    def set(self, **values):
+        self.args.update(values)
+
+    def __enter__(self):
+        self.tid = threading.get_ident()
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.end = time.perf_counter_ns()
+        if exc_type is not None:
+            self.args["error"] = exc_type.__name__
+        self.tracer.record(self)
+        return False
+
+
+class _NullSpan:
+    """未开启记录时返回的空区间"""
+
+    def add(self, **counters):
+        pass
+
+    def set(self, **values):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Tracer:
+    def __init__(self):
+        self.spans: list[Span] = []
+        self._lock = threading.Lock()
+        self.t0 = time.perf_counter_ns()
+
+    def record(self, span: Span):
+        with self._lock:
+            self.spans.append(span)
+
+    def chrome_trace(self) -> dict:
+        pid = os.getpid()
+        events = [{
+            "name": s.name, "cat": s.cat, "ph": "X", "pid": pid, "tid": s.tid,
+            "ts": (s.start - self.t0) / 1000, "dur": (s.end - s.start) / 1000, "args": s.args,
+        } for s in sorted(self.spans, key=lambda s: s.start)]
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def summary(self) -> dict:
+        """按阶段名汇总：次数、总耗时（毫秒）及各数值型统计之和"""
+        stages: dict[str, dict] = {}
+        for s in self.spans:
+            st = stages.setdefault(s.name, {"count": 0, "ms": 0.0})
+            st["count"] += 1
+            st["ms"] += (s.end - s.start) / 1e6
+            for key, value in s.args.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    st[key] = st.get(key, 0) + value
+        wall = (max((s.end for s in self.spans), default=self.t0) - self.t0) / 1e6
+        return {"wall_ms": wall, "stages": stages}
+
+    def write(self, base_path: str) -> tuple[str, str] | None:
+        """写出 <base_path>.trace.json 和 <base_path>.summary.json，失败只记录日志"""
+        trace_path, summary_path = f"{base_path}.trace.json", f"{base_path}.summary.json"
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(base_path)), exist_ok=True)
+            with open(trace_path, "w", encoding="utf-8") as f:
+                json.dump(self.chrome_trace(), f, ensure_ascii=False)
+            with open(summary_path, "w", encoding="utf-8") as f:
+                json.dump(self.summary(), f, ensure_ascii=False, indent=2)
+        except OSError as e:
+            logger.warning(f"写入阶段计时文件失败: {base_path}, err={e}")
+            return None
+        logger.info(f"阶段计时已写入: {trace_path}")
+        return trace_path, summary_path
+
+
+# 当前上下文（线程 / 协程）的记录会话：并发的多个会话（发布队列、守护进程中同时发布的多个包）互不混入；
+# 新线程从空上下文开始，线程池中的子任务需用 bind() 包装后才记录到提交任务时的会话
+_current: ContextVar["Tracer | None"] = ContextVar("py_app_packer_tracer", default=None)
+
+
+def current() -> Tracer | None:
+    return _current.get()
+
+
+def span(name: str, cat: str = "stage", **args):
+    """在当前记录会话中开始一个计时区间；没有会话时返回空区间"""
+    tracer = _current.get()
+    if tracer is None:
+        return _NULL_SPAN
+    return Span(tracer, name, cat, args)
+
+
+def bind(fn):
+    """
+    包装提交到线程池的函数，使其在执行线程中记录到当前会话；没有会话时原样返回
+    （不用 contextvars.copy_context().run：同一个 Context 不能在多个线程中同时进入）
+    """
+    tracer = _current.get()
+    if tracer is None:
+        return fn
+
+    @functools.wraps(fn)
+    def run(*args, **kwargs):
+        token = _current.set(tracer)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _current.reset(token)
+
+    return run
+
+
+@contextmanager
+def session(enabled: bool = True):
+    """
+    在当前上下文中开启一个记录会话，enabled 为假时不记录，产出 None
+    结束后恢复之前的会话，本会话的区间同时并入外层会话（外层可看到完整流程）
+    """
+    if not enabled:
+        yield None
+        return
+    outer = _current.get()
+    tracer = Tracer()
+    token = _current.set(tracer)
+    try:
+        yield tracer
+    finally:
+        _current.reset(token)
+        if outer is not None:
+            with outer._lock:
+                outer.spans.extend(tracer.spans)
+
+
+def enabled_by_cfg(cfg) -> bool:
+    """BENCHMARK 开启或 VERBOSE >= 2 时记录阶段计时"""
+    try:
+        verbose = int(cfg.get("VERBOSE", 0) or 0)
+    except (TypeError, ValueError):
+        verbose = 0
+    return bool(cfg.get("BENCHMARK")) or verbose >= 2
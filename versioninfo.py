@@ -0,0 +1,71 @@
+"""
+version.py 元数据读取
+
+用 ast 解析 __version__ / __update_timestamp__ 的字面量赋值，不执行模块代码；
+__version__ 不是字面量（计算得到或从其他模块导入）时为 None（未知），调用方不会覆盖这样的 version.py。
+结果按 (路径, mtime_ns, 文件大小) 缓存，写入 version.py 后调用 invalidate() 使缓存失效。
+"""
+import ast
+import os
+import threading
+from loguru import logger
+
+VERSION_KEYS = ("__version__", "__update_timestamp__")
+
+# 路径 -> ((mtime_ns, size), (版本号, 更新时间))
+_cache: dict[str, tuple[tuple[int, int], tuple[str | None, str | None]]] = {}
+_lock = threading.Lock()
+
+
+def parse_version_source(code: str) -> tuple[str | None, str | None]:
+    """从 version.py 源码中解析 (__version__, __update_timestamp__)，只识别模块顶层的字面量赋值"""
+    values: dict[str, str] = {}
+    for node in ast.parse(code).body:
+        if isinstance(node, ast.Assign):
+            targets, value = node.targets, node.value
+        elif isinstance(node, ast.AnnAssign) and node.value is not None:
+            targets, value = [node.target], node.value
+        else:
+            continue
+        for target in targets:
+            if isinstance(target, ast.Name) and target.id in VERSION_KEYS:
+                try:
+                    values[target.id] = str(ast.literal_eval(value))
+                except ValueError:
+                    logger.warning(f"{target.id} 不是字面量（第 {node.lineno} 行），视为未知")
+    return values.get("__version__"), values.get("__update_timestamp__")
+
+
+def read_version_info(version_file: str) -> tuple[str | None, str | None]:
+    """从 version.py 中读取 (__version__, __update_timestamp__)，任一不存在则为 None"""
+    try:
+        st = os.stat(version_file)
+    except OSError:
+        return None, None
+    key = (st.st_mtime_ns, st.st_size)
+    path = os.path.abspath(version_file)
+    with _lock:
+        cached = _cache.get(path)
+    if cached and cached[0] == key:
+        return cached[1]
+
+    try:
+        with open(version_file, "r", encoding="utf-8") as f:
+            code = f.read()
+        info = parse_version_source(code)
+    except Exception as e:  # noqa: BLE001
+        logger.exception(f"读取版本文件失败: {version_file}, err={e}")
+        return None, None
+    with _lock:
+        _cache[path] = (key, info)
+    return info
+
+
+def invalidate(version_file: str):
+    with _lock:
+        _cache.pop(os.path.abspath(version_file), None)
+
+
+def clear_cache():
+    with _lock:
+        _cache.clear()
@@ -0,0 +1,216 @@
+"""
+监视模式：开发时持续增量加密到固定的实时输出目录（不依赖 Qt）
+
+包先完整加密到 <仓库根>/dist/live_<包名>（不带时间戳，不会被 gc 清理），之后只处理变化：
+- 修改、新增的 .py 经构建缓存增量加密（内容未变的直接命中缓存），删除的 .py 同时删除其加密输出；
+- mapp.txt 或其指定的内容变化时重新同步（大小和 mtime 相同的文件跳过），不再被指定的文件从输出中删除，
+  被 mapp.txt 覆盖的 .py 不加密（与发布时 mapp.txt 内容覆盖加密输出一致）；
+- pyarmor 失败（如语法错误）时保留上一次的状态，文件再次保存后重试。
+界面用 QFileSystemWatcher（inotify）触发并去抖，命令行 watch 子命令用轮询（见 poll）。
+"""
+import os
+import shutil
+import time
+from dataclasses import dataclass
+from loguru import logger
+from . import buildcache
+from . import manifest
+from . import packer
+from . import tracing
+
+LIVE_PREFIX = "live_"
+# 轮询间隔与去抖时间（秒）
+POLL_INTERVAL = 1.0
+DEBOUNCE = 0.3
+
+
+def live_output_root(root_path: str, pkg_name: str) -> str:
+    """实时输出目录：<root_path 的上级>/dist/live_<包名>"""
+    repo_root = os.path.dirname(os.path.abspath(root_path))
+    return os.path.join(repo_root, "dist", f"{LIVE_PREFIX}{os.path.basename(pkg_name)}")
+
+
+@dataclass
+class LiveUpdate:
+    """一次同步的结果"""
+    encrypted: int = 0
+    cached: int = 0
+    removed: int = 0
+    synced: int = 0
+    elapsed: float = 0.0
+
+    @property
+    def changed(self) -> bool:
+        return bool(self.encrypted or self.cached or self.removed or self.synced)
+
+    def describe(self) -> str:
+        return (f"重新加密 {self.encrypted} 个、命中缓存 {self.cached} 个、同步 mapp {self.synced} 个、"
+                f"删除 {self.removed} 个文件，耗时 {self.elapsed:.2f}s")
+
+
+class LiveBuild:
+    """一个包的实时输出目录及其源文件快照"""
+
+    def __init__(self, root_path: str, pkg_name: str, output_root: str | None = None,
+                 silent: bool = True, timeout: float = 300, mapp_mode: str = "copy"):
+        root_path = os.path.abspath(root_path)
+        self.pkg_full_name = os.path.normpath(os.path.join(root_path, pkg_name))
+        self.pkg_name = os.path.basename(self.pkg_full_name)
+        self.output_root = output_root or live_output_root(root_path, pkg_name)
+        self.cwd = os.path.dirname(root_path)
+        # 与正式发布共用 dist/.build_cache
+        self.cache_dir = buildcache.default_cache_dir(self.output_root)
+        self.silent = silent
+        self.timeout = timeout
+        self.mapp_mode = mapp_mode
+        # {相对包目录的路径: (mtime_ns, 大小)}，mapp.txt 中包外的字面路径以 ../ 开头
+        self._snapshot: dict[str, tuple[int, int]] = {}
+        # 当前被 mapp.txt 指定的文件（相对包目录）
+        self._mapp: set[str] = set()
+
+    @property
+    def pkg_output(self) -> str:
+        return os.path.join(self.output_root, self.pkg_name)
+
+    def _outside_roots(self) -> list[tuple[str, str]]:
+        """mapp.txt 中指向包外的字面路径 [(规则路径, 绝对路径)]"""
+        mapp_path = os.path.join(self.pkg_full_name, "mapp.txt")
+        if not os.path.isfile(mapp_path):
+            return []
+        return [(r.pattern, os.path.normpath(os.path.join(self.pkg_full_name, r.pattern)))
+                for r in manifest.parse_manifest(mapp_path)
+                if r.pattern.startswith("../") and not r.exclude and not r.is_glob]
+
+    def snapshot(self) -> dict[str, tuple[int, int]]:
+        """包目录（及 mapp.txt 指定的包外路径）下全部文件的 mtime 和大小"""
+        snap: dict[str, tuple[int, int]] = {}
+        for prefix, top in [("", self.pkg_full_name), *self._outside_roots()]:
+            if os.path.isfile(top):
+                st = os.stat(top)
+                snap[prefix] = (st.st_mtime_ns, st.st_size)
+                continue
+            for root, dirs, names in os.walk(top):
+                dirs[:] = [d for d in dirs if d != "__pycache__"]
+                rel_root = os.path.relpath(root, top).replace(os.sep, "/")
+                rel_root = "" if rel_root == "." else rel_root
+                for name in names:
+                    rel = "/".join(p for p in (prefix, rel_root, name) if p)
+                    try:
+                        st = os.stat(os.path.join(root, name))
+                    except OSError:
+                        continue
+                    snap[rel] = (st.st_mtime_ns, st.st_size)
+        return snap
+
+    def watch_paths(self) -> list[str]:
+        """需要监视的目录和文件（供 QFileSystemWatcher 使用）"""
+        paths = []
+        for top in [self.pkg_full_name, *(p for _, p in self._outside_roots())]:
+            if os.path.isfile(top):
+                paths.append(top)
+                continue
+            for root, dirs, names in os.walk(top):
+                dirs[:] = [d for d in dirs if d != "__pycache__"]
+                paths.append(root)
+                paths.extend(os.path.join(root, name) for name in names)
+        return paths
+
+    def _resolve_mapp(self) -> list[tuple[str, str]]:
+        return manifest.resolve(self.pkg_full_name, warn=False) or []
+
+    def _encrypt(self, sources: list[str], on_line, cancel) -> tuple[int, int]:
+        if not sources:
+            return 0, 0
+        return buildcache.incremental_gen(self.pkg_full_name, self.output_root, self.cwd, self.cache_dir,
+                                          self.silent, self.timeout, on_line=on_line, cancel=cancel,
+                                          sources=sources)
+
+    def _sync_mapp(self, files: list[tuple[str, str]], cancel) -> int:
+        if not files:
+            return 0
+        copied, _ = manifest.execute(files, self.pkg_output, self.mapp_mode, cancel=cancel)
+        return copied
+
+    def sync(self, on_line=None, cancel: packer.CancelToken | None = None) -> LiveUpdate:
+        """重建实时输出目录：全部 .py 经构建缓存加密，再拷贝 mapp.txt 内容"""
+        t0 = time.perf_counter()
+        snap = self.snapshot()
+        with tracing.span("live.sync", package=self.pkg_name):
+            if os.path.isdir(self.output_root):
+                shutil.rmtree(self.output_root)
+            files = self._resolve_mapp()
+            mapp = {rel for _, rel in files}
+            sources = [rel for rel in buildcache.list_sources(self.pkg_full_name) if rel not in mapp]
+            cached, encrypted = self._encrypt(sources, on_line, cancel)
+            synced = self._sync_mapp(files, cancel)
+        self._snapshot, self._mapp = snap, mapp
+        result = LiveUpdate(encrypted, cached, 0, synced, time.perf_counter() - t0)
+        logger.info(f"实时输出已建立：{self.output_root}，{result.describe()}")
+        return result
+
+    def update(self, snap: dict[str, tuple[int, int]] | None = None, on_line=None,
+               cancel: packer.CancelToken | None = None) -> LiveUpdate:
+        """与上一次的快照比较，只处理变化的文件；没有变化时返回空结果"""
+        t0 = time.perf_counter()
+        snap = self.snapshot() if snap is None else snap
+        old = self._snapshot
+        changed = {rel for rel, st in snap.items() if old.get(rel) != st}
+        removed = set(old) - set(snap)
+        if not changed and not removed:
+            return LiveUpdate()
+
+        with tracing.span("live.update", package=self.pkg_name, changed=len(changed), removed=len(removed)):
+            files = self._resolve_mapp()
+            mapp = {rel for _, rel in files}
+            dropped = self._mapp - mapp
+            # 不再被 mapp.txt 覆盖的 .py 需要重新加密，其余不再指定的文件从输出中删除
+            sources = sorted(rel for rel in changed | dropped
+                             if rel.endswith(".py") and rel in snap and rel not in mapp and not rel.startswith("../"))
+            stale = removed | {rel for rel in dropped if not rel.endswith(".py") or rel not in snap}
+            removed_count = 0
+            for rel in stale - mapp:
+                path = os.path.join(self.pkg_output, rel)
+                if os.path.isfile(path):
+                    os.remove(path)
+                    removed_count += 1
+            cached, encrypted = self._encrypt(sources, on_line, cancel)
+            synced = self._sync_mapp(files, cancel)
+        # pyarmor 失败时上面已抛出异常，不更新快照，下次变化时重试
+        self._snapshot, self._mapp = snap, mapp
+        result = LiveUpdate(encrypted, cached, removed_count, synced, time.perf_counter() - t0)
+        if result.changed:
+            logger.info(f"实时输出已更新：{result.describe()}")
+        return result
+
+
+def poll(live: LiveBuild, interval: float = POLL_INTERVAL, debounce: float = DEBOUNCE,
+         on_update=None, on_error=None, on_line=None, cancel: packer.CancelToken | None = None):
+    """
+    轮询模式（不依赖 inotify）：先 sync()，之后每 interval 秒比较一次快照，
+    发现变化后等到 debounce 秒内不再变化（编辑器保存、git checkout 等成批写入）再 update()。
+    on_update(LiveUpdate) / on_error(异常) 为可选回调，出错后继续监视；cancel 取消后返回
+    """
+    cancel = cancel or packer.CancelToken()
+    live.sync(on_line=on_line, cancel=cancel)
+    while not cancel.cancelled:
+        time.sleep(interval)
+        snap = live.snapshot()
+        if snap == live._snapshot:
+            continue
+        while not cancel.cancelled:
+            time.sleep(debounce)
+            again = live.snapshot()
+            if again == snap:
+                break
+            snap = again
+        try:
+            result = live.update(snap, on_line=on_line, cancel=cancel)
+        except packer.CancelledError:
+            return
+        except Exception as e:  # noqa: BLE001
+            logger.error(f"实时输出更新失败（保存后重试）：{e}")
+            if on_error:
+                on_error(e)
+            continue
+        if on_update and result.changed:
+            on_update(result)
@@ -0,0 +1,101 @@
+"""
+后台流水线线程
+
+在 QThread 中执行加密/拷贝/压缩等耗时阶段，避免阻塞界面：
+- pyarmor 输出逐行写入有界环形缓冲区，由界面定时批量取出显示；
+- 各阶段进度经节流后通过信号上报；
+- cancel() 终止正在运行的 pyarmor 进程树，并在下一个检查点中止流程。
+"""
+import os
+import time
+from collections import deque
+from PySide6 import QtCore
+from loguru import logger
+from . import packer
+from . import scanner
+from . import tracing
+
+
+class PipelineWorker(QtCore.QThread):
+    # 阶段名, 已完成数, 总数（总数为 0 表示进度未知）
+    progress = QtCore.Signal(str, int, int)
+    succeeded = QtCore.Signal(object)
+    failed = QtCore.Signal(str)
+    cancelled = QtCore.Signal()
+
+    # 进度信号最短间隔（秒）
+    PROGRESS_INTERVAL = 0.1
+
+    def __init__(self, fn, parent=None, trace_base: str | None = None):
+        """
+        fn(worker) -> 结果：在后台线程中执行，可使用 worker.on_line / worker.stage() / worker.cancel_token
+        trace_base 不为空时记录各阶段耗时，结束后写出 <trace_base>.trace.json / .summary.json
+        """
+        super().__init__(parent)
+        self._fn = fn
+        self.trace_base = trace_base
+        self.lines: deque[str] = deque(maxlen=packer.OUTPUT_RING_LINES)
+        self.cancel_token = packer.CancelToken()
+
+    def on_line(self, line: str):
+        """pyarmor 输出行回调（后台线程中调用）"""
+        self.lines.append(line)
+        logger.info(f"[pyarmor] {line}")
+
+    def drain_lines(self) -> list[str]:
+        """取出缓冲区中的全部输出行（界面线程中调用）"""
+        out = []
+        while self.lines:
+            out.append(self.lines.popleft())
+        return out
+
+    def stage(self, name: str, total: int = 0):
+        """进入新阶段并返回该阶段的节流进度回调 progress(done, total)"""
+        self.progress.emit(name, 0, total)
+        last = [0.0]
+
+        def _progress(done: int, total: int):
+            now = time.monotonic()
+            if done < total and now - last[0] < self.PROGRESS_INTERVAL:
+                return
+            last[0] = now
+            self.progress.emit(name, done, total)
+
+        return _progress
+
+    def cancel(self):
+        self.cancel_token.cancel()
+
+    def run(self):
+        try:
+            with tracing.session(self.trace_base is not None) as tracer:
+                try:
+                    result = self._fn(self)
+                finally:
+                    if tracer is not None:
+                        tracer.write(self.trace_base)
+        except packer.CancelledError:
+            logger.warning("后台任务已取消")
+            self.cancelled.emit()
+        except Exception as e:  # noqa: BLE001
+            logger.exception(f"后台任务失败: {e}")
+            self.failed.emit(str(e))
+        else:
+            self.succeeded.emit(result)
+
+
+class ScanWorker(PipelineWorker):
+    """后台扫描线程：扫描结果分批通过 batch 信号上报，完成后 succeeded 携带全部结果"""
+    batch = QtCore.Signal(list)
+
+    def __init__(self, root_path: str, options: scanner.ScanOptions | None = None, trace: bool = False,
+                 parent=None):
+        # 计时文件写在扫描快照旁
+        trace_base = os.path.splitext(scanner.snapshot_path(root_path))[0] if trace else None
+        super().__init__(self._scan, parent, trace_base)
+        self.root_path = root_path
+        self.options = options
+
+    def _scan(self, w: "ScanWorker"):
+        return scanner.scan_rows(self.root_path, on_batch=self.batch.emit, cancel=self.cancel_token,
+                                 options=self.options)